@@ -1,7 +1,7 @@
 import json
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView, View
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, Http404
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import models
@@ -12,8 +12,11 @@ from datetime import timedelta
 
 from .models import User, Profile
 from .forms import ProfileForm, PasswordChangeForm
+from .services import CabinetFilesService
 from apps.loyalty.models import LoyaltyAccount, LoyaltyTier
 from apps.content.models import Course, Material, UserCourseProgress, Favorite
+from apps.content.progress import mark_material
+from apps.core.downloads import serve_file
 try:
     from apps.payments.models import Payment
 except ImportError:
@@ -145,93 +148,8 @@ class CabinetView(LoginRequiredMixin, TemplateView):
     
     def _get_files_context(self, user, active_subscription):
         """Контекст для вкладки файлів"""
-        context = {}
-        
         # TODO: Доступні курси через підписку (нова система)
-        accessible_courses = []
-        
-        # Прогрес по курсах
-        progress_map = {
-            p.course_id: p for p in user.course_progress.filter(
-                course__in=accessible_courses
-            ).select_related('course').prefetch_related('materials_completed')
-        }
-        
-        # Підготувати дані для відображення матеріалів
-        materials_data = []
-        for course in accessible_courses:
-            progress = progress_map.get(course.id)
-            for material in course.materials.all()[:6]:  # Показати перші 6 матеріалів як на дизайні
-                material_progress = 0
-                is_completed = False
-                
-                if progress:
-                    is_completed = material in progress.materials_completed.all()
-                    if is_completed:
-                        material_progress = 100
-                    elif progress.progress_percentage > 0:
-                        # Припустимий прогрес для поточного матеріалу
-                        completed_count = progress.materials_completed.count()
-                        total_materials = course.materials.count()
-                        if total_materials > 0:
-                            material_progress = min(85, (completed_count / total_materials) * 100)
-                
-                # Визначити тип контенту
-                content_type_display = "PDF / Відео"
-                if material.content_type == 'video':
-                    content_type_display = "Відео"
-                elif material.content_type == 'pdf':
-                    content_type_display = "PDF"
-                elif material.content_type == 'article':
-                    content_type_display = "Стаття"
-                
-                # Перевірка доступу (TODO: нова система підписок)
-                has_access = False
-                purchased_separately = False
-                
-                materials_data.append({
-                    'id': material.id,
-                    'title': material.title,
-                    'course_title': course.title,
-                    'content_type': content_type_display,
-                    'progress': material_progress,
-                    'is_completed': is_completed,
-                    'is_favorite': user.favorites.filter(course=course).exists(),
-                    'can_download': material.content_type in ['pdf', 'video'] and material_progress > 0,
-                    'course_id': course.id,
-                    'has_access': has_access,
-                    'purchased_separately': purchased_separately,
-                })
-        
-        context['materials'] = materials_data
-        context['accessible_courses'] = accessible_courses
-        
-        # Підготувати дані курсів з прогресом
-        courses_data = []
-        for course in accessible_courses:
-            progress = progress_map.get(course.id)
-            progress_percentage = progress.progress_percentage if progress else 0
-            
-            courses_data.append({
-                'id': course.id,
-                'title': course.title,
-                'progress_percentage': progress_percentage,
-                'is_completed': progress.completed if progress else False,
-                'total_materials': course.materials.count(),
-                'completed_materials': progress.materials_completed.count() if progress else 0
-            })
-        
-        context['user_courses'] = courses_data
-        
-        # Статистика файлів
-        context['files_stats'] = {
-            'total_materials': len(materials_data),
-            'completed_materials': sum(1 for m in materials_data if m['is_completed']),
-            'in_progress_materials': sum(1 for m in materials_data if 0 < m['progress'] < 100),
-            'favorite_courses': user.favorites.count(),
-        }
-        
-        return context
+        return CabinetFilesService(user).load()
     
     def _get_loyalty_context(self, user, loyalty_account):
         """Контекст для вкладки лояльності"""
@@ -509,27 +427,14 @@ class UpdateMaterialProgressView(LoginRequiredMixin, View):
                 return JsonResponse({'success': False, 'message': 'Не вказано ID матеріалу'})
             
             material = get_object_or_404(Material, id=material_id)
-            course = material.course
             
-            # Отримати або створити прогрес курсу
-            progress, created = UserCourseProgress.objects.get_or_create(
-                user=request.user,
-                course=course
-            )
-            
-            # Оновити прогрес матеріалу
-            if completed:
-                progress.materials_completed.add(material)
-            else:
-                progress.materials_completed.remove(material)
-            
-            # Оновити загальний прогрес
-            progress.update_progress()
+            # Оновити прогрес матеріалу і курсу (атомарний лічильник)
+            state = mark_material(request.user, material, completed)
             
             return JsonResponse({
                 'success': True,
                 'completed': completed,
-                'course_progress': float(progress.progress_percentage),
+                'course_progress': state['progress_percentage'],
                 'message': f'Прогрес {"оновлено" if completed else "скинуто"}'
             })
         
@@ -564,14 +469,8 @@ class DownloadMaterialView(LoginRequiredMixin, View):
             else:
                 raise Http404("Файл недоступний для завантаження")
             
-            # Відправити файл
-            response = HttpResponse(
-                file_field.read(),
-                content_type='application/octet-stream'
-            )
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            return response
+            # Відправити файл потоком (Range для докачки) або через вебсервер
+            return serve_file(request, file_field, filename)
         
         except Exception as e:
             raise Http404(f"Помилка завантаження: {str(e)}")
@@ -1,5 +1,5 @@
 """
-Email services for accounts app
+Services for accounts app (email verification, cabinet data)
 """
 import random
 from datetime import timedelta
@@ -102,3 +102,125 @@ class EmailService:
             logger = logging.getLogger(__name__)
             logger.error(f"Failed to send reminder email to {user.email}: {e}")
             return False
+
+
+class CabinetFilesService:
+    """
+    Дані вкладки "Файли" кабінету фіксованою кількістю запитів
+    (курси, перші матеріали, кількість матеріалів, прогрес, пройдені матеріали, обране)
+    незалежно від кількості курсів і матеріалів; view model збирається в пам'яті
+    """
+    
+    MATERIALS_PER_COURSE = 6  # Як на дизайні
+    
+    CONTENT_TYPE_LABELS = {
+        'video': 'Відео',
+        'pdf': 'PDF',
+        'article': 'Стаття',
+    }
+    
+    def __init__(self, user):
+        self.user = user
+    
+    def _first_materials(self, course_ids):
+        """Перші N матеріалів кожного курсу одним запитом (ROW_NUMBER по курсу)"""
+        from django.db.models import F, Window
+        from django.db.models.functions import RowNumber
+        from apps.content.models import Material
+        
+        return Material.objects.filter(course_id__in=course_ids).annotate(
+            position=Window(
+                RowNumber(), partition_by=[F('course_id')], order_by=[F('order').asc(), F('created_at').asc()]
+            )
+        ).filter(position__lte=self.MATERIALS_PER_COURSE).only(
+            'id', 'course_id', 'title', 'content_type', 'order', 'created_at'
+        ).order_by('course_id', 'position')
+    
+    def load(self):
+        from django.db.models import Count
+        from apps.content.entitlements import get_entitled_ids
+        from apps.content.models import Material, UserCourseProgress
+        from apps.content.utils import get_user_accessible_courses
+        
+        user = self.user
+        courses = list(get_user_accessible_courses(user).only('id', 'title', 'is_free'))
+        course_ids = [course.id for course in courses]
+        purchased_ids = get_entitled_ids(user, 'course')
+        
+        materials_by_course = {}
+        for material in self._first_materials(course_ids):
+            materials_by_course.setdefault(material.course_id, []).append(material)
+        
+        material_counts = dict(
+            Material.objects.filter(course_id__in=course_ids)
+            .values('course_id').annotate(count=Count('id')).values_list('course_id', 'count')
+        )
+        
+        progress_map = {
+            progress.course_id: progress
+            for progress in UserCourseProgress.objects.filter(user=user, course_id__in=course_ids).only(
+                'id', 'course_id', 'progress_percentage', 'completed_at'
+            )
+        }
+        
+        completed_ids = {}
+        completed_rows = UserCourseProgress.materials_completed.through.objects.filter(
+            usercourseprogress_id__in=[progress.id for progress in progress_map.values()]
+        ).values_list('usercourseprogress__course_id', 'material_id')
+        for course_id, material_id in completed_rows:
+            completed_ids.setdefault(course_id, set()).add(material_id)
+        
+        favorite_ids = set(user.favorites.values_list('course_id', flat=True))
+        
+        materials_data = []
+        courses_data = []
+        for course in courses:
+            progress = progress_map.get(course.id)
+            completed = completed_ids.get(course.id, set())
+            total_materials = material_counts.get(course.id, 0)
+            
+            for material in materials_by_course.get(course.id, []):
+                material_progress = 0
+                is_completed = material.id in completed
+                
+                if progress:
+                    if is_completed:
+                        material_progress = 100
+                    elif progress.progress_percentage > 0 and total_materials > 0:
+                        # Припустимий прогрес для поточного матеріалу
+                        material_progress = min(85, (len(completed) / total_materials) * 100)
+                
+                materials_data.append({
+                    'id': material.id,
+                    'title': material.title,
+                    'course_title': course.title,
+                    'content_type': self.CONTENT_TYPE_LABELS.get(material.content_type, 'PDF / Відео'),
+                    'progress': material_progress,
+                    'is_completed': is_completed,
+                    'is_favorite': course.id in favorite_ids,
+                    'can_download': material.content_type in ['pdf', 'video'] and material_progress > 0,
+                    'course_id': course.id,
+                    'has_access': True,  # Курс зі списку доступних
+                    'purchased_separately': course.id in purchased_ids and not course.is_free,
+                })
+            
+            courses_data.append({
+                'id': course.id,
+                'title': course.title,
+                'progress_percentage': progress.progress_percentage if progress else 0,
+                'is_completed': bool(progress and progress.completed_at),
+                'total_materials': total_materials,
+                'completed_materials': len(completed),
+            })
+        
+        return {
+            'materials': materials_data,
+            'accessible_courses': courses,
+            'user_courses': courses_data,
+            'files_stats': {
+                'total_materials': len(materials_data),
+                'completed_materials': sum(1 for m in materials_data if m['is_completed']),
+                'in_progress_materials': sum(1 for m in materials_data if 0 < m['progress'] < 100),
+                'favorite_courses': len(favorite_ids),
+            },
+        }
@@ -0,0 +1,108 @@
+"""
+Test cabinet files tab - fixed number of queries for any library size
+"""
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.services import CabinetFilesService
+from apps.content.models import Course, Favorite, Material, UserCourseProgress, UserEntitlement
+
+
+def build_library(user, courses, materials):
+    """
+    Курси з матеріалами: кожен четвертий безкоштовний, решта куплені;
+    у парних курсах прогрес з пройденими i % materials матеріалами, кожен третій в обраному
+    """
+    for i in range(courses):
+        course = Course.objects.create(
+            title=f'Курс {i}', slug=f'course-{i}', description='Опис', short_description='Коротко',
+            price=Decimal('500'), is_published=True, is_free=i % 4 == 0,
+        )
+        Material.objects.bulk_create([
+            Material(course=course, title=f'Урок {n}', slug=f'lesson-{n}', order=n,
+                     content_type=['video', 'pdf', 'article'][n % 3])
+            for n in range(materials)
+        ])
+        if not course.is_free:
+            UserEntitlement.objects.create(user=user, item_type='course', item_id=course.id, source='manual')
+        if i % 2 == 0:
+            progress = UserCourseProgress.objects.create(user=user, course=course, progress_percentage=40)
+            progress.materials_completed.add(*course.materials.all()[:i % materials])
+        if i % 3 == 0:
+            Favorite.objects.create(user=user, course=course)
+
+
+def load(user):
+    """Новий об'єкт користувача (без пам'яті прав) і кількість запитів"""
+    user = type(user).objects.get(pk=user.pk)
+    with CaptureQueriesContext(connection) as ctx:
+        data = CabinetFilesService(user).load()
+    return data, len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestCabinetFilesService:
+    """Test the files tab view model"""
+
+    def test_view_model(self, user):
+        build_library(user, courses=3, materials=8)
+        Course.objects.create(
+            title='Чужий', slug='other', description='Опис', short_description='Коротко',
+            price=Decimal('500'), is_published=True,
+        )
+
+        data, _ = load(user)
+        courses = {course['title']: course for course in data['user_courses']}
+        assert set(courses) == {'Курс 0', 'Курс 1', 'Курс 2'}
+        assert courses['Курс 2']['completed_materials'] == 2
+        assert courses['Курс 2']['total_materials'] == 8
+        assert courses['Курс 1']['progress_percentage'] == 0
+
+        course_2 = [m for m in data['materials'] if m['course_title'] == 'Курс 2']
+        assert [m['title'] for m in course_2] == [f'Урок {n}' for n in range(6)]
+        assert [m['is_completed'] for m in course_2] == [True, True, False, False, False, False]
+        assert course_2[0]['progress'] == 100
+        assert course_2[2]['progress'] == 25  # 2 з 8 пройдено
+        assert course_2[0]['content_type'] == 'Відео'
+        assert course_2[0]['purchased_separately'] is True
+
+        course_0 = [m for m in data['materials'] if m['course_title'] == 'Курс 0']
+        assert course_0[0]['is_favorite'] is True
+        assert course_0[0]['purchased_separately'] is False
+        assert data['files_stats'] == {
+            'total_materials': 18,
+            'completed_materials': 2,
+            'in_progress_materials': 4,
+            'favorite_courses': 1,
+        }
+
+    def test_query_count_is_fixed(self, user, django_user_model):
+        build_library(user, courses=2, materials=3)
+        _, small_queries = load(user)
+
+        other = django_user_model.objects.create_user(
+            username='big', email='big@test.com', password='test123!@#'
+        )
+        Course.objects.all().delete()
+        build_library(other, courses=20, materials=30)
+        data, large_queries = load(other)
+
+        assert len(data['user_courses']) == 20
+        assert len(data['materials']) == 20 * CabinetFilesService.MATERIALS_PER_COURSE
+        # Права, курси, перші матеріали, кількість матеріалів, прогрес, пройдені, обране
+        assert small_queries == large_queries == 7
+
+    def test_files_tab_page(self, client, user, no_silk):
+        build_library(user, courses=20, materials=30)
+        client.force_login(user)
+
+        client.get('/account/files/')  # рахунок лояльності створюється при першому візиті
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/account/files/')
+        assert response.status_code == 200
+        assert len(response.context['materials']) == 120
+        # Сесія, користувач, профіль, лояльність + 7 запитів вкладки
+        assert len(ctx.captured_queries) == 12
@@ -0,0 +1,235 @@
+"""
+Analytics services
+Buffered, batched page-view ingestion
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Мінімальний запис, який middleware кладе в чергу (без ORM об'єктів)
+PageViewRecord = namedtuple('PageViewRecord', [
+    'user_id', 'session_key', 'path', 'ip_address', 'user_agent',
+])
+
+
+def write_page_views(records):
+    """
+    Записати пачку переглядів: UserSession (get/bulk create) + bulk_create PageView
+
+    Args:
+        records: list[PageViewRecord]
+
+    Returns:
+        int: Кількість створених PageView
+    """
+    from .models import UserSession, PageView
+
+    session_ids = {record.session_key for record in records}
+    sessions = {
+        s.session_id: s
+        for s in UserSession.objects.filter(session_id__in=session_ids)
+    }
+
+    new_sessions = {}
+    for record in records:
+        if record.session_key not in sessions and record.session_key not in new_sessions:
+            new_sessions[record.session_key] = UserSession(
+                user_id=record.user_id,
+                session_id=record.session_key,
+                ip_address=record.ip_address or '0.0.0.0',
+                user_agent=record.user_agent,
+            )
+    if new_sessions:
+        UserSession.objects.bulk_create(new_sessions.values())
+        # Не всі БД повертають pk з bulk_create - дочитуємо
+        sessions.update({
+            s.session_id: s
+            for s in UserSession.objects.filter(session_id__in=new_sessions.keys())
+        })
+
+    page_views = [
+        PageView(session=sessions[record.session_key], path=record.path[:500])
+        for record in records
+        if record.session_key in sessions
+    ]
+    PageView.objects.bulk_create(page_views)
+    return len(page_views)
+
+
+_STOP = object()  # Sentinel для зупинки фонового потоку
+
+
+class PageViewBuffer:
+    """
+    In-process черга переглядів з фоновим flush через bulk_create
+
+    Middleware тільки кладе PageViewRecord в чергу (без запитів до БД).
+    Фоновий потік пише пачку, коли набирається max_batch записів або минає
+    flush_interval_ms з моменту першого запису в пачці. При зупинці процесу
+    черга дописується (atexit). Якщо черга переповнена - запис відкидається.
+
+    Usage:
+        page_view_buffer.enqueue(PageViewRecord(...))
+        page_view_buffer.get_stats()
+        # {'enqueued': 10, 'flushed': 10, 'dropped': 0, 'pending': 0}
+    """
+
+    def __init__(self, max_batch=200, flush_interval_ms=1000, max_queue=10000, writer=write_page_views):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.writer = writer
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Нова черга і потік (також після fork gunicorn воркера)"""
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='pageview-flusher', daemon=True
+                )
+                self._thread.start()
+
+    def enqueue(self, record):
+        """
+        Додати запис в чергу (non-blocking)
+
+        Returns:
+            bool: False якщо запис відкинуто (черга переповнена)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def _drain(self):
+        """Забрати з черги до max_batch записів без очікування"""
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                batch.append(record)
+        return batch
+
+    def _write(self, batch):
+        try:
+            written = self.writer(batch)
+        except Exception as e:
+            written = 0
+            logger.error(f"Page view flush failed, {len(batch)} records dropped: {e}")
+
+        with self._stats_lock:
+            self.flushed += written
+            self.dropped += len(batch) - written
+        return written
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stop_event.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [] if first is _STOP else [first]
+
+            # Добираємо пачку до max_batch, але не довше flush_interval
+            deadline = time.monotonic() + self.flush_interval
+            while batch and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    break
+                batch.append(record)
+
+            if batch:
+                self._write(batch)
+                close_old_connections()
+
+    def flush(self):
+        """
+        Синхронно дописати все, що є в черзі
+
+        Returns:
+            int: Кількість записаних PageView
+        """
+        written = 0
+        while True:
+            batch = self._drain()
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def stop(self, timeout=5):
+        """Зупинити фоновий потік і дописати чергу (drain on shutdown)"""
+        if self._pid != os.getpid():
+            return
+        self._stop_event.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(_STOP)  # Розбудити потік, що чекає на пачку
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        stats = self.get_stats()
+        if stats['enqueued']:
+            logger.info(f"Page view buffer stopped: {stats}")
+
+    def get_stats(self):
+        """Лічильники: enqueued, flushed, dropped, pending"""
+        with self._stats_lock:
+            return {
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'pending': self._queue.qsize(),
+            }
+
+
+page_view_buffer = PageViewBuffer(
+    max_batch=getattr(settings, 'ANALYTICS_PAGEVIEW_BATCH_SIZE', 200),
+    flush_interval_ms=getattr(settings, 'ANALYTICS_PAGEVIEW_FLUSH_MS', 1000),
+    max_queue=getattr(settings, 'ANALYTICS_PAGEVIEW_MAX_QUEUE', 10000),
+)
+atexit.register(page_view_buffer.stop)
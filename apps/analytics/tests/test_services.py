@@ -0,0 +1,119 @@
+"""
+Test batched page-view ingestion
+"""
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.analytics.services import PageViewBuffer, PageViewRecord, write_page_views
+
+
+def make_record(n, session_key='sess-1'):
+    return PageViewRecord(
+        user_id=None,
+        session_key=session_key,
+        path=f'/hub/course-{n}/',
+        ip_address='10.0.0.1',
+        user_agent='pytest',
+    )
+
+
+class CollectingWriter:
+    """Writer stub - запам'ятовує пачки замість запису в БД"""
+
+    def __init__(self):
+        self.batches = []
+        self.event = threading.Event()
+
+    def __call__(self, batch):
+        self.batches.append(list(batch))
+        self.event.set()
+        return len(batch)
+
+
+@pytest.mark.unit
+class TestPageViewBuffer:
+    """Test buffering, flush triggers and counters"""
+
+    def test_flushes_when_batch_is_full(self):
+        writer = CollectingWriter()
+        buffer = PageViewBuffer(max_batch=5, flush_interval_ms=10000, writer=writer)
+
+        for n in range(5):
+            buffer.enqueue(make_record(n))
+
+        assert writer.event.wait(2)
+        assert [len(b) for b in writer.batches] == [5]
+        buffer.stop()
+
+    def test_flushes_after_interval(self):
+        writer = CollectingWriter()
+        buffer = PageViewBuffer(max_batch=100, flush_interval_ms=50, writer=writer)
+
+        start = time.monotonic()
+        buffer.enqueue(make_record(1))
+        buffer.enqueue(make_record(2))
+
+        assert writer.event.wait(2)
+        assert time.monotonic() - start < 1
+        assert sum(len(b) for b in writer.batches) == 2
+        buffer.stop()
+
+    def test_drops_when_queue_full(self):
+        writer = CollectingWriter()
+        buffer = PageViewBuffer(max_batch=100, flush_interval_ms=10000, max_queue=2, writer=writer)
+        buffer._ensure_started = lambda: None  # Без фонового потоку
+
+        assert buffer.enqueue(make_record(1)) is True
+        assert buffer.enqueue(make_record(2)) is True
+        assert buffer.enqueue(make_record(3)) is False
+
+        assert buffer.flush() == 2
+        assert buffer.get_stats() == {'enqueued': 2, 'flushed': 2, 'dropped': 1, 'pending': 0}
+
+    def test_stop_drains_queue(self):
+        writer = CollectingWriter()
+        buffer = PageViewBuffer(max_batch=1000, flush_interval_ms=60000, writer=writer)
+
+        for n in range(10):
+            buffer.enqueue(make_record(n))
+        buffer.stop(timeout=2)
+
+        assert sum(len(b) for b in writer.batches) == 10
+        assert buffer.get_stats()['pending'] == 0
+
+    def test_writer_errors_count_as_dropped(self):
+        def broken_writer(batch):
+            raise RuntimeError('db down')
+
+        buffer = PageViewBuffer(writer=broken_writer)
+        buffer._ensure_started = lambda: None
+        buffer.enqueue(make_record(1))
+
+        assert buffer.flush() == 0
+        assert buffer.get_stats()['dropped'] == 1
+
+
+@pytest.mark.django_db
+class TestWritePageViews:
+    """Test bulk writer"""
+
+    def test_bulk_writes_batch(self):
+        from apps.analytics.models import PageView, UserSession
+
+        records = [make_record(n, session_key=f'sess-{n % 3}') for n in range(30)]
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert write_page_views(records) == 30
+
+        # select sessions, bulk insert sessions, re-read sessions, bulk insert page views
+        assert len(ctx.captured_queries) <= 5
+        assert UserSession.objects.count() == 3
+        assert PageView.objects.count() == 30
+
+        # Повторна пачка перевикористовує існуючі сесії
+        write_page_views(records[:3])
+        assert UserSession.objects.count() == 3
@@ -148,6 +148,14 @@ class CartService:
         if existing_item:
             return False, "Квиток на цей івент вже в кошику"
         
+        # Резерв місця на час оформлення (тільки для авторизованих)
+        if self.user:
+            from apps.events.inventory import SoldOut, hold_seat
+            try:
+                hold_seat(event, self.user, tier_name or '')
+            except SoldOut as e:
+                return False, e.message
+        
         # Determine price based on tier
         price = event.price
         tier_data = None
@@ -187,6 +195,8 @@ class CartService:
             item = self.cart.items.get(id=item_id)
             item_name = item.item_name
             item.delete()
+            if item.item_type == 'event_ticket':
+                self._release_ticket_holds([item.item_id])
             return True, f"'{item_name}' видалено з кошика"
         except CartItem.DoesNotExist:
             return False, "Товар не знайдено в кошику"
@@ -212,9 +222,20 @@ class CartService:
     
     def clear(self):
         """Clear all items from cart"""
+        event_ids = list(self.cart.items.filter(item_type='event_ticket').values_list('item_id', flat=True))
         self.cart.clear()
+        self._release_ticket_holds(event_ids)
         return True, "Кошик очищено"
     
+    def _release_ticket_holds(self, event_ids):
+        """Повернути зарезервовані місця квитків, прибраних з кошика"""
+        if not self.user or not event_ids:
+            return
+        from apps.events.inventory import release_hold
+        from apps.events.models import Event
+        for event in Event.objects.filter(id__in=event_ids).only('id'):
+            release_hold(event, self.user)
+    
     def get_total(self):
         """Get cart total"""
         return self.cart.get_total()
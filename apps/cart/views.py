@@ -21,7 +21,7 @@ class CartView(TemplateView):
         cart = cart_service.cart
         
         context['cart'] = cart
-        context['cart_items'] = cart.items.all()
+        context['cart_items'] = cart_items = list(cart.items.all())
         context['cart_subtotal'] = cart.get_subtotal()
         context['cart_discount'] = cart.discount_amount
         context['cart_tips'] = cart.tips_amount
@@ -32,6 +32,19 @@ class CartView(TemplateView):
             context['applied_coupon'] = cart.applied_coupon
             context['discount_percentage'] = cart.get_discount_percentage()
         
+        # Бали лояльності: за кожен курс та за все замовлення (підписки окремо)
+        from apps.loyalty.services import LoyaltyService
+        prices = {
+            item.id: item.get_total()
+            for item in cart_items if item.item_type != 'subscription'
+        }
+        context['item_points'] = LoyaltyService.get_points_for_courses_display(prices, self.request.user)
+        purchase_amount = sum(prices.values())
+        context['cart_points_total'] = (
+            LoyaltyService.get_points_for_course_display(purchase_amount, self.request.user)
+            if purchase_amount else 0
+        )
+        
         # Subscription suggestion
         suggestion_service = SubscriptionSuggestionService()
         if suggestion_service.should_show_suggestion(cart, self.request.user):
@@ -1,9 +1,6 @@
 """
 Context processor для визначення країни та теми
 """
-import geoip2.database
-from django.conf import settings
-import os
 
 
 def get_client_ip(request):
@@ -17,41 +14,47 @@ def get_client_ip(request):
 
 
 def get_country_code(request):
-    """Визначити країну по IP"""
+    """
+    Визначити країну по IP
+    
+    CountryDetectionMiddleware вже визначає request.country_code через
+    GeolocationService - використовуємо його. Якщо middleware не відпрацював
+    (наприклад, render поза звичайним request/response циклом) - той самий
+    GeolocationService зі спільним mmap reader та LRU.
+    """
+    country_code = getattr(request, 'country_code', None)
+    if country_code:
+        return country_code
+    
     try:
-        ip = get_client_ip(request)
-        
-        # Локальні IP = UA
-        if ip in ['127.0.0.1', 'localhost'] or ip.startswith('192.168.'):
-            return 'UA'
-        
-        # GeoIP lookup
-        geoip_path = os.path.join(settings.BASE_DIR, 'geoip', 'GeoLite2-Country.mmdb')
-        if os.path.exists(geoip_path):
-            with geoip2.database.Reader(geoip_path) as reader:
-                response = reader.country(ip)
-                return response.country.iso_code
-        
-        return 'UA'  # Fallback
+        from apps.core.services import GeolocationService
+        return GeolocationService.get_country_from_ip(get_client_ip(request))
     except Exception:
         return 'UA'  # Fallback при будь-якій помилці
 
 
-def site_content(request):
-    """
-    Додає country_code, theme та CMS контент в контекст всіх templates
-    """
-    # Визначити країну та тему
+def country_context(request):
+    """Країна користувача"""
     country_code = get_country_code(request)
+    return {
+        'country_code': country_code,
+        'is_ukraine': country_code == 'UA',
+    }
+
+
+def theme_context(request):
+    """Тема з cookie (light/dark)"""
     theme = request.COOKIES.get('theme', 'light')
     if theme not in ['light', 'dark']:
         theme = 'light'
-    
-    # Імпортувати CMS моделі
-    from apps.cms.models import HeroSlide, ExpertCard, FeaturedCourse
+    return {'theme': theme}
+
+
+def hero_slides_context(request):
+    """Hero Slides - кеш 5 хв"""
+    from apps.cms.models import HeroSlide
     from django.core.cache import cache
     
-    # Hero Slides - кеш 5 хв
     hero_slides = cache.get('cms_hero_slides')
     if hero_slides is None:
         hero_slides = list(
@@ -59,13 +62,35 @@ def site_content(request):
         )
         cache.set('cms_hero_slides', hero_slides, 60*5)
     
-    # Expert Cards - окремо для кожної сторінки (кеш 10 хв)
+    return {'cms_hero_slides': hero_slides}
+
+
+def _get_experts_home():
+    from apps.cms.models import ExpertCard
+    from django.core.cache import cache
+    
     experts_home = cache.get('cms_experts_home')
     if experts_home is None:
         experts_home = list(
             ExpertCard.objects.filter(is_active=True, show_on_home=True).order_by('order_home')
         )
         cache.set('cms_experts_home', experts_home, 60*10)
+    return experts_home
+
+
+def experts_home_context(request):
+    """Expert Cards для головної (кеш 10 хв)"""
+    experts_home = _get_experts_home()
+    return {
+        'cms_experts': experts_home,  # Backward compatibility
+        'cms_experts_home': experts_home,
+    }
+
+
+def experts_about_context(request):
+    """Expert Cards для сторінки About (кеш 10 хв)"""
+    from apps.cms.models import ExpertCard
+    from django.core.cache import cache
     
     experts_about = cache.get('cms_experts_about')
     if experts_about is None:
@@ -74,6 +99,14 @@ def site_content(request):
         )
         cache.set('cms_experts_about', experts_about, 60*10)
     
+    return {'cms_experts_about': experts_about}
+
+
+def experts_mentoring_context(request):
+    """Expert Cards для сторінки менторства (кеш 10 хв)"""
+    from apps.cms.models import ExpertCard
+    from django.core.cache import cache
+    
     experts_mentoring = cache.get('cms_experts_mentoring')
     if experts_mentoring is None:
         experts_mentoring = list(
@@ -81,13 +114,17 @@ def site_content(request):
         )
         # Fallback: якщо немає експертів з show_on_mentoring=True, використовуємо тих що на головній
         if not experts_mentoring:
-            experts_mentoring = experts_home
+            experts_mentoring = _get_experts_home()
         cache.set('cms_experts_mentoring', experts_mentoring, 60*10)
     
-    # Backward compatibility
-    experts = experts_home
+    return {'cms_experts_mentoring': experts_mentoring}
+
+
+def main_courses_context(request):
+    """Featured Courses для головної - кеш 5 хв"""
+    from apps.cms.models import FeaturedCourse
+    from django.core.cache import cache
     
-    # Featured Courses - кеш 5 хв
     main_courses = cache.get('cms_main_courses')
     if main_courses is None:
         featured = FeaturedCourse.objects.filter(
@@ -100,15 +137,26 @@ def site_content(request):
         ]
         cache.set('cms_main_courses', main_courses, 60*5)
     
-    return {
-        'country_code': country_code,
-        'theme': theme,
-        'is_ukraine': country_code == 'UA',
-        # CMS дані (можуть бути порожні списки якщо немає в БД):
-        'cms_hero_slides': hero_slides,
-        'cms_experts': experts,  # Backward compatibility
-        'cms_experts_home': experts_home,
-        'cms_experts_about': experts_about,
-        'cms_experts_mentoring': experts_mentoring,
-        'main_courses': main_courses,
-    }
+    return {'main_courses': main_courses}
+
+
+def site_content(request):
+    """
+    Додає country_code, theme та CMS контент в контекст всіх templates
+    
+    Eager-версія: у TEMPLATES підключено лінивий
+    apps.core.context_processors.site_context, який викликає частини нижче
+    тільки коли template їх реально використовує.
+    """
+    context = {}
+    for processor in (
+        country_context,
+        theme_context,
+        hero_slides_context,
+        experts_home_context,
+        experts_about_context,
+        experts_mentoring_context,
+        main_courses_context,
+    ):
+        context.update(processor(request))
+    return context
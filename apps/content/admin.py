@@ -3,7 +3,7 @@ from django.db import models
 from django.forms import TextInput, CheckboxSelectMultiple
 from django import forms
 import json
-from .models import Course, Material, UserCourseProgress, Favorite, MonthlyQuote
+from .models import Course, Material, UserCourseProgress, Favorite, MonthlyQuote, UserEntitlement
 
 
 class CourseAdminForm(forms.ModelForm):
@@ -324,6 +324,15 @@ class FavoriteAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(UserEntitlement)
+class UserEntitlementAdmin(admin.ModelAdmin):
+    list_display = ('user', 'item_type', 'item_id', 'source', 'source_id', 'valid_until', 'created_at')
+    list_filter = ('item_type', 'source')
+    search_fields = ('user__email',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('created_at',)
+
+
 @admin.register(MonthlyQuote)
 class MonthlyQuoteAdmin(admin.ModelAdmin):
     list_display = ['expert_name', 'expert_role', 'month', 'is_active', 'views_count']
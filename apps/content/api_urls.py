@@ -4,8 +4,13 @@ from . import api_views
 app_name = 'content_api'
 
 urlpatterns = [
+    # Courses (serializer context preloaded per page)
+    path('courses/', api_views.CourseListAPIView.as_view(), name='course_list'),
+    path('courses/<slug:slug>/', api_views.CourseDetailAPIView.as_view(), name='course_detail'),
+    
     # Material progress tracking
     path('material/progress/', api_views.MaterialProgressAPIView.as_view(), name='material_progress'),
+    path('material/progress/batch/', api_views.MaterialProgressBatchAPIView.as_view(), name='material_progress_batch'),
     
     # Course progress tracking  
     path('course/<int:course_id>/progress/', api_views.CourseProgressAPIView.as_view(), name='course_progress'),
@@ -1,10 +1,12 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from .models import Course, Material, UserCourseProgress
+from .progress import BATCH_MAX_EVENTS, apply_progress_events, get_material_count, mark_material
+from .serializers import CourseDetailSerializer, CourseSerializer, preload_course_context
 from .utils import check_user_course_access
 import json
 
@@ -52,8 +54,8 @@ class MaterialProgressAPIView(APIView):
             return Response({
                 'success': True,
                 'progress_percentage': float(progress.progress_percentage),
-                'materials_completed': progress.materials_completed.count(),
-                'total_materials': material.course.materials.count()
+                'materials_completed': progress.completed_count,
+                'total_materials': get_material_count(material.course_id)
             })
             
         except Material.DoesNotExist:
@@ -94,24 +96,10 @@ class CourseProgressAPIView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-            # Get or create progress
-            progress, created = UserCourseProgress.objects.get_or_create(
-                user=request.user,
-                course=course
-            )
-            
-            # Mark material as completed
-            progress.materials_completed.add(material)
-            progress.last_accessed = timezone.now()
-            progress.update_progress()
+            # Mark material as completed (атомарний лічильник)
+            state = mark_material(request.user, material)
         
-            return Response({
-                'success': True,
-                'progress_percentage': float(progress.progress_percentage),
-                'completed_count': progress.materials_completed.count(),
-                'total_count': course.materials.count(),
-                'is_completed': progress.progress_percentage >= 100
-            })
+            return Response({'success': True, **state})
             
         except (Course.DoesNotExist, Material.DoesNotExist):
             return Response(
@@ -125,6 +113,73 @@ class CourseProgressAPIView(APIView):
             )
 
 
+class MaterialProgressBatchAPIView(APIView):
+    """
+    Batch material progress events (offline/PWA sync)
+    
+    POST {"events": [{"material_id": 1, "completed": true}, ...]}
+    Events are applied in order (last one per material wins), one recount per course.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        events = request.data.get('events')
+        
+        if not isinstance(events, list) or not events:
+            return Response(
+                {'error': 'events list is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(events) > BATCH_MAX_EVENTS:
+            return Response(
+                {'error': f'Too many events (max {BATCH_MAX_EVENTS})'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        courses, rejected = apply_progress_events(
+            request.user, events,
+            has_access=lambda course: check_user_course_access(request.user, course)
+        )
+        
+        return Response({
+            'success': not rejected,
+            'courses': courses,
+            'rejected': rejected
+        })
+
+
+class CourseListAPIView(generics.ListAPIView):
+    """
+    Published courses, paginated
+    Дані користувача (обране, прогрес, доступ) - preload_course_context на сторінку
+    """
+    serializer_class = CourseSerializer
+    
+    def get_queryset(self):
+        return Course.objects.filter(is_published=True)
+    
+    def list(self, request, *args, **kwargs):
+        courses = list(self.paginate_queryset(self.get_queryset()))
+        context = preload_course_context(courses, request, self.get_serializer_context())
+        return self.get_paginated_response(CourseSerializer(courses, many=True, context=context).data)
+
+
+class CourseDetailAPIView(generics.RetrieveAPIView):
+    """
+    Course with materials and related courses
+    """
+    serializer_class = CourseDetailSerializer
+    lookup_field = 'slug'
+    
+    def get_queryset(self):
+        return Course.objects.filter(is_published=True).prefetch_related('materials')
+    
+    def retrieve(self, request, *args, **kwargs):
+        course = self.get_object()
+        context = preload_course_context([course], request, self.get_serializer_context())
+        return Response(CourseDetailSerializer(course, context=context).data)
+
+
 class SearchSuggestionsAPIView(APIView):
     """
     API view for search suggestions/autocomplete
@@ -135,20 +190,10 @@ class SearchSuggestionsAPIView(APIView):
         if len(query) < 2:
             return Response({'suggestions': []})
         
-        # Search in course titles and tags
-        courses = Course.objects.filter(
-            title__icontains=query,
-            is_published=True
-        ).values_list('title', flat=True)[:5]
-        
-        # Search in tags
-        from .models import Tag
-        tags = Tag.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        
-        # Combine suggestions
-        suggestions = list(courses) + list(tags)
+        # Prefix index over titles/authors/audiences/events (no DB query);
+        # промах індексу - порожній список, без запиту на кожне натискання
+        from .autocomplete import search_autocomplete
+        suggestions = [suggestion.text for suggestion in search_autocomplete.suggest(query, limit=8)]
         
         return Response({
             'suggestions': suggestions[:8],  # Limit to 8 suggestions
@@ -0,0 +1,245 @@
+"""
+Search autocomplete
+In-memory prefix index (sorted array + bisect) over course titles,
+authors, audience labels and event titles
+"""
+import bisect
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+
+AUTOCOMPLETE_VERSION_KEY = 'search_autocomplete_version'
+
+Suggestion = namedtuple('Suggestion', ['text', 'kind', 'score'])
+
+SPACES_RE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lowercase, unify apostrophes, collapse whitespace"""
+    text = (text or '').lower().replace('’', "'").replace('ʼ', "'")
+    return SPACES_RE.sub(' ', text).strip()
+
+
+def load_suggestions():
+    """
+    Suggestion candidates from the database
+
+    Score = popularity within its kind: course views, total views of an
+    author's courses, number of courses per audience, event tickets sold.
+    """
+    from apps.content.models import Course
+    from apps.events.models import Event
+
+    suggestions = []
+    authors = {}
+    audiences = {}
+    audience_labels = dict(Course.TARGET_AUDIENCE_CHOICES)
+
+    courses = Course.objects.filter(is_published=True).values_list(
+        'title', 'author', 'view_count', 'target_audience'
+    )
+    for title, author, view_count, target_audience in courses.iterator(chunk_size=2000):
+        suggestions.append(Suggestion(title, 'course', view_count))
+        if author:
+            authors[author] = authors.get(author, 0) + view_count
+        for code in target_audience or ():
+            label = audience_labels.get(code)
+            if label:
+                audiences[label] = audiences.get(label, 0) + 1
+
+    suggestions.extend(Suggestion(author, 'author', score) for author, score in authors.items())
+    suggestions.extend(Suggestion(label, 'audience', count) for label, count in audiences.items())
+
+    events = Event.objects.filter(status='published').values_list('title', 'tickets_sold')
+    suggestions.extend(Suggestion(title, 'event', tickets_sold) for title, tickets_sold in events)
+    return suggestions
+
+
+class AutocompleteIndex:
+    """
+    Prefix index for search-as-you-type
+
+    Every word start of every suggestion is a key in one sorted list
+    ("тренування воротарів" -> "тренування воротарів", "воротарів").
+    Suggestions are numbered by rank (score desc, text), so the top-k for a
+    prefix are simply the k smallest ids in its bisect range. Prefixes whose
+    range is longer than SCAN_LIMIT keys get precomputed top-k lists (an
+    implicit trie over the sorted keys), so a lookup never scans more than
+    SCAN_LIMIT keys.
+
+    The index is rebuilt lazily when AUTOCOMPLETE_VERSION_KEY changes
+    (Course/Event saves), checked at most once per VERSION_CHECK_INTERVAL.
+    One thread checks/rebuilds at a time; other threads keep serving the
+    current index instead of starting their own rebuild.
+
+    Usage:
+        search_autocomplete.suggest('ворот', limit=8)  # [Suggestion, ...]
+        search_autocomplete.get_stats()  # {'suggestions': ..., 'memory_bytes': ...}
+    """
+
+    SCAN_LIMIT = 64
+    TOP_K = 10
+    VERSION_CHECK_INTERVAL = 1.0
+
+    _unchecked = object()
+
+    def __init__(self, loader=load_suggestions):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._suggestions = []
+        self._keys = []
+        self._ids = array('I')
+        self._hot = {}
+        self._built = False
+        self._version = self._unchecked
+        self._next_check = 0.0
+
+    # Building
+
+    def build(self, suggestions):
+        """Build from (text, kind, score) items; duplicates keep the best score"""
+        best = {}
+        for text, kind, score in suggestions:
+            key = normalize(text)
+            if not key:
+                continue
+            current = best.get(key)
+            if current is None or score > current.score:
+                best[key] = Suggestion(text.strip(), kind, score)
+
+        ranked = sorted(best.items(), key=lambda item: (-item[1].score, item[0]))
+        pairs = []
+        for suggestion_id, (key, _) in enumerate(ranked):
+            words = key.split(' ')
+            for position in range(len(words)):
+                pairs.append((' '.join(words[position:]), suggestion_id))
+        pairs.sort()
+        keys = [key for key, _ in pairs]
+        ids = array('I', (suggestion_id for _, suggestion_id in pairs))
+        hot = self._hot_prefixes(keys, ids)
+
+        with self._lock:
+            self._suggestions = [suggestion for _, suggestion in ranked]
+            self._keys = keys
+            self._ids = ids
+            self._hot = hot
+            self._built = True
+
+    def _hot_prefixes(self, keys, ids):
+        """Top-k ids for every prefix matching more than SCAN_LIMIT keys"""
+        hot = {}
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, start, end = stack.pop()
+            if prefix:
+                hot[prefix] = tuple(heapq.nsmallest(self.TOP_K, set(ids[start:end])))
+            depth = len(prefix)
+            position = start
+            while position < end:
+                key = keys[position]
+                if len(key) == depth:
+                    position += 1
+                    continue
+                child = key[:depth + 1]
+                child_end = bisect.bisect_left(keys, child + '\uffff', position, end)
+                if child_end - position > self.SCAN_LIMIT:
+                    stack.append((child, position, child_end))
+                position = child_end
+        return hot
+
+    def rebuild(self):
+        from django.core.cache import cache
+
+        version = cache.get(AUTOCOMPLETE_VERSION_KEY)
+        start = time.perf_counter()
+        self.build(self.loader())
+        self._version = version
+        logger.debug(
+            f"Autocomplete index rebuilt: {len(self._suggestions)} suggestions "
+            f"in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+    def _ensure_fresh(self):
+        if self._built and time.monotonic() < self._next_check:
+            return
+        # Поки інший потік перевіряє/перебудовує - віддаємо поточний індекс;
+        # до першої побудови чекаємо на неї
+        if not self._refresh_lock.acquire(blocking=not self._built):
+            return
+        try:
+            now = time.monotonic()
+            if self._built and now < self._next_check:
+                return
+            self._next_check = now + self.VERSION_CHECK_INTERVAL
+
+            from django.core.cache import cache
+            if not self._built or cache.get(AUTOCOMPLETE_VERSION_KEY) != self._version:
+                self.rebuild()
+        finally:
+            self._refresh_lock.release()
+
+    # Querying
+
+    def suggest(self, query, limit=8):
+        """
+        Top suggestions whose text (or any word in it) starts with query
+
+        Returns:
+            list[Suggestion]: best first
+        """
+        self._ensure_fresh()
+        prefix = normalize(query)
+        if not prefix or limit <= 0:
+            return []
+
+        ids = self._hot.get(prefix)
+        if ids is not None and limit <= self.TOP_K:
+            ids = ids[:limit]
+        else:
+            keys = self._keys
+            start = bisect.bisect_left(keys, prefix)
+            end = bisect.bisect_left(keys, prefix + '\uffff', start)
+            ids = heapq.nsmallest(limit, set(self._ids[start:end]))
+
+        suggestions = self._suggestions
+        return [suggestions[suggestion_id] for suggestion_id in ids]
+
+    def get_stats(self):
+        """Sizes and approximate memory footprint (bytes)"""
+        memory = (
+            sys.getsizeof(self._suggestions)
+            + sum(sys.getsizeof(s) + sys.getsizeof(s.text) for s in self._suggestions)
+            + sys.getsizeof(self._keys) + sum(sys.getsizeof(key) for key in self._keys)
+            + sys.getsizeof(self._ids)
+            + sys.getsizeof(self._hot)
+            + sum(sys.getsizeof(prefix) + sys.getsizeof(ids) for prefix, ids in self._hot.items())
+        )
+        return {
+            'suggestions': len(self._suggestions),
+            'keys': len(self._keys),
+            'hot_prefixes': len(self._hot),
+            'memory_bytes': memory,
+        }
+
+
+search_autocomplete = AutocompleteIndex()
+
+
+def invalidate_autocomplete():
+    """Нова версія індексу автодоповнення (викликається при зміні Course/Event)"""
+    from django.core.cache import cache
+
+    try:
+        cache.incr(AUTOCOMPLETE_VERSION_KEY)
+    except ValueError:
+        cache.set(AUTOCOMPLETE_VERSION_KEY, 1, None)
@@ -0,0 +1,245 @@
+"""
+Entitlements - хто що має
+Права доступу матеріалізовані в UserEntitlement (заповнюються сигналами
+платежів і підписок) і кешуються на користувача як словник
+(item_type, item_id) -> valid_until, тож перевірка доступу - це lookup у словнику
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+ENTITLEMENTS_CACHE_KEY = 'user_entitlements:{user_id}'
+ENTITLEMENTS_CACHE_TTL = 60 * 60
+
+# Пам'ять у межах запиту (request.user)
+USER_MEMO_ATTR = '_entitlements'
+
+# Статуси платежу, при яких права від нього відкликаються
+REVOKED_PAYMENT_STATUSES = {'failed', 'cancelled', 'refunded'}
+
+# Підписки дають права через рядок Subscription, а не через позицію замовлення
+PAYMENT_ITEM_TYPES = ['course', 'event_ticket']
+
+
+def _expires_at(valid_until):
+    return valid_until.timestamp() if valid_until is not None else None
+
+
+def load_user_entitlements(user_id):
+    """
+    Дійсні права користувача з БД
+
+    Returns:
+        dict: {(item_type, item_id): timestamp кінця дії або None (безстроково)}
+    """
+    from .models import UserEntitlement
+
+    rows = UserEntitlement.objects.filter(user_id=user_id).filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gt=timezone.now())
+    ).values_list('item_type', 'item_id', 'valid_until')
+
+    entitlements = {}
+    for item_type, item_id, valid_until in rows:
+        key = (item_type, item_id)
+        expires = _expires_at(valid_until)
+        if key in entitlements:
+            current = entitlements[key]
+            # Безстрокове право перекриває будь-яке строкове
+            expires = None if current is None or expires is None else max(current, expires)
+        entitlements[key] = expires
+    return entitlements
+
+
+def get_user_entitlements(user):
+    """Права користувача: пам'ять запиту -> кеш -> БД (один запит)"""
+    memo = getattr(user, USER_MEMO_ATTR, None)
+    if memo is not None:
+        return memo
+
+    key = ENTITLEMENTS_CACHE_KEY.format(user_id=user.pk)
+    entitlements = cache.get(key)
+    if entitlements is None:
+        entitlements = load_user_entitlements(user.pk)
+        cache.set(key, entitlements, ENTITLEMENTS_CACHE_TTL)
+
+    setattr(user, USER_MEMO_ATTR, entitlements)
+    return entitlements
+
+
+def has_entitlement(user, item_type, item_id):
+    """Чи має користувач дійсне право на item (O(1) після першого виклику)"""
+    if not user or not user.is_authenticated:
+        return False
+    entitlements = get_user_entitlements(user)
+    key = (item_type, item_id)
+    if key not in entitlements:
+        return False
+    expires = entitlements[key]
+    return expires is None or expires > timezone.now().timestamp()
+
+
+def get_entitled_ids(user, item_type):
+    """ID усіх дійсних items одного типу (наприклад, куплені курси)"""
+    if not user or not user.is_authenticated:
+        return set()
+    now = timezone.now().timestamp()
+    return {
+        item_id
+        for (kind, item_id), expires in get_user_entitlements(user).items()
+        if kind == item_type and (expires is None or expires > now)
+    }
+
+
+def invalidate_user_entitlements(*user_ids):
+    """
+    Скинути кеш прав після commit (до commit інші воркери бачать старі рядки)
+    Викликається сигналами UserEntitlement (save/delete, у т.ч. з адмінки)
+    """
+    keys = [ENTITLEMENTS_CACHE_KEY.format(user_id=user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# ============ ЗАПИС ============
+
+def grant_entitlement(user_id, item_type, item_id, source, source_id=None, valid_until=None):
+    """Видати (або продовжити) право; ідемпотентно для того самого джерела"""
+    from .models import UserEntitlement
+
+    entitlement, _ = UserEntitlement.objects.update_or_create(
+        user_id=user_id, item_type=item_type, item_id=item_id, source=source, source_id=source_id,
+        defaults={'valid_until': valid_until},
+    )
+    return entitlement
+
+
+def revoke_entitlements(source, source_id, user_id):
+    """Відкликати всі права, видані джерелом (платіж повернено, підписку вимкнено)"""
+    from .models import UserEntitlement
+
+    deleted, _ = UserEntitlement.objects.filter(user_id=user_id, source=source, source_id=source_id).delete()
+    return deleted
+
+
+def sync_payment_entitlements(payment):
+    """Привести права від платежу у відповідність до його статусу"""
+    from apps.payments.models import OrderItem
+
+    if payment.status == 'succeeded':
+        items = OrderItem.objects.filter(
+            order__payment=payment, item_type__in=PAYMENT_ITEM_TYPES
+        ).values_list('item_type', 'item_id')
+        for item_type, item_id in set(items):
+            grant_entitlement(payment.user_id, item_type, item_id, 'payment', payment.pk)
+    elif payment.status in REVOKED_PAYMENT_STATUSES:
+        revoke_entitlements('payment', payment.pk, payment.user_id)
+
+
+def sync_subscription_entitlements(subscription):
+    """Активна підписка - право на план до end_date"""
+    if subscription.is_active:
+        grant_entitlement(
+            subscription.user_id, 'subscription', subscription.plan_id, 'subscription', subscription.pk,
+            valid_until=subscription.end_date,
+        )
+    else:
+        revoke_entitlements('subscription', subscription.pk, subscription.user_id)
+
+
+# ============ ВІДНОВЛЕННЯ ТА ПЕРЕВІРКА ============
+
+def expected_entitlements(user_ids=None):
+    """
+    Права, які випливають з історії платежів і підписок
+
+    Returns:
+        set: {(user_id, item_type, item_id, source, source_id, valid_until)}
+    """
+    from apps.payments.models import OrderItem
+    from apps.subscriptions.models import Subscription
+
+    items = OrderItem.objects.filter(order__payment__status='succeeded', item_type__in=PAYMENT_ITEM_TYPES)
+    subscriptions = Subscription.objects.filter(is_active=True)
+    if user_ids is not None:
+        items = items.filter(order__payment__user_id__in=user_ids)
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+
+    expected = {
+        (user_id, item_type, item_id, 'payment', payment_id, None)
+        for user_id, item_type, item_id, payment_id in items.values_list(
+            'order__payment__user_id', 'item_type', 'item_id', 'order__payment_id'
+        ).iterator()
+    }
+    expected.update(
+        (user_id, 'subscription', plan_id, 'subscription', subscription_id, end_date)
+        for user_id, plan_id, subscription_id, end_date in subscriptions.values_list(
+            'user_id', 'plan_id', 'id', 'end_date'
+        ).iterator()
+    )
+    return expected
+
+
+def diff_entitlements(user_ids=None):
+    """
+    Порівняти таблицю з історією (рядки source='manual' не перевіряються)
+
+    Returns:
+        tuple: (missing, stale) - множини рядків як у expected_entitlements;
+        missing - є в історії, немає в таблиці; stale - навпаки
+    """
+    from .models import UserEntitlement
+
+    rows = UserEntitlement.objects.filter(source__in=['payment', 'subscription'])
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    actual = set(rows.values_list(
+        'user_id', 'item_type', 'item_id', 'source', 'source_id', 'valid_until'
+    ).iterator())
+
+    expected = expected_entitlements(user_ids)
+    return expected - actual, actual - expected
+
+
+@transaction.atomic
+def rebuild_entitlements(user_ids=None, batch_size=1000, invalidate_cache=True):
+    """
+    Відновити таблицю з історії: додати відсутні рядки, прибрати зайві
+    invalidate_cache=False - для міграції (кешу прав ще немає, а таблиці
+    кешу може ще не бути)
+
+    Returns:
+        tuple: (created, deleted)
+    """
+    from .models import UserEntitlement
+
+    missing, stale = diff_entitlements(user_ids)
+
+    deleted = 0
+    for user_id, item_type, item_id, source, source_id, _ in stale:
+        deleted += UserEntitlement.objects.filter(
+            user_id=user_id, item_type=item_type, item_id=item_id, source=source, source_id=source_id
+        ).delete()[0]
+
+    # Рядок із застарілим valid_until щойно видалено - конфліктів немає
+    UserEntitlement.objects.bulk_create(
+        [
+            UserEntitlement(
+                user_id=user_id, item_type=item_type, item_id=item_id,
+                source=source, source_id=source_id, valid_until=valid_until,
+            )
+            for user_id, item_type, item_id, source, source_id, valid_until in missing
+        ],
+        batch_size=batch_size,
+    )
+
+    # bulk_create не надсилає post_save
+    if invalidate_cache:
+        invalidate_user_entitlements(*(row[0] for row in missing))
+    if missing or stale:
+        logger.info(f"Entitlements rebuilt: {len(missing)} created, {deleted} deleted")
+    return len(missing), deleted
@@ -0,0 +1,27 @@
+"""
+Заповнити UserEntitlement з історії платежів і підписок
+Usage: python manage.py backfill_entitlements [--user ID ...] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from apps.content.entitlements import diff_entitlements, rebuild_entitlements
+
+
+class Command(BaseCommand):
+    help = 'Backfill user entitlements from succeeded payments and active subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Тільки для цих користувачів')
+        parser.add_argument('--dry-run', action='store_true', help='Показати кількість змін без запису')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+
+        if options['dry_run']:
+            missing, stale = diff_entitlements(user_ids)
+            self.stdout.write(f"Would create {len(missing)}, delete {len(stale)} entitlements")
+            return
+
+        created, deleted = rebuild_entitlements(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Created {created}, deleted {deleted} entitlements"))
@@ -0,0 +1,34 @@
+"""
+Перевірити UserEntitlement проти історії платежів і підписок
+Usage: python manage.py check_entitlements [--user ID ...] [--limit N]
+Завершується з помилкою при розбіжностях (для cron/моніторингу)
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.content.entitlements import diff_entitlements
+
+
+class Command(BaseCommand):
+    help = 'Compare user entitlements with payment and subscription history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Тільки для цих користувачів')
+        parser.add_argument('--limit', type=int, default=20, help='Скільки розбіжностей показати')
+
+    def handle(self, *args, **options):
+        missing, stale = diff_entitlements(options['user_ids'])
+
+        if not missing and not stale:
+            self.stdout.write(self.style.SUCCESS('Entitlements match payment history'))
+            return
+
+        limit = options['limit']
+        for label, rows in (('missing', missing), ('stale', stale)):
+            for user_id, item_type, item_id, source, source_id, valid_until in sorted(rows, key=str)[:limit]:
+                self.stdout.write(
+                    f"{label}: user={user_id} {item_type}#{item_id} {source}#{source_id} until={valid_until}"
+                )
+
+        raise CommandError(
+            f"{len(missing)} missing, {len(stale)} stale entitlements; run backfill_entitlements to repair"
+        )
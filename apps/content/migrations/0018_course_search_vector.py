@@ -0,0 +1,66 @@
+# Full-text search vector for course catalog
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def add_search_vector(apps, schema_editor):
+    """tsvector + GIN індекс на PostgreSQL, звичайна колонка на інших БД"""
+    connection = schema_editor.connection
+    db_table = 'courses'
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            config = getattr(settings, 'COURSE_SEARCH_CONFIG', 'simple')
+            cursor.execute(f"ALTER TABLE {db_table} ADD COLUMN IF NOT EXISTS search_vector tsvector NULL")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS courses_search_vector_gin ON {db_table} USING GIN (search_vector)"
+            )
+            # Заповнити для існуючих курсів (ваги як у apps.content.search.SEARCH_FIELDS)
+            cursor.execute(f"""
+                UPDATE {db_table} SET search_vector =
+                    setweight(to_tsvector(%s::regconfig, coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector(%s::regconfig, coalesce(author, '')), 'B') ||
+                    setweight(to_tsvector(%s::regconfig, coalesce(short_description, '')), 'C') ||
+                    setweight(to_tsvector(%s::regconfig, coalesce(description, '')), 'D')
+            """, [config] * 4)
+        else:
+            columns = {
+                column.name
+                for column in connection.introspection.get_table_description(cursor, db_table)
+            }
+            if 'search_vector' not in columns:
+                cursor.execute(f"ALTER TABLE {db_table} ADD COLUMN search_vector text NULL")
+
+
+def remove_search_vector(apps, schema_editor):
+    """Відкат міграції"""
+    connection = schema_editor.connection
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS courses_search_vector_gin")
+            cursor.execute("ALTER TABLE courses DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0017_add_coming_soon_and_new_badges'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_search_vector, remove_search_vector),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='course',
+                    name='search_vector',
+                    field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+                ),
+            ],
+        ),
+    ]
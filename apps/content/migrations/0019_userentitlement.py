@@ -0,0 +1,59 @@
+# Materialized user entitlements (courses, event tickets, subscription plans)
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_entitlements(apps, schema_editor):
+    """
+    Заповнити таблицю з платежів і активних підписок (як manage.py backfill_entitlements)
+
+    check_user_course_access читає тільки UserEntitlement - без цього кроку
+    покупці втратили б доступ до курсів одразу після деплою. Поточні моделі,
+    а не історичні: стан міграцій subscriptions не збігається з реальною
+    таблицею (db_table). На новій БД без цих таблиць заповнювати нічого.
+    """
+    from apps.content.entitlements import rebuild_entitlements
+    from apps.payments.models import Order, OrderItem, Payment
+    from apps.subscriptions.models import Subscription
+
+    tables = set(schema_editor.connection.introspection.table_names())
+    required = {model._meta.db_table for model in (Order, OrderItem, Payment, Subscription)}
+    if not required <= tables:
+        return
+    rebuild_entitlements(invalidate_cache=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content', '0018_course_search_vector'),
+        ('payments', '0001_initial'),
+        ('subscriptions', '0023_refactor_pricing_logic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('course', 'Course'), ('event_ticket', 'Event Ticket'), ('subscription', 'Subscription Plan')], max_length=20)),
+                ('item_id', models.PositiveIntegerField()),
+                ('source', models.CharField(choices=[('payment', 'Payment'), ('subscription', 'Subscription'), ('manual', 'Manual')], max_length=20)),
+                ('source_id', models.PositiveIntegerField(blank=True, help_text='ID платежу або підписки', null=True)),
+                ('valid_until', models.DateTimeField(blank=True, help_text='Порожнє - безстроково', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Entitlement',
+                'verbose_name_plural': 'User Entitlements',
+                'db_table': 'user_entitlements',
+                'indexes': [models.Index(fields=['source', 'source_id'], name='user_entitl_source_7183d9_idx')],
+                'unique_together': {('user', 'item_type', 'item_id', 'source', 'source_id')},
+            },
+        ),
+        migrations.RunPython(backfill_entitlements, migrations.RunPython.noop),
+    ]
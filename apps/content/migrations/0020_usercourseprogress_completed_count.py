@@ -0,0 +1,30 @@
+# Denormalized completed materials counter for incremental progress
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_completed_count(apps, schema_editor):
+    UserCourseProgress = apps.get_model('content', 'UserCourseProgress')
+    through = UserCourseProgress.materials_completed.through
+    counts = through.objects.filter(
+        usercourseprogress_id=OuterRef('pk')
+    ).values('usercourseprogress_id').annotate(count=Count('*')).values('count')
+    UserCourseProgress.objects.update(completed_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0019_userentitlement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercourseprogress',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_completed_count, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 from django.utils import timezone
@@ -111,6 +112,9 @@ class Course(models.Model):
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.TextField(max_length=300, blank=True)
     
+    # Full-text search (Postgres tsvector, оновлюється в post_save - apps.content.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # 🏷️ Badges and discounts
     has_discount = models.BooleanField(
         'Знижка активна',
@@ -151,6 +155,7 @@ class Course(models.Model):
             models.Index(fields=['slug']),
             models.Index(fields=['is_published', 'published_at']),
         ]
+        # GIN індекс на search_vector створюється міграцією 0018 (тільки PostgreSQL)
     
     def __str__(self):
         return self.title
@@ -333,6 +338,8 @@ class UserCourseProgress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_progress')
     materials_completed = models.ManyToManyField(Material, blank=True, related_name='completed_by')
+    # Лічильник materials_completed (оновлюється атомарно - apps.content.progress)
+    completed_count = models.PositiveIntegerField(default=0, editable=False)
     progress_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     started_at = models.DateTimeField(auto_now_add=True)
     last_accessed = models.DateTimeField(auto_now=True)
@@ -348,18 +355,13 @@ class UserCourseProgress(models.Model):
         return f"{self.user.email} - {self.course.title} ({self.progress_percentage}%)"
     
     def update_progress(self):
-        """Update progress percentage based on completed materials"""
-        total_materials = self.course.materials.count()
-        if total_materials == 0:
-            self.progress_percentage = 0
-        else:
-            completed_count = self.materials_completed.count()
-            self.progress_percentage = (completed_count / total_materials) * 100
-        
-        if self.progress_percentage >= 100 and not self.completed_at:
-            self.completed_at = timezone.now()
-        
-        self.save()
+        """
+        Перерахувати прогрес з materials_completed (повний перерахунок)
+        Для подій завершення - apps.content.progress.mark_material
+        """
+        from .progress import recount_progress
+        recount_progress(progress_ids=[self.pk])
+        self.refresh_from_db(fields=['completed_count', 'progress_percentage', 'completed_at'])
 
 
 class Favorite(models.Model):
@@ -380,6 +382,49 @@ class Favorite(models.Model):
         return f"{self.user.email} - {self.course.title}"
 
 
+class UserEntitlement(models.Model):
+    """
+    Матеріалізовані права доступу користувача (що куплено/доступно і до коли)
+    Рядки похідні від успішних платежів і підписок (сигнали нижче), читаються
+    через apps.content.entitlements; відновлення: manage.py backfill_entitlements
+    """
+    ITEM_TYPE_CHOICES = [
+        ('course', 'Course'),
+        ('event_ticket', 'Event Ticket'),
+        ('subscription', 'Subscription Plan'),
+    ]
+
+    SOURCE_CHOICES = [
+        ('payment', 'Payment'),
+        ('subscription', 'Subscription'),
+        ('manual', 'Manual'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='entitlements')
+    item_type = models.CharField(max_length=20, choices=ITEM_TYPE_CHOICES)
+    item_id = models.PositiveIntegerField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    source_id = models.PositiveIntegerField(null=True, blank=True, help_text='ID платежу або підписки')
+    valid_until = models.DateTimeField(null=True, blank=True, help_text='Порожнє - безстроково')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'user_entitlements'
+        verbose_name = 'User Entitlement'
+        verbose_name_plural = 'User Entitlements'
+        unique_together = ['user', 'item_type', 'item_id', 'source', 'source_id']
+        indexes = [
+            models.Index(fields=['source', 'source_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.item_type}#{self.item_id} ({self.source})"
+
+    @property
+    def is_valid(self):
+        return self.valid_until is None or self.valid_until > timezone.now()
+
+
 class MonthlyQuote(models.Model):
     """
     Цитата експерта місяця (показується в Хабі знань)
@@ -448,11 +493,11 @@ class MonthlyQuote(models.Model):
             if quote:
                 # Кешувати до кінця місяця (31 день max)
                 cache.set(cache_key, quote, 60*60*24*31)
-                
-                # Оновити статистику
-                quote.views_count += 1
-                quote.last_displayed_at = timezone.now()
-                quote.save(update_fields=['views_count', 'last_displayed_at'])
+        
+        if quote:
+            # Оновити статистику (write-behind; save() скинув би кеш цитати)
+            from apps.core.counters import view_counters
+            view_counters.incr(quote, 'views_count', touch='last_displayed_at')
         
         return quote
     
@@ -464,4 +509,109 @@ class MonthlyQuote(models.Model):
         
         # Очистити кеш при збереженні
         from django.core.cache import cache
-        cache.delete('current_monthly_quote')
\ No newline at end of file
+        cache.delete('current_monthly_quote')
+
+# ============ SEARCH INDEX ============
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=Course)
+def reindex_course(sender, instance, update_fields=None, **kwargs):
+    """Оновити пошуковий індекс курсу (Postgres vector + in-process індекс)"""
+    from django.db import transaction
+    from .search import SEARCH_FIELDS, index_course, update_search_vector
+    
+    # Лічильники (view_count тощо) не змінюють текст
+    if update_fields is not None and not {field for field, _, _ in SEARCH_FIELDS} & set(update_fields):
+        return
+    
+    update_search_vector([instance.pk])
+    transaction.on_commit(lambda: index_course(instance))
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    from django.db import transaction
+    from .search import unindex_course
+    
+    course_id = instance.pk
+    transaction.on_commit(lambda: unindex_course(course_id))
+
+
+# ============ AUTOCOMPLETE ============
+
+# Поля, що потрапляють у підказки пошуку
+AUTOCOMPLETE_FIELDS = {'title', 'author', 'target_audience', 'is_published'}
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_autocomplete(sender, update_fields=None, **kwargs):
+    """Нова версія індексу підказок (перебудова ліниво при наступному запиті)"""
+    from django.db import transaction
+    from .autocomplete import invalidate_autocomplete
+    
+    if update_fields is not None and not AUTOCOMPLETE_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(invalidate_autocomplete)
+
+
+# ============ ENTITLEMENTS ============
+
+@receiver(post_save, sender='payments.Payment')
+def sync_payment_entitlements(sender, instance, **kwargs):
+    """Успішний платіж видає права на куплені курси/квитки, повернення - відкликає"""
+    from django.db import transaction
+    from .entitlements import sync_payment_entitlements
+    
+    # Після commit: позиції замовлення зберігаються в тій самій транзакції
+    transaction.on_commit(lambda: sync_payment_entitlements(instance))
+
+
+@receiver(post_save, sender='subscriptions.Subscription')
+def sync_subscription_entitlements(sender, instance, **kwargs):
+    from .entitlements import sync_subscription_entitlements
+    sync_subscription_entitlements(instance)
+
+
+@receiver([post_save, post_delete], sender=UserEntitlement)
+def invalidate_entitlements_cache(sender, instance, **kwargs):
+    from .entitlements import invalidate_user_entitlements
+    invalidate_user_entitlements(instance.user_id)
+
+
+# ============ PROGRESS ============
+
+from django.db.models.signals import m2m_changed
+
+
+@receiver(m2m_changed, sender=UserCourseProgress.materials_completed.through)
+def update_completed_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Лічильник completed_count слідує за materials_completed (у т.ч. зміни з адмінки)"""
+    from .progress import recount_progress
+    
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # material.completed_by.add/remove(progress...) - instance це Material
+        recount_progress(progress_ids=pk_set, course_id=instance.course_id)
+    else:
+        # Перерахунок з M2M таблиці і для add: pk_set двох паралельних add()
+        # того самого матеріалу містить його в обох (ignore_conflicts), тож
+        # len(pk_set) рахував би його двічі
+        recount_progress(progress_ids=[instance.pk], course_id=instance.course_id)
+
+
+@receiver(post_save, sender=Material)
+def refresh_progress_on_material_create(sender, instance, created, **kwargs):
+    """Новий матеріал змінює знаменник прогресу всіх користувачів курсу"""
+    if created:
+        from .progress import refresh_course_progress
+        refresh_course_progress(instance.course_id)
+
+
+@receiver(post_delete, sender=Material)
+def refresh_progress_on_material_delete(sender, instance, **kwargs):
+    from .progress import refresh_course_progress
+    refresh_course_progress(instance.course_id)
@@ -0,0 +1,196 @@
+"""
+Incremental course progress
+Кількість матеріалів курсу кешується (скидається сигналами Material), а
+UserCourseProgress.completed_count / progress_percentage / completed_at
+оновлюються одним атомарним UPDATE на подію замість count() + count() + save()
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+MATERIAL_COUNT_CACHE_KEY = 'course_material_count:{course_id}'
+MATERIAL_COUNT_CACHE_TTL = 60 * 60 * 24
+
+# Максимум подій в одному batch запиті (офлайн синхронізація PWA)
+BATCH_MAX_EVENTS = 500
+
+
+def get_material_count(course_id):
+    """Кількість матеріалів курсу (кеш, скидається при створенні/видаленні матеріалу)"""
+    from .models import Material
+
+    key = MATERIAL_COUNT_CACHE_KEY.format(course_id=course_id)
+    count = cache.get(key)
+    if count is None:
+        count = Material.objects.filter(course_id=course_id).count()
+        cache.set(key, count, MATERIAL_COUNT_CACHE_TTL)
+    return count
+
+
+def invalidate_material_count(course_id):
+    key = MATERIAL_COUNT_CACHE_KEY.format(course_id=course_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _recount_expression():
+    """COUNT(*) пройдених матеріалів рядка прогресу (підзапит до M2M таблиці)"""
+    from .models import UserCourseProgress
+
+    through = UserCourseProgress.materials_completed.through
+    counts = through.objects.filter(
+        usercourseprogress_id=OuterRef('pk')
+    ).values('usercourseprogress_id').annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts), 0)
+
+
+def _progress_values(completed, total):
+    """
+    Поля для UPDATE: лічильник, відсоток і момент завершення з одного виразу completed
+    (усі F() в UPDATE читають значення рядка до оновлення - без гонок між запитами)
+    """
+    values = {'completed_count': completed, 'last_accessed': timezone.now()}
+    if not total:
+        values['progress_percentage'] = Value(0)
+        return values
+
+    values['progress_percentage'] = Least(
+        Value(100.0), completed * Value(100.0) / Value(float(total)), output_field=FloatField()
+    )
+    values['completed_at'] = Case(
+        When(completed_at__isnull=False, then=F('completed_at')),
+        When(GreaterThanOrEqual(completed, Value(total)), then=Value(timezone.now())),
+        default=Value(None),
+        output_field=DateTimeField(),
+    )
+    return values
+
+
+def recount_progress(progress_ids=None, course_id=None):
+    """
+    Перерахувати лічильник з M2M і відсоток (зміни materials_completed, матеріалів курсу)
+    Одним UPDATE на курс.
+    """
+    from .models import UserCourseProgress
+
+    progress = UserCourseProgress.objects.all()
+    if progress_ids is not None:
+        progress = progress.filter(pk__in=progress_ids)
+    if course_id is not None:
+        progress = progress.filter(course_id=course_id)
+
+    updated = 0
+    course_ids = [course_id] if course_id is not None else set(progress.values_list('course_id', flat=True))
+    for current_course_id in course_ids:
+        values = _progress_values(_recount_expression(), get_material_count(current_course_id))
+        updated += progress.filter(course_id=current_course_id).update(**values)
+    return updated
+
+
+def refresh_course_progress(course_id):
+    """Матеріал додано/видалено - нова кількість і перерахунок прогресу всіх користувачів курсу"""
+    invalidate_material_count(course_id)
+    return recount_progress(course_id=course_id)
+
+
+def progress_state(progress_id, course_id):
+    """Поточний стан прогресу для відповіді API"""
+    from .models import UserCourseProgress
+
+    percentage, completed, completed_at = UserCourseProgress.objects.filter(pk=progress_id).values_list(
+        'progress_percentage', 'completed_count', 'completed_at'
+    ).get()
+    return {
+        'progress_percentage': float(percentage),
+        'completed_count': completed,
+        'total_count': get_material_count(course_id),
+        'is_completed': completed_at is not None,
+    }
+
+
+def mark_material(user, material, completed=True):
+    """
+    Відмітити матеріал пройденим (або скинути) і оновити прогрес курсу
+
+    Лічильник оновлює сигнал m2m_changed (також для змін з адмінки).
+
+    Returns:
+        dict: progress_state
+    """
+    from .models import UserCourseProgress
+
+    with transaction.atomic():
+        progress, _ = UserCourseProgress.objects.get_or_create(user=user, course_id=material.course_id)
+        if completed:
+            progress.materials_completed.add(material)
+        else:
+            progress.materials_completed.remove(material)
+    return progress_state(progress.pk, material.course_id)
+
+
+def apply_progress_events(user, events, has_access):
+    """
+    Застосувати пачку подій прогресу (офлайн синхронізація)
+
+    Args:
+        events: [{'material_id': int, 'completed': bool}] у порядку виникнення;
+            для одного матеріалу діє остання подія
+        has_access: callable(course) -> bool
+
+    Returns:
+        tuple: ({course_id: progress_state}, [{'material_id', 'error'}])
+    """
+    from .models import Material, UserCourseProgress
+
+    final = {}
+    rejected = []
+    for event in events:
+        if not isinstance(event, dict):
+            rejected.append({'material_id': None, 'error': 'invalid event'})
+            continue
+        try:
+            completed = event.get('completed', True)
+            if isinstance(completed, str):
+                completed = completed.lower() == 'true'
+            final[int(event['material_id'])] = bool(completed)
+        except (KeyError, TypeError, ValueError):
+            rejected.append({'material_id': event.get('material_id'), 'error': 'invalid event'})
+
+    materials = Material.objects.filter(id__in=final).select_related('course').only(
+        'id', 'course_id', 'course__id', 'course__is_free'
+    )
+    by_course = {}
+    for material in materials:
+        by_course.setdefault(material.course, []).append(material.id)
+    found = {material_id for ids in by_course.values() for material_id in ids}
+    rejected.extend({'material_id': material_id, 'error': 'not found'} for material_id in final if material_id not in found)
+
+    through = UserCourseProgress.materials_completed.through
+    results = {}
+    for course, material_ids in by_course.items():
+        if not has_access(course):
+            rejected.extend({'material_id': material_id, 'error': 'access denied'} for material_id in material_ids)
+            continue
+
+        done = [material_id for material_id in material_ids if final[material_id]]
+        undone = [material_id for material_id in material_ids if not final[material_id]]
+        with transaction.atomic():
+            progress, _ = UserCourseProgress.objects.get_or_create(user=user, course_id=course.id)
+            # Напряму в M2M таблицю (без m2m_changed) і один перерахунок на курс
+            through.objects.bulk_create(
+                [through(usercourseprogress_id=progress.pk, material_id=material_id) for material_id in done],
+                ignore_conflicts=True,
+            )
+            if undone:
+                through.objects.filter(usercourseprogress_id=progress.pk, material_id__in=undone).delete()
+            recount_progress(progress_ids=[progress.pk], course_id=course.id)
+        results[course.id] = progress_state(progress.pk, course.id)
+
+    return results, rejected
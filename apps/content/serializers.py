@@ -1,11 +1,45 @@
 from rest_framework import serializers
+from django.db.models import Count
 from django.utils import timezone
 from .models import (
     Course, Material, UserCourseProgress, Favorite
 )
+from .progress import get_material_count
 from .utils import check_user_course_access, calculate_content_preview_limits
 
 
+def preload_course_context(courses, request, context=None):
+    """
+    Serializer context з даними користувача для всієї сторінки курсів
+    По одному запиту на зв'язок замість запитів на кожен курс:
+    обране, прогрес (з лічильником пройдених), кількість матеріалів.
+    Права перевіряє check_user_course_access - вони завантажуються один раз
+    на request.user (apps.content.entitlements)
+    
+    Usage:
+        courses = list(queryset)
+        CourseSerializer(courses, many=True, context=preload_course_context(courses, request)).data
+    """
+    context = {**(context or {}), 'request': request}
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return context
+    
+    course_ids = [course.id for course in courses]
+    context['favorite_course_ids'] = set(
+        Favorite.objects.filter(user=user, course_id__in=course_ids).values_list('course_id', flat=True)
+    )
+    context['course_progress'] = {
+        progress.course_id: progress
+        for progress in UserCourseProgress.objects.filter(user=user, course_id__in=course_ids)
+    }
+    context['material_counts'] = dict(
+        Material.objects.filter(course_id__in=course_ids)
+        .values('course_id').annotate(count=Count('id')).values_list('course_id', 'count')
+    )
+    return context
+
+
 class MaterialSerializer(serializers.ModelSerializer):
     """Material/Lesson serializer"""
     content_type_display = serializers.CharField(source='get_content_type_display', read_only=True)
@@ -115,6 +149,9 @@ class CourseSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return False
         
+        favorite_ids = self.context.get('favorite_course_ids')
+        if favorite_ids is not None:
+            return obj.id in favorite_ids
         return Favorite.objects.filter(user=request.user, course=obj).exists()
     
     def get_has_access(self, obj):
@@ -131,18 +168,28 @@ class CourseSerializer(serializers.ModelSerializer):
         if not request or not request.user.is_authenticated:
             return None
         
-        try:
-            progress = UserCourseProgress.objects.get(user=request.user, course=obj)
-            return {
-                'percentage': float(progress.progress_percentage),
-                'started_at': progress.started_at,
-                'last_accessed': progress.last_accessed,
-                'completed_at': progress.completed_at,
-                'completed_materials': progress.materials_completed.count(),
-                'total_materials': obj.materials.count()
-            }
-        except UserCourseProgress.DoesNotExist:
-            return None
+        progress_map = self.context.get('course_progress')
+        if progress_map is not None:
+            progress = progress_map.get(obj.id)
+            if progress is None:
+                return None
+            total_materials = self.context['material_counts'].get(obj.id, 0)
+        else:
+            try:
+                progress = UserCourseProgress.objects.get(user=request.user, course=obj)
+            except UserCourseProgress.DoesNotExist:
+                return None
+            total_materials = get_material_count(obj.id)
+        completed_materials = progress.completed_count
+        
+        return {
+            'percentage': float(progress.progress_percentage),
+            'started_at': progress.started_at,
+            'last_accessed': progress.last_accessed,
+            'completed_at': progress.completed_at,
+            'completed_materials': completed_materials,
+            'total_materials': total_materials
+        }
 
 
 class CourseDetailSerializer(CourseSerializer):
@@ -183,14 +230,19 @@ class CourseDetailSerializer(CourseSerializer):
     
     def get_related_courses(self, obj):
         """Get related courses (simply latest published courses)"""
-        related = Course.objects.filter(
+        related = list(Course.objects.filter(
             is_published=True
-        ).exclude(id=obj.id)[:4]
+        ).exclude(id=obj.id)[:4])
+        
+        context = self.context
+        if 'course_progress' in context:
+            # Сторінка завантажена preload_course_context - те саме для схожих курсів
+            context = preload_course_context(related, context['request'], context)
         
         return CourseSerializer(
             related, 
             many=True, 
-            context=self.context
+            context=context
         ).data
 
 
@@ -208,10 +260,10 @@ class UserCourseProgressSerializer(serializers.ModelSerializer):
         ]
     
     def get_completed_materials_count(self, obj):
-        return obj.materials_completed.count()
+        return obj.completed_count
     
     def get_total_materials_count(self, obj):
-        return obj.course.materials.count()
+        return get_material_count(obj.course_id)
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
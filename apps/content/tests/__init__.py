@@ -0,0 +1 @@
+# Content tests
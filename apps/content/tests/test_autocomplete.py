@@ -0,0 +1,233 @@
+"""
+Test search autocomplete - prefix index, ranking, invalidation, API
+"""
+import random
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.content import autocomplete
+from apps.content.autocomplete import AutocompleteIndex, Suggestion, invalidate_autocomplete
+
+
+@pytest.fixture
+def index(monkeypatch, locmem_cache):
+    """Fresh index for each test, version checked on every call"""
+    index = AutocompleteIndex()
+    index.VERSION_CHECK_INTERVAL = 0
+    monkeypatch.setattr(autocomplete, 'search_autocomplete', index)
+    return index
+
+
+def texts(suggestions):
+    return [suggestion.text for suggestion in suggestions]
+
+
+@pytest.mark.unit
+class TestAutocompleteIndex:
+    """Test prefix matching and ranking (no database)"""
+
+    def build(self, items):
+        index = AutocompleteIndex(loader=lambda: items)
+        index.build(items)
+        index._version = None
+        index._next_check = float('inf')
+        return index
+
+    def test_matches_any_word_start(self):
+        index = self.build([
+            ('Тренування воротарів', 'course', 10),
+            ('Тактика пресингу', 'course', 5),
+        ])
+        assert texts(index.suggest('ворот')) == ['Тренування воротарів']
+        assert texts(index.suggest('тренування во')) == ['Тренування воротарів']
+        assert texts(index.suggest('т')) == ['Тренування воротарів', 'Тактика пресингу']
+        assert index.suggest('арів') == []
+
+    def test_ranked_by_score_and_limited(self):
+        index = self.build([(f'Курс {i}', 'course', i) for i in range(30)])
+        assert texts(index.suggest('к', limit=3)) == ['Курс 29', 'Курс 28', 'Курс 27']
+        assert texts(index.suggest('курс', limit=3)) == ['Курс 29', 'Курс 28', 'Курс 27']
+        assert len(index.suggest('курс', limit=20)) == 20
+
+    def test_hot_prefixes_match_range_scan(self):
+        words = ['тактика', 'тренування', 'техніка', 'тест', 'аналітика', 'атака']
+        items = [(f'{random.choice(words)} {random.choice(words)} {i}', 'course', random.randint(0, 100))
+                 for i in range(300)]
+        index = self.build(items)
+        assert {'т', 'та', 'тактика ', 'а'} <= set(index._hot)
+        for prefix in ['т', 'та', 'тре', 'тактика т', 'а', 'ат']:
+            hot = index.suggest(prefix, limit=index.TOP_K)
+            scanned = index.suggest(prefix, limit=index.TOP_K + 1)[:index.TOP_K]
+            assert hot == scanned
+
+    def test_duplicates_keep_best_score(self):
+        index = self.build([
+            ('Тактика', 'course', 1),
+            ('тактика ', 'audience', 7),
+        ])
+        assert index.suggest('так') == [Suggestion('тактика', 'audience', 7)]
+
+    def test_apostrophes_and_case(self):
+        index = self.build([("М'яч та техніка", 'course', 1)])
+        assert texts(index.suggest('МʼЯЧ')) == ["М'яч та техніка"]
+
+    def test_stats(self):
+        index = self.build([('Тренування воротарів', 'course', 1)])
+        stats = index.get_stats()
+        assert stats['suggestions'] == 1
+        assert stats['keys'] == 2
+        assert stats['memory_bytes'] > 0
+
+
+@pytest.mark.django_db
+class TestAutocompleteDatabase:
+    """Test loading from the database and lazy rebuild"""
+
+    def make_course(self, slug, title, **kwargs):
+        from apps.content.models import Course
+        return Course.objects.create(
+            title=title, slug=slug, description='Опис', short_description='Коротко',
+            price=100, is_published=kwargs.pop('is_published', True), **kwargs,
+        )
+
+    def test_loads_courses_authors_audiences(self, index):
+        self.make_course('gk', 'Тренування воротарів', author='Олег Тренер', view_count=5,
+                         target_audience=['coach_youth'])
+        self.make_course('draft', 'Тренування чернетка', is_published=False)
+
+        # Однакові бали (5 переглядів курсу = 5 у автора) - за алфавітом
+        assert texts(index.suggest('трен')) == ['Олег Тренер', 'Тренування воротарів', 'Дитячий тренер']
+        assert [s.kind for s in index.suggest('олег')] == ['author']
+
+    def test_loads_published_events(self, index):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.events.models import Event
+
+        start = timezone.now() + timedelta(days=7)
+        Event.objects.create(
+            title='Семінар воротарів', slug='gk-seminar', description='Опис', short_description='Коротко',
+            event_type='seminar', location='Київ', start_datetime=start,
+            end_datetime=start + timedelta(hours=2), status='published',
+        )
+        assert index.suggest('семінар') == [Suggestion('Семінар воротарів', 'event', 0)]
+
+    def test_save_bumps_version_and_rebuilds(self, index, django_capture_on_commit_callbacks):
+        course = self.make_course('gk', 'Тренування воротарів')
+        assert texts(index.suggest('ворот')) == ['Тренування воротарів']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = 'Тренування захисників'
+            course.save()
+        assert index.suggest('ворот') == []
+        assert texts(index.suggest('захис')) == ['Тренування захисників']
+
+    def test_counter_save_keeps_index(self, index, locmem_cache, django_capture_on_commit_callbacks):
+        course = self.make_course('gk', 'Тренування воротарів')
+        index.suggest('ворот')
+        version = locmem_cache.get(autocomplete.AUTOCOMPLETE_VERSION_KEY)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.view_count = 10
+            course.save(update_fields=['view_count'])
+        assert locmem_cache.get(autocomplete.AUTOCOMPLETE_VERSION_KEY) == version
+
+    def test_concurrent_refresh_rebuilds_once(self, index, monkeypatch):
+        self.make_course('gk', 'Тренування воротарів')
+        index.suggest('ворот')
+        invalidate_autocomplete()
+
+        started, release = threading.Event(), threading.Event()
+        rebuilds = []
+        rebuild = index.rebuild
+
+        def slow_rebuild():
+            rebuilds.append(1)
+            started.set()
+            release.wait(5)
+            rebuild()
+
+        monkeypatch.setattr(index, 'rebuild', slow_rebuild)
+        worker = threading.Thread(target=index.suggest, args=('ворот',))
+        worker.start()
+        assert started.wait(5)
+        # Поки перший потік перебудовує - старий індекс, без другої перебудови
+        assert texts(index.suggest('ворот')) == ['Тренування воротарів']
+        release.set()
+        worker.join()
+        assert rebuilds == [1]
+
+    def test_version_check_is_throttled(self, index):
+        self.make_course('gk', 'Тренування воротарів')
+        index.VERSION_CHECK_INTERVAL = 60
+        index.suggest('ворот')
+
+        invalidate_autocomplete()
+        with CaptureQueriesContext(connection) as ctx:
+            assert texts(index.suggest('ворот')) == ['Тренування воротарів']
+        assert len(ctx.captured_queries) == 0
+
+    def test_suggestions_api(self, client, index, django_user_model, no_silk):
+        client.force_login(django_user_model.objects.create_user(
+            username='autocomplete', email='autocomplete@test.com', password='test123!@#'
+        ))
+        self.make_course('gk', 'Тренування воротарів', author='Олег Тренер')
+        url = reverse('content_api:search_suggestions')
+
+        response = client.get(url, {'q': 'трен'})
+        assert response.status_code == 200
+        assert response.json()['suggestions'] == ['Олег Тренер', 'Тренування воротарів']
+
+        # Промах індексу не йде в БД
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, {'q': 'футзал'})
+        assert response.json()['suggestions'] == []
+        assert not [q for q in ctx.captured_queries if 'FROM "courses"' in q['sql']]
+
+
+@pytest.mark.slow
+class TestAutocompleteBenchmark:
+    """Top-k throughput at 50k suggestions"""
+
+    SUGGESTIONS = 50000
+    LOOKUPS = 100000
+
+    WORDS = [
+        'тактика', 'воротарів', 'підготовка', 'гравців', 'аналітика', 'скаутинг', 'психологія',
+        'спорту', 'харчування', 'реабілітація', 'менеджмент', 'клубу', 'тренування', 'молоді',
+        'пресинг', 'захист', 'атака', 'стандарти', 'відео', 'фітнес',
+    ]
+
+    def test_throughput(self):
+        rng = random.Random(42)
+        items = [
+            (f'{rng.choice(self.WORDS).capitalize()} {rng.choice(self.WORDS)} {i}', 'course', rng.randint(0, 5000))
+            for i in range(self.SUGGESTIONS)
+        ]
+        index = AutocompleteIndex(loader=lambda: items)
+
+        start = time.perf_counter()
+        index.rebuild()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        prefixes = []
+        for _ in range(1000):
+            word = rng.choice(self.WORDS)
+            prefixes.append(word[:rng.randint(1, len(word))])
+
+        start = time.perf_counter()
+        for i in range(self.LOOKUPS):
+            index.suggest(prefixes[i % len(prefixes)], limit=8)
+        elapsed = time.perf_counter() - start
+
+        stats = index.get_stats()
+        per_lookup_us = elapsed / self.LOOKUPS * 1_000_000
+        print(f"\n{stats['suggestions']} suggestions, {stats['keys']} keys, build {build_ms:.0f}ms, "
+              f"memory {stats['memory_bytes'] / 1024 / 1024:.1f}MB"
+              f"\n{self.LOOKUPS / elapsed:,.0f} lookups/s ({per_lookup_us:.1f}µs per top-8)")
+        assert per_lookup_us < 1000
@@ -0,0 +1,203 @@
+"""
+Test user entitlements - materialized access, cache, backfill and consistency check
+"""
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.content.entitlements import (
+    diff_entitlements, get_entitled_ids, has_entitlement, rebuild_entitlements,
+)
+from apps.content.models import Course, UserEntitlement
+from apps.content.utils import check_user_course_access, get_user_accessible_courses
+
+
+def fresh(user):
+    """Новий об'єкт користувача (як request.user наступного запиту)"""
+    return type(user).objects.get(pk=user.pk)
+
+
+def make_course(slug, **kwargs):
+    return Course.objects.create(
+        title=f'Курс {slug}', slug=slug, description='Опис', short_description='Коротко',
+        price=Decimal('500'), is_published=True, **kwargs,
+    )
+
+
+def make_payment(user, items, status='pending'):
+    """Платіж із замовленням; items - [(item_type, item_id)]"""
+    from apps.payments.models import Order, Payment
+
+    payment = Payment.objects.create(user=user, amount=Decimal('500'), status=status, payment_type='course')
+    order = Order.objects.create(
+        user=user, order_number=f'ORD-{payment.pk}', subtotal=Decimal('500'), total=Decimal('500'), payment=payment,
+    )
+    for item_type, item_id in items:
+        order.items.create(item_type=item_type, item_id=item_id, item_name='Позиція', price=Decimal('500'))
+    return payment
+
+
+@pytest.mark.django_db
+class TestEntitlementSync:
+    """Payments and subscriptions populate the table"""
+
+    def test_payment_success_and_refund(self, user, locmem_cache, django_capture_on_commit_callbacks):
+        course = make_course('paid')
+        with django_capture_on_commit_callbacks(execute=True):
+            payment = make_payment(user, [('course', course.id), ('event_ticket', 7), ('subscription', 1)])
+        assert not check_user_course_access(fresh(user), course)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            payment.mark_succeeded()
+        assert set(UserEntitlement.objects.values_list('item_type', 'item_id', 'source', 'source_id')) == {
+            ('course', course.id, 'payment', payment.id),
+            ('event_ticket', 7, 'payment', payment.id),
+        }
+        assert check_user_course_access(fresh(user), course)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            payment.status = 'refunded'
+            payment.save()
+        assert not UserEntitlement.objects.exists()
+        assert not check_user_course_access(fresh(user), course)
+
+    def test_subscription_sets_valid_until(self, user, django_capture_on_commit_callbacks):
+        from apps.subscriptions.models import Subscription, SubscriptionPlan
+
+        plan = SubscriptionPlan.objects.create(name='C-Vision', slug='c-vision')
+        end = timezone.now() + timedelta(days=30)
+        subscription = Subscription.objects.create(user=user, plan=plan, end_date=end)
+        assert has_entitlement(fresh(user), 'subscription', plan.id)
+        assert UserEntitlement.objects.get().valid_until == end
+
+        subscription.is_active = False
+        subscription.save()
+        assert not UserEntitlement.objects.exists()
+
+
+@pytest.mark.django_db
+class TestEntitlementAccess:
+    """Access checks read a cached per-user dict"""
+
+    def test_expired_entitlement(self, user):
+        course = make_course('expired')
+        UserEntitlement.objects.create(
+            user=user, item_type='course', item_id=course.id, source='manual',
+            valid_until=timezone.now() - timedelta(minutes=1),
+        )
+        assert not check_user_course_access(fresh(user), course)
+
+    def test_free_and_anonymous(self, user):
+        from django.contrib.auth.models import AnonymousUser
+
+        free = make_course('free', is_free=True)
+        paid = make_course('paid')
+        assert check_user_course_access(user, free)
+        assert not check_user_course_access(AnonymousUser(), free)
+        assert not has_entitlement(AnonymousUser(), 'course', paid.id)
+        assert get_entitled_ids(AnonymousUser(), 'course') == set()
+
+    def test_checks_are_cached(self, user, locmem_cache, django_capture_on_commit_callbacks):
+        courses = [make_course(f'c{i}') for i in range(20)]
+        with django_capture_on_commit_callbacks(execute=True):
+            for course in courses[:10]:
+                UserEntitlement.objects.create(user=user, item_type='course', item_id=course.id, source='manual')
+
+        request_user = fresh(user)
+        with CaptureQueriesContext(connection) as ctx:
+            granted = [check_user_course_access(request_user, course) for course in courses]
+        assert granted == [True] * 10 + [False] * 10
+        assert len(ctx.captured_queries) == 1
+
+        # Наступний запит - з кешу
+        with CaptureQueriesContext(connection) as ctx:
+            assert check_user_course_access(fresh(user), courses[0])
+        assert [q for q in ctx.captured_queries if 'user_entitlements' in q['sql']] == []
+
+        # Зміна прав скидає кеш після commit
+        with django_capture_on_commit_callbacks(execute=True):
+            UserEntitlement.objects.filter(item_id=courses[0].id).delete()
+        assert not check_user_course_access(fresh(user), courses[0])
+
+    def test_accessible_courses(self, user):
+        free = make_course('free', is_free=True)
+        bought = make_course('bought')
+        make_course('other')
+        Course.objects.filter(pk=make_course('draft-free', is_free=True).pk).update(is_published=False)
+        UserEntitlement.objects.create(user=user, item_type='course', item_id=bought.id, source='manual')
+        # Квиток з тим самим id не відкриває курс
+        UserEntitlement.objects.create(user=user, item_type='event_ticket', item_id=free.id + 100, source='manual')
+
+        request_user = fresh(user)
+        with CaptureQueriesContext(connection) as ctx:
+            courses = set(get_user_accessible_courses(request_user))
+        assert courses == {free, bought}
+        # Права + курси, без JOIN платежів
+        assert len(ctx.captured_queries) == 2
+
+
+@pytest.mark.django_db
+class TestEntitlementBackfill:
+    """History-derived rebuild and the consistency checker"""
+
+    def make_history(self, user):
+        """Історія без сигналів (як до появи таблиці)"""
+        course = make_course('legacy')
+        paid = make_payment(user, [('course', course.id)], status='succeeded')
+        make_payment(user, [('course', course.id + 1)], status='failed')
+        return course, paid
+
+    def test_rebuild_creates_and_removes(self, user):
+        course, paid = self.make_history(user)
+        UserEntitlement.objects.create(
+            user=user, item_type='course', item_id=999, source='payment', source_id=paid.id + 50,
+        )
+        manual = UserEntitlement.objects.create(user=user, item_type='course', item_id=998, source='manual')
+
+        missing, stale = diff_entitlements()
+        assert missing == {(user.id, 'course', course.id, 'payment', paid.id, None)}
+        assert len(stale) == 1
+
+        assert rebuild_entitlements() == (1, 1)
+        assert diff_entitlements() == (set(), set())
+        assert UserEntitlement.objects.filter(pk=manual.pk).exists()
+        assert rebuild_entitlements() == (0, 0)
+        assert check_user_course_access(fresh(user), course)
+
+    def test_commands(self, user):
+        self.make_history(user)
+
+        out = StringIO()
+        with pytest.raises(CommandError, match='1 missing, 0 stale'):
+            call_command('check_entitlements', stdout=out)
+        assert 'missing: user=' in out.getvalue()
+
+        out = StringIO()
+        call_command('backfill_entitlements', '--dry-run', stdout=out)
+        assert 'Would create 1, delete 0' in out.getvalue()
+        assert not UserEntitlement.objects.exists()
+
+        out = StringIO()
+        call_command('backfill_entitlements', '--user', str(user.id), stdout=out)
+        assert 'Created 1, deleted 0' in out.getvalue()
+
+        out = StringIO()
+        call_command('check_entitlements', stdout=out)
+        assert 'match payment history' in out.getvalue()
+
+    def test_migration_backfills_existing_buyers(self, user):
+        course, paid = self.make_history(user)
+        migration = import_module('apps.content.migrations.0019_userentitlement')
+
+        migration.backfill_entitlements(None, SimpleNamespace(connection=connection))
+
+        assert diff_entitlements() == (set(), set())
+        assert check_user_course_access(fresh(user), course)
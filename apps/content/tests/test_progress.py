@@ -0,0 +1,189 @@
+"""
+Test incremental course progress - atomic counters, cached material counts, batch sync
+"""
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.content.models import Course, Material, UserCourseProgress, UserEntitlement
+from apps.content.progress import BATCH_MAX_EVENTS, get_material_count, mark_material
+
+
+def make_course(slug, materials=4, **kwargs):
+    course = Course.objects.create(
+        title=f'Курс {slug}', slug=slug, description='Опис', short_description='Коротко',
+        price=Decimal('500'), is_published=True, **kwargs,
+    )
+    for n in range(materials):
+        Material.objects.create(course=course, title=f'Урок {n}', slug=f'lesson-{n}', order=n, content_type='article')
+    return course
+
+
+def progress_of(user, course):
+    return UserCourseProgress.objects.get(user=user, course=course)
+
+
+@pytest.mark.django_db
+class TestIncrementalProgress:
+    """Counter and percentage are kept in sync by signals"""
+
+    def test_mark_and_unmark(self, user, locmem_cache):
+        course = make_course('python')
+        first, second, *_ = course.materials.order_by('order')
+
+        state = mark_material(user, first)
+        assert state == {'progress_percentage': 25.0, 'completed_count': 1, 'total_count': 4, 'is_completed': False}
+
+        mark_material(user, first)  # повторна відмітка не рахується двічі
+        state = mark_material(user, second)
+        assert state['completed_count'] == 2
+        assert state['progress_percentage'] == 50.0
+
+        state = mark_material(user, first, completed=False)
+        assert state['completed_count'] == 1
+        assert progress_of(user, course).materials_completed.count() == 1
+
+    def test_completion_timestamp(self, user, locmem_cache):
+        course = make_course('django', materials=2)
+        for material in course.materials.all():
+            state = mark_material(user, material)
+
+        progress = progress_of(user, course)
+        assert state['is_completed'] is True
+        assert float(progress.progress_percentage) == 100.0
+        assert progress.completed_at is not None
+
+        # Завершення фіксується один раз і не скидається при відкаті
+        completed_at = progress.completed_at
+        mark_material(user, course.materials.first(), completed=False)
+        assert progress_of(user, course).completed_at == completed_at
+
+    def test_material_changes_refresh_percentage(self, user, locmem_cache, django_capture_on_commit_callbacks):
+        course = make_course('sql', materials=2)
+        mark_material(user, course.materials.first())
+        assert float(progress_of(user, course).progress_percentage) == 50.0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Material.objects.create(course=course, title='Новий', slug='new', order=9, content_type='article')
+        assert get_material_count(course.id) == 3
+        assert float(progress_of(user, course).progress_percentage) == pytest.approx(33.33, abs=0.01)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.materials.exclude(pk=course.materials.first().pk).delete()
+        progress = progress_of(user, course)
+        assert progress.completed_count == 1
+        assert float(progress.progress_percentage) == 100.0
+
+    def test_reverse_and_clear(self, user, locmem_cache):
+        course = make_course('go', materials=2)
+        material = course.materials.first()
+        progress = UserCourseProgress.objects.create(user=user, course=course)
+
+        material.completed_by.add(progress)
+        assert progress_of(user, course).completed_count == 1
+
+        progress.materials_completed.clear()
+        assert progress_of(user, course).completed_count == 0
+
+    def test_mark_query_count_is_fixed(self, user, locmem_cache):
+        course = make_course('rust', materials=30)
+        materials = list(course.materials.all())
+        mark_material(user, materials[0])
+
+        with CaptureQueriesContext(connection) as ctx:
+            mark_material(user, materials[1])
+        # Кількість матеріалів курсу з кешу; COUNT лише по пройдених цього прогресу (підзапит UPDATE)
+        counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()]
+        assert len(counts) == 1 and counts[0].startswith('UPDATE')
+        assert 'FROM "materials"' not in counts[0]
+
+    def test_concurrent_add_counted_once(self, user, locmem_cache):
+        from django.db.models.signals import m2m_changed
+
+        course = make_course('zig', materials=2)
+        material = course.materials.first()
+        mark_material(user, material)
+        progress = progress_of(user, course)
+
+        # Другий add() того самого матеріалу з паралельного запиту: рядок уже є,
+        # але pk_set (ignore_conflicts) все одно містить матеріал
+        m2m_changed.send(
+            sender=UserCourseProgress.materials_completed.through, instance=progress, action='post_add',
+            reverse=False, model=Material, pk_set={material.pk},
+        )
+        progress = progress_of(user, course)
+        assert progress.completed_count == 1
+        assert float(progress.progress_percentage) == 50.0
+
+
+@pytest.mark.django_db
+class TestProgressBatchAPI:
+    """Offline sync endpoint"""
+
+    url = '/api/v1/content/material/progress/batch/'
+
+    @pytest.fixture
+    def api(self, client, user, no_silk):
+        client.force_login(user)
+        return client
+
+    def post(self, api, events):
+        return api.post(self.url, {'events': events}, content_type='application/json')
+
+    def test_last_event_wins(self, api, user, locmem_cache):
+        course = make_course('paid')
+        UserEntitlement.objects.create(user=user, item_type='course', item_id=course.id, source='manual')
+        ids = list(course.materials.values_list('id', flat=True))
+
+        response = self.post(api, [
+            {'material_id': ids[0], 'completed': True},
+            {'material_id': ids[1], 'completed': True},
+            {'material_id': ids[1], 'completed': False},
+            {'material_id': ids[2]},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data['success'] is True
+        assert data['courses'][str(course.id)]['completed_count'] == 2
+        assert data['courses'][str(course.id)]['progress_percentage'] == 50.0
+        assert set(progress_of(user, course).materials_completed.values_list('id', flat=True)) == {ids[0], ids[2]}
+
+    def test_rejected_events(self, api, user, locmem_cache):
+        free = make_course('free', materials=2, is_free=True)
+        paid = make_course('locked', materials=2)
+        free_id = free.materials.first().id
+        paid_id = paid.materials.first().id
+
+        response = self.post(api, [
+            {'material_id': free_id},
+            {'material_id': paid_id},
+            {'material_id': 999999},
+            {'completed': True},
+            1,
+            None,
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert data['success'] is False
+        assert list(data['courses']) == [str(free.id)]
+        errors = {(item['material_id'], item['error']) for item in data['rejected']}
+        assert errors == {(paid_id, 'access denied'), (999999, 'not found'), (None, 'invalid event')}
+        assert [item['error'] for item in data['rejected']].count('invalid event') == 3
+        assert not UserCourseProgress.objects.filter(user=user, course=paid).exists()
+
+    def test_limits(self, api, locmem_cache):
+        assert self.post(api, []).status_code == 400
+        assert self.post(api, [{'material_id': 1}] * (BATCH_MAX_EVENTS + 1)).status_code == 400
+
+    def test_query_count_per_course(self, api, user, locmem_cache):
+        course = make_course('bulk', materials=50, is_free=True)
+        events = [{'material_id': material_id} for material_id in course.materials.values_list('id', flat=True)]
+        self.post(api, events[:1])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(api, events)
+        assert response.json()['courses'][str(course.id)]['completed_count'] == 50
+        # Сесія, користувач, матеріали, прогрес, вставка, перерахунок, стан - не залежить від кількості подій
+        assert len(ctx.captured_queries) == 9
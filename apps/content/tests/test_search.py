@@ -0,0 +1,207 @@
+"""
+Test course catalog search - stemming, in-process index, catalog/API integration
+"""
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.content import search
+from apps.content.search import CourseSearchIndex, search_courses, stem, tokenize
+
+
+@pytest.fixture
+def index(monkeypatch, locmem_cache):
+    """Fresh in-process index for each test"""
+    index = CourseSearchIndex()
+    monkeypatch.setattr(search, 'course_search_index', index)
+    return index
+
+
+def make_course(slug, title, description='Опис', author='', short_description='Коротко', **kwargs):
+    from apps.content.models import Course
+    return Course.objects.create(
+        title=title, slug=slug, description=description, short_description=short_description,
+        author=author, price=100, is_published=kwargs.pop('is_published', True), **kwargs,
+    )
+
+
+def course_select_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries if 'FROM "courses"' in q['sql']]
+
+
+@pytest.mark.unit
+class TestTokenize:
+    """Test light Ukrainian stemming"""
+
+    def test_word_forms_share_stem(self):
+        assert stem('тактика') == stem('тактики') == stem('тактикою') == 'тактик'
+        assert stem('воротарів') == stem('воротарями') == 'воротар'
+
+    def test_short_words_untouched(self):
+        assert stem('гра') == 'гра'
+
+    def test_tokenize(self):
+        assert tokenize("Підготовка воротарів: м'яч та ТАКТИКА!") == ['підготовк', 'воротар', 'мяч', 'та', 'тактик']
+        assert tokenize('') == []
+
+
+@pytest.mark.django_db
+class TestCourseSearchIndex:
+    """Test ranking, prefix matching and incremental updates"""
+
+    def test_title_ranks_above_description(self, index):
+        in_description = make_course('desc', 'Фізична підготовка', description='Тактика пресингу')
+        in_title = make_course('title', 'Тактика гри', description='Опис')
+
+        ranked = [course_id for course_id, _ in index.search('тактики')]
+        assert ranked == [in_title.pk, in_description.pk]
+
+    def test_prefix_and_all_terms(self, index):
+        goalkeeper = make_course('gk', 'Тренування воротарів', author='Іван Петренко')
+        make_course('tactics', 'Тактика')
+
+        assert [cid for cid, _ in index.search('ворот')] == [goalkeeper.pk]
+        assert [cid for cid, _ in index.search('воротар петренко')] == [goalkeeper.pk]
+        assert index.search('воротар тактика') == []
+
+    def test_incremental_update_without_rebuild(self, index, django_capture_on_commit_callbacks):
+        course = make_course('c1', 'Аналітика матчів')
+        assert index.search('аналітика')
+        assert index.search('скаутинг') == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = 'Скаутинг гравців'
+            course.save()
+            new_course = make_course('c2', 'Скаутинг молоді')
+
+        with CaptureQueriesContext(connection) as ctx:
+            ranked = {cid for cid, _ in index.search('скаутинг')}
+        assert ranked == {course.pk, new_course.pk}
+        assert index.search('аналітика') == []
+        assert course_select_queries(ctx) == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            new_course.delete()
+        assert [cid for cid, _ in index.search('скаутинг')] == [course.pk]
+
+    def test_counter_save_does_not_reindex(self, index, django_capture_on_commit_callbacks):
+        course = make_course('c1', 'Аналітика')
+        index.search('аналітика')
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            course.view_count += 1
+            course.save(update_fields=['view_count'])
+        assert callbacks == []
+
+    def test_other_process_bump_triggers_rebuild(self, index, locmem_cache):
+        make_course('c1', 'Психологія')
+        assert index.search('психологія')
+
+        make_course('c2', 'Психологія спорту')  # Без on_commit - інший процес
+        assert len(index.search('психологія')) == 1
+        locmem_cache.set(search.SEARCH_VERSION_KEY, 99, None)
+        assert len(index.search('психологія')) == 2
+
+
+@pytest.mark.django_db
+class TestSearchIntegration:
+    """Test catalog view and suggestions API use the index"""
+
+    def test_search_courses_orders_by_rank(self, index):
+        from apps.content.models import Course
+
+        make_course('a', 'Менеджмент клубу', description='Тактика')
+        best = make_course('b', 'Тактика і стратегія')
+        make_course('c', 'Харчування', is_published=False, description='Тактика')
+
+        results = list(search_courses(Course.objects.filter(is_published=True), 'тактика'))
+        assert [c.slug for c in results] == ['b', 'a']
+        assert results[0] == best
+        assert not search_courses(Course.objects.all(), 'футзал').exists()
+
+    def test_catalog_view(self, client, index, no_silk):
+        make_course('gk', 'Тренування воротарів')
+        make_course('fit', 'Фізична підготовка')
+
+        response = client.get('/hub/', {'q': 'воротарі'}, HTTP_HX_REQUEST='true')
+        assert response.status_code == 200
+        assert [c.slug for c in response.context['courses']] == ['gk']
+
+    def test_suggestions_api(self, client, index, django_user_model, no_silk):
+        client.force_login(django_user_model.objects.create_user(
+            username='search', email='search@test.com', password='test123!@#'
+        ))
+        make_course('gk', 'Тренування воротарів')
+
+        response = client.get(reverse('content_api:search_suggestions'), {'q': 'ворот'})
+        assert response.status_code == 200
+        assert response.json()['suggestions'] == ['Тренування воротарів']
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestSearchBenchmark:
+    """Search latency at 10k courses: icontains scan vs inverted index"""
+
+    COURSES = 10000
+    QUERIES = ['тактика', 'воротарів', 'підготовка гравців', 'аналітик', 'психологія спорту']
+
+    WORDS = [
+        'тактика', 'воротарів', 'підготовка', 'гравців', 'аналітика', 'скаутинг', 'психологія',
+        'спорту', 'харчування', 'реабілітація', 'менеджмент', 'клубу', 'тренування', 'молоді',
+        'пресинг', 'захист', 'атака', 'стандарти', 'відео', 'фітнес',
+    ]
+
+    def _make_courses(self):
+        from apps.content.models import Course
+
+        courses = []
+        for i in range(self.COURSES):
+            words = [self.WORDS[(i * k) % len(self.WORDS)] for k in (1, 3, 7)]
+            courses.append(Course(
+                title=f'{words[0].capitalize()} {words[1]} {i}', slug=f'course-{i}',
+                short_description=' '.join(words), description=' '.join(words * 20),
+                author=f'Автор {i % 50}', price=100, is_published=True,
+            ))
+        Course.objects.bulk_create(courses, batch_size=1000)
+
+    def _measure(self, func, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for query in self.QUERIES:
+                func(query)
+        return (time.perf_counter() - start) / (repeat * len(self.QUERIES)) * 1000
+
+    def test_search_latency(self, index):
+        from django.db.models import Q
+        from apps.content.models import Course
+
+        self._make_courses()
+
+        def icontains(query):
+            return list(Course.objects.filter(
+                Q(title__icontains=query) | Q(description__icontains=query) |
+                Q(short_description__icontains=query) | Q(author__icontains=query),
+                is_published=True,
+            ).order_by('-created_at').values_list('id', flat=True)[:12])
+
+        def indexed(query):
+            return list(search_courses(
+                Course.objects.filter(is_published=True), query
+            ).values_list('id', flat=True)[:12])
+
+        start = time.perf_counter()
+        index.rebuild()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        icontains_ms = self._measure(icontains, repeat=5)
+        indexed_ms = self._measure(indexed)
+        lookup_ms = self._measure(index.search)
+
+        print(f"\n{self.COURSES} courses, index build {build_ms:.0f}ms ({index.get_stats()['terms']} terms)"
+              f"\nicontains page: {icontains_ms:.2f}ms, indexed page: {indexed_ms:.2f}ms "
+              f"(index lookup alone {lookup_ms:.2f}ms)")
+        assert lookup_ms < icontains_ms
@@ -0,0 +1,154 @@
+"""
+Test content serializers - preloaded user context, constant query count
+"""
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.content.models import Course, Favorite, Material, UserCourseProgress, UserEntitlement
+from apps.content.serializers import (
+    CourseDetailSerializer, CourseSerializer, UserCourseProgressSerializer, preload_course_context,
+)
+
+
+def make_request(user):
+    request = RequestFactory().get('/api/courses/')
+    # Новий об'єкт - без пам'яті прав з попереднього запиту
+    request.user = type(user).objects.get(pk=user.pk)
+    return request
+
+
+def make_courses(user, count, start=0):
+    """Курси з матеріалами; кожен третій в обраному, кожен другий з прогресом, кожен четвертий куплено"""
+    courses = []
+    for i in range(start, start + count):
+        course = Course.objects.create(
+            title=f'Курс {i}', slug=f'course-{i}', description='Опис', short_description='Коротко',
+            price=Decimal('500'), is_published=True, is_free=i % 5 == 0,
+        )
+        materials = [
+            Material.objects.create(course=course, title=f'Урок {n}', slug=f'lesson-{n}', content_type='article')
+            for n in range(3)
+        ]
+        if i % 3 == 0:
+            Favorite.objects.create(user=user, course=course)
+        if i % 2 == 0:
+            progress = UserCourseProgress.objects.create(user=user, course=course, progress_percentage=50)
+            progress.materials_completed.add(*materials[:i % 3 + 1])
+        if i % 4 == 0:
+            UserEntitlement.objects.create(user=user, item_type='course', item_id=course.id, source='manual')
+        courses.append(course)
+    return courses
+
+
+def serialize_page(courses, user):
+    request = make_request(user)
+    with CaptureQueriesContext(connection) as ctx:
+        courses = list(Course.objects.filter(id__in=[course.id for course in courses]).order_by('id'))
+        data = CourseSerializer(courses, many=True, context=preload_course_context(courses, request)).data
+    return data, len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+class TestCourseContextPreload:
+    """One query per relation for the whole page"""
+
+    def test_matches_per_object_queries(self, user):
+        courses = make_courses(user, 8)
+        preloaded, _ = serialize_page(courses, user)
+
+        request = make_request(user)
+        plain = CourseSerializer(sorted(courses, key=lambda c: c.id), many=True, context={'request': request}).data
+
+        assert preloaded == plain
+        assert [row['is_favorite'] for row in preloaded] == [i % 3 == 0 for i in range(8)]
+        assert [row['has_access'] for row in preloaded] == [i % 5 == 0 or i % 4 == 0 for i in range(8)]
+        assert preloaded[2]['user_progress']['completed_materials'] == 3
+        assert preloaded[2]['user_progress']['total_materials'] == 3
+        assert preloaded[1]['user_progress'] is None
+
+    def test_query_count_does_not_grow_with_page(self, user):
+        small = make_courses(user, 5)
+        large = make_courses(user, 40, start=5)
+
+        _, small_queries = serialize_page(small, user)
+        _, large_queries = serialize_page(large, user)
+        # Курси + обране + прогрес + матеріали + права
+        assert small_queries == large_queries == 5
+
+    def test_anonymous_page(self, user):
+        from django.contrib.auth.models import AnonymousUser
+
+        courses = make_courses(user, 5)
+        request = RequestFactory().get('/api/courses/')
+        request.user = AnonymousUser()
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = CourseSerializer(courses, many=True, context=preload_course_context(courses, request)).data
+        assert len(ctx.captured_queries) == 0
+        assert [row['has_access'] for row in data] == [course.is_free for course in courses]
+        assert {row['user_progress'] for row in data} == {None}
+
+    def test_detail_related_courses_preloaded(self, user):
+        make_courses(user, 10)
+        course = Course.objects.get(slug='course-0')
+
+        request = make_request(user)
+        with CaptureQueriesContext(connection) as ctx:
+            data = CourseDetailSerializer(course, context=preload_course_context([course], request)).data
+        assert len(data['related_courses']) == 4
+        assert all(material['is_accessible'] for material in data['materials'])
+        # Preload (4) + матеріали + схожі курси + їх обране/прогрес/матеріали (права вже в пам'яті)
+        assert len(ctx.captured_queries) == 9
+
+
+@pytest.mark.django_db
+class TestCourseAPIViews:
+    """List/detail endpoints use the preloaded context"""
+
+    def page_queries(self, client, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        assert response.status_code == 200
+        return response.json(), len(ctx.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_page(self, client, user, no_silk):
+        client.force_login(user)
+        url = reverse('content_api:course_list')
+
+        make_courses(user, 3)
+        small, small_queries = self.page_queries(client, url)
+        make_courses(user, 17, start=3)
+        large, large_queries = self.page_queries(client, url)
+
+        assert (small['count'], len(large['results'])) == (3, 20)
+        assert small_queries == large_queries
+        assert {row['slug']: row['is_favorite'] for row in large['results']}['course-3'] is True
+
+    def test_detail(self, client, user, no_silk):
+        client.force_login(user)
+        make_courses(user, 6)
+
+        data = client.get(reverse('content_api:course_detail', kwargs={'slug': 'course-2'})).json()
+        assert data['user_progress']['completed_materials'] == 3
+        assert len(data['materials']) == 3 and len(data['related_courses']) == 4
+        assert client.get(reverse('content_api:course_detail', kwargs={'slug': 'missing'})).status_code == 404
+
+
+@pytest.mark.django_db
+class TestUserCourseProgressSerializer:
+    """Counts come from counters, not per-row COUNT queries"""
+
+    def test_uses_counters(self, user):
+        course, = make_courses(user, 1)
+        progress = UserCourseProgress.objects.select_related('course').get(user=user, course=course)
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = UserCourseProgressSerializer(progress, context={'request': make_request(user)}).data
+        assert (data['completed_materials_count'], data['total_materials_count']) == (1, 3)
+        # Лічильник пройдених з рядка прогресу - без COUNT по materials_completed
+        assert not [q for q in ctx.captured_queries if 'materials_completed' in q['sql']]
@@ -5,6 +5,7 @@ from django.utils import timezone
 def check_user_course_access(user, course):
     """
     Check if user has access to a specific course
+    Покупки читаються з UserEntitlement (кеш на користувача, без JOIN платежів)
     TODO: Оновити для нової системи підписок
     """
     if not user or not user.is_authenticated:
@@ -15,21 +16,13 @@ def check_user_course_access(user, course):
         return True
     
     # Check if user purchased the course individually
-    from apps.payments.models import Payment, OrderItem
-    purchased = Payment.objects.filter(
-        user=user,
-        status='succeeded',
-        order__items__item_type='course',
-        order__items__item_id=course.id
-    ).exists()
-    
-    if purchased:
+    from .entitlements import has_entitlement
+    if has_entitlement(user, 'course', course.id):
         return True
     
     # TODO: Check if course requires subscription (нова система)
-    # if course.requires_subscription:
-    #     active_subscriptions = user.subscriptions.filter(...)
-    #     ...
+    # Права на план уже є в UserEntitlement (item_type='subscription'),
+    # бракує відповідності плану до course.subscription_tiers
     
     return False
 
@@ -45,29 +38,16 @@ def get_user_accessible_courses(user):
         # Only free courses for non-authenticated
         return Course.objects.filter(is_free=True, is_published=True)
     
-    # Start with free courses
-    accessible_courses = Course.objects.filter(is_free=True, is_published=True)
-    
-    # Add individually purchased courses
-    from apps.payments.models import Payment
-    purchased_course_ids = Payment.objects.filter(
-        user=user,
-        status='succeeded'
-    ).values_list('order__items__item_id', flat=True).distinct()
-    
-    purchased_courses = Course.objects.filter(id__in=purchased_course_ids, is_published=True)
+    # Free + individually purchased courses (один запит без distinct)
+    from .entitlements import get_entitled_ids
+    purchased_course_ids = get_entitled_ids(user, 'course')
     
     # TODO: Add subscription courses (нова система)
-    # active_subscriptions = user.subscriptions.filter(...)
-    # if active_subscriptions.exists():
-    #     subscription_courses = ...
-    #     accessible_courses = accessible_courses | purchased_courses | subscription_courses
-    # else:
-    #     accessible_courses = accessible_courses | purchased_courses
-    
-    accessible_courses = accessible_courses | purchased_courses
     
-    return accessible_courses.distinct()
+    return Course.objects.filter(
+        models.Q(is_free=True) | models.Q(id__in=purchased_course_ids),
+        is_published=True
+    )
 
 
 def calculate_content_preview_limits(content_type, content):
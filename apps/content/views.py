@@ -8,6 +8,7 @@ from django.utils import timezone
 from .models import Course, Material, Favorite, UserCourseProgress
 from .utils import check_user_course_access
 from apps.loyalty.services import LoyaltyService
+from apps.core.counters import view_counters
 
 
 class CourseListView(ListView):
@@ -39,15 +40,11 @@ class CourseListView(ListView):
                 q_objects |= Q(target_audience__contains=[aud])
             queryset = queryset.filter(q_objects)
         
-        # Пошук
+        # Пошук (full-text з ранжуванням - apps.content.search)
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(short_description__icontains=search_query) |
-                Q(author__icontains=search_query)
-            )
+            from .search import search_courses
+            return search_courses(queryset, search_query)
         
         return queryset.order_by('-created_at')
     
@@ -77,15 +74,11 @@ class CourseListView(ListView):
         else:
             context['user_favorites'] = []
         
-        # Додати бали для кожного курсу
-        course_points = {}
-        for course in context['courses']:
-            points = LoyaltyService.get_points_for_course_display(
-                course.price,
-                self.request.user if self.request.user.is_authenticated else None
-            )
-            course_points[course.id] = points
-        context['course_points'] = course_points
+        # Бали для карток курсів (один виклик на сторінку)
+        context['course_points'] = LoyaltyService.get_points_for_courses_display(
+            {course.id: course.price for course in context['courses']},
+            self.request.user
+        )
         
         return context
 
@@ -98,9 +91,8 @@ class CourseDetailView(DetailView):
     
     def get_object(self):
         obj = super().get_object()
-        # Increment view count
-        obj.view_count += 1
-        obj.save(update_fields=['view_count'])
+        # Increment view count (write-behind, без UPDATE на кожен перегляд)
+        view_counters.incr(obj, 'view_count')
         return obj
     
     def get_context_data(self, **kwargs):
@@ -124,9 +116,17 @@ class CourseDetailView(DetailView):
         context['target_audience_display'] = course.get_target_audience_display()
         
         # Related courses
-        context['related_courses'] = Course.objects.filter(
+        context['related_courses'] = list(Course.objects.filter(
             is_published=True
-        ).exclude(id=course.id)[:4]
+        ).exclude(id=course.id)[:4])
+        
+        # Бали за покупку: цей курс + картки схожих курсів
+        course_points = LoyaltyService.get_points_for_courses_display(
+            {c.id: c.price for c in [course, *context['related_courses']]},
+            self.request.user
+        )
+        context['course_points'] = course_points
+        context['purchase_points'] = course_points[course.id]
         
         # Materials (закомментовано - для майбутнього)
         # context['materials'] = course.materials.all().order_by('order')
@@ -256,17 +256,13 @@ class UpdateProgressView(LoginRequiredMixin, View):
         if material_id:
             material = get_object_or_404(Material, id=material_id, course=course)
             
-            progress, created = UserCourseProgress.objects.get_or_create(
-                user=request.user,
-                course=course
-            )
-            progress.materials_completed.add(material)
-            progress.update_progress()
+            from .progress import mark_material
+            state = mark_material(request.user, material)
             
             return JsonResponse({
-                'progress_percentage': float(progress.progress_percentage),
-                'completed_count': progress.materials_completed.count(),
-                'total_count': course.materials.count()
+                'progress_percentage': state['progress_percentage'],
+                'completed_count': state['completed_count'],
+                'total_count': state['total_count']
             })
         
         return JsonResponse({'error': 'Material ID required'}, status=400)
\ No newline at end of file
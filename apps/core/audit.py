@@ -0,0 +1,336 @@
+"""
+Audit trail subsystem
+In-memory change tracking: snapshot at load time, diff on save;
+entries are collected per transaction/request and bulk-written
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+import copy
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Поля, які не потрапляють у diff
+SKIP_DIFF_FIELDS = {'updated_at', 'last_login'}
+
+DEFAULT_EXCLUDED_MODELS = [
+    'core.AuditLog',
+    'core.ContentVersion',
+    'admin.LogEntry',
+    'sessions.Session',
+    'analytics.PageView',
+    'analytics.UserSession',
+    'silk',  # Профайлер (development) - вся app
+]
+
+DEFAULT_IGNORED_UPDATE_FIELDS = {
+    # Лічильники переглядів та службові токени - save(update_fields=...) без аудиту
+    'content.Course': ['view_count'],
+    'content.MonthlyQuote': ['views_count', 'last_displayed_at'],
+    'content.Material': ['video_access_token', 'token_expires_at'],
+}
+
+
+class AuditRegistry:
+    """
+    Which models are audited and which saves are too hot to audit
+
+    Defaults come from settings.AUDIT_EXCLUDED_MODELS ('app_label' or
+    'app_label.ModelName') and settings.AUDIT_IGNORED_UPDATE_FIELDS
+    ({'app_label.ModelName': [fields]}). Apps can adjust from AppConfig.ready():
+
+        from apps.core.audit import audit_registry
+        audit_registry.exclude(MyModel)
+        audit_registry.ignore_update_fields(Course, ['view_count'])
+    """
+
+    def __init__(self):
+        self._excluded = set()
+        self._included = set()
+        self._ignored_update_fields = {}
+        self._decisions = {}
+        self._configured = False
+
+    def _configure(self):
+        if self._configured:
+            return
+        self._configured = True
+        self._excluded.update(
+            getattr(settings, 'AUDIT_EXCLUDED_MODELS', DEFAULT_EXCLUDED_MODELS)
+        )
+        ignored = getattr(settings, 'AUDIT_IGNORED_UPDATE_FIELDS', DEFAULT_IGNORED_UPDATE_FIELDS)
+        for label, fields in ignored.items():
+            self._ignored_update_fields.setdefault(label, set()).update(fields)
+
+    @staticmethod
+    def _label(model):
+        return f"{model._meta.app_label}.{model.__name__}"
+
+    def exclude(self, *models):
+        """Opt models out of the audit trail"""
+        self._configure()
+        for model in models:
+            label = self._label(model)
+            self._included.discard(label)
+            self._excluded.add(label)
+        self._decisions.clear()
+
+    def include(self, *models):
+        """Opt models back in (overrides app-level exclusion)"""
+        self._configure()
+        for model in models:
+            label = self._label(model)
+            self._excluded.discard(label)
+            self._included.add(label)
+        self._decisions.clear()
+
+    def ignore_update_fields(self, model, fields):
+        """Skip audit for save(update_fields=...) touching only these fields"""
+        self._configure()
+        self._ignored_update_fields.setdefault(self._label(model), set()).update(fields)
+
+    def is_audited(self, model):
+        """Check if model changes go to AuditLog (memoized per model)"""
+        decision = self._decisions.get(model)
+        if decision is None:
+            self._configure()
+            label = self._label(model)
+            if label in self._included:
+                decision = True
+            else:
+                decision = not (
+                    label in self._excluded
+                    or model._meta.app_label in self._excluded
+                    or model._meta.proxy and self._label(model._meta.concrete_model) in self._excluded
+                )
+            self._decisions[model] = decision
+        return decision
+
+    def is_ignored_save(self, model, update_fields):
+        """Counter-only save (all update_fields are ignored for this model)"""
+        if not update_fields:
+            return False
+        self._configure()
+        ignored = self._ignored_update_fields.get(self._label(model))
+        return bool(ignored) and set(update_fields) <= ignored
+
+
+audit_registry = AuditRegistry()
+
+
+# Snapshots
+
+def take_snapshot(instance, update_fields=None):
+    """
+    Запам'ятати поточні значення полів (deferred поля пропускаються)
+    
+    Після save(update_fields=...) оновлюються тільки збережені поля.
+    """
+    values = instance.__dict__
+    snapshot = getattr(instance, '_audit_snapshot', None)
+    if update_fields is None or snapshot is None:
+        snapshot = {}
+    
+    for field in instance._meta.concrete_fields:
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        if field.attname in values:
+            value = values[field.attname]
+            if isinstance(value, (list, dict)):
+                # JSONField - in-place зміни не мають потрапити в snapshot
+                value = copy.deepcopy(value)
+            snapshot[field.attname] = value
+    instance._audit_snapshot = snapshot
+
+
+def _wrap_from_db(model):
+    original = model.from_db.__func__
+
+    def from_db(cls, db, field_names, values):
+        instance = original(cls, db, field_names, values)
+        take_snapshot(instance)
+        return instance
+
+    from_db._audit_wrapped = True
+    model.from_db = classmethod(from_db)
+
+
+def install_snapshots(models):
+    """Snapshot audited models when they are loaded from the database"""
+    for model in models:
+        if model._meta.abstract or not audit_registry.is_audited(model):
+            continue
+        if getattr(model.from_db, '_audit_wrapped', False):
+            continue
+        _wrap_from_db(model)
+
+
+def diff_instance(instance, update_fields=None):
+    """
+    Diff current field values against the load-time snapshot (no queries)
+
+    Returns:
+        dict: {"field": {"old": "...", "new": "..."}}; empty if no snapshot
+    """
+    snapshot = getattr(instance, '_audit_snapshot', None)
+    if snapshot is None:
+        return {}
+
+    values = instance.__dict__
+    changes = {}
+    for field in instance._meta.concrete_fields:
+        if field.name in SKIP_DIFF_FIELDS:
+            continue
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        if field.attname not in snapshot or field.attname not in values:
+            continue
+
+        old_value = snapshot[field.attname]
+        new_value = values[field.attname]
+
+        # Convert to string for comparison
+        old_str = str(old_value) if old_value is not None else ''
+        new_str = str(new_value) if new_value is not None else ''
+
+        if old_str != new_str:
+            changes[field.name] = {
+                'old': old_str[:200],  # Truncate long values
+                'new': new_str[:200]
+            }
+    return changes
+
+
+# AuditLog table check
+
+_audit_table_exists = False
+
+
+def audit_table_exists():
+    """
+    Check if AuditLog table exists (skip during migrations)
+
+    A positive answer is cached for the life of the process; a negative one
+    is re-checked, so the first migrate of a fresh DB still starts auditing.
+    """
+    global _audit_table_exists
+    if not _audit_table_exists:
+        from apps.core.models import AuditLog
+        _audit_table_exists = AuditLog._meta.db_table in connection.introspection.table_names()
+    return _audit_table_exists
+
+
+# Deferred writes
+
+class AuditCollector:
+    """
+    Collects AuditLog entries and writes them with one bulk_create
+
+    - Inside a transaction: entries are batched per transaction (savepoint)
+      and written via transaction.on_commit - a rollback drops them together
+      with the changes they describe.
+    - Inside a request (RequestContextMiddleware): committed batches and
+      autocommit saves are buffered until the end of the request.
+    - Otherwise (shell, management commands in autocommit): written at once.
+
+    Usage:
+        audit_collector.add(AuditLog(...), using='default')
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self):
+        self._local = threading.local()
+
+    # Request scope
+
+    def begin_request(self):
+        self._local.request_entries = []
+
+    def end_request(self):
+        """Write everything buffered during the request"""
+        entries = getattr(self._local, 'request_entries', None)
+        self._local.request_entries = None
+        if entries:
+            self.write(entries)
+
+    def _request_entries(self):
+        return getattr(self._local, 'request_entries', None)
+
+    # Collecting
+
+    def add(self, entry, using=None):
+        """Queue an unsaved AuditLog instance"""
+        conn = connections[using or DEFAULT_DB_ALIAS]
+        if conn.in_atomic_block:
+            self._current_batch(conn).append(entry)
+            return
+
+        request_entries = self._request_entries()
+        if request_entries is not None:
+            request_entries.append(entry)
+        else:
+            self.write([entry])
+
+    def _current_batch(self, conn):
+        """
+        Batch bound to the current transaction/savepoint
+
+        A new batch (and on_commit callback) is started when the savepoint
+        stack changed or the previous callback was discarded by a rollback.
+        """
+        sids = tuple(conn.savepoint_ids)
+        state = getattr(conn, '_audit_batch', None)
+        if state is not None:
+            batch_sids, batch, callback = state
+            if batch_sids == sids and self._is_pending(conn, callback):
+                return batch
+
+        batch = []
+
+        def callback():
+            if getattr(conn, '_audit_batch', None) is state:
+                conn._audit_batch = None
+            self._committed(batch)
+
+        state = (sids, batch, callback)
+        conn.on_commit(callback)
+        conn._audit_batch = state
+        return batch
+
+    @staticmethod
+    def _is_pending(conn, callback):
+        # Свіжий callback зазвичай останній у списку
+        for _, func, _ in reversed(conn.run_on_commit):
+            if func is callback:
+                return True
+        return False
+
+    def _committed(self, batch):
+        request_entries = self._request_entries()
+        if request_entries is not None:
+            request_entries.extend(batch)
+        else:
+            self.write(batch)
+
+    def write(self, entries):
+        """
+        Bulk insert entries (never raises - audit must not break saves)
+
+        Returns:
+            int: Number of written entries
+        """
+        from apps.core.models import AuditLog
+
+        try:
+            AuditLog.objects.bulk_create(entries, batch_size=self.BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"Failed to write {len(entries)} audit log entries: {e}")
+            return 0
+        logger.debug(f"Audit log: {len(entries)} entries written")
+        return len(entries)
+
+
+audit_collector = AuditCollector()
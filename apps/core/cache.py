@@ -0,0 +1,333 @@
+"""
+Caching utilities for Play Vision
+Tiered cache backend and query caching helpers
+"""
+import base64
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, router, transaction
+from django.utils.timezone import now as tz_now
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCache(BaseCache):
+    """
+    Two-tier cache: per-process LRU in front of a shared backend
+
+    Reads are served from a bounded in-process LocMemCache with a short TTL;
+    misses fall through to the shared backend (DatabaseCache) and are copied
+    into the local tier. Writes go through to the shared backend.
+
+    Invalidation: delete/incr/decr bump a generation counter in the shared
+    backend and record the touched keys under that generation. Every process
+    polls the counter at most once per VERSION_CHECK_INTERVAL and drops just
+    the recorded keys from its local tier, so a cache.delete() in one gunicorn
+    worker reaches all workers within a second without evicting unrelated
+    entries (version keys are bumped on every content change). clear(), a gap
+    longer than INVALIDATION_LOG_LIMIT or an expired log entry drop the whole
+    local tier. A plain set() is not broadcast - other workers may serve the
+    previous value for at most LOCAL_TIMEOUT seconds.
+
+    Keys with LOCAL_EXCLUDE_PREFIXES (counters, per-user logs) bypass the
+    local tier entirely and always hit the shared backend.
+
+    Usage (settings.CACHES):
+        'default': {
+            'BACKEND': 'apps.core.cache.TieredCache',
+            'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_TIMEOUT': 10},
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache_table',
+        },
+    """
+
+    GENERATION_KEY = 'tiered_cache:generation'
+    INVALIDATION_KEY = 'tiered_cache:invalidated:{}'
+    INVALIDATION_LOG_LIMIT = 100
+    INVALIDATION_LOG_TIMEOUT = 300
+    _missing = object()
+    _unchecked = object()
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._shared = None
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 10)
+        self.version_check_interval = options.get('VERSION_CHECK_INTERVAL', 1)
+        self.local_exclude_prefixes = tuple(options.get('LOCAL_EXCLUDE_PREFIXES', ()))
+
+        self._local = LocMemCache(
+            f'tiered-local-{location or self._shared_alias}',
+            {
+                'TIMEOUT': self.local_timeout,
+                'OPTIONS': {
+                    'MAX_ENTRIES': options.get('LOCAL_MAX_ENTRIES', 1000),
+                    'CULL_FREQUENCY': 4,
+                },
+            },
+        )
+
+        self._lock = threading.Lock()
+        self._generation = self._unchecked
+        self._next_check = 0.0
+
+    @property
+    def shared(self):
+        """Shared backend (resolved lazily - caches are created on first access)"""
+        if self._shared is None:
+            self._shared = caches[self._shared_alias]
+        return self._shared
+
+    def _is_local(self, key):
+        return not key.startswith(self.local_exclude_prefixes)
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    # Invalidation broadcast
+
+    def _sync_generation(self):
+        """Drop keys other processes invalidated since the last check"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.version_check_interval
+            try:
+                generation = self.shared.get(self.GENERATION_KEY)
+            except Exception as e:
+                logger.error(f"Tiered cache generation check failed: {e}")
+                self._local.clear()
+                return
+            if generation != self._generation:
+                if self._generation is not self._unchecked:
+                    self._apply_invalidations(self._generation, generation)
+                self._generation = generation
+
+    def _apply_invalidations(self, previous, current):
+        """Delete keys logged for generations (previous, current]; clear local tier if the log is incomplete"""
+        if not (isinstance(previous, int) and isinstance(current, int)
+                and 0 < current - previous <= self.INVALIDATION_LOG_LIMIT):
+            self._local.clear()
+            return
+
+        log_keys = [self.INVALIDATION_KEY.format(generation) for generation in range(previous + 1, current + 1)]
+        try:
+            entries = self.shared.get_many(log_keys)
+        except Exception as e:
+            logger.error(f"Tiered cache invalidation log read failed: {e}")
+            entries = {}
+        if len(entries) != len(log_keys) or any(entry is None for entry in entries.values()):
+            # Запис протух / ще не записаний або clear() - скидаємо все
+            self._local.clear()
+            return
+        for entry in entries.values():
+            for key, version in entry:
+                self._local.delete(key, version=version)
+
+    def _broadcast_invalidation(self, keys, version=None):
+        """Bump generation and log the keys other processes must drop (None - whole local tier)"""
+        try:
+            self.shared.add(self.GENERATION_KEY, 0, None)
+            generation = self.shared.incr(self.GENERATION_KEY)
+            entry = None if keys is None else [(key, version) for key in keys]
+            self.shared.set(self.INVALIDATION_KEY.format(generation), entry, self.INVALIDATION_LOG_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Tiered cache invalidation broadcast failed: {e}")
+            return
+
+        with self._lock:
+            # Only our own bump since last check - local tier is still valid
+            previous = self._generation
+            if isinstance(previous, int) and generation == previous + 1:
+                self._generation = generation
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self.shared.get(key, default, version=version)
+
+        self._sync_generation()
+        value = self._local.get(key, self._missing, version=version)
+        if value is not self._missing:
+            return value
+
+        value = self.shared.get(key, self._missing, version=version)
+        if value is self._missing:
+            return default
+        self._local.set(key, value, self.local_timeout, version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        if self._is_local(key):
+            self._local.set(key, value, self._local_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and self._is_local(key):
+            self._local.set(key, value, self._local_timeout(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.shared.delete(key, version=version)
+        if self._is_local(key):
+            self._local.delete(key, version=version)
+            self._broadcast_invalidation([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        local_keys = [key for key in keys if self._is_local(key)]
+        if local_keys:
+            self._local.delete_many(local_keys, version=version)
+            self._broadcast_invalidation(local_keys, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        if self._is_local(key):
+            self._local.delete(key, version=version)
+            self._broadcast_invalidation([key], version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missing, version=version) is not self._missing
+
+    def clear(self):
+        # Лічильник поколінь переживає clear(), інакше він почнеться з 1 і
+        # воркер, що вже бачив 1, не помітить інвалідацію
+        generation = self.shared.get(self.GENERATION_KEY)
+        self.shared.clear()
+        if isinstance(generation, int):
+            self.shared.add(self.GENERATION_KEY, generation, None)
+        self._local.clear()
+        self._broadcast_invalidation(None)
+
+    def clear_local(self):
+        """Drop only this process's local tier"""
+        self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+
+class AtomicDatabaseCache(DatabaseCache):
+    """
+    DatabaseCache with an atomic incr()
+
+    Django's DatabaseCache.incr() is get() + set(), so concurrent workers
+    lose updates (rate limit counters undercount). Here the row is locked
+    first (SELECT ... FOR UPDATE on Postgres, a no-op UPDATE taking the
+    write lock on SQLite), then read and rewritten inside one transaction.
+    """
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db = router.db_for_write(self.cache_model_class)
+        connection = connections[db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self._table)
+        cache_key, value_col, expires = quote_name('cache_key'), quote_name('value'), quote_name('expires')
+        now = connection.ops.adapt_datetimefield_value(tz_now().replace(microsecond=0))
+
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            if connection.features.has_select_for_update:
+                cursor.execute(
+                    f"SELECT {value_col} FROM {table} WHERE {cache_key} = %s AND {expires} > %s FOR UPDATE",
+                    [key, now],
+                )
+                row = cursor.fetchone()
+            else:
+                cursor.execute(
+                    f"UPDATE {table} SET {expires} = {expires} WHERE {cache_key} = %s AND {expires} > %s",
+                    [key, now],
+                )
+                row = None
+                if cursor.rowcount:
+                    cursor.execute(f"SELECT {value_col} FROM {table} WHERE {cache_key} = %s", [key])
+                    row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+
+            value = pickle.loads(base64.b64decode(row[0].encode())) + delta
+
+            b64encoded = base64.b64encode(pickle.dumps(value, self.pickle_protocol)).decode('latin1')
+            cursor.execute(
+                f"UPDATE {table} SET {value_col} = %s WHERE {cache_key} = %s",
+                [b64encoded, key],
+            )
+        return value
+
+
+class CacheStrategy:
+    """
+    Helpers for caching expensive function results
+
+    Usage:
+        @CacheStrategy.cached_query('popular_courses', ttl=600)
+        def get_popular_courses(limit):
+            ...
+    """
+
+    @staticmethod
+    def get_cache_key(prefix, *args, **kwargs):
+        """
+        Build deterministic cache key from prefix and arguments
+
+        Returns:
+            str: '<prefix>:<md5 of args>'
+        """
+        raw = repr((args, sorted(kwargs.items())))
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f"{prefix}:{digest}"
+
+    @staticmethod
+    def cached_query(prefix, ttl=300):
+        """
+        Decorator caching function result by its arguments
+
+        Args:
+            prefix: Cache key prefix
+            ttl: Time to live in seconds
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                from django.core.cache import cache
+
+                cache_key = CacheStrategy.get_cache_key(prefix, *args, **kwargs)
+                result = cache.get(cache_key)
+                if result is None:
+                    result = func(*args, **kwargs)
+                    cache.set(cache_key, result, ttl)
+                return result
+            return wrapper
+        return decorator
@@ -22,3 +22,49 @@ def external_urls(request):
             'BUNNY_LIBRARY_ID': getattr(settings, 'BUNNY_LIBRARY_ID', ''),
         }
 
+
+
+def _is_htmx_fragment(request):
+    """HTMX запит на фрагмент (не hx-boost і не відновлення історії)"""
+    meta = request.META
+    return (
+        'HTTP_HX_REQUEST' in meta
+        and 'HTTP_HX_BOOSTED' not in meta
+        and 'HTTP_HX_HISTORY_RESTORE_REQUEST' not in meta
+    )
+
+
+def _resolve_site_value(request, provider_path, key):
+    """Викликати provider один раз за request і повернути значення ключа"""
+    from django.utils.module_loading import import_string
+
+    results = request.__dict__.setdefault('_site_context_cache', {})
+    if provider_path not in results:
+        results[provider_path] = import_string(provider_path)(request)
+    return results[provider_path].get(key)
+
+
+def site_context(request):
+    """
+    Лінивий контекст сайту замість глобальних context processors
+    
+    Кожне значення з settings.SITE_CONTEXT_PROVIDERS обгорнуте в
+    SimpleLazyObject: provider викликається тільки коли template вперше
+    звертається до його ключа, а результат кешується на request і
+    перевикористовується всіма templates цього запиту.
+    HTMX фрагменти (каталог hub/events) не отримують цих даних взагалі.
+    """
+    from functools import partial
+    from django.conf import settings
+    from django.utils.functional import SimpleLazyObject
+
+    if _is_htmx_fragment(request):
+        return {}
+
+    context = {}
+    for provider_path, keys in settings.SITE_CONTEXT_PROVIDERS.items():
+        for key in keys:
+            context[key] = SimpleLazyObject(
+                partial(_resolve_site_value, request, provider_path, key)
+            )
+    return context
@@ -0,0 +1,192 @@
+"""
+Streaming file downloads
+Файл віддається шматками (локальне сховище або потік з віддаленого бекенду),
+з підтримкою Range/If-Range для докачки; або віддача передається nginx/Apache
+через X-Accel-Redirect / X-Sendfile, і воркер звільняється одразу
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date
+from urllib.parse import quote
+import logging
+import mimetypes
+import re
+
+logger = logging.getLogger(__name__)
+
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Заголовки, які передаються з віддаленого сховища клієнту
+REMOTE_PASSTHROUGH_HEADERS = ['Content-Length', 'Content-Range', 'ETag', 'Last-Modified', 'Accept-Ranges']
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Один діапазон з заголовка Range
+
+    Returns:
+        tuple | None: (start, end) включно; None - віддати весь файл
+        (немає заголовка, інша одиниця, кілька діапазонів, синтаксична помилка)
+
+    Raises:
+        RangeNotSatisfiable: діапазон поза файлом (416)
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N - останні N байт
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, end
+
+
+def iter_file(file, start, length, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Читати length байт з позиції start шматками; файл закривається в кінці або при обриві"""
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def _local_path(file_field):
+    try:
+        return file_field.storage.path(file_field.name)
+    except NotImplementedError:
+        return None
+
+
+def _validators(file_field, size):
+    """(ETag, Last-Modified) для If-Range; Last-Modified може бути None"""
+    try:
+        modified = file_field.storage.get_modified_time(file_field.name).timestamp()
+    except (NotImplementedError, OSError):
+        modified = None
+    etag = f'"{size:x}-{int(modified or 0):x}"'
+    return etag, http_date(modified) if modified else None
+
+
+def _base_response(response, filename, content_type):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _offload_response(mode, file_field, path, filename, content_type):
+    """Порожня відповідь - файл віддасть вебсервер (він же обробляє Range)"""
+    response = _base_response(HttpResponse(), filename, content_type)
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(file_field.name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _remote_response(request, file_field, filename, content_type, chunk_size):
+    """Проксі потоком з віддаленого сховища (Range/If-Range передаються далі)"""
+    import requests
+
+    headers = {name: request.headers[name] for name in ('Range', 'If-Range') if name in request.headers}
+    try:
+        upstream = requests.get(file_field.url, headers=headers, stream=True, timeout=(5, 60))
+    except requests.RequestException as e:
+        logger.error(f"Remote download failed for {file_field.name}: {e}")
+        raise Http404("Файл тимчасово недоступний")
+
+    if upstream.status_code not in (200, 206, 416):
+        upstream.close()
+        logger.error(f"Remote download {file_field.name}: upstream returned {upstream.status_code}")
+        raise Http404("Файл недоступний")
+
+    response = StreamingHttpResponse(
+        upstream.iter_content(chunk_size) if upstream.status_code != 416 else iter(()),
+        status=upstream.status_code,
+    )
+    response._resource_closers.append(upstream.close)
+    for name in REMOTE_PASSTHROUGH_HEADERS:
+        if name in upstream.headers:
+            response[name] = upstream.headers[name]
+    return _base_response(response, filename, content_type)
+
+
+def serve_file(request, file_field, filename, content_type=None, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Віддати FieldFile як завантаження без читання всього файлу в пам'ять
+
+    Режим (settings.DOWNLOAD_OFFLOAD):
+        ''                 - потік з Django (Range/If-Range, 206/416)
+        'x-accel-redirect' - nginx internal location (DOWNLOAD_ACCEL_PREFIX -> MEDIA_ROOT)
+        'x-sendfile'       - Apache mod_xsendfile / lighttpd
+    Offload можливий тільки для локального сховища; віддалене проксіюється потоком.
+    """
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    path = _local_path(file_field)
+
+    if path is None:
+        return _remote_response(request, file_field, filename, content_type, chunk_size)
+
+    mode = getattr(settings, 'DOWNLOAD_OFFLOAD', '')
+    if mode:
+        return _offload_response(mode, file_field, path, filename, content_type)
+
+    try:
+        size = file_field.size
+    except OSError:
+        raise Http404("Файл не знайдено")
+    etag, last_modified = _validators(file_field, size)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range: докачка тільки якщо файл не змінився, інакше - весь файл заново
+    if range_header and (not if_range or if_range in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = _base_response(HttpResponse(status=416), filename, content_type)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    file = file_field.storage.open(file_field.name, 'rb')
+    response = StreamingHttpResponse(iter_file(file, start, length, chunk_size), status=206 if byte_range else 200)
+    response._resource_closers.append(file.close)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _base_response(response, filename, content_type)
@@ -3,6 +3,7 @@ Management команда для створення demo даних для Play
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from decimal import Decimal
 from django.utils import timezone
 from datetime import timedelta
@@ -14,6 +15,15 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write('🚀 Створення demo даних для Play Vision...')
         
+        # Одна транзакція: все або нічого, аудит пишеться одним bulk INSERT
+        with transaction.atomic():
+            self.create_all()
+        
+        self.stdout.write(
+            self.style.SUCCESS('🎉 Demo дані успішно створені!')
+        )
+    
+    def create_all(self):
         # Створення користувачів
         self.create_users()
         
@@ -34,10 +44,6 @@ class Command(BaseCommand):
         
         # AI конфігурація
         self.create_ai_config()
-        
-        self.stdout.write(
-            self.style.SUCCESS('🎉 Demo дані успішно створені!')
-        )
     
     def create_users(self):
         """Створення користувачів"""
@@ -0,0 +1,20 @@
+"""
+Примусово записати накопичені лічильники переглядів
+Usage: python manage.py flush_view_counters
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Flush write-behind view counters (this process) and ask all workers to flush'
+
+    def handle(self, *args, **options):
+        from apps.core import counters
+
+        flushed = counters.view_counters.flush()
+        counters.view_counters.request_flush()
+
+        interval = counters.view_counters.check_interval
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {flushed} rows; workers will flush within ~{interval:.0f}s"
+        ))
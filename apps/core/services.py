@@ -6,7 +6,9 @@ import geoip2.database
 import geoip2.errors
 from django.conf import settings
 from django.core.cache import cache
+from collections import OrderedDict
 import logging
+import threading
 import time
 from functools import wraps
 
@@ -23,16 +25,30 @@ class GeolocationService:
     """
     
     _reader = None  # Singleton pattern
+    _reader_retry_at = 0.0  # monotonic time of the next load attempt after a failure
+    READER_RETRY_INTERVAL = 300  # Don't re-check a missing/broken DB file on every request
+    
+    # Bounded in-process LRU in front of the shared geoip:{ip} cache
+    LRU_MAXSIZE = 10000
+    CACHE_TTL = 86400  # 24 hours
+    _lru = OrderedDict()  # ip -> (country_code, expires_at)
+    _lru_lock = threading.Lock()
     
     @classmethod
     def get_reader(cls):
         """
         Lazy load GeoIP2 database reader (singleton)
         
+        The database is memory-mapped (MODE_MMAP): one process-wide reader,
+        pages shared between gunicorn workers by the OS page cache.
+        A failed load is retried after READER_RETRY_INTERVAL seconds.
+        
         Returns:
             geoip2.database.Reader or None
         """
-        if cls._reader is None:
+        if cls._reader is None and time.monotonic() >= cls._reader_retry_at:
+            # Until the next attempt lookups fall back to 'WORLD'
+            cls._reader_retry_at = time.monotonic() + cls.READER_RETRY_INTERVAL
             try:
                 geoip_path = settings.GEOIP_PATH
                 db_file = geoip_path / 'GeoLite2-Country.mmdb'
@@ -44,7 +60,9 @@ class GeolocationService:
                     )
                     return None
                 
-                cls._reader = geoip2.database.Reader(str(db_file))
+                cls._reader = geoip2.database.Reader(
+                    str(db_file), mode=geoip2.database.MODE_MMAP
+                )
                 logger.info("GeoIP database loaded successfully")
                 
             except Exception as e:
@@ -64,19 +82,25 @@ class GeolocationService:
         Returns:
             str: 2-letter ISO country code (e.g. 'UA', 'US') or 'WORLD' if unknown
         """
-        # Check cache first (24h TTL)
+        # In-process LRU first - no cache round trip on warm requests
+        country_code = cls._lru_get(ip_address)
+        if country_code:
+            return country_code
+        
+        # Check if private/local IP
+        if cls._is_private_ip(ip_address):
+            logger.debug(f"Private IP detected: {ip_address}, returning UA")
+            return 'UA'  # Default for localhost/private networks
+        
+        # Check shared cache (24h TTL)
         cache_key = f"geoip:{ip_address}"
         cached_country = cache.get(cache_key)
         
         if cached_country:
             logger.debug(f"GeoIP cache HIT for {ip_address}: {cached_country}")
+            cls._lru_set(ip_address, cached_country)
             return cached_country
         
-        # Check if private/local IP
-        if cls._is_private_ip(ip_address):
-            logger.debug(f"Private IP detected: {ip_address}, returning UA")
-            return 'UA'  # Default for localhost/private networks
-        
         try:
             reader = cls.get_reader()
             
@@ -93,20 +117,45 @@ class GeolocationService:
                 return 'WORLD'
             
             # Cache for 24 hours
-            cache.set(cache_key, country_code, 86400)
+            cache.set(cache_key, country_code, cls.CACHE_TTL)
+            cls._lru_set(ip_address, country_code)
             logger.info(f"IP {ip_address} resolved to {country_code}")
             
             return country_code
             
         except geoip2.errors.AddressNotFoundError:
             logger.warning(f"IP {ip_address} not found in GeoIP database")
-            cache.set(cache_key, 'WORLD', 86400)
+            cache.set(cache_key, 'WORLD', cls.CACHE_TTL)
+            cls._lru_set(ip_address, 'WORLD')
             return 'WORLD'
             
         except Exception as e:
             logger.error(f"GeoIP lookup failed for {ip_address}: {e}")
             return 'WORLD'
     
+    @classmethod
+    def _lru_get(cls, ip_address):
+        """Get country from in-process LRU (None on miss or expiry)"""
+        with cls._lru_lock:
+            entry = cls._lru.get(ip_address)
+            if entry is None:
+                return None
+            country_code, expires_at = entry
+            if expires_at < time.monotonic():
+                del cls._lru[ip_address]
+                return None
+            cls._lru.move_to_end(ip_address)
+            return country_code
+    
+    @classmethod
+    def _lru_set(cls, ip_address, country_code):
+        """Store country in in-process LRU, evicting least recently used"""
+        with cls._lru_lock:
+            cls._lru[ip_address] = (country_code, time.monotonic() + cls.CACHE_TTL)
+            cls._lru.move_to_end(ip_address)
+            while len(cls._lru) > cls.LRU_MAXSIZE:
+                cls._lru.popitem(last=False)
+    
     @staticmethod
     def _is_private_ip(ip):
         """
@@ -132,6 +181,9 @@ class GeolocationService:
         if cls._reader:
             cls._reader.close()
             cls._reader = None
+        cls._reader_retry_at = 0.0
+        with cls._lru_lock:
+            cls._lru.clear()
 
 
 def profile_query(threshold_ms=100):
@@ -190,8 +242,11 @@ class RequestContextMiddleware:
         RequestContextMiddleware._thread_locals = threading.local()
     
     def __call__(self, request):
+        from .audit import audit_collector
+        
         # Store request in thread-local
         RequestContextMiddleware._thread_locals.request = request
+        audit_collector.begin_request()
         
         try:
             response = self.get_response(request)
@@ -200,6 +255,8 @@ class RequestContextMiddleware:
             # Clean up
             if hasattr(RequestContextMiddleware._thread_locals, 'request'):
                 del RequestContextMiddleware._thread_locals.request
+            # One bulk INSERT for all audit entries of this request
+            audit_collector.end_request()
     
     @classmethod
     def get_current_request(cls):
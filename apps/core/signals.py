@@ -6,6 +6,9 @@ from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
 from django.apps import apps
+from .audit import (
+    audit_collector, audit_registry, audit_table_exists, diff_instance, install_snapshots, take_snapshot,
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,47 +19,23 @@ def track_changes(sender, instance, **kwargs):
     """
     Track field changes before save
     Stores changes in instance._tracked_changes for later use
+    
+    Diffs against the snapshot taken when the instance was loaded
+    (apps.core.audit) - no extra query per save.
     """
     # Skip if new object (no previous state to compare)
     if instance._state.adding:
         return
     
-    # Skip AuditLog and ContentVersion to avoid recursion
-    if sender.__name__ in ['AuditLog', 'ContentVersion', 'LogEntry']:
+    # Skip AuditLog, ContentVersion etc. to avoid recursion, and counter-only saves
+    if not audit_registry.is_audited(sender):
+        return
+    update_fields = kwargs.get('update_fields')
+    if audit_registry.is_ignored_save(sender, update_fields):
         return
     
     try:
-        # Get old version from database
-        old_instance = sender.objects.get(pk=instance.pk)
-        changes = {}
-        
-        # Compare all fields
-        for field in instance._meta.fields:
-            field_name = field.name
-            
-            # Skip auto-generated fields
-            if field_name in ['updated_at', 'last_login']:
-                continue
-            
-            old_value = getattr(old_instance, field_name, None)
-            new_value = getattr(instance, field_name, None)
-            
-            # Convert to string for comparison
-            old_str = str(old_value) if old_value is not None else ''
-            new_str = str(new_value) if new_value is not None else ''
-            
-            if old_str != new_str:
-                changes[field_name] = {
-                    'old': old_str[:200],  # Truncate long values
-                    'new': new_str[:200]
-                }
-        
-        # Store changes on instance
-        instance._tracked_changes = changes
-        
-    except sender.DoesNotExist:
-        # Object doesn't exist yet (shouldn't happen with pre_save)
-        pass
+        instance._tracked_changes = diff_instance(instance, update_fields)
     except Exception as e:
         logger.error(f"Error tracking changes for {sender.__name__}: {e}")
 
@@ -65,35 +44,22 @@ def track_changes(sender, instance, **kwargs):
 def log_save_action(sender, instance, created, **kwargs):
     """
     Log create/update actions to audit trail
+    
+    Entries are not inserted here - see apps.core.audit.AuditCollector.
     """
     # Skip certain models to avoid recursion
-    if sender.__name__ in ['AuditLog', 'ContentVersion', 'LogEntry', 'Session']:
+    if not audit_registry.is_audited(sender):
+        return
+    if audit_registry.is_ignored_save(sender, kwargs.get('update_fields')):
         return
     
     try:
         from apps.core.models import AuditLog
         from apps.core.services import get_current_request
-        from django.db import connection
         
         # Check if AuditLog table exists (skip during migrations)
-        with connection.cursor() as cursor:
-            if connection.vendor == 'postgresql':
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name='core_audit_logs' AND table_schema='public'
-                    )
-                """)
-                if not cursor.fetchone()[0]:
-                    return
-            else:
-                # SQLite
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='core_audit_logs'
-                """)
-                if not cursor.fetchone():
-                    return
+        if not audit_table_exists():
+            return
         
         # Get current request from thread-local storage
         request = get_current_request()
@@ -104,8 +70,8 @@ def log_save_action(sender, instance, created, **kwargs):
         # Get tracked changes (if any)
         changes = getattr(instance, '_tracked_changes', {})
         
-        # Create audit log entry
-        AuditLog.objects.create(
+        # Queue audit log entry (bulk-written on commit / end of request)
+        audit_collector.add(AuditLog(
             user=request.user if request and request.user.is_authenticated else None,
             content_type=ContentType.objects.get_for_model(sender),
             object_id=instance.pk,
@@ -114,13 +80,17 @@ def log_save_action(sender, instance, created, **kwargs):
             changes=changes,
             ip_address=getattr(request, 'client_ip', None) if request else None,
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500] if request else ''
-        )
+        ), using=kwargs.get('using'))
         
-        logger.debug(f"Audit log created: {action} {sender.__name__} #{instance.pk}")
+        logger.debug(f"Audit log queued: {action} {sender.__name__} #{instance.pk}")
         
     except Exception as e:
         # Don't break the save operation if audit logging fails
         logger.error(f"Failed to create audit log for {sender.__name__}: {e}")
+    finally:
+        # Saved state becomes the baseline for the next diff
+        instance._tracked_changes = {}
+        take_snapshot(instance, kwargs.get('update_fields'))
 
 
 @receiver(post_delete)
@@ -129,37 +99,20 @@ def log_delete_action(sender, instance, **kwargs):
     Log delete actions to audit trail
     """
     # Skip certain models
-    if sender.__name__ in ['AuditLog', 'ContentVersion', 'LogEntry', 'Session']:
+    if not audit_registry.is_audited(sender):
         return
     
     try:
         from apps.core.models import AuditLog
         from apps.core.services import get_current_request
-        from django.db import connection
         
         # Check if AuditLog table exists (skip during migrations)
-        with connection.cursor() as cursor:
-            if connection.vendor == 'postgresql':
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name='core_audit_logs' AND table_schema='public'
-                    )
-                """)
-                if not cursor.fetchone()[0]:
-                    return
-            else:
-                # SQLite
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='core_audit_logs'
-                """)
-                if not cursor.fetchone():
-                    return
+        if not audit_table_exists():
+            return
         
         request = get_current_request()
         
-        AuditLog.objects.create(
+        audit_collector.add(AuditLog(
             user=request.user if request and request.user.is_authenticated else None,
             content_type=ContentType.objects.get_for_model(sender),
             object_id=instance.pk,
@@ -168,9 +121,9 @@ def log_delete_action(sender, instance, **kwargs):
             changes={},
             ip_address=getattr(request, 'client_ip', None) if request else None,
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500] if request else ''
-        )
+        ), using=kwargs.get('using'))
         
-        logger.debug(f"Audit log created: delete {sender.__name__} #{instance.pk}")
+        logger.debug(f"Audit log queued: delete {sender.__name__} #{instance.pk}")
         
     except Exception as e:
         logger.error(f"Failed to log deletion of {sender.__name__}: {e}")
@@ -181,5 +134,5 @@ def setup_signals():
     """
     Call this from AppConfig.ready() to ensure signals are connected
     """
+    install_snapshots(apps.get_models())
     logger.info("Audit trail signals registered")
-
@@ -0,0 +1,239 @@
+"""
+Test in-memory audit trail - snapshot at load, diff on save
+"""
+import time
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.core import audit
+from apps.core.audit import AuditCollector, AuditRegistry, audit_collector, audit_registry
+from apps.core.models import AuditLog
+
+
+@pytest.fixture
+def course(db, django_capture_on_commit_callbacks):
+    from apps.content.models import Course
+    with django_capture_on_commit_callbacks(execute=True):
+        return Course.objects.create(
+            title='Тактика', slug='taktyka', description='Опис',
+            short_description='Коротко', price=100, is_published=True,
+        )
+
+
+def select_queries(ctx, table):
+    return [
+        q['sql'] for q in ctx.captured_queries
+        if q['sql'].startswith('SELECT') and f'"{table}"' in q['sql']
+    ]
+
+
+@pytest.mark.django_db
+class TestAuditTrail:
+    """Test audit signals use in-memory diff"""
+
+    def test_update_diffs_without_refetch(self, course, django_capture_on_commit_callbacks):
+        from apps.content.models import Course
+
+        course = Course.objects.get(pk=course.pk)
+        course.title = 'Тактика 2.0'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                course.save()
+
+        assert select_queries(ctx, 'courses') == []
+        assert not any('sqlite_master' in q['sql'] for q in ctx.captured_queries)
+
+        log = AuditLog.objects.filter(action='update', object_id=course.pk).latest('timestamp')
+        assert log.changes == {'title': {'old': 'Тактика', 'new': 'Тактика 2.0'}}
+
+    def test_snapshot_refreshes_after_save(self, course, django_capture_on_commit_callbacks):
+        from apps.content.models import Course
+
+        course = Course.objects.get(pk=course.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            course.price = 200
+            course.save()
+            course.price = 300
+            course.save()
+
+        log = AuditLog.objects.filter(action='update', object_id=course.pk).latest('timestamp')
+        assert log.changes == {'price': {'old': '200', 'new': '300'}}
+
+    def test_counter_only_save_is_not_audited(self, course):
+        from apps.content.models import Course
+
+        course = Course.objects.get(pk=course.pk)
+        before = AuditLog.objects.count()
+        course.view_count += 1
+
+        with CaptureQueriesContext(connection) as ctx:
+            course.save(update_fields=['view_count'])
+
+        assert len(ctx.captured_queries) == 1  # тільки UPDATE
+        assert AuditLog.objects.count() == before
+
+    def test_excluded_model_is_not_audited(self, course, monkeypatch):
+        from apps.content.models import Course
+
+        registry = AuditRegistry()
+        registry.exclude(Course)
+        monkeypatch.setattr('apps.core.signals.audit_registry', registry)
+
+        before = AuditLog.objects.count()
+        course.title = 'Без аудиту'
+        course.save()
+        assert AuditLog.objects.count() == before
+
+
+def make_courses(n, prefix='course'):
+    from apps.content.models import Course
+
+    for i in range(n):
+        Course.objects.create(
+            title=f'Курс {i}', slug=f'{prefix}-{i}', description='Опис',
+            short_description='Коротко', price=100,
+        )
+
+
+def audit_inserts(ctx):
+    table = AuditLog._meta.db_table
+    return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(f'INSERT INTO "{table}"')]
+
+
+@pytest.mark.django_db
+class TestAuditCollector:
+    """Test deferred bulk writes of audit entries"""
+
+    def test_transaction_writes_one_bulk_insert(self, django_capture_on_commit_callbacks):
+        before = AuditLog.objects.count()
+
+        with CaptureQueriesContext(connection) as ctx:
+            with django_capture_on_commit_callbacks(execute=True):
+                with transaction.atomic():
+                    make_courses(20)
+
+        assert len(audit_inserts(ctx)) == 1
+        assert AuditLog.objects.count() == before + 20
+
+    def test_rolled_back_savepoint_is_dropped(self, django_capture_on_commit_callbacks):
+        before = AuditLog.objects.count()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                make_courses(2, prefix='kept')
+                try:
+                    with transaction.atomic():
+                        make_courses(3, prefix='rolled-back')
+                        raise RuntimeError('rollback')
+                except RuntimeError:
+                    pass
+                make_courses(1, prefix='after')
+
+        assert AuditLog.objects.count() == before + 3
+        assert not AuditLog.objects.filter(object_repr__startswith='Курс 2').exists()
+
+    def test_nothing_written_before_commit(self, django_capture_on_commit_callbacks):
+        before = AuditLog.objects.count()
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            make_courses(5)
+
+        assert AuditLog.objects.count() == before
+        audit_callbacks = [cb for cb in callbacks if cb.__qualname__.startswith('AuditCollector.')]
+        assert len(audit_callbacks) == 1
+
+    def test_request_scope_buffers_until_end(self, monkeypatch):
+        from django.db import connections
+
+        collector = AuditCollector()
+        # Поза транзакцією тесту - autocommit-шлях
+        monkeypatch.setattr(connections['default'], 'in_atomic_block', False)
+        written = []
+        monkeypatch.setattr(collector, 'write', lambda entries: written.append(list(entries)))
+
+        collector.begin_request()
+        collector.add(AuditLog(action='create'))
+        collector.add(AuditLog(action='update'))
+        assert written == []
+
+        collector.end_request()
+        assert [len(batch) for batch in written] == [2]
+
+        collector.add(AuditLog(action='delete'))  # Без request - одразу
+        assert [len(batch) for batch in written] == [2, 1]
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestAuditBenchmark:
+    """Save 1,000 Course rows with and without audit"""
+
+    ROWS = 1000
+
+    def _measure(self, prefix, django_capture_on_commit_callbacks):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            with django_capture_on_commit_callbacks(execute=True):
+                with transaction.atomic():
+                    make_courses(self.ROWS, prefix=prefix)
+            elapsed = time.perf_counter() - start
+        return elapsed, ctx
+
+    def test_save_1000_courses(self, monkeypatch, django_capture_on_commit_callbacks):
+        from apps.content.models import Course
+
+        registry = AuditRegistry()
+        registry.exclude(Course)
+        monkeypatch.setattr('apps.core.signals.audit_registry', registry)
+        plain, _ = self._measure('plain', django_capture_on_commit_callbacks)
+        monkeypatch.undo()
+
+        audited, ctx = self._measure('audited', django_capture_on_commit_callbacks)
+
+        print(f"\n{self.ROWS} Course saves: {plain * 1000:.0f}ms without audit, "
+              f"{audited * 1000:.0f}ms with audit ({audited / plain:.2f}x), "
+              f"{len(audit_inserts(ctx))} audit INSERT statements")
+        # SQLite обмежує кількість параметрів - bulk_create ділить на пачки
+        fields = [f for f in AuditLog._meta.concrete_fields if not f.primary_key]
+        batch_size = min(AuditCollector.BATCH_SIZE, connection.ops.bulk_batch_size(fields, []) or self.ROWS)
+        assert 0 < len(audit_inserts(ctx)) <= -(-self.ROWS // batch_size)
+
+
+@pytest.mark.unit
+class TestAuditRegistry:
+    """Test opt-in/opt-out rules"""
+
+    def test_defaults_exclude_audit_models(self):
+        from django.contrib.sessions.models import Session
+
+        assert audit_registry.is_audited(AuditLog) is False
+        assert audit_registry.is_audited(Session) is False
+
+    def test_include_overrides_app_exclusion(self, settings):
+        from apps.content.models import Course
+
+        settings.AUDIT_EXCLUDED_MODELS = ['content']
+        registry = AuditRegistry()
+        assert registry.is_audited(Course) is False
+
+        registry.include(Course)
+        assert registry.is_audited(Course) is True
+
+    def test_ignored_update_fields(self):
+        from apps.content.models import Course
+
+        registry = AuditRegistry()
+        assert registry.is_ignored_save(Course, ['view_count']) is True
+        assert registry.is_ignored_save(Course, ['view_count', 'title']) is False
+        assert registry.is_ignored_save(Course, None) is False
+
+    def test_table_check_cached_per_process(self, db, monkeypatch):
+        monkeypatch.setattr(audit, '_audit_table_exists', False)
+        assert audit.audit_table_exists() is True
+
+        with CaptureQueriesContext(connection) as ctx:
+            assert audit.audit_table_exists() is True
+        assert ctx.captured_queries == []
@@ -0,0 +1,149 @@
+"""
+Test TieredCache - local LRU tier, invalidation broadcast, hit latency benchmark
+"""
+import time
+
+import pytest
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+
+from apps.core.cache import TieredCache
+
+
+def make_tiered(name, shared, **options):
+    """TieredCache with its own local tier (simulates one worker process)"""
+    options.setdefault('VERSION_CHECK_INTERVAL', 0)
+    cache = TieredCache(name, {'OPTIONS': options})
+    cache._shared = shared
+    cache.clear_local()
+    return cache
+
+
+@pytest.fixture
+def shared():
+    shared = LocMemCache('tiered-test-shared', {})
+    shared.clear()
+    return shared
+
+
+@pytest.mark.unit
+class TestTieredCache:
+    """Test two-tier get/set/delete semantics"""
+
+    def test_hit_served_from_local_tier(self, shared, monkeypatch):
+        cache = make_tiered('worker-a', shared)
+        cache.set('cms_hero_slides', ['slide'], 300)
+        assert shared.get('cms_hero_slides') == ['slide']
+
+        monkeypatch.setattr(shared, 'get', lambda key, default=None, version=None: (
+            None if key == TieredCache.GENERATION_KEY else pytest.fail('shared tier hit')
+        ))
+        assert cache.get('cms_hero_slides') == ['slide']
+
+    def test_miss_falls_through_and_fills_local(self, shared):
+        shared.set('site_settings', 'value')
+        cache = make_tiered('worker-a', shared)
+
+        assert cache.get('site_settings') == 'value'
+        shared.delete('site_settings')  # Видалено в обхід tiered
+        assert cache.get('site_settings') == 'value'
+        assert cache.get('missing', 'default') == 'default'
+
+    def test_delete_broadcasts_to_other_workers(self, shared):
+        worker_a = make_tiered('worker-a', shared)
+        worker_b = make_tiered('worker-b', shared)
+
+        worker_a.set('cms_main_courses', [1, 2])
+        assert worker_b.get('cms_main_courses') == [1, 2]
+
+        worker_a.delete('cms_main_courses')
+        assert worker_a.get('cms_main_courses') is None
+        assert worker_b.get('cms_main_courses') is None
+
+    def test_incr_broadcasts_version_keys(self, shared):
+        worker_a = make_tiered('worker-a', shared)
+        worker_b = make_tiered('worker-b', shared)
+
+        worker_a.set('menu_version', 1, None)
+        assert worker_b.get('menu_version') == 1
+        assert worker_a.incr('menu_version') == 2
+        assert worker_b.get('menu_version') == 2
+
+    def test_invalidation_scoped_to_touched_key(self, shared, monkeypatch):
+        worker_a = make_tiered('worker-a', shared)
+        worker_b = make_tiered('worker-b', shared)
+        worker_a.delete('warmup')  # Лічильник поколінь уже існує
+
+        worker_a.set('search_index_version', 1, None)
+        worker_a.set('cms_hero_slides', ['slide'])
+        worker_b.get('search_index_version')
+        worker_b.get('cms_hero_slides')
+        worker_a.incr('search_index_version')
+        worker_a.delete_many(['menu_a', 'menu_b'])
+
+        real_get = shared.get
+        monkeypatch.setattr(shared, 'get', lambda key, default=None, version=None: (
+            real_get(key, default, version)
+            if key.startswith('tiered_cache:') or key == 'search_index_version'
+            else pytest.fail(f'shared tier hit: {key}')
+        ))
+        assert worker_b.get('search_index_version') == 2
+        assert worker_b.get('cms_hero_slides') == ['slide']  # Не скинуто
+
+    def test_incomplete_log_clears_local_tier(self, shared):
+        worker_a = make_tiered('worker-a', shared)
+        worker_b = make_tiered('worker-b', shared)
+        worker_a.delete('warmup')  # Лічильник поколінь уже існує
+
+        worker_a.set('cms_hero_slides', ['slide'])
+        worker_b.get('cms_hero_slides')
+        worker_a.delete('menu')
+        shared.delete(TieredCache.INVALIDATION_KEY.format(shared.get(TieredCache.GENERATION_KEY)))
+        shared.set('cms_hero_slides', ['new'])  # Змінено в обхід tiered
+        assert worker_b.get('cms_hero_slides') == ['new']
+
+        worker_a.clear()
+        shared.set('cms_hero_slides', ['newest'])
+        assert worker_b.get('cms_hero_slides') == ['newest']
+
+    def test_excluded_prefixes_bypass_local(self, shared):
+        cache = make_tiered('worker-a', shared, LOCAL_EXCLUDE_PREFIXES=['rate_limit:'])
+
+        cache.set('rate_limit:1.2.3.4', 3, 60)
+        shared.set('rate_limit:1.2.3.4', 4, 60)
+        assert cache.get('rate_limit:1.2.3.4') == 4
+
+    def test_local_ttl_never_exceeds_requested_timeout(self, shared):
+        cache = make_tiered('worker-a', shared, LOCAL_TIMEOUT=10)
+        assert cache._local_timeout(2) == 2
+        assert cache._local_timeout(3600) == 10
+        assert cache._local_timeout(None) == 10
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestTieredCacheBenchmark:
+    """Hit latency: TieredCache vs current DatabaseCache"""
+
+    ITERATIONS = 2000
+
+    def _measure_hits(self, cache):
+        cache.set('bench_key', {'slides': list(range(20))}, 300)
+        cache.get('bench_key')
+        start = time.perf_counter()
+        for _ in range(self.ITERATIONS):
+            cache.get('bench_key')
+        return (time.perf_counter() - start) / self.ITERATIONS * 1e6
+
+    def test_hit_latency(self):
+        call_command('createcachetable', 'tiered_bench_cache', verbosity=0)
+        db_cache = DatabaseCache('tiered_bench_cache', {})
+        tiered = make_tiered('worker-bench', db_cache, VERSION_CHECK_INTERVAL=1)
+
+        db_us = self._measure_hits(db_cache)
+        tiered_us = self._measure_hits(tiered)
+
+        print(f"\nDatabaseCache hit: {db_us:.1f}us, TieredCache hit: {tiered_us:.1f}us "
+              f"({db_us / tiered_us:.1f}x)")
+        assert tiered_us < db_us
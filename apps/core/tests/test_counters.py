@@ -0,0 +1,209 @@
+"""
+Test write-behind view counters
+"""
+import threading
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core import counters
+from apps.core.counters import ViewCounterBuffer, view_counters, write_counter
+
+
+class CollectingWriter:
+    """Writer stub - запам'ятовує інкременти замість запису в БД"""
+
+    def __init__(self):
+        self.writes = []
+        self.event = threading.Event()
+
+    def __call__(self, model, field, touch, pk, amount):
+        self.writes.append((model.__name__, field, pk, amount))
+        self.event.set()
+        return 1
+
+
+def course_stub(pk):
+    from apps.content.models import Course
+    return Course(pk=pk, view_count=10)
+
+
+@pytest.fixture
+def flush_global_counters():
+    """Views use the module-level buffer (discarded after each test by conftest)"""
+    view_counters.discard()
+    return view_counters
+
+
+@pytest.mark.unit
+class TestViewCounterBuffer:
+    """Test accumulation, flush triggers and stats"""
+
+    def test_one_write_per_object(self):
+        writer = CollectingWriter()
+        buffer = ViewCounterBuffer(flush_interval=3600, writer=writer)
+        first, second = course_stub(1), course_stub(2)
+
+        for _ in range(3):
+            buffer.incr(first, 'view_count')
+        buffer.incr(second, 'view_count')
+
+        assert first.view_count == 13
+        assert writer.writes == []
+        assert buffer.get_stats()['pending'] == 2
+
+        assert buffer.flush() == 2
+        assert sorted(writer.writes) == [('Course', 'view_count', 1, 3), ('Course', 'view_count', 2, 1)]
+        assert buffer.get_stats() == {'counted': 4, 'flushed': 2, 'failed': 0, 'pending': 0}
+        buffer.stop()
+
+    def test_flushes_when_max_pending(self):
+        writer = CollectingWriter()
+        buffer = ViewCounterBuffer(flush_interval=3600, max_pending=3, check_interval=10, writer=writer)
+
+        for pk in range(3):
+            buffer.incr(course_stub(pk), 'view_count')
+
+        assert writer.event.wait(2)
+        assert len(writer.writes) == 3
+        buffer.stop()
+
+    def test_flushes_after_interval(self):
+        writer = CollectingWriter()
+        buffer = ViewCounterBuffer(flush_interval=0.05, check_interval=0.02, writer=writer)
+
+        buffer.incr(course_stub(1), 'view_count')
+
+        assert writer.event.wait(2)
+        assert writer.writes == [('Course', 'view_count', 1, 1)]
+        buffer.stop()
+
+    def test_stop_drains_buffer(self):
+        writer = CollectingWriter()
+        buffer = ViewCounterBuffer(flush_interval=3600, writer=writer)
+
+        buffer.incr(course_stub(1), 'view_count', amount=5)
+        buffer.stop()
+
+        assert writer.writes == [('Course', 'view_count', 1, 5)]
+
+    def test_writer_errors_count_as_failed(self):
+        def broken_writer(*args):
+            raise RuntimeError('db down')
+
+        buffer = ViewCounterBuffer(flush_interval=3600, writer=broken_writer)
+        buffer.incr(course_stub(1), 'view_count')
+
+        assert buffer.flush() == 0
+        assert buffer.get_stats()['failed'] == 1
+        buffer.stop()
+
+    def test_flush_request_from_other_process(self, locmem_cache):
+        writer = CollectingWriter()
+        buffer = ViewCounterBuffer(flush_interval=3600, check_interval=0.02, writer=writer)
+
+        buffer.incr(course_stub(1), 'view_count')
+        assert not writer.event.wait(0.1)
+
+        ViewCounterBuffer().request_flush()
+        assert writer.event.wait(2)
+        buffer.stop()
+
+
+@pytest.mark.django_db
+class TestCounterWrites:
+    """Test F() writes and the views using the buffer"""
+
+    def make_course(self):
+        from apps.content.models import Course
+        return Course.objects.create(
+            title='Тактика', slug='tactics', description='Опис', short_description='Коротко', price=100,
+            is_published=True,
+        )
+
+    def test_write_counter_sends_no_signals(self):
+        from apps.content.models import Course
+
+        course = self.make_course()
+        saves = []
+        receiver = lambda sender, **kwargs: saves.append(sender)  # noqa: E731
+        post_save.connect(receiver, sender=Course)
+        try:
+            assert write_counter(Course, 'view_count', None, course.pk, 5) == 1
+            assert write_counter(Course, 'view_count', None, course.pk, 2) == 1
+        finally:
+            post_save.disconnect(receiver, sender=Course)
+
+        course.refresh_from_db()
+        assert course.view_count == 7
+        assert saves == []
+
+    def test_course_detail_view(self, client, flush_global_counters, no_silk):
+        course = self.make_course()
+
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                response = client.get(course.get_absolute_url())
+        assert response.status_code == 200
+        assert response.context['course'].view_count == 1
+        assert not [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "courses"')]
+
+        flush_global_counters.flush()
+        course.refresh_from_db()
+        assert course.view_count == 3
+
+    def test_event_detail_view(self, client, flush_global_counters, no_silk):
+        from apps.events.models import Event
+
+        start = timezone.now() + timedelta(days=7)
+        event = Event.objects.create(
+            title='Семінар', slug='seminar', description='Опис', short_description='Коротко',
+            event_type='seminar', location='Київ', start_datetime=start,
+            end_datetime=start + timedelta(hours=2), status='published',
+        )
+
+        client.get(f'/events/{event.slug}/')
+        client.get(f'/events/{event.slug}/')
+
+        flush_global_counters.flush()
+        event.refresh_from_db()
+        assert event.view_count == 2
+
+    def test_monthly_quote(self, locmem_cache, flush_global_counters):
+        from apps.content.models import MonthlyQuote
+
+        quote = MonthlyQuote.objects.create(
+            expert_name='Експерт', expert_role='Тренер', quote_text='Цитата',
+            month=timezone.now().date(), is_active=True,
+        )
+
+        MonthlyQuote.get_current_quote()
+        with CaptureQueriesContext(connection) as ctx:
+            MonthlyQuote.get_current_quote()
+        assert len(ctx.captured_queries) == 0
+
+        flush_global_counters.flush()
+        quote.refresh_from_db()
+        assert quote.views_count == 2
+        assert quote.last_displayed_at is not None
+
+    def test_flush_command(self, locmem_cache, monkeypatch):
+        buffer = ViewCounterBuffer(flush_interval=3600)
+        monkeypatch.setattr(counters, 'view_counters', buffer)
+        course = self.make_course()
+        buffer.incr(course, 'view_count', amount=4)
+
+        out = StringIO()
+        call_command('flush_view_counters', stdout=out)
+        assert 'Flushed 1 rows' in out.getvalue()
+
+        course.refresh_from_db()
+        assert course.view_count == 4
+        assert locmem_cache.get(counters.COUNTERS_FLUSH_REQUEST_KEY) is not None
+        buffer.stop()
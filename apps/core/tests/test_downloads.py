@@ -0,0 +1,246 @@
+"""
+Test streaming downloads - Range/If-Range, offload modes, remote proxy, memory
+"""
+import os
+from decimal import Decimal
+
+import pytest
+from django.core.files.storage import Storage
+from django.db.models.fields.files import FieldFile
+from django.test import RequestFactory
+
+from apps.core.downloads import RangeNotSatisfiable, parse_range, serve_file
+
+
+CONTENT = bytes(range(256)) * 40  # 10240 байт
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+@pytest.fixture
+def media(media, settings):
+    settings.DOWNLOAD_OFFLOAD = ''
+    (media / 'materials' / 'pdfs').mkdir(parents=True)
+    return media
+
+
+@pytest.fixture
+def pdf(media):
+    from apps.content.models import Material
+
+    (media / 'materials' / 'pdfs' / 'lesson.pdf').write_bytes(CONTENT)
+    return Material(title='Урок', pdf_file='materials/pdfs/lesson.pdf').pdf_file
+
+
+def get(path='/download/', **headers):
+    return RequestFactory().get(path, **{f'HTTP_{name.upper().replace("-", "_")}': value
+                                         for name, value in headers.items()})
+
+
+@pytest.mark.unit
+class TestParseRange:
+    """Single byte range parsing"""
+
+    @pytest.mark.parametrize('header, expected', [
+        ('bytes=0-9', (0, 9)),
+        ('bytes=100-', (100, 999)),
+        ('bytes=-100', (900, 999)),
+        ('bytes=-5000', (0, 999)),
+        ('bytes=990-5000', (990, 999)),
+        (None, None),
+        ('bytes=5-1', None),
+        ('bytes=0-1,5-9', None),
+        ('items=0-9', None),
+        ('bytes=-', None),
+    ])
+    def test_ranges(self, header, expected):
+        assert parse_range(header, 1000) == expected
+
+    @pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=-0'])
+    def test_not_satisfiable(self, header):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 1000)
+
+
+class TestServeFile:
+    """Local storage streaming"""
+
+    def test_full_download(self, pdf):
+        response = serve_file(get(), pdf, 'Урок 1.pdf')
+
+        assert response.status_code == 200
+        assert response.streaming
+        assert body(response) == CONTENT
+        assert response['Content-Length'] == str(len(CONTENT))
+        assert response['Content-Type'] == 'application/pdf'
+        assert response['Accept-Ranges'] == 'bytes'
+        assert "filename*=utf-8''%D0%A3%D1%80%D0%BE%D0%BA%201.pdf" in response['Content-Disposition']
+
+    def test_range(self, pdf):
+        response = serve_file(get(Range='bytes=100-199'), pdf, 'lesson.pdf')
+
+        assert response.status_code == 206
+        assert body(response) == CONTENT[100:200]
+        assert response['Content-Range'] == f'bytes 100-199/{len(CONTENT)}'
+        assert response['Content-Length'] == '100'
+
+    def test_resume_with_if_range(self, pdf):
+        first = serve_file(get(), pdf, 'lesson.pdf', chunk_size=4000)
+        partial = next(iter(first.streaming_content))  # з'єднання обірвалось після першого шматка
+
+        for validator in [first['ETag'], first['Last-Modified']]:
+            response = serve_file(get(Range=f'bytes={len(partial)}-', If_Range=validator), pdf, 'lesson.pdf')
+            assert response.status_code == 206
+            assert partial + body(response) == CONTENT
+
+        # Файл змінився - If-Range не збігається, віддається весь файл
+        response = serve_file(get(Range='bytes=100-', If_Range='"stale"'), pdf, 'lesson.pdf')
+        assert response.status_code == 200
+        assert body(response) == CONTENT
+
+    def test_not_satisfiable(self, pdf):
+        response = serve_file(get(Range=f'bytes={len(CONTENT)}-'), pdf, 'lesson.pdf')
+
+        assert response.status_code == 416
+        assert response['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+    def test_missing_file(self, media):
+        from django.http import Http404
+        from apps.content.models import Material
+
+        with pytest.raises(Http404):
+            serve_file(get(), Material(pdf_file='materials/pdfs/missing.pdf').pdf_file, 'missing.pdf')
+
+    def test_x_accel_redirect(self, pdf, settings):
+        settings.DOWNLOAD_OFFLOAD = 'x-accel-redirect'
+        settings.DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+        response = serve_file(get(Range='bytes=0-9'), pdf, 'lesson.pdf')
+        assert response.status_code == 200
+        assert response['X-Accel-Redirect'] == '/protected-media/materials/pdfs/lesson.pdf'
+        assert response.content == b''
+
+    def test_x_sendfile(self, pdf, settings, media):
+        settings.DOWNLOAD_OFFLOAD = 'x-sendfile'
+
+        response = serve_file(get(), pdf, 'lesson.pdf')
+        assert response['X-Sendfile'] == str(media / 'materials' / 'pdfs' / 'lesson.pdf')
+        assert response.content == b''
+
+
+class RemoteStorage(Storage):
+    """Сховище без локального шляху (як Cloudinary/S3)"""
+
+    def url(self, name):
+        return f'https://cdn.example.com/{name}'
+
+
+class UpstreamResponse:
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.django_db  # response.close() шле request_finished (close_old_connections)
+class TestRemoteStorage:
+    """Remote backends are proxied chunk by chunk"""
+
+    def test_range_forwarded(self, monkeypatch):
+        import requests
+
+        calls = []
+        upstream = UpstreamResponse(206, CONTENT[10:20], {'Content-Range': 'bytes 10-19/10240', 'Content-Length': '10'})
+
+        def fake_get(url, headers, stream, timeout):
+            calls.append((url, headers, stream))
+            return upstream
+
+        monkeypatch.setattr(requests, 'get', fake_get)
+        field = FieldFile(None, type('Field', (), {'storage': RemoteStorage()})(), 'materials/videos/lesson.mp4')
+
+        response = serve_file(get(Range='bytes=10-19'), field, 'lesson.mp4', chunk_size=4)
+        assert calls == [('https://cdn.example.com/materials/videos/lesson.mp4', {'Range': 'bytes=10-19'}, True)]
+        assert response.status_code == 206
+        assert response['Content-Range'] == 'bytes 10-19/10240'
+        assert response['Content-Type'] == 'video/mp4'
+        assert body(response) == CONTENT[10:20]
+        response.close()
+        assert upstream.closed
+
+
+def read_rss_kb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('no_silk')
+class TestDownloadMaterialView:
+    """Cabinet download view"""
+
+    def make_material(self, name, content_type='pdf'):
+        from apps.content.models import Course, Material
+
+        course = Course.objects.create(
+            title='Курс', slug='course', description='Опис', short_description='Коротко',
+            price=Decimal('0'), is_free=True, is_published=True,
+        )
+        field = 'pdf_file' if content_type == 'pdf' else 'video_file'
+        return Material.objects.create(
+            course=course, title='Урок', slug='lesson', content_type=content_type, **{field: name},
+        )
+
+    def login(self, client, django_user_model):
+        client.force_login(django_user_model.objects.create_user(
+            username='downloader', email='downloader@test.com', password='test123!@#'
+        ))
+
+    def test_streams_with_range(self, client, django_user_model, pdf):
+        self.login(client, django_user_model)
+        material = self.make_material(pdf.name)
+
+        response = client.get(f'/account/download/{material.id}/', HTTP_RANGE='bytes=0-99')
+        assert response.status_code == 206
+        assert response.streaming
+        assert b''.join(response.streaming_content) == CONTENT[:100]
+
+    @pytest.mark.slow
+    @pytest.mark.skipif(not os.path.exists('/proc/self/status'), reason='needs /proc')
+    def test_memory_flat_on_1gb_file(self, client, django_user_model, media):
+        self.login(client, django_user_model)
+        path = media / 'materials' / 'videos' / 'big.mp4'
+        path.parent.mkdir(parents=True)
+        size = 1024 ** 3
+        with open(path, 'wb') as f:
+            f.truncate(size)  # розріджений файл - диск не займає
+        material = self.make_material('materials/videos/big.mp4', content_type='video')
+
+        baseline = read_rss_kb()
+        response = client.get(f'/account/download/{material.id}/')
+        assert response.status_code == 200
+        assert response['Content-Length'] == str(size)
+
+        received = peak = 0
+        for i, chunk in enumerate(response.streaming_content):
+            received += len(chunk)
+            if i % 256 == 0:
+                peak = max(peak, read_rss_kb())
+        response.close()
+
+        growth_mb = (peak - baseline) / 1024
+        print(f"\n1 GB download: RSS growth {growth_mb:.1f} MB")
+        assert received == size
+        assert growth_mb < 32
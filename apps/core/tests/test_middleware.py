@@ -0,0 +1,408 @@
+"""
+Test custom middleware - route table, rate limiting engine and atomic
+counters, phone registration reminders
+"""
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.core.cache import AtomicDatabaseCache
+from playvision.middleware import (
+    AdminRateLimitMiddleware, MiddlewareRouter, PhoneRegistrationMiddleware, PrefixTable, RateLimitMiddleware,
+    SlidingWindowRateLimiter, build_rate_limit_rules, classify_request, get_router,
+)
+
+
+@pytest.fixture
+def locmem(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'rate-limit-test': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rate-limit-test'},
+    }
+    settings.RATE_LIMIT_CACHE = 'rate-limit-test'
+    from django.core.cache import caches
+    caches['rate-limit-test'].clear()
+    return caches['rate-limit-test']
+
+
+def ok_view(request):
+    return HttpResponse('ok')
+
+
+class CountingPath(str):
+    """Path that counts prefix checks made against it"""
+
+    checks = 0
+
+    def startswith(self, prefix, *args):
+        self.checks += 1
+        return super().startswith(prefix, *args)
+
+
+def legacy_classify(host, path):
+    """Per-request list scans the middlewares did before MiddlewareRouter"""
+    is_com_ua = host in ['playvision.com.ua', 'www.playvision.com.ua']
+    landing_only = not is_com_ua and path == '/submit/'
+    tracked = any(path.startswith(p) for p in ['/hub/', '/events/', '/account/', '/pricing/'])
+    limited = any(path.startswith(p) for p in ['/auth/login/', '/auth/register/', '/auth/password-reset/'])
+    admin = path.startswith('/admin/login/')
+    reminder = any(path.startswith(p) for p in ['/account/', '/cabinet/', '/hub/', '/events/'])
+    return is_com_ua, landing_only, tracked, limited, admin, reminder
+
+
+def admin_login_post(ip='10.0.0.1'):
+    request = RequestFactory().post('/admin/login/', REMOTE_ADDR=ip)
+    request.client_ip = ip
+    return request
+
+
+@pytest.mark.unit
+class TestMiddlewareRouter:
+    """Test compiled request classification"""
+
+    def test_prefix_table_longest_first(self):
+        table = PrefixTable([('/auth/', 'auth'), ('/auth/login/', 'login'), ('/a', 'short'), ('/hub/', 'hub')])
+
+        assert table.match_all('/auth/login/') == ('login', 'auth', 'short')
+        assert table.match('/auth/register/') == 'auth'
+        assert table.match('/about/') == 'short'
+        assert table.match('/hub') is None
+        assert table.match('/events/', 'default') == 'default'
+
+    def test_classify(self, settings):
+        router = MiddlewareRouter(settings)
+
+        hub = router.classify('playvision.com', '/hub/course/tactics/')
+        assert hub.domain == 'default' and not hub.is_com_ua_domain
+        assert hub.analytics_tracked and hub.phone_reminder and not hub.skip_user_checks
+
+        submit = router.classify('www.playvision.com.ua', '/submit/')
+        assert submit.is_com_ua_domain and submit.landing_only
+        assert not router.classify('playvision.com.ua', '/submit/extra/').landing_only
+
+        api = router.classify('playvision.com', '/api/v1/content/courses/')
+        assert api.skip_user_checks and not api.analytics_tracked
+        assert router.classify('playvision.com', settings.STATIC_URL + 'css/main.css').skip_user_checks
+
+        login = router.classify('playvision.com', '/admin/login/')
+        assert [rule.prefix for rule in login.rate_limit_rules] == ['/admin/login/']
+        assert router.classify('playvision.com', '/admin/').rate_limit_rules == ()
+
+    def test_segment_cache_keeps_domain(self, settings):
+        router = MiddlewareRouter(settings)
+
+        assert router.classify('playvision.com', '/hub/a/') is router.classify('playvision.com', '/hub/b/')
+        assert router.classify('playvision.com.ua', '/hub/a/').is_com_ua_domain
+
+    def test_prefix_checks_per_request(self, settings):
+        router = MiddlewareRouter(settings)
+        legacy = CountingPath('/pricing/annual/')
+        cold = CountingPath('/pricing/annual/')
+        warm = CountingPath('/pricing/monthly/')
+
+        legacy_classify('playvision.com', legacy)
+        router.classify('playvision.com', cold)
+        router.classify('playvision.com', warm)
+
+        assert legacy.checks == 12  # Кожен список префіксів сканується по черзі
+        assert cold.checks == 1  # Тільки бакет '/pricing/'
+        assert warm.checks == 0  # Маршрут сегмента вже закешований
+
+    def test_rebuilt_on_settings_change(self, settings):
+        settings.ANALYTICS_TRACKED_PATHS = ['/cart/']
+        request = RequestFactory().get('/cart/')
+
+        assert classify_request(request).analytics_tracked
+        assert request.route is classify_request(request)  # Memoized
+        assert not get_router().classify('testserver', '/hub/').analytics_tracked
+
+
+@pytest.mark.unit
+class TestSlidingWindowRateLimiter:
+    """Test window math and Retry-After"""
+
+    def test_allows_limit_then_blocks(self, locmem):
+        limiter = SlidingWindowRateLimiter(limit=5, window=60, scope='test')
+        now = 6000.0  # Початок вікна
+
+        results = [limiter.hit('1.2.3.4', now=now) for _ in range(6)]
+
+        assert [r.allowed for r in results] == [True] * 5 + [False]
+        assert results[-1].retry_after > 0
+        # Інша IP має свій лічильник
+        assert limiter.hit('5.6.7.8', now=now).allowed
+
+    def test_previous_window_is_weighted(self, locmem):
+        limiter = SlidingWindowRateLimiter(limit=5, window=60, scope='test')
+        for _ in range(5):
+            limiter.hit('ip', now=6050.0)
+
+        # 15s у новому вікні: 5 * 0.75 + 1 = 4.75 -> дозволено, далі - ні
+        assert limiter.hit('ip', now=6075.0).allowed
+        blocked = limiter.hit('ip', now=6075.0)
+        assert not blocked.allowed
+        assert 1 <= blocked.retry_after <= 60
+
+        # Попереднє вікно повністю "вивітрилось"
+        assert limiter.hit('ip', now=6179.0).allowed
+
+    def test_window_ttl_not_extended_by_hits(self, locmem):
+        limiter = SlidingWindowRateLimiter(limit=2, window=60, scope='test')
+        for second in range(0, 60, 10):
+            limiter.hit('ip', now=6000.0 + second)
+
+        # Через два вікна старі хіти більше не рахуються
+        assert limiter.hit('ip', now=6120.0).allowed
+
+
+@pytest.mark.unit
+class TestRateLimitMiddleware:
+    """Test route rules and 429 responses"""
+
+    def test_longest_prefix_wins(self):
+        rules = build_rate_limit_rules({
+            '/auth/': {'limit': 100, 'window': 60},
+            '/auth/login/': {'limit': 5, 'window': 60, 'methods': ['POST']},
+        })
+        assert [r.prefix for r in rules] == ['/auth/login/', '/auth/']
+
+    def test_blocked_response_has_retry_after(self, locmem):
+        middleware = AdminRateLimitMiddleware(ok_view)
+
+        responses = [middleware(admin_login_post()) for _ in range(6)]
+
+        assert [r.status_code for r in responses] == [200] * 5 + [429]
+        assert int(responses[-1]['Retry-After']) > 0
+        assert b'Too many login attempts' in responses[-1].content
+
+    def test_get_and_other_paths_not_limited(self, locmem):
+        middleware = AdminRateLimitMiddleware(ok_view)
+        factory = RequestFactory()
+
+        for _ in range(10):
+            assert middleware(factory.get('/admin/login/')).status_code == 200
+            assert middleware(factory.post('/hub/')).status_code == 200
+
+    def test_rules_from_settings(self, locmem, settings):
+        settings.RATE_LIMIT_RULES = {'/auth/register/': {'limit': 1, 'window': 60}}
+        middleware = RateLimitMiddleware(ok_view)
+        factory = RequestFactory()
+
+        assert middleware(factory.post('/auth/register/')).status_code == 200
+        assert middleware(factory.post('/auth/register/')).status_code == 429
+
+
+@pytest.fixture
+def db_cache(db, settings):
+    call_command('createcachetable', 'rate_limit_test_cache', verbosity=0)
+    settings.CACHES = {
+        **settings.CACHES,
+        'rate-limit-db': {'BACKEND': 'apps.core.cache.AtomicDatabaseCache', 'LOCATION': 'rate_limit_test_cache'},
+    }
+    from django.core.cache import caches
+    caches['rate-limit-db'].clear()
+    return caches['rate-limit-db']
+
+
+@pytest.mark.django_db
+class TestAtomicDatabaseCache:
+    """Test row-locked incr"""
+
+    def test_incr(self, db_cache):
+        assert isinstance(db_cache, AtomicDatabaseCache)
+        db_cache.set('counter', 1, 60)
+        assert db_cache.incr('counter') == 2
+        assert db_cache.incr('counter', 5) == 7
+        assert db_cache.get('counter') == 7
+
+    def test_incr_missing_or_expired_raises(self, db_cache):
+        with pytest.raises(ValueError):
+            db_cache.incr('missing')
+
+        db_cache.set('expired', 1, -1)
+        with pytest.raises(ValueError):
+            db_cache.incr('expired')
+
+    def test_limiter_on_database_cache(self, db_cache):
+        limiter = SlidingWindowRateLimiter(limit=3, window=60, scope='db', cache_alias='rate-limit-db')
+
+        results = [limiter.hit('ip', now=6000.0) for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+
+
+@pytest.fixture
+def shared_db_cache(transactional_db, settings):
+    """AtomicDatabaseCache committed outside the test transaction - visible to other threads"""
+    call_command('createcachetable', 'rate_limit_shared_test_cache', verbosity=0)
+    settings.CACHES = {
+        **settings.CACHES,
+        'rate-limit-shared': {'BACKEND': 'apps.core.cache.AtomicDatabaseCache', 'LOCATION': 'rate_limit_shared_test_cache'},
+    }
+    settings.RATE_LIMIT_CACHE = 'rate-limit-shared'
+    from django.core.cache import caches
+    caches['rate-limit-shared'].clear()
+    return caches['rate-limit-shared']
+
+
+class TestRateLimitConcurrency:
+    """Parallel workers share one counter in the production (database) backend"""
+
+    def test_concurrent_admin_login_admits_exactly_limit(self, shared_db_cache):
+        middleware = AdminRateLimitMiddleware(ok_view)
+        threads_count = 50
+        barrier = threading.Barrier(threads_count)
+        statuses = []
+        lock = threading.Lock()
+
+        def hammer():
+            barrier.wait()
+            try:
+                for _ in range(4):
+                    status = middleware(admin_login_post('203.0.113.7')).status_code
+                    with lock:
+                        statuses.append(status)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=hammer) for _ in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(statuses) == threads_count * 4
+        assert statuses.count(200) == 5
+        assert statuses.count(429) == threads_count * 4 - 5
+
+
+@pytest.mark.django_db
+class TestRateLimitQueryCost:
+    """Per-check cost on DatabaseCache: old get()+set() vs incr-based sliding window"""
+
+    ITERATIONS = 20
+
+    @staticmethod
+    def old_check(cache, key):
+        requests = cache.get(key, 0)
+        if requests >= 10 ** 9:
+            return False
+        cache.set(key, requests + 1, 60)
+        return True
+
+    def _queries_per_call(self, func):
+        func()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(self.ITERATIONS):
+                func()
+        return len(ctx.captured_queries) / self.ITERATIONS
+
+    def test_check_cost(self, db_cache, locmem):
+        db_limiter = SlidingWindowRateLimiter(limit=10 ** 9, window=60, scope='bench', cache_alias='rate-limit-db')
+        mem_limiter = SlidingWindowRateLimiter(limit=10 ** 9, window=60, scope='bench')
+
+        old_queries = self._queries_per_call(lambda: self.old_check(db_cache, 'rate_limit:old'))
+        new_queries = self._queries_per_call(lambda: db_limiter.hit('bench'))
+        assert new_queries <= old_queries  # Атомарність без додаткових запитів
+        assert self._queries_per_call(lambda: mem_limiter.hit('bench')) == 0
+
+
+class ExplodingUser:
+    """request.user that must not be touched"""
+
+    def __getattr__(self, name):
+        pytest.fail(f'request.user.{name} accessed')
+
+
+def phone_request(path, user, **extra):
+    request = RequestFactory().get(path, **extra)
+    request.user = user
+    request.session = {}
+    request._messages = CookieStorage(request)
+    return request
+
+
+def phone_only_user(days_ago=1):
+    from apps.accounts.models import User
+    return User(email='phone@test.com', phone_registered_at=timezone.now() - timedelta(days=days_ago))
+
+
+@pytest.mark.unit
+class TestPhoneRegistrationMiddleware:
+    """Test reminder flag and fast paths"""
+
+    @pytest.mark.parametrize('path,extra', [
+        ('/api/v1/content/courses/', {}),
+        ('/static/css/main.css', {}),
+        ('/htmx/cart/count/', {}),
+        ('/hub/', {'HTTP_HX_REQUEST': 'true'}),
+    ])
+    def test_non_html_requests_skip_user(self, path, extra):
+        middleware = PhoneRegistrationMiddleware(ok_view)
+        request = phone_request(path, ExplodingUser(), **extra)
+
+        assert middleware.process_request(request) is None
+
+    def test_verified_user_gets_no_reminder(self):
+        from apps.accounts.models import User
+
+        middleware = PhoneRegistrationMiddleware(ok_view)
+        request = phone_request('/hub/', User(email='ok@test.com', is_email_verified=True))
+
+        assert middleware.process_request(request) is None
+        assert list(request._messages) == []
+        assert request.session == {}
+
+    def test_reminder_shown_once_per_ttl(self):
+        middleware = PhoneRegistrationMiddleware(ok_view)
+        user = phone_only_user()
+
+        request = phone_request('/hub/', user)
+        middleware.process_request(request)
+        assert len(list(request._messages)) == 1
+
+        # Той самий session - повторно не показується до закінчення TTL
+        next_request = phone_request('/events/', user)
+        next_request.session = request.session
+        middleware.process_request(next_request)
+        assert list(next_request._messages) == []
+
+        next_request.session[PhoneRegistrationMiddleware.REMINDER_SESSION_KEY] = time.time() - 1
+        middleware.process_request(next_request)
+        assert len(list(next_request._messages)) == 1
+
+    def test_reminder_only_on_listed_paths(self):
+        middleware = PhoneRegistrationMiddleware(ok_view)
+        request = phone_request('/cart/', phone_only_user())
+
+        middleware.process_request(request)
+        assert list(request._messages) == []
+
+
+@pytest.mark.django_db
+class TestMiddlewareStack:
+    """Full middleware stack through the test client"""
+
+    def test_static_path_costs_no_queries(self, client, no_silk, monkeypatch):
+        router = get_router()
+        calls = []
+        classify = router.classify
+        monkeypatch.setattr(router, 'classify', lambda host, path: calls.append(path) or classify(host, path))
+
+        client.get('/robots.txt')
+        calls.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                assert client.get('/robots.txt').status_code == 200
+
+        assert len(ctx.captured_queries) == 0
+        assert calls == ['/robots.txt'] * 3  # Один раз на запит, а не в кожному middleware
@@ -24,6 +24,69 @@ class TestGeolocationService:
         assert GeolocationService._is_private_ip('192.168.1.1') is True
         assert GeolocationService._is_private_ip('10.0.0.1') is True
         assert GeolocationService._is_private_ip('8.8.8.8') is False
+    
+    def test_lru_hit_skips_shared_cache(self, monkeypatch):
+        """Test warm lookup is served from in-process LRU"""
+        from apps.core import services
+        
+        GeolocationService.close()
+        monkeypatch.setattr(services.cache, 'get', lambda key: 'PL')
+        assert GeolocationService.get_country_from_ip('8.8.4.4') == 'PL'
+        
+        def fail_get(key):
+            raise AssertionError('shared cache must not be hit on LRU hit')
+        
+        monkeypatch.setattr(services.cache, 'get', fail_get)
+        assert GeolocationService.get_country_from_ip('8.8.4.4') == 'PL'
+        GeolocationService.close()
+    
+    def test_lru_is_bounded(self, monkeypatch):
+        """Test LRU evicts least recently used IPs"""
+        GeolocationService.close()
+        monkeypatch.setattr(GeolocationService, 'LRU_MAXSIZE', 2)
+        
+        GeolocationService._lru_set('1.1.1.1', 'AU')
+        GeolocationService._lru_set('2.2.2.2', 'FR')
+        assert GeolocationService._lru_get('1.1.1.1') == 'AU'  # now most recent
+        GeolocationService._lru_set('3.3.3.3', 'DE')
+        
+        assert GeolocationService._lru_get('2.2.2.2') is None
+        assert GeolocationService._lru_get('1.1.1.1') == 'AU'
+        assert GeolocationService._lru_get('3.3.3.3') == 'DE'
+        GeolocationService.close()
+    
+    def test_failed_reader_load_is_retried(self, monkeypatch, tmp_path, settings):
+        """Test a missing GeoIP DB is re-checked after the retry interval"""
+        from apps.core import services
+        
+        GeolocationService.close()
+        settings.GEOIP_PATH = tmp_path
+        now = [1000.0]
+        monkeypatch.setattr(services.time, 'monotonic', lambda: now[0])
+        assert GeolocationService.get_reader() is None
+        
+        opened = []
+        monkeypatch.setattr(services.geoip2.database, 'Reader', lambda path, mode: opened.append(path) or 'reader')
+        (tmp_path / 'GeoLite2-Country.mmdb').write_bytes(b'')
+        assert GeolocationService.get_reader() is None  # still backing off
+        
+        now[0] += GeolocationService.READER_RETRY_INTERVAL
+        assert GeolocationService.get_reader() == 'reader'
+        assert len(opened) == 1
+        GeolocationService._reader = None
+        GeolocationService.close()
+    
+    def test_context_processor_reuses_request_country(self, rf, monkeypatch):
+        """Test get_country_code uses country from CountryDetectionMiddleware"""
+        from apps.cms.context_processors import get_country_code
+        
+        def fail_lookup(ip):
+            raise AssertionError('GeoIP lookup must not run twice per request')
+        
+        monkeypatch.setattr(GeolocationService, 'get_country_from_ip', fail_lookup)
+        request = rf.get('/')
+        request.country_code = 'DE'
+        assert get_country_code(request) == 'DE'
 
 
 @pytest.mark.unit
@@ -38,7 +101,7 @@ class TestCacheStrategy:
         # Same args should produce same key
         assert key1 == key2
     
-    def test_cached_query_decorator(self):
+    def test_cached_query_decorator(self, locmem_cache):
         """Test cached query decorator"""
         call_count = 0
         
@@ -0,0 +1,96 @@
+"""
+Test lazy site context - query-count benchmark for /, /hub/, /events/
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+EAGER_CONTEXT_PROCESSORS = [
+    'apps.events.context_processors.event_categories_menu',
+    'apps.cart.context_processors.cart_context',
+    'apps.cms.context_processors.site_content',
+    'apps.core.context_processors.external_urls',
+    'apps.landing.context_processors.analytics',
+]
+
+
+def _count_queries(client, url, **extra):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, **extra)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+
+def _use_eager_processors(settings):
+    templates = [dict(t, OPTIONS=dict(t['OPTIONS'])) for t in settings.TEMPLATES]
+    processors = [
+        p for p in templates[0]['OPTIONS']['context_processors']
+        if p != 'apps.core.context_processors.site_context'
+    ]
+    templates[0]['OPTIONS']['context_processors'] = processors + EAGER_CONTEXT_PROCESSORS
+    settings.TEMPLATES = templates
+
+
+@pytest.mark.django_db
+@pytest.mark.integration
+class TestSiteContextQueryCount:
+    """Порівняння кількості запитів: eager context processors vs site_context"""
+
+    @pytest.mark.parametrize('url', ['/', '/hub/', '/events/'])
+    def test_lazy_context_saves_queries(self, client, no_silk, url):
+        lazy_queries = _count_queries(client, url)
+
+        _use_eager_processors(no_silk)
+        client.cookies.clear()
+        eager_queries = _count_queries(client, url)
+
+        print(f"\n{url}: eager={eager_queries} lazy={lazy_queries}")
+        assert lazy_queries < eager_queries
+
+    @pytest.mark.parametrize('url', ['/hub/', '/events/'])
+    def test_htmx_fragment_skips_site_context(self, client, no_silk, url):
+        response = client.get(url, HTTP_HX_REQUEST='true')
+        assert response.status_code == 200
+        assert 'cms_hero_slides' not in response.context
+        assert 'cart_items_count' not in response.context
+
+
+@pytest.mark.django_db
+class TestSiteContext:
+    """Test lazy evaluation and per-request memoization"""
+
+    def test_values_are_lazy_and_memoized(self, rf, settings, monkeypatch):
+        from apps.core import context_processors
+
+        calls = []
+
+        def provider(request):
+            calls.append(request)
+            return {'first': 1, 'second': 'two'}
+
+        monkeypatch.setattr(context_processors, 'fake_provider', provider, raising=False)
+        settings.SITE_CONTEXT_PROVIDERS = {
+            'apps.core.context_processors.fake_provider': ['first', 'second'],
+        }
+
+        request = rf.get('/')
+        context = context_processors.site_context(request)
+        assert calls == []
+
+        assert context['first'] == 1
+        assert str(context['second']) == 'two'
+
+        # Другий render того ж запиту використовує вже обчислене значення
+        context = context_processors.site_context(request)
+        assert context['first'] == 1
+        assert len(calls) == 1
+
+    def test_htmx_boosted_request_keeps_context(self, rf):
+        from apps.core.context_processors import site_context
+
+        request = rf.get('/', HTTP_HX_REQUEST='true', HTTP_HX_BOOSTED='true')
+        assert 'country_code' in site_context(request)
+
+        request = rf.get('/hub/', HTTP_HX_REQUEST='true')
+        assert site_context(request) == {}
@@ -48,16 +48,16 @@ class EventAdmin(admin.ModelAdmin):
         }),
         ('Квитки та ціни', {
             'fields': (
-                'max_attendees', 'is_free',
+                'max_attendees', 'tickets_sold', 'tickets_held', 'is_free',
                 'requires_subscription'
             ),
             'description': 'Якщо "Безкоштовний івент" - тарифи не заповнюються'
         }),
         ('Тарифи квитків', {
             'fields': (
-                'tier_1_name', 'tier_1_price', 'tier_1_features', 'tier_1_popular',
-                'tier_2_name', 'tier_2_price', 'tier_2_features', 'tier_2_popular',
-                'tier_3_name', 'tier_3_price', 'tier_3_features', 'tier_3_popular',
+                'tier_1_name', 'tier_1_price', 'tier_1_features', 'tier_1_popular' 'tier_1_capacity',
+                'tier_2_name', 'tier_2_price', 'tier_2_features', 'tier_2_popular' 'tier_2_capacity',
+                'tier_3_name', 'tier_3_price', 'tier_3_features', 'tier_3_popular' 'tier_3_capacity',
             ),
             'description': 'Для платних подій (is_free=False). Кожен пункт переваг з нового рядка.',
             'classes': ('collapse',)
@@ -103,7 +103,7 @@ class EventAdmin(admin.ModelAdmin):
         })
     )
     
-    readonly_fields = ['tickets_sold']
+    readonly_fields = ['tickets_sold', 'tickets_held']
     
     class Media:
         js = ('admin/js/playvision-admin.js',)
@@ -175,12 +175,12 @@ class EventTicketAdmin(admin.ModelAdmin):
     )
     
     def qr_code_preview(self, obj):
-        if obj.qr_code:
+        if obj.pk:
             return format_html(
                 '<img src="{}" width="200" height="200" />',
-                obj.qr_code.url
+                obj.get_qr_url('svg')
             )
-        return "QR код не згенерований"
+        return "QR код буде доступний після збереження"
     qr_code_preview.short_description = "QR код"
     
     def get_queryset(self, request):
@@ -18,4 +18,6 @@ urlpatterns = [
     path('calendar/', api_views.CalendarEventsAPIView.as_view(), name='calendar_events'),
     path('qr/validate/', api_views.ValidateQRCodeAPIView.as_view(), name='validate_qr'),
     path('qr/checkin/', api_views.CheckInTicketAPIView.as_view(), name='checkin_ticket'),
+    path('qr/events/<int:event_id>/manifest/', api_views.EventScanManifestAPIView.as_view(), name='scan_manifest'),
+    path('qr/events/<int:event_id>/checkins/', api_views.BatchCheckInAPIView.as_view(), name='batch_checkin'),
 ]
@@ -5,9 +5,16 @@ from rest_framework.views import APIView
 from django.utils import timezone
 from django.db.models import Q, Count, Avg
 from django.shortcuts import get_object_or_404
-import json
+from django.utils.cache import get_conditional_response
 
+from .calendar_feed import CalendarRangeError, feed_for_request, set_validators
+
+from .inventory import AlreadyRegistered, SoldOut, issue_ticket
 from .models import Event, Speaker, EventTicket, EventWaitlist, EventFeedback
+from .tickets import (
+    CHECKIN_BATCH_MAX, build_manifest, can_manage_event, check_in_batch,
+    check_in_token, ticket_info, validate_scan
+)
 from .serializers import (
     EventSerializer, EventDetailSerializer, SpeakerSerializer,
     EventTicketSerializer, EventRegistrationSerializer,
@@ -179,36 +186,19 @@ class RegisterForEventAPIView(APIView):
         
         use_balance = request.data.get('use_balance', False)
         
-        if use_balance and event.requires_subscription:
+        if (use_balance and event.requires_subscription) or event.is_free:
             # TODO: Use new subscription system ticket balance
-            # Temporarily treat as free event until new subscription system is integrated
-            ticket = EventTicket.objects.create(
-                event=event,
-                user=user,
-                status='confirmed',
-                used_balance=True
-            )
-            
-            # Update event stats
-            event.tickets_sold += 1
-            event.save()
-            
-            serializer = EventTicketSerializer(ticket)
-            return Response({
-                'message': f'Ви успішно зареєстровані на {event.title}!',
-                'ticket': serializer.data
-            }, status=status.HTTP_201_CREATED)
-        
-        elif event.is_free:
-            # Free event registration
-            ticket = EventTicket.objects.create(
-                event=event,
-                user=user,
-                status='confirmed'
-            )
-            
-            event.tickets_sold += 1
-            event.save()
+            # Temporarily treat balance as free event until new subscription system is integrated
+            try:
+                ticket = issue_ticket(
+                    event, user, request.data.get('tier_name', ''),
+                    status='confirmed',
+                    used_balance=bool(use_balance and event.requires_subscription)
+                )
+            except SoldOut as e:
+                return Response({'error': e.message}, status=status.HTTP_409_CONFLICT)
+            except AlreadyRegistered as e:
+                return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
             
             serializer = EventTicketSerializer(ticket)
             return Response({
@@ -264,52 +254,24 @@ class JoinWaitlistAPIView(APIView):
 
 class CalendarEventsAPIView(APIView):
     """
-    API view for calendar events data
+    API view for calendar events data (кешовані місячні кошики, умовний GET)
     """
     
     def get(self, request):
-        start_date = request.query_params.get('start')
-        end_date = request.query_params.get('end')
-        event_type = request.query_params.get('type')
-        
-        # Base queryset
-        events = Event.objects.filter(
-            status='published'
-        )
+        try:
+            feed = feed_for_request(request.query_params)
+        except CalendarRangeError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if start_date:
-            events = events.filter(start_datetime__gte=start_date)
-        if end_date:
-            events = events.filter(start_datetime__lte=end_date)
-        if event_type and event_type != 'all':
-            events = events.filter(event_type=event_type)
-        
-        # Format for calendar
-        calendar_events = []
-        for event in events:
-            calendar_events.append({
-                'id': event.id,
-                'title': event.title,
-                'start': event.start_datetime.isoformat(),
-                'end': event.end_datetime.isoformat(),
-                'url': event.get_absolute_url(),
-                'className': f'event-{event.event_type}',
-                'extendedProps': {
-                    'type': event.get_event_type_display(),
-                    'location': event.location,
-                    'price': float(event.price) if not event.is_free else 0,
-                    'isFree': event.is_free,
-                    'availableTickets': event.available_tickets,
-                    'isSoldOut': event.is_sold_out
-                }
-            })
-        
-        return Response(calendar_events)
+        not_modified = get_conditional_response(request, etag=feed.etag, last_modified=feed.last_modified)
+        if not_modified is not None:
+            return set_validators(not_modified, feed, private=True)
+        return set_validators(Response(feed.events), feed, private=True)
 
 
 class ValidateQRCodeAPIView(APIView):
     """
-    API view to validate QR code
+    API view to validate QR code (підпис без БД, стан квитка - один запит)
     """
     
     def post(self, request):
@@ -321,62 +283,14 @@ class ValidateQRCodeAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            # Decode QR data
-            decoded_data = json.loads(qr_data)
-            ticket_id = decoded_data.get('ticket_id')
-            
-            if not ticket_id:
-                return Response({
-                    'valid': False,
-                    'error': 'Невірний QR код'
-                })
-            
-            ticket = EventTicket.objects.get(id=ticket_id)
-            
-            # Validate QR data
-            if not ticket.validate_qr_data(qr_data):
-                return Response({
-                    'valid': False,
-                    'error': 'Підроблений QR код'
-                })
-            
-            # Check ticket status
-            if ticket.status == 'used':
-                return Response({
-                    'valid': False,
-                    'error': f'Квиток вже використаний {ticket.used_at.strftime("%d.%m.%Y %H:%M")}',
-                    'used_at': ticket.used_at.isoformat()
-                })
-            
-            if ticket.status != 'confirmed':
-                return Response({
-                    'valid': False,
-                    'error': 'Квиток не підтверджений'
-                })
-            
-            # Check event timing
-            if not ticket.event.is_ongoing and not ticket.event.is_upcoming:
-                return Response({
-                    'valid': False,
-                    'error': 'Івент завершений'
-                })
-            
-            return Response({
-                'valid': True,
-                'ticket': {
-                    'number': ticket.ticket_number,
-                    'event': ticket.event.title,
-                    'user': ticket.user.profile.full_name if hasattr(ticket.user, 'profile') else ticket.user.email,
-                    'event_start': ticket.event.start_datetime.isoformat()
-                }
-            })
-            
-        except (json.JSONDecodeError, ValueError, EventTicket.DoesNotExist):
-            return Response({
-                'valid': False,
-                'error': 'Квиток не знайдено'
-            })
+        valid, error, ticket = validate_scan(qr_data)
+        if not valid:
+            response = {'valid': False, 'error': error}
+            if ticket is not None and ticket.used_at:
+                response['used_at'] = ticket.used_at.isoformat()
+            return Response(response)
+        
+        return Response({'valid': True, 'ticket': ticket_info(ticket)})
 
 
 class CheckInTicketAPIView(APIView):
@@ -393,40 +307,55 @@ class CheckInTicketAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            # Decode and find ticket
-            decoded_data = json.loads(qr_data)
-            ticket = EventTicket.objects.get(id=decoded_data.get('ticket_id'))
-            
-            # Validate QR
-            if not ticket.validate_qr_data(qr_data):
-                return Response({
-                    'success': False,
-                    'error': 'Підроблений QR код'
-                })
-            
-            # Check in
-            checked_by = request.user if request.user.is_authenticated else None
-            success, message = ticket.check_in(checked_by)
-            
-            if success:
-                return Response({
-                    'success': True,
-                    'message': message,
-                    'ticket': {
-                        'number': ticket.ticket_number,
-                        'user': ticket.user.profile.full_name if hasattr(ticket.user, 'profile') else ticket.user.email,
-                        'checked_in_at': ticket.used_at.isoformat()
-                    }
-                })
-            else:
-                return Response({
-                    'success': False,
-                    'error': message
-                })
-                
-        except (json.JSONDecodeError, ValueError, EventTicket.DoesNotExist):
-            return Response({
-                'success': False,
-                'error': 'Квиток не знайдено'
-            })
+        checked_by = request.user if request.user.is_authenticated else None
+        success, message, ticket = check_in_token(qr_data, checked_by)
+        if not success:
+            return Response({'success': False, 'error': message})
+        
+        return Response({
+            'success': True,
+            'message': message,
+            'ticket': ticket_info(ticket)
+        })
+
+
+class EventScanManifestAPIView(APIView):
+    """
+    Signed per-event manifest for offline scanners (staff only)
+    Маніфест містить ключ події, яким можна підписати токен - організатору не видається
+    """
+    
+    def get(self, request, event_id):
+        event = get_object_or_404(Event, pk=event_id)
+        if not request.user.is_staff:
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(build_manifest(event))
+
+
+class BatchCheckInAPIView(APIView):
+    """
+    Upload offline check-ins in bulk
+    
+    POST {"scans": [{"token": "PV1:...", "scanned_at": "2025-10-01T10:00:00+03:00"}, ...]}
+    """
+    
+    def post(self, request, event_id):
+        event = get_object_or_404(Event, pk=event_id)
+        if not can_manage_event(request.user, event):
+            return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
+        
+        scans = request.data.get('scans')
+        if not isinstance(scans, list) or not scans:
+            return Response({'error': 'scans list is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scans) > CHECKIN_BATCH_MAX:
+            return Response(
+                {'error': f'Too many scans (max {CHECKIN_BATCH_MAX})'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = check_in_batch(event, scans, checked_by=request.user)
+        return Response({
+            'checked_in': sum(1 for result in results if result['status'] == 'checked_in'),
+            'results': results
+        })
@@ -0,0 +1,313 @@
+"""
+Calendar feed (CalendarEventsAPIView, event_calendar_data, calendar.ics)
+Події календаря серіалізуються один раз у місячні кошики (місяць, тип) у кеші.
+Запит збирає потрібні місяці одним get_many, відсутні будуються одним запитом на
+весь діапазон. Зміна Event інвалідовує всі кошики через версію; доступність квитків
+змінюється атомарними UPDATE без сигналів - тому кошик живе не довше CALENDAR_FEED_TTL.
+
+ETag/Last-Modified беруться з часу побудови кошиків, .ics - з тих самих кошиків.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+CALENDAR_CACHE_KEY = 'events_calendar:v{version}:{month}:{event_type}'
+CALENDAR_VERSION_KEY = 'events_calendar_version'
+
+# Найбільший діапазон одного запиту (річний вигляд + сусідні тижні)
+CALENDAR_MAX_MONTHS = 14
+# Підписка на .ics без параметрів - поточний місяць і наступні
+CALENDAR_ICS_MONTHS = 12
+
+# Поля Event, зміна яких змінює календар
+CALENDAR_FIELDS = {
+    'title', 'slug', 'status', 'event_type', 'start_datetime', 'end_datetime', 'location',
+    'price', 'is_free', 'max_attendees',
+}
+
+_SLUG_PLACEHOLDER = '__slug__'
+
+
+class CalendarRangeError(ValueError):
+    """Некоректні параметри start/end/type"""
+
+
+def get_feed_ttl():
+    return getattr(settings, 'CALENDAR_FEED_TTL', 300)
+
+
+def get_calendar_version():
+    version = cache.get(CALENDAR_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.set(CALENDAR_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_calendar_feed():
+    """Нова версія кошиків календаря (викликається при зміні/видаленні Event)"""
+    try:
+        cache.incr(CALENDAR_VERSION_KEY)
+    except ValueError:
+        cache.set(CALENDAR_VERSION_KEY, 2, None)
+
+
+def _parse_bound(value, name):
+    """Дата або ISO datetime з параметра запиту (FullCalendar шле обидва)"""
+    if not value:
+        return None
+    value = value.strip().replace(' ', '+')  # незакодований '+' зміщення в query string
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CalendarRangeError(f"Invalid {name}: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _month_start(moment):
+    local = timezone.localtime(moment)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def _months(start, end):
+    """Початки місяців (aware, локальний час), що перетинають [start, end]"""
+    months = []
+    month = _month_start(start)
+    while month <= end:
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def parse_range(params, default_months=1):
+    """
+    start/end/type з query params
+
+    Returns:
+        tuple: (start, end, event_type) - type 'all' або ключ з EVENT_TYPE_CHOICES
+    Raises:
+        CalendarRangeError
+    """
+    from .models import Event
+
+    start = _parse_bound(params.get('start'), 'start')
+    end = _parse_bound(params.get('end'), 'end')
+    if start is None:
+        start = _month_start(end or timezone.now())
+    if end is None:
+        end = _add_months(_month_start(start), default_months)
+    if end < start:
+        raise CalendarRangeError("end must be after start")
+    if len(_months(start, end)) > CALENDAR_MAX_MONTHS:
+        raise CalendarRangeError(f"Range is limited to {CALENDAR_MAX_MONTHS} months")
+
+    event_type = params.get('type') or 'all'
+    if event_type != 'all' and event_type not in dict(Event.EVENT_TYPE_CHOICES):
+        raise CalendarRangeError(f"Unknown event type: {event_type!r}")
+    return start, end, event_type
+
+
+def _serialize(event, url_pattern, type_labels):
+    """(start_ts, end_ts, item) - item у форматі FullCalendar"""
+    return (
+        event.start_datetime.timestamp(),
+        event.end_datetime.timestamp() if event.end_datetime else None,
+        {
+            'id': event.id,
+            'title': event.title,
+            'start': event.start_datetime.isoformat(),
+            'end': event.end_datetime.isoformat() if event.end_datetime else None,
+            'url': url_pattern.replace(_SLUG_PLACEHOLDER, event.slug),
+            'className': f'event-{event.event_type}',
+            'extendedProps': {
+                'type': type_labels.get(event.event_type, event.event_type),
+                'location': event.location,
+                'price': float(event.price) if not event.is_free else 0,
+                'isFree': event.is_free,
+                'availableTickets': event.available_tickets,
+                'isSoldOut': event.is_sold_out,
+            },
+        },
+    )
+
+
+def build_buckets(months, event_type):
+    """
+    Кошики для місяців одним запитом
+
+    Returns:
+        dict: {month_key: {'built_at': float, 'events': [(start_ts, end_ts, item), ...]}}
+    """
+    from .models import Event
+
+    events = Event.objects.filter(
+        status='published',
+        start_datetime__gte=months[0],
+        start_datetime__lt=_add_months(months[-1], 1),
+    ).only(
+        'id', 'title', 'slug', 'event_type', 'start_datetime', 'end_datetime', 'location',
+        'price', 'is_free', 'max_attendees', 'tickets_sold', 'tickets_held',
+    ).order_by('start_datetime', 'id')
+    if event_type != 'all':
+        events = events.filter(event_type=event_type)
+
+    url_pattern = reverse('events:event_detail', kwargs={'slug': _SLUG_PLACEHOLDER})
+    type_labels = dict(Event.EVENT_TYPE_CHOICES)
+    built_at = timezone.now().timestamp()
+    buckets = {month.strftime('%Y-%m'): {'built_at': built_at, 'events': []} for month in months}
+    for event in events:
+        key = timezone.localtime(event.start_datetime).strftime('%Y-%m')
+        if key in buckets:
+            buckets[key]['events'].append(_serialize(event, url_pattern, type_labels))
+    return buckets
+
+
+class CalendarFeed:
+    """Події діапазону з кешованих кошиків + валідатори для умовного GET"""
+
+    def __init__(self, start, end, event_type, buckets):
+        self.start = start
+        self.end = end
+        self.event_type = event_type
+        self.buckets = buckets
+
+    def _rows(self):
+        start, end = self.start.timestamp(), self.end.timestamp()
+        for bucket in self.buckets:
+            for row in bucket['events']:
+                if start <= row[0] <= end:
+                    yield row
+
+    @property
+    def events(self):
+        return [item for _, _, item in self._rows()]
+
+    @property
+    def last_modified(self):
+        return int(max(bucket['built_at'] for bucket in self.buckets))
+
+    @property
+    def etag(self):
+        source = ':'.join(
+            [self.event_type, str(self.start.timestamp()), str(self.end.timestamp())] +
+            [repr(bucket['built_at']) for bucket in self.buckets]
+        )
+        return '"%s"' % hashlib.sha256(source.encode()).hexdigest()[:32]
+
+    def to_ics(self, base_url):
+        """iCalendar (RFC 5545); base_url - схема і хост для посилань подій"""
+        stamp = _ics_datetime(self.last_modified)
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//PlayVision//Events//UK',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            'X-WR-CALNAME:PlayVision',
+        ]
+        for start_ts, end_ts, item in self._rows():
+            lines += [
+                'BEGIN:VEVENT',
+                f"UID:event-{item['id']}@playvision",
+                f'DTSTAMP:{stamp}',
+                f'DTSTART:{_ics_datetime(start_ts)}',
+            ]
+            if end_ts:
+                lines.append(f'DTEND:{_ics_datetime(end_ts)}')
+            lines += [
+                f"SUMMARY:{_ics_text(item['title'])}",
+                f"URL:{base_url}{item['url']}",
+            ]
+            if item['extendedProps']['location']:
+                lines.append(f"LOCATION:{_ics_text(item['extendedProps']['location'])}")
+            lines += [f"CATEGORIES:{_ics_text(item['extendedProps']['type'])}", 'END:VEVENT']
+        lines.append('END:VCALENDAR')
+        return ''.join(_ics_fold(line) + '\r\n' for line in lines)
+
+
+def _ics_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_text(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_fold(line):
+    """Рядки довші за 75 байт переносяться (продовження починається з пробілу)"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # Не розрізати багатобайтний символ UTF-8
+        while size < len(encoded) and encoded[size] & 0xC0 == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return '\r\n '.join(parts)
+
+
+def get_calendar_feed(start, end, event_type='all'):
+    """
+    Події [start, end] з кошиків (month, type); відсутні кошики будуються одним запитом
+
+    Returns:
+        CalendarFeed
+    """
+    months = _months(start, end)
+    version = get_calendar_version()
+    keys = {
+        month.strftime('%Y-%m'): CALENDAR_CACHE_KEY.format(
+            version=version, month=month.strftime('%Y-%m'), event_type=event_type
+        )
+        for month in months
+    }
+    cached = cache.get_many(list(keys.values()))
+    buckets = {month: cached[key] for month, key in keys.items() if key in cached}
+
+    missing = [month for month in months if month.strftime('%Y-%m') not in buckets]
+    if missing:
+        built = build_buckets(missing, event_type)
+        cache.set_many({keys[month]: bucket for month, bucket in built.items()}, get_feed_ttl())
+        buckets.update(built)
+        logger.debug(f"Built {len(built)} calendar buckets ({event_type})")
+
+    return CalendarFeed(start, end, event_type, [buckets[month.strftime('%Y-%m')] for month in months])
+
+
+def feed_for_request(params, default_months=1):
+    """parse_range + get_calendar_feed"""
+    start, end, event_type = parse_range(params, default_months)
+    return get_calendar_feed(start, end, event_type)
+
+
+def set_validators(response, feed, private=False):
+    """ETag і Last-Modified; клієнт щоразу перевіряє актуальність (304 без тіла)"""
+    response['ETag'] = feed.etag
+    response['Last-Modified'] = http_date(feed.last_modified)
+    response['Cache-Control'] = ('private, ' if private else '') + 'max-age=0, must-revalidate'
+    return response
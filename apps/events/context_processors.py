@@ -1,47 +1,96 @@
+from django.core.cache import cache
+from django.db.models import Count, Min
 from django.utils import timezone
-from django.db import connection
 from .models import Event
 
 
+MENU_CACHE_KEY = 'event_categories_menu'
+MENU_VERSION_KEY = 'event_categories_menu_version'
+MENU_CACHE_TTL = 60 * 60  # 1 година (максимум, до старту найближчої події - менше)
+
+
+def get_menu_version():
+    """Поточна версія кешу меню категорій"""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.set(MENU_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_event_categories_menu():
+    """Інвалідувати меню категорій (викликається при зміні/видаленні Event)"""
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError:
+        # Ключа ще немає в кеші
+        cache.set(MENU_VERSION_KEY, 2, None)
+
+
+def build_event_categories_menu():
+    """
+    Побудувати меню категорій одним grouped запитом
+
+    Returns:
+        tuple: (categories, next_start) - список категорій з майбутніми
+        подіями та час старту найближчої з них (коли меню застаріє)
+    """
+    rows = Event.objects.filter(
+        status='published',
+        start_datetime__gt=timezone.now()
+    ).exclude(
+        event_category=''
+    ).values('event_category').annotate(
+        count=Count('id'),
+        next_start=Min('start_datetime')
+    )
+    stats = {row['event_category']: row for row in rows}
+
+    categories = []
+    next_start = None
+    for cat_value, cat_display in Event.EVENT_CATEGORY_CHOICES:
+        row = stats.get(cat_value)
+        if not row:  # Показуємо тільки категорії з подіями
+            continue
+        categories.append({
+            'slug': cat_value,
+            'name': cat_display,
+            'count': row['count'],
+            'url': f'/events/?category={cat_value}'
+        })
+        if next_start is None or row['next_start'] < next_start:
+            next_start = row['next_start']
+
+    return categories, next_start
+
+
+def get_event_categories_menu():
+    """
+    Меню категорій з версіонованого кешу
+
+    Кеш живе до старту найближчої події (тоді лічильники змінюються),
+    але не довше MENU_CACHE_TTL. Зміни Event інвалідовують його через версію.
+    """
+    cache_key = f'{MENU_CACHE_KEY}:v{get_menu_version()}'
+    categories = cache.get(cache_key)
+    if categories is not None:
+        return categories
+
+    categories, next_start = build_event_categories_menu()
+
+    ttl = MENU_CACHE_TTL
+    if next_start is not None:
+        seconds_to_start = int((next_start - timezone.now()).total_seconds()) + 1
+        ttl = max(1, min(ttl, seconds_to_start))
+    cache.set(cache_key, categories, ttl)
+
+    return categories
+
+
 def event_categories_menu(request):
-    """Static categories menu for events"""
+    """Categories menu for events"""
     try:
-        # Check if events table exists before querying
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT EXISTS (
-                    SELECT 1 FROM information_schema.tables 
-                    WHERE table_name = 'events'
-                );
-            """)
-            table_exists = cursor.fetchone()[0]
-            
-        if not table_exists:
-            return {'event_categories_menu': []}
-        
-        categories = []
-        for cat_value, cat_display in Event.EVENT_CATEGORY_CHOICES:
-            try:
-                # Підрахунок майбутніх подій категорії
-                count = Event.objects.filter(
-                    status='published',
-                    event_category=cat_value,
-                    start_datetime__gt=timezone.now()
-                ).count()
-                
-                if count > 0:  # Показуємо тільки категорії з подіями
-                    categories.append({
-                        'slug': cat_value,
-                        'name': cat_display,
-                        'count': count,
-                        'url': f'/events/?category={cat_value}'
-                    })
-            except Exception as e:
-                continue
-        
-        return {'event_categories_menu': categories}
-    except Exception as e:
-        # If any database error occurs, return empty categories list
-        return {
-            'event_categories_menu': []
-        }
+        return {'event_categories_menu': get_event_categories_menu()}
+    except Exception:
+        # If any database error occurs (e.g. table not migrated yet), return empty categories list
+        return {'event_categories_menu': []}
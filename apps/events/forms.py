@@ -44,6 +44,11 @@ class EventForm(forms.ModelForm):
         label='Тариф 1: Переваги'
     )
     tier_1_popular = forms.BooleanField(required=False, label='Тариф 1: Найвигідніше')
+    tier_1_capacity = forms.IntegerField(
+        required=False, min_value=1,
+        label='Тариф 1: Кількість місць',
+        help_text='Порожньо - обмежено лише загальною кількістю місць'
+    )
     
     tier_2_name = forms.CharField(max_length=50, initial='ПРО', label='Тариф 2: Назва')
     tier_2_price = forms.DecimalField(max_digits=10, decimal_places=2, initial=0, label='Тариф 2: Ціна')
@@ -53,6 +58,11 @@ class EventForm(forms.ModelForm):
         label='Тариф 2: Переваги'
     )
     tier_2_popular = forms.BooleanField(required=False, label='Тариф 2: Найвигідніше')
+    tier_2_capacity = forms.IntegerField(
+        required=False, min_value=1,
+        label='Тариф 2: Кількість місць',
+        help_text='Порожньо - обмежено лише загальною кількістю місць'
+    )
     
     tier_3_name = forms.CharField(max_length=50, initial='Преміум', label='Тариф 3: Назва')
     tier_3_price = forms.DecimalField(max_digits=10, decimal_places=2, initial=0, label='Тариф 3: Ціна')
@@ -62,6 +72,11 @@ class EventForm(forms.ModelForm):
         label='Тариф 3: Переваги'
     )
     tier_3_popular = forms.BooleanField(required=False, label='Тариф 3: Найвигідніше')
+    tier_3_capacity = forms.IntegerField(
+        required=False, min_value=1,
+        label='Тариф 3: Кількість місць',
+        help_text='Порожньо - обмежено лише загальною кількістю місць'
+    )
     
     class Meta:
         model = Event
@@ -78,6 +93,7 @@ class EventForm(forms.ModelForm):
                 features_list = tier.get('features', [])
                 self.fields[f'tier_{i}_features'].initial = '\n'.join(features_list)
                 self.fields[f'tier_{i}_popular'].initial = tier.get('is_popular', False)
+                self.fields[f'tier_{i}_capacity'].initial = tier.get('capacity')
     
     def clean(self):
         cleaned_data = super().clean()
@@ -112,15 +128,19 @@ class EventForm(forms.ModelForm):
                 price = self.cleaned_data.get(f'tier_{i}_price')
                 features_text = self.cleaned_data.get(f'tier_{i}_features', '')
                 is_popular = self.cleaned_data.get(f'tier_{i}_popular', False)
+                capacity = self.cleaned_data.get(f'tier_{i}_capacity')
                 
                 if name and price is not None:
                     features = [f.strip() for f in features_text.split('\n') if f.strip()][:8]
-                    tiers.append({
+                    tier = {
                         'name': name,
                         'price': float(price),
                         'features': features,
                         'is_popular': is_popular
-                    })
+                    }
+                    if capacity:
+                        tier['capacity'] = capacity
+                    tiers.append(tier)
             
             instance.ticket_tiers = tiers
         else:
@@ -0,0 +1,302 @@
+"""
+Ticket inventory
+Місця резервуються умовним UPDATE (tickets_sold + tickets_held + n <= max_attendees)
+замість can_register() + tickets_sold += 1 + save(): при будь-якій кількості паралельних
+запитів місць не продається більше, ніж є, і жоден інкремент не губиться.
+
+Порядок блокувань завжди Event -> TicketTierInventory (без дедлоків у Postgres).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SoldOut(Exception):
+    """Немає вільних місць (на подію або тариф)"""
+
+    def __init__(self, message="Всі квитки продані"):
+        super().__init__(message)
+        self.message = message
+
+
+class AlreadyRegistered(Exception):
+    """У користувача вже є квиток на подію"""
+
+    def __init__(self, message="Ви вже зареєстровані"):
+        super().__init__(message)
+        self.message = message
+
+
+def get_hold_ttl():
+    return timedelta(minutes=getattr(settings, 'TICKET_HOLD_MINUTES', 15))
+
+
+def sync_tier_capacity(event):
+    """Рядки TicketTierInventory для тарифів події з актуальною ємністю (capacity)"""
+    from .models import TicketTierInventory
+
+    for tier in event.ticket_tiers or []:
+        name = tier.get('name')
+        if not name:
+            continue
+        capacity = tier.get('capacity')
+        TicketTierInventory.objects.update_or_create(
+            event_id=event.pk, tier_name=name,
+            defaults={'capacity': int(capacity) if capacity else None},
+        )
+
+
+def _tier_row(event, tier_name):
+    """Рядок лічильників тарифу або None (тариф не з ticket_tiers - рахується лише подія)"""
+    from .models import TicketTierInventory
+
+    if not tier_name:
+        return None
+    tier = event.get_tier(tier_name)
+    if tier is None:
+        return None
+    capacity = tier.get('capacity')
+    row, _ = TicketTierInventory.objects.get_or_create(
+        event_id=event.pk, tier_name=tier_name,
+        defaults={'capacity': int(capacity) if capacity else None},
+    )
+    return row
+
+
+def _take(event, tier_name, quantity, field):
+    """
+    Забрати quantity місць у field ('tickets_sold' або 'tickets_held') однією транзакцією
+
+    Raises:
+        SoldOut
+    """
+    from .models import Event, TicketTierInventory
+
+    tier_field = 'sold' if field == 'tickets_sold' else 'held'
+    with transaction.atomic():
+        taken = Event.objects.filter(
+            pk=event.pk,
+            max_attendees__gte=F('tickets_sold') + F('tickets_held') + quantity,
+        ).update(**{field: F(field) + quantity})
+        if not taken:
+            raise SoldOut()
+
+        tier = _tier_row(event, tier_name)
+        if tier is not None:
+            taken = TicketTierInventory.objects.filter(pk=tier.pk).filter(
+                Q(capacity__isnull=True) | Q(capacity__gte=F('sold') + F('held') + quantity)
+            ).update(**{tier_field: F(tier_field) + quantity})
+            if not taken:
+                # Відкат інкременту події разом з транзакцією
+                raise SoldOut(f"Квитки тарифу «{tier_name}» закінчились")
+
+
+def _give_back(event_id, tier_name, quantity, field):
+    """Повернути місця (не нижче нуля)"""
+    from .models import Event, TicketTierInventory
+
+    tier_field = 'sold' if field == 'tickets_sold' else 'held'
+    Event.objects.filter(pk=event_id, **{f'{field}__gte': quantity}).update(**{field: F(field) - quantity})
+    if tier_name:
+        TicketTierInventory.objects.filter(
+            event_id=event_id, tier_name=tier_name, **{f'{tier_field}__gte': quantity}
+        ).update(**{tier_field: F(tier_field) - quantity})
+
+
+def _take_with_sweep(event, tier_name, quantity, field):
+    """Якщо місць немає - звільнити прострочені резерви події і спробувати ще раз"""
+    try:
+        _take(event, tier_name, quantity, field)
+    except SoldOut:
+        if not release_expired_holds(event_id=event.pk):
+            raise
+        _take(event, tier_name, quantity, field)
+
+
+def reserve_seat(event, tier_name='', quantity=1):
+    """
+    Продати місце одразу (безкоштовна реєстрація, баланс, оплата без резерву)
+
+    Raises:
+        SoldOut
+    """
+    _take_with_sweep(event, tier_name, quantity, 'tickets_sold')
+
+
+def release_seat(event, tier_name='', quantity=1):
+    """Повернути продане місце (скасування квитка)"""
+    _give_back(event.pk, tier_name, quantity, 'tickets_sold')
+
+
+def hold_seat(event, user, tier_name='', quantity=1, ttl=None):
+    """
+    Зарезервувати місце на час оформлення кошика
+
+    Повторний виклик з тим самим тарифом продовжує резерв.
+
+    Raises:
+        SoldOut
+    Returns:
+        TicketHold
+    """
+    from .models import TicketHold
+
+    expires_at = timezone.now() + (ttl or get_hold_ttl())
+    with transaction.atomic():
+        existing = TicketHold.objects.filter(event_id=event.pk, user=user).first()
+        if existing and existing.tier_name == tier_name and existing.quantity == quantity:
+            TicketHold.objects.filter(pk=existing.pk).update(expires_at=expires_at)
+            existing.expires_at = expires_at
+            return existing
+        if existing:
+            _release_hold(existing)
+
+        _take_with_sweep(event, tier_name, quantity, 'tickets_held')
+        return TicketHold.objects.create(
+            event_id=event.pk, user=user, tier_name=tier_name, quantity=quantity, expires_at=expires_at,
+        )
+
+
+def _release_hold(hold):
+    """Видалити резерв і повернути місця; лічильники зменшує лише той, хто видалив рядок"""
+    from .models import TicketHold
+
+    with transaction.atomic():
+        deleted, _ = TicketHold.objects.filter(pk=hold.pk).delete()
+        if deleted:
+            _give_back(hold.event_id, hold.tier_name, hold.quantity, 'tickets_held')
+    return bool(deleted)
+
+
+def release_hold(event, user):
+    """Користувач прибрав квиток з кошика"""
+    from .models import TicketHold
+
+    hold = TicketHold.objects.filter(event_id=event.pk, user=user).first()
+    return _release_hold(hold) if hold else False
+
+
+def release_expired_holds(event_id=None, now=None):
+    """
+    Звільнити прострочені резерви
+
+    Returns:
+        int: кількість звільнених місць
+    """
+    from .models import TicketHold
+
+    expired = TicketHold.objects.filter(expires_at__lte=now or timezone.now())
+    if event_id is not None:
+        expired = expired.filter(event_id=event_id)
+
+    released = 0
+    for hold in expired.only('id', 'event_id', 'tier_name', 'quantity'):
+        if _release_hold(hold):
+            released += hold.quantity
+    if released:
+        logger.info(f"Released {released} expired ticket holds" + (f" for event {event_id}" if event_id else ''))
+    return released
+
+
+def confirm_seat(event, user, tier_name='', quantity=1):
+    """
+    Перевести резерв користувача в продаж (оплата пройшла)
+
+    Резерв, ще не звільнений після закінчення терміну, теж конвертується - його
+    місце досі враховане. Без резерву місце продається, якщо воно ще є.
+
+    Raises:
+        SoldOut
+    """
+    from .models import Event, TicketHold, TicketTierInventory
+
+    with transaction.atomic():
+        hold = TicketHold.objects.filter(event_id=event.pk, user=user).first()
+        if hold and hold.tier_name == tier_name and hold.quantity == quantity:
+            deleted, _ = TicketHold.objects.filter(pk=hold.pk).delete()
+            if deleted:
+                Event.objects.filter(pk=event.pk).update(
+                    tickets_held=F('tickets_held') - quantity, tickets_sold=F('tickets_sold') + quantity,
+                )
+                if tier_name:
+                    TicketTierInventory.objects.filter(event_id=event.pk, tier_name=tier_name).update(
+                        held=F('held') - quantity, sold=F('sold') + quantity,
+                    )
+                return
+        elif hold:
+            _release_hold(hold)
+
+    reserve_seat(event, tier_name, quantity)
+
+
+def issue_ticket(event, user, tier_name='', from_hold=False, **ticket_fields):
+    """
+    Місце + квиток в одній транзакції (місце не списується без квитка і навпаки)
+
+    Args:
+        from_hold: конвертувати резерв кошика (оплата) замість нового продажу
+
+    Raises:
+        SoldOut, AlreadyRegistered
+    Returns:
+        EventTicket
+    """
+    from .models import EventTicket
+    from .numbering import next_ticket_number
+
+    # Номер до транзакції: блок лічильника процесу не залежить від її відкату
+    ticket_fields.setdefault('ticket_number', next_ticket_number())
+    try:
+        with transaction.atomic():
+            if from_hold:
+                confirm_seat(event, user, tier_name)
+            else:
+                reserve_seat(event, tier_name)
+            return EventTicket.objects.create(event=event, user=user, tier_name=tier_name, **ticket_fields)
+    except IntegrityError:
+        # unique_together (event, user) - паралельна повторна реєстрація
+        raise AlreadyRegistered()
+
+
+def issue_tickets(event, users, tier_name='', **ticket_fields):
+    """
+    Імпорт списку учасників: місця, номери і квитки пачкою
+
+    Користувачі, які вже мають квиток на подію, пропускаються. Місця списуються
+    одним умовним UPDATE на всю пачку - якщо їх не вистачає, не створюється жоден квиток.
+
+    Raises:
+        SoldOut, AlreadyRegistered (паралельна реєстрація когось зі списку)
+    Returns:
+        list[EventTicket]: створені квитки
+    """
+    from .models import EventTicket
+    from .numbering import allocate_ticket_numbers
+
+    users = list({user.pk: user for user in users}.values())
+    registered = set(EventTicket.objects.filter(
+        event_id=event.pk, user_id__in=[user.pk for user in users]
+    ).values_list('user_id', flat=True))
+    users = [user for user in users if user.pk not in registered]
+    if not users:
+        return []
+
+    numbers = allocate_ticket_numbers(len(users))
+    try:
+        with transaction.atomic():
+            reserve_seat(event, tier_name, quantity=len(users))
+            tickets = EventTicket.objects.bulk_create([
+                EventTicket(event=event, user=user, tier_name=tier_name, ticket_number=number, **ticket_fields)
+                for user, number in zip(users, numbers)
+            ])
+    except IntegrityError:
+        raise AlreadyRegistered("Хтось зі списку вже зареєстрований")
+
+    logger.info(f"Imported {len(tickets)} tickets for event {event.pk} ({len(registered)} already registered)")
+    return tickets
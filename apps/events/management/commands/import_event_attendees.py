@@ -0,0 +1,72 @@
+"""
+Імпорт списку учасників події (квитки з номерами пачкою, без запиту на кожен номер)
+Usage: python manage.py import_event_attendees --event 12 attendees.csv [--tier ПРО] [--status confirmed]
+CSV: колонка email (або перша колонка без заголовка); учасники мають бути зареєстровані.
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Issue event tickets for a CSV list of attendee emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file with attendee emails')
+        parser.add_argument('--event', type=int, required=True, help='Event ID')
+        parser.add_argument('--tier', default='', help='Ticket tier name')
+        parser.add_argument('--status', default='confirmed', choices=['pending', 'confirmed'])
+        parser.add_argument('--batch-size', type=int, default=500, help='Tickets per transaction')
+
+    def read_emails(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as handle:
+                rows = list(csv.reader(handle))
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+        if not rows:
+            return []
+        header = [cell.strip().lower() for cell in rows[0]]
+        column = header.index('email') if 'email' in header else 0
+        if 'email' in header:
+            rows = rows[1:]
+        return list(dict.fromkeys(
+            row[column].strip().lower() for row in rows if len(row) > column and '@' in row[column]
+        ))
+
+    def handle(self, *args, **options):
+        from django.contrib.auth import get_user_model
+        from apps.events.inventory import SoldOut, issue_tickets
+        from apps.events.models import Event
+
+        try:
+            event = Event.objects.get(pk=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Event {options['event']} not found")
+        if options['tier'] and event.get_tier(options['tier']) is None:
+            raise CommandError(f"Event has no tier «{options['tier']}»")
+
+        emails = self.read_emails(options['file'])
+        User = get_user_model()
+        users = {user.email.lower(): user for user in User.objects.filter(email__in=emails)}
+        missing = [email for email in emails if email not in users]
+        users = [users[email] for email in emails if email in users]
+
+        imported = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(users), batch_size):
+            try:
+                tickets = issue_tickets(
+                    event, users[start:start + batch_size], options['tier'],
+                    status=options['status'], price=0,
+                )
+            except SoldOut as e:
+                self.stdout.write(self.style.ERROR(f"{e.message}: imported {imported}, stopped at row {start + 1}"))
+                break
+            imported += len(tickets)
+
+        for email in missing:
+            self.stdout.write(self.style.WARNING(f"  no user: {email}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} tickets ({len(users) - imported} skipped, {len(missing)} unknown emails)"
+        ))
@@ -0,0 +1,50 @@
+"""
+Заздалегідь відрендерити QR коди квитків у кеш (перед розсилкою / днем події)
+Usage: python manage.py prerender_ticket_qr --event 12 [--format svg --format png] [--workers 4] [--force]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Render ticket QR images into the cache using a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, action='append', help='Event ID (repeatable); default - upcoming events')
+        parser.add_argument('--format', action='append', choices=['svg', 'png'], dest='formats',
+                            help='Image format (repeatable); default - svg and png')
+        parser.add_argument('--workers', type=int, default=None, help='Process pool size (1 - no pool)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Tickets loaded per batch')
+        parser.add_argument('--force', action='store_true', help='Re-render images that are already cached')
+
+    def handle(self, *args, **options):
+        from django.utils import timezone
+        from apps.events.models import EventTicket
+        from apps.events.qr import prerender
+        from apps.events.tickets import sign_ticket
+
+        tickets = EventTicket.objects.filter(status__in=['pending', 'confirmed'])
+        if options['event']:
+            tickets = tickets.filter(event_id__in=options['event'])
+        else:
+            tickets = tickets.filter(event__start_datetime__gte=timezone.now())
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be >= 1')
+
+        formats = tuple(options['formats'] or ('svg', 'png'))
+        rows = tickets.order_by('id').values_list('id', 'event_id', 'ticket_number')
+        batch_size = options['batch_size']
+
+        rendered = skipped = 0
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            tokens = [sign_ticket(event_id, ticket_id, number) for ticket_id, event_id, number in batch]
+            done, cached = prerender(tokens, formats, workers=options['workers'], force=options['force'])
+            rendered += done
+            skipped += cached
+            self.stdout.write(f"  ...{last_id}: {rendered} rendered, {skipped} cached")
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} QR images ({skipped} already cached)"))
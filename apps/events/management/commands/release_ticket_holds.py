@@ -0,0 +1,19 @@
+"""
+Звільнити прострочені резерви квитків (кошики, які не оплатили вчасно)
+Usage: python manage.py release_ticket_holds [--event ID]
+Запускати кроном раз на хвилину; при нестачі місць резерви події звільняються і без нього.
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Release expired event ticket holds back to inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Only this event ID')
+
+    def handle(self, *args, **options):
+        from apps.events.inventory import release_expired_holds
+
+        released = release_expired_holds(event_id=options.get('event'))
+        self.stdout.write(self.style.SUCCESS(f"Released {released} seats"))
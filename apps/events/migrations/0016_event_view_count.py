@@ -0,0 +1,18 @@
+# Write-behind view counter for events
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_add_video_to_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
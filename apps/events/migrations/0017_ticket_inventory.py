@@ -0,0 +1,78 @@
+# Ticket inventory: held seats counter, per-tier counters and cart holds
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_tier_inventory(apps, schema_editor):
+    """Рядки тарифів з ticket_tiers і продані квитки по тарифах"""
+    Event = apps.get_model('events', 'Event')
+    EventTicket = apps.get_model('events', 'EventTicket')
+    TicketTierInventory = apps.get_model('events', 'TicketTierInventory')
+
+    for event in Event.objects.exclude(ticket_tiers=[]).only('id', 'ticket_tiers'):
+        for tier in event.ticket_tiers or []:
+            name = tier.get('name')
+            if not name:
+                continue
+            sold = EventTicket.objects.filter(
+                event_id=event.id, tier_name=name, status__in=['pending', 'confirmed', 'used']
+            ).count()
+            TicketTierInventory.objects.get_or_create(
+                event_id=event.id, tier_name=name,
+                defaults={'capacity': tier.get('capacity') or None, 'sold': sold},
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_event_view_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='tickets_held',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Місця, зарезервовані в кошиках (apps.events.inventory)'),
+        ),
+        migrations.CreateModel(
+            name='TicketTierInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier_name', models.CharField(max_length=50)),
+                ('capacity', models.PositiveIntegerField(blank=True, help_text='Порожньо - обмежено лише max_attendees', null=True)),
+                ('sold', models.PositiveIntegerField(default=0)),
+                ('held', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tier_inventory', to='events.event')),
+            ],
+            options={
+                'verbose_name': 'Ticket Tier Inventory',
+                'verbose_name_plural': 'Ticket Tier Inventory',
+                'db_table': 'event_tier_inventory',
+                'unique_together': {('event', 'tier_name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier_name', models.CharField(blank=True, max_length=50)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticket_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ticket Hold',
+                'verbose_name_plural': 'Ticket Holds',
+                'db_table': 'event_ticket_holds',
+                'indexes': [models.Index(fields=['expires_at'], name='event_ticke_expires_6699aa_idx')],
+                'unique_together': {('event', 'user')},
+            },
+        ),
+        migrations.RunPython(fill_tier_inventory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Ticket number allocator: counter table (SQLite/MySQL) and Postgres sequence
+
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE SEQUENCE IF NOT EXISTS event_ticket_number_seq')
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS event_ticket_number_seq')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_ticket_inventory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketNumberCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ticket Number Counter',
+                'verbose_name_plural': 'Ticket Number Counters',
+                'db_table': 'event_ticket_number_counter',
+            },
+        ),
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -3,12 +3,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator
-import qrcode
-from io import BytesIO
-from django.core.files import File
-import json
 import hashlib
-import base64
 
 
 class Event(models.Model):
@@ -71,6 +66,9 @@ class Event(models.Model):
     # Capacity and pricing
     max_attendees = models.PositiveIntegerField(default=100)
     tickets_sold = models.PositiveIntegerField(default=0)
+    tickets_held = models.PositiveIntegerField(default=0, editable=False,
+                                               help_text='Місця, зарезервовані в кошиках (apps.events.inventory)')
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
     is_free = models.BooleanField(default=False)
     requires_subscription = models.BooleanField(default=False, 
@@ -185,9 +183,18 @@ class Event(models.Model):
     def __str__(self):
         return self.title
     
+    # Лічильники місць змінюються тільки атомарними UPDATE (apps.events.inventory)
+    INVENTORY_FIELDS = ('tickets_sold', 'tickets_held')
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            # save() з адмінки/форми не перезаписує лічильники застарілими значеннями
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.INVENTORY_FIELDS
+            ]
         super().save(*args, **kwargs)
     
     def get_video_library_id(self, country_code='UA'):
@@ -276,13 +283,20 @@ class Event(models.Model):
     
     @property
     def is_sold_out(self):
-        """Check if event is sold out"""
-        return self.tickets_sold >= self.max_attendees
+        """Check if event is sold out (включно з місцями в кошиках)"""
+        return self.tickets_sold + self.tickets_held >= self.max_attendees
     
     @property
     def available_tickets(self):
         """Get number of available tickets"""
-        return max(0, self.max_attendees - self.tickets_sold)
+        return max(0, self.max_attendees - self.tickets_sold - self.tickets_held)
+    
+    def get_tier(self, tier_name):
+        """Тариф з ticket_tiers за назвою"""
+        for tier in self.ticket_tiers or []:
+            if tier.get('name') == tier_name:
+                return tier
+        return None
     
     @property
     def duration_minutes(self):
@@ -394,7 +408,7 @@ class EventTicket(models.Model):
     used_balance = models.BooleanField(default=False, 
                                      help_text='Чи використаний баланс квитків з підписки')
     
-    # QR Code
+    # QR Code (застарілі поля квитків до PV1; нові QR - qr_token + apps.events.qr)
     qr_code = models.ImageField(upload_to='ticket_qr/', blank=True, max_length=500)
     qr_data = models.TextField(blank=True, help_text='Дані для QR коду')
     
@@ -425,99 +439,49 @@ class EventTicket(models.Model):
     def save(self, *args, **kwargs):
         if not self.ticket_number:
             self.ticket_number = self.generate_ticket_number()
+        # QR зображення рендериться при першому запиті (apps.events.qr)
         super().save(*args, **kwargs)
-        
-        # Generate QR code after save (when we have ID)
-        if not self.qr_code:
-            self.generate_qr_code()
     
     def generate_ticket_number(self):
-        """Generate unique ticket number"""
-        import random
-        import string
-        
-        # Обмежуємо кількість спроб для безпеки
-        max_attempts = 100
-        for attempt in range(max_attempts):
-            number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            if not EventTicket.objects.filter(ticket_number=number).exists():
-                return number
-        
-        # Якщо не змогли згенерувати унікальний номер за 100 спроб
-        # використовуємо більш довгий номер з timestamp
-        import time
-        timestamp_suffix = str(int(time.time()))[-4:]  # Останні 4 цифри timestamp
-        number = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4)) + timestamp_suffix
-        return number
-    
-    def generate_qr_code(self):
-        """Generate QR code for ticket"""
-        # Create QR data
-        qr_data = {
-            'ticket_id': self.id,
-            'event_id': self.event.id,
-            'user_id': self.user.id,
-            'ticket_number': self.ticket_number,
-            'hash': self.generate_secure_hash()
-        }
-        
-        # Encode data
-        encoded_data = base64.b64encode(json.dumps(qr_data).encode()).decode()
-        self.qr_data = encoded_data
-        
-        # Generate QR code image
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(encoded_data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save to file field
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        filename = f'ticket_{self.ticket_number}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
-        
-        # Save model
-        EventTicket.objects.filter(id=self.id).update(
-            qr_data=self.qr_data,
-            qr_code=self.qr_code
-        )
+        """Unique ticket number from the block allocator (apps.events.numbering)"""
+        from .numbering import next_ticket_number
+        return next_ticket_number()
+    
+    @property
+    def qr_token(self):
+        """Підписаний токен для QR коду (apps.events.tickets)"""
+        from .tickets import sign_ticket
+        return sign_ticket(self.event_id, self.id, self.ticket_number)
+    
+    def get_qr_url(self, fmt='svg'):
+        from django.urls import reverse
+        return reverse('events:ticket_qr', kwargs={'ticket_id': self.id, 'fmt': fmt})
     
     def generate_secure_hash(self):
-        """Generate secure hash for QR validation"""
-        data = f"{self.id}{self.event.id}{self.user.id}{self.ticket_number}"
+        """Hash of legacy (pre-PV1) QR codes"""
+        data = f"{self.id}{self.event_id}{self.user_id}{self.ticket_number}"
         return hashlib.sha256(data.encode()).hexdigest()[:16]
     
     def validate_qr_data(self, qr_data_input):
-        """Validate QR code data"""
-        try:
-            decoded_data = json.loads(base64.b64decode(qr_data_input).decode())
-            
-            return (
-                decoded_data.get('ticket_id') == self.id and
-                decoded_data.get('event_id') == self.event.id and
-                decoded_data.get('user_id') == self.user.id and
-                decoded_data.get('ticket_number') == self.ticket_number and
-                decoded_data.get('hash') == self.generate_secure_hash()
-            )
-        except (json.JSONDecodeError, ValueError):
-            return False
+        """Validate QR code data (PV1 токен або старий формат)"""
+        from .tickets import resolve_qr
+        
+        claim = resolve_qr(qr_data_input)
+        return (
+            claim is not None and
+            claim.ticket_id == self.id and
+            claim.event_id == self.event_id and
+            claim.ticket_number == self.ticket_number
+        )
     
     def check_in(self, checked_by=None):
         """Check in the ticket"""
-        if self.status != 'confirmed':
-            return False, "Квиток не підтверджений"
-        
         if self.status == 'used':
             return False, f"Квиток вже використаний {self.used_at.strftime('%d.%m.%Y %H:%M')}"
         
+        if self.status != 'confirmed':
+            return False, "Квиток не підтверджений"
+        
         self.status = 'used'
         self.used_at = timezone.now()
         self.checked_in_by = checked_by
@@ -530,17 +494,96 @@ class EventTicket(models.Model):
         if self.status == 'used':
             return False, "Неможливо скасувати використаний квиток"
         
+        from .inventory import release_seat
+        
+        if self.status == 'cancelled':
+            return False, "Квиток вже скасований"
+        
         self.status = 'cancelled'
         self.save()
         
         # Return ticket to event availability
-        if self.event.tickets_sold > 0:
-            self.event.tickets_sold -= 1
-            self.event.save()
+        release_seat(self.event, self.tier_name)
         
         return True, "Квиток скасовано"
 
 
+class TicketTierInventory(models.Model):
+    """
+    Лічильники місць тарифу (capacity з ticket_tiers)
+    Оновлюються тільки умовними UPDATE з apps.events.inventory
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='tier_inventory')
+    tier_name = models.CharField(max_length=50)
+    capacity = models.PositiveIntegerField(null=True, blank=True,
+                                           help_text='Порожньо - обмежено лише max_attendees')
+    sold = models.PositiveIntegerField(default=0)
+    held = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'event_tier_inventory'
+        verbose_name = 'Ticket Tier Inventory'
+        verbose_name_plural = 'Ticket Tier Inventory'
+        unique_together = ['event', 'tier_name']
+    
+    def __str__(self):
+        return f"{self.event_id}: {self.tier_name} ({self.sold}/{self.capacity or '∞'})"
+    
+    @property
+    def available(self):
+        if self.capacity is None:
+            return None
+        return max(0, self.capacity - self.sold - self.held)
+
+
+class TicketHold(models.Model):
+    """
+    Тимчасовий резерв місця на час оформлення кошика
+    Місце враховане в Event.tickets_held; прострочені резерви звільняє
+    inventory.release_expired_holds (команда release_ticket_holds або при нестачі місць)
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='holds')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='ticket_holds')
+    tier_name = models.CharField(max_length=50, blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'event_ticket_holds'
+        verbose_name = 'Ticket Hold'
+        verbose_name_plural = 'Ticket Holds'
+        unique_together = ['event', 'user']
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"Hold {self.event_id}/{self.user_id} until {self.expires_at}"
+    
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+class TicketNumberCounter(models.Model):
+    """
+    Лічильник номерів квитків для БД без SEQUENCE (apps.events.numbering)
+    Postgres використовує sequence event_ticket_number_seq
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'event_ticket_number_counter'
+        verbose_name = 'Ticket Number Counter'
+        verbose_name_plural = 'Ticket Number Counters'
+    
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
 class EventRegistration(models.Model):
     """
     Additional registration data for events
@@ -649,3 +692,44 @@ class EventFeedback(models.Model):
     
     def __str__(self):
         return f"Feedback for {self.event.title} by {self.user.email}"
+
+
+# Signals для інвалідації кешу меню категорій подій
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+@receiver([post_save, post_delete], sender=Event)
+def clear_event_categories_menu_cache(sender, **kwargs):
+    """Нова версія кешу меню категорій при додаванні/зміні/видаленні події"""
+    from .context_processors import invalidate_event_categories_menu
+    invalidate_event_categories_menu()
+
+
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event_autocomplete(sender, update_fields=None, **kwargs):
+    """Назви подій є у підказках пошуку курсів"""
+    from django.db import transaction
+    from apps.content.autocomplete import invalidate_autocomplete
+    
+    if update_fields is not None and not {'title', 'status'} & set(update_fields):
+        return
+    transaction.on_commit(invalidate_autocomplete)
+
+
+@receiver(post_save, sender=Event)
+def sync_tier_inventory(sender, instance, **kwargs):
+    """Ємність тарифів з ticket_tiers -> TicketTierInventory"""
+    from .inventory import sync_tier_capacity
+    sync_tier_capacity(instance)
+
+
+@receiver([post_save, post_delete], sender=Event)
+def invalidate_event_calendar(sender, update_fields=None, **kwargs):
+    """Нова версія кошиків календаря (apps.events.calendar_feed)"""
+    from django.db import transaction
+    from .calendar_feed import CALENDAR_FIELDS, invalidate_calendar_feed
+    
+    if update_fields is not None and not CALENDAR_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(invalidate_calendar_feed)
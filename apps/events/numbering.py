@@ -0,0 +1,177 @@
+"""
+Ticket number allocator
+Номер квитка: T + 7 символів Crockford base32 + контрольний символ (Luhn mod 32),
+наприклад T4K9ZQ2MX. Унікальність дає лічильник, а не перевірка exists() на кожну
+спробу: Postgres - SEQUENCE (nextval поза транзакціями, блок значень одним запитом),
+інші БД - рядок TicketNumberCounter з умовним UPDATE.
+
+Значення лічильника переставляються множенням за модулем 32^7 (бієкція) - номери
+не йдуть підряд, але й не повторюються. Це не захист: QR квитка підписаний
+(apps.events.tickets). Префікс T і довжина 9 не перетинаються зі старими номерами
+(8 випадкових символів або EVT...).
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford: без I, L, O, U
+BASE = len(ALPHABET)
+PREFIX = 'T'
+DIGITS = 7
+SPACE = BASE ** DIGITS  # 2^35 номерів
+
+# Непарний множник - бієкція на [0, 2^35)
+SCRAMBLE = 0x5DEECE66D
+
+SEQUENCE_NAME = 'event_ticket_number_seq'
+COUNTER_NAME = 'ticket_number'
+
+_DECODE = {char: index for index, char in enumerate(ALPHABET)}
+# Crockford: неоднозначні символи при ручному введенні
+_DECODE.update({'O': 0, 'I': 1, 'L': 1})
+
+
+class TicketNumbersExhausted(Exception):
+    """Лічильник вийшов за межі простору номерів"""
+
+
+def check_char(digits):
+    """Контрольний символ Luhn mod 32 для рядка з ALPHABET"""
+    total = 0
+    factor = 2
+    for char in reversed(digits):
+        addend = factor * _DECODE[char]
+        total += addend // BASE + addend % BASE
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(BASE - total % BASE) % BASE]
+
+
+def encode_ticket_number(value):
+    """Номер квитка зі значення лічильника (1..2^35-1)"""
+    if not 0 < value < SPACE:
+        raise TicketNumbersExhausted(f"Ticket counter value {value} is out of range")
+    scrambled = value * SCRAMBLE % SPACE
+    digits = []
+    for _ in range(DIGITS):
+        scrambled, index = divmod(scrambled, BASE)
+        digits.append(ALPHABET[index])
+    body = ''.join(reversed(digits))
+    return f'{PREFIX}{body}{check_char(body)}'
+
+
+def normalize_ticket_number(number):
+    """Верхній регістр, без пробілів і дефісів, O/I/L -> 0/1/1 (ручне введення на вході)"""
+    cleaned = (number or '').strip().upper().replace('-', '').replace(' ', '')
+    if not cleaned.startswith(PREFIX):
+        return cleaned
+    return PREFIX + ''.join(ALPHABET[_DECODE[char]] if char in _DECODE else char for char in cleaned[1:])
+
+
+def is_valid_ticket_number(number):
+    """Перевірка контрольного символу (ловить одну помилку символу і більшість перестановок)"""
+    number = normalize_ticket_number(number)
+    if len(number) != DIGITS + 2 or not number.startswith(PREFIX):
+        return False
+    body = number[1:-1]
+    if any(char not in ALPHABET for char in number[1:]):
+        return False
+    return check_char(body) == number[-1]
+
+
+def get_block_size():
+    return getattr(settings, 'TICKET_NUMBER_BLOCK_SIZE', 50)
+
+
+_sequence_ready = False
+
+
+def _ensure_sequence(cursor):
+    global _sequence_ready
+    if not _sequence_ready:
+        cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}')
+        _sequence_ready = True
+
+
+def _reserve(count):
+    """
+    Зарезервувати count значень лічильника одним запитом
+
+    Returns:
+        list[int]: унікальні між процесами значення (не обов'язково підряд)
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            _ensure_sequence(cursor)
+            cursor.execute(f"SELECT nextval('{SEQUENCE_NAME}') FROM generate_series(1, %s)", [count])
+            return [row[0] for row in cursor.fetchall()]
+
+    from .models import TicketNumberCounter
+
+    with transaction.atomic():
+        updated = TicketNumberCounter.objects.filter(name=COUNTER_NAME).update(value=F('value') + count)
+        if not updated:
+            _, created = TicketNumberCounter.objects.get_or_create(name=COUNTER_NAME, defaults={'value': count})
+            if not created:
+                TicketNumberCounter.objects.filter(name=COUNTER_NAME).update(value=F('value') + count)
+        end = TicketNumberCounter.objects.filter(name=COUNTER_NAME).values_list('value', flat=True).get()
+    return list(range(end - count + 1, end + 1))
+
+
+def _block_is_durable():
+    """
+    Чи можна тримати залишок блоку в пам'яті
+
+    nextval не відкочується. Лічильник у таблиці відкочується разом з зовнішньою
+    транзакцією - залишок блоку тоді могли б отримати інші процеси.
+    """
+    return connection.vendor == 'postgresql' or not connection.in_atomic_block
+
+
+class _BlockCache:
+    """Залишок зарезервованого блоку значень процесу (один запит на TICKET_NUMBER_BLOCK_SIZE номерів)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = []
+        self.pid = os.getpid()
+
+    def take(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Форк воркера (gunicorn --preload) - блок батьківського процесу не ділимо
+                self.values = []
+                self.pid = os.getpid()
+            if not self.values:
+                if not _block_is_durable():
+                    return _reserve(1)[0]
+                self.values = _reserve(get_block_size())
+                self.values.reverse()
+            return self.values.pop()
+
+    def clear(self):
+        with self.lock:
+            self.values = []
+
+
+_block = _BlockCache()
+
+
+def next_ticket_number():
+    """Номер для одного квитка (без запитів, поки в блоці процесу є значення)"""
+    return encode_ticket_number(_block.take())
+
+
+def allocate_ticket_numbers(count):
+    """
+    Номери для імпорту списку учасників - один запит на всю пачку
+
+    Returns:
+        list[str]
+    """
+    if count <= 0:
+        return []
+    return [encode_ticket_number(value) for value in _reserve(count)]
@@ -0,0 +1,116 @@
+"""
+QR images for tickets
+Зображення не створюється при збереженні квитка: рендериться з підписаного токена
+при першому запиті (SVG або PNG) і кешується; prerender_ticket_qr заповнює кеш
+заздалегідь пулом процесів (рендер PNG - CPU-bound).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import hashlib
+
+from django.core.cache import cache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+QR_FORMATS = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+}
+
+QR_CACHE_KEY = 'ticket_qr:{fmt}:{digest}'
+QR_CACHE_TTL = 60 * 60 * 24 * 30
+
+QR_BOX_SIZE = 10
+QR_BORDER = 4
+
+
+def token_digest(token):
+    """Ключ кешу і ETag: зміна токена (ключа підпису) - нове зображення"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def qr_cache_key(token, fmt):
+    return QR_CACHE_KEY.format(fmt=fmt, digest=token_digest(token))
+
+
+def render_qr(token, fmt='svg'):
+    """Зображення QR коду (bytes); без Django - викликається в процесах пулу"""
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=QR_BOX_SIZE,
+        border=QR_BORDER,
+        image_factory=qrcode.image.svg.SvgPathImage if fmt == 'svg' else None,
+    )
+    qr.add_data(token)
+    qr.make(fit=True)
+    image = qr.make_image()
+
+    if fmt == 'svg':
+        return image.to_string()
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def get_qr_image(token, fmt='svg'):
+    """Зображення з кешу або рендер і запис у кеш"""
+    key = qr_cache_key(token, fmt)
+    image = cache.get(key)
+    if image is None:
+        image = render_qr(token, fmt)
+        cache.set(key, image, QR_CACHE_TTL)
+    return image
+
+
+def _render_job(job):
+    token, fmt = job
+    return render_qr(token, fmt)
+
+
+def prerender(tokens, formats=('svg', 'png'), workers=None, force=False, chunk_size=200):
+    """
+    Заповнити кеш зображеннями для токенів
+
+    Рендер у ProcessPoolExecutor (workers=1 - в цьому процесі), запис у кеш
+    пачками set_many з основного процесу.
+
+    Returns:
+        tuple: (rendered, skipped)
+    """
+    jobs = [(token, fmt) for token in tokens for fmt in formats]
+    if not force:
+        cached = set()
+        for start in range(0, len(jobs), chunk_size):
+            keys = {qr_cache_key(token, fmt): (token, fmt) for token, fmt in jobs[start:start + chunk_size]}
+            cached.update(keys[key] for key in cache.get_many(list(keys)))
+        skipped = len(cached)
+        jobs = [job for job in jobs if job not in cached]
+    else:
+        skipped = 0
+
+    if not jobs:
+        return 0, skipped
+
+    def store(batch, images):
+        cache.set_many(
+            {qr_cache_key(token, fmt): image for (token, fmt), image in zip(batch, images)},
+            QR_CACHE_TTL,
+        )
+
+    if workers == 1:
+        for start in range(0, len(jobs), chunk_size):
+            batch = jobs[start:start + chunk_size]
+            store(batch, [_render_job(job) for job in batch])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(jobs), chunk_size):
+                batch = jobs[start:start + chunk_size]
+                store(batch, list(pool.map(_render_job, batch, chunksize=max(1, len(batch) // 32))))
+
+    logger.info(f"Pre-rendered {len(jobs)} ticket QR images ({skipped} already cached)")
+    return len(jobs), skipped
@@ -64,6 +64,7 @@ class EventTicketSerializer(serializers.ModelSerializer):
     event = EventSerializer(read_only=True)
     user = UserBasicSerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    qr_code = serializers.SerializerMethodField()
     
     class Meta:
         model = EventTicket
@@ -72,6 +73,12 @@ class EventTicketSerializer(serializers.ModelSerializer):
             'event', 'user', 'used_balance', 'qr_code',
             'used_at', 'created_at'
         ]
+    
+    def get_qr_code(self, obj):
+        """URL QR коду (рендериться при першому запиті)"""
+        url = obj.get_qr_url('svg')
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
 class EventRegistrationSerializer(serializers.ModelSerializer):
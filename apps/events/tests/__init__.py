@@ -0,0 +1 @@
+# Events tests
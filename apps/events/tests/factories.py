@@ -0,0 +1,27 @@
+"""
+Test data helpers for events tests
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.events.models import Event
+
+
+def make_event(**fields):
+    """Опублікований форум через тиждень; будь-яке поле можна перевизначити"""
+    fields.setdefault('slug', f'forum-{Event.objects.count()}')
+    fields.setdefault('start_datetime', timezone.now() + timedelta(days=7))
+    defaults = {
+        'title': 'Форум', 'description': 'Опис', 'short_description': 'Коротко',
+        'event_type': 'forum', 'status': 'published',
+    }
+    return Event.objects.create(**{**defaults, **fields})
+
+
+def make_users(django_user_model, count, prefix='fan'):
+    """Користувачі через bulk_create - без хешування паролів (сотні у тестах навантаження)"""
+    django_user_model.objects.bulk_create([
+        django_user_model(username=f'{prefix}{i}', email=f'{prefix}{i}@test.com') for i in range(count)
+    ])
+    return list(django_user_model.objects.filter(username__startswith=prefix).order_by('id'))
@@ -0,0 +1,191 @@
+"""
+Test calendar feed - month buckets, conditional GET, invalidation, iCalendar export
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.events.models import Event
+from apps.events.tests import factories
+
+pytestmark = pytest.mark.usefixtures('no_silk')
+
+
+def local(year, month, day, hour=10):
+    return timezone.make_aware(datetime(year, month, day, hour))
+
+
+def make_event(start, slug, **kwargs):
+    return factories.make_event(
+        title=f'Подія {slug}', slug=slug, is_free=True, max_attendees=50,
+        start_datetime=start, end_datetime=start + timedelta(hours=3), **kwargs,
+    )
+
+
+def event_queries(ctx):
+    return [q for q in ctx.captured_queries if 'FROM "events"' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestCalendarFeed:
+    """JSON feed for the calendar widget"""
+
+    URL = '/events/calendar/'
+
+    def test_range_and_type(self, client, locmem_cache):
+        make_event(local(2026, 3, 5), 'march', location='Київ')
+        make_event(local(2026, 3, 20), 'march-webinar', event_type='webinar')
+        make_event(local(2026, 4, 2), 'april')
+        make_event(local(2026, 3, 10), 'draft', status='draft')
+
+        data = client.get(self.URL, {'start': '2026-03-01', 'end': '2026-04-01'}).json()
+        assert [item['id'] for item in data] == list(
+            Event.objects.filter(slug__in=['march', 'march-webinar']).order_by('start_datetime').values_list('id', flat=True)
+        )
+        assert data[0]['url'] == '/events/march/'
+        assert data[0]['extendedProps'] == {
+            'type': 'Форум', 'location': 'Київ', 'price': 0, 'isFree': True,
+            'availableTickets': 50, 'isSoldOut': False,
+        }
+
+        data = client.get(self.URL, {'start': '2026-03-01T00:00:00+02:00', 'end': '2026-04-30', 'type': 'forum'}).json()
+        assert [item['title'] for item in data] == ['Подія march', 'Подія april']
+
+    def test_bad_params(self, client, locmem_cache):
+        assert client.get(self.URL, {'start': 'yesterday', 'end': '2026-04-01'}).status_code == 400
+        assert client.get(self.URL, {'start': '2026-04-01', 'end': '2026-03-01'}).status_code == 400
+        assert client.get(self.URL, {'start': '2020-01-01', 'end': '2026-01-01'}).status_code == 400
+        assert client.get(self.URL, {'start': '2026-03-01', 'end': '2026-04-01', 'type': "x' OR 1"}).status_code == 400
+
+    def test_cached_buckets_and_conditional_get(self, client, locmem_cache):
+        make_event(local(2026, 3, 5), 'march')
+        params = {'start': '2026-03-01', 'end': '2026-05-31'}
+
+        with CaptureQueriesContext(connection) as ctx:
+            first = client.get(self.URL, params)
+        assert len(event_queries(ctx)) == 1  # три місяці одним запитом
+        with CaptureQueriesContext(connection) as ctx:
+            second = client.get(self.URL, params)
+        assert event_queries(ctx) == []
+        assert second.content == first.content
+        assert second['ETag'] == first['ETag']
+        assert first['Last-Modified']
+
+        not_modified = client.get(self.URL, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert not_modified.status_code == 304
+        assert not_modified.content == b''
+
+        # Інший діапазон з тих самих місяців - з кешу
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(self.URL, {'start': '2026-04-01', 'end': '2026-04-30'})
+        assert event_queries(ctx) == []
+
+    def test_event_save_invalidates(self, client, locmem_cache, django_capture_on_commit_callbacks):
+        event = make_event(local(2026, 3, 5), 'march')
+        params = {'start': '2026-03-01', 'end': '2026-03-31'}
+        etag = client.get(self.URL, params)['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            event.title = 'Перейменована'
+            event.save()
+        response = client.get(self.URL, params, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()[0]['title'] == 'Перейменована'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            event.delete()
+        assert client.get(self.URL, params).json() == []
+
+    def test_api_view(self, client, locmem_cache, django_user_model):
+        make_event(local(2026, 3, 5), 'march')
+        client.force_login(django_user_model.objects.create_user(username='fan', email='fan@test.com', password='x'))
+
+        response = client.get('/api/v1/events/calendar/', {'start': '2026-03-01', 'end': '2026-03-31'})
+        assert [item['url'] for item in response.json()] == ['/events/march/']
+        assert 'private' in response['Cache-Control']
+        again = client.get('/api/v1/events/calendar/', {'start': '2026-03-01', 'end': '2026-03-31'},
+                           HTTP_IF_NONE_MATCH=response['ETag'])
+        assert again.status_code == 304
+        assert client.get('/api/v1/events/calendar/', {'start': 'bad'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestICalendar:
+    """calendar.ics export"""
+
+    def test_export(self, client, locmem_cache):
+        make_event(local(2026, 3, 5, 12), 'march', location='Київ, стадіон; сектор A')
+        Event.objects.filter(slug='march').update(title='Форум ' + 'дуже довга назва ' * 5)
+
+        response = client.get('/events/calendar.ics', {'start': '2026-03-01', 'end': '2026-03-31'})
+        assert response['Content-Type'] == 'text/calendar; charset=utf-8'
+        body = response.content.decode()
+        assert body.startswith('BEGIN:VCALENDAR\r\n')
+        assert body.count('BEGIN:VEVENT') == 1
+        assert 'DTSTART:20260305T100000Z' in body  # 12:00 Київ (UTC+2)
+        assert 'LOCATION:Київ\\, стадіон\\; сектор A' in body
+        assert 'URL:http://testserver/events/march/' in body
+        assert all(len(line.encode()) <= 75 for line in body.split('\r\n'))
+        unfolded = body.replace('\r\n ', '')
+        assert 'дуже довга назва ' * 4 in unfolded
+
+        assert client.get('/events/calendar.ics', {'start': '2026-03-01', 'end': '2026-03-31'},
+                          HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    def test_subscription_defaults_to_next_months(self, client, locmem_cache):
+        soon = timezone.now() + timedelta(days=40)
+        make_event(soon, 'soon')
+        make_event(timezone.now() + timedelta(days=500), 'far')
+
+        body = client.get('/events/calendar.ics').content.decode()
+        assert 'events/soon/' in body
+        assert 'events/far/' not in body
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestCalendarBenchmark:
+    """A year of events"""
+
+    def test_year_of_events(self, client, locmem_cache):
+        start = local(2026, 1, 1, 0)
+        Event.objects.bulk_create([
+            Event(
+                title=f'Подія {i}', slug=f'event-{i}', description='Опис', short_description='Коротко',
+                event_type=Event.EVENT_TYPE_CHOICES[i % 6][0], status='published', is_free=bool(i % 2),
+                price=350, max_attendees=100, start_datetime=start + timedelta(hours=8 * i),
+                end_datetime=start + timedelta(hours=8 * i + 2),
+            )
+            for i in range(365 * 3)
+        ])
+        year = {'start': '2026-01-01', 'end': '2026-12-31T23:59:59'}
+
+        started = time.perf_counter()
+        cold = client.get('/events/calendar/', year)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        rounds = 20
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(rounds):
+                warm = client.get('/events/calendar/', year)
+        warm_ms = (time.perf_counter() - started) * 1000 / rounds
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            client.get('/events/calendar/', year, HTTP_IF_NONE_MATCH=cold['ETag'])
+        revalidate_ms = (time.perf_counter() - started) * 1000 / rounds
+
+        started = time.perf_counter()
+        ics = client.get('/events/calendar.ics', year)
+        ics_ms = (time.perf_counter() - started) * 1000
+
+        print(f"\nCalendar, {len(cold.json())} events/year: cold {cold_ms:.1f} ms, warm {warm_ms:.1f} ms, "
+              f"304 {revalidate_ms:.1f} ms, ics {ics_ms:.1f} ms")
+        assert len(warm.json()) == 365 * 3
+        assert event_queries(ctx) == []
+        assert ics.content.decode().count('BEGIN:VEVENT') == 365 * 3
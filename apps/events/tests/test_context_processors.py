@@ -0,0 +1,83 @@
+"""
+Test cached event categories menu
+"""
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.events.context_processors import event_categories_menu
+from apps.events.models import Event
+from apps.events.tests import factories
+
+
+def make_event(title, category, days=7, status='published'):
+    return factories.make_event(
+        title=title, event_type='webinar', event_category=category, status=status,
+        start_datetime=timezone.now() + timedelta(days=days),
+        end_datetime=timezone.now() + timedelta(days=days, hours=2),
+        location='Online', max_attendees=100, price=500,
+    )
+
+
+@pytest.mark.django_db
+class TestEventCategoriesMenu:
+    """Test grouped, cached categories menu"""
+
+    def test_single_grouped_query(self, rf, locmem_cache):
+        make_event('Forum 1', 'football_experts_forum')
+        make_event('Forum 2', 'football_experts_forum', days=3)
+        make_event('Webinar', 'online_webinars')
+        make_event('Draft', 'parents_forum', status='draft')
+        make_event('Past', 'selection_camps', days=-3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            menu = event_categories_menu(rf.get('/'))['event_categories_menu']
+
+        assert len(ctx.captured_queries) == 1
+        assert [(c['slug'], c['count']) for c in menu] == [
+            ('football_experts_forum', 2),
+            ('online_webinars', 1),
+        ]
+        assert menu[0]['url'] == '/events/?category=football_experts_forum'
+
+    def test_warm_request_costs_zero_queries(self, rf, locmem_cache):
+        make_event('Forum', 'football_experts_forum')
+        event_categories_menu(rf.get('/'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            menu = event_categories_menu(rf.get('/'))['event_categories_menu']
+
+        assert len(ctx.captured_queries) == 0
+        assert len(menu) == 1
+
+    def test_event_save_and_delete_invalidate_menu(self, rf, locmem_cache):
+        event = make_event('Forum', 'football_experts_forum')
+        assert len(event_categories_menu(rf.get('/'))['event_categories_menu']) == 1
+
+        make_event('Webinar', 'online_webinars')
+        assert len(event_categories_menu(rf.get('/'))['event_categories_menu']) == 2
+
+        event.delete()
+        menu = event_categories_menu(rf.get('/'))['event_categories_menu']
+        assert [c['slug'] for c in menu] == ['online_webinars']
+
+    def test_cache_expires_at_next_event_start(self, rf, locmem_cache, monkeypatch):
+        event = make_event('Soon', 'football_experts_forum')
+        Event.objects.filter(pk=event.pk).update(
+            start_datetime=timezone.now() + timedelta(seconds=30)
+        )
+
+        ttls = []
+        original_set = locmem_cache.set
+
+        def spy_set(key, value, timeout=None, **kwargs):
+            ttls.append((key, timeout))
+            return original_set(key, value, timeout, **kwargs)
+
+        monkeypatch.setattr(locmem_cache, 'set', spy_set)
+        event_categories_menu(rf.get('/'))
+
+        menu_ttls = [ttl for key, ttl in ttls if key.startswith('event_categories_menu:')]
+        assert menu_ttls and menu_ttls[0] <= 31
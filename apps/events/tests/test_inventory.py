@@ -0,0 +1,237 @@
+"""
+Test ticket inventory - atomic seats, tier capacity, expiring holds, concurrency
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from apps.events.inventory import AlreadyRegistered, SoldOut, hold_seat, issue_ticket, release_expired_holds
+from apps.events.models import Event, EventTicket, TicketHold
+from apps.events.tests import factories
+
+pytestmark = pytest.mark.usefixtures('media')  # QR коди квитків
+
+
+TIERS = [
+    {'name': 'Базовий', 'price': 350, 'features': [], 'capacity': 3},
+    {'name': 'ПРО', 'price': 700, 'features': []},
+]
+
+
+def make_event(max_attendees=5, **kwargs):
+    kwargs.setdefault('ticket_tiers', TIERS)
+    return factories.make_event(max_attendees=max_attendees, price=350, **kwargs)
+
+
+def counters(event):
+    event.refresh_from_db()
+    tiers = {row.tier_name: (row.sold, row.held) for row in event.tier_inventory.all()}
+    return event.tickets_sold, event.tickets_held, tiers
+
+
+@pytest.mark.django_db
+class TestSeats:
+    """Selling and releasing seats"""
+
+    def test_capacity_and_tiers(self, django_user_model):
+        event = make_event(max_attendees=5)
+        users = factories.make_users(django_user_model, 6)
+
+        for user in users[:3]:
+            issue_ticket(event, user, 'Базовий', status='confirmed')
+        with pytest.raises(SoldOut, match='Базовий'):
+            issue_ticket(event, users[3], 'Базовий', status='confirmed')
+
+        issue_ticket(event, users[3], 'ПРО', status='confirmed')
+        issue_ticket(event, users[4], 'ПРО', status='confirmed')
+        with pytest.raises(SoldOut):
+            issue_ticket(event, users[5], 'ПРО', status='confirmed')
+
+        assert counters(event) == (5, 0, {'Базовий': (3, 0), 'ПРО': (2, 0)})
+        assert EventTicket.objects.filter(event=event).count() == 5
+
+    def test_failed_tier_rolls_back_event_counter(self, django_user_model):
+        event = make_event(max_attendees=10, ticket_tiers=[{'name': 'VIP', 'price': 1000, 'capacity': 1}])
+        first, second = factories.make_users(django_user_model, 2)
+
+        issue_ticket(event, first, 'VIP')
+        with pytest.raises(SoldOut):
+            issue_ticket(event, second, 'VIP')
+        assert counters(event) == (1, 0, {'VIP': (1, 0)})
+
+    def test_duplicate_registration(self, django_user_model):
+        event = make_event()
+        user, = factories.make_users(django_user_model, 1)
+
+        issue_ticket(event, user)
+        with pytest.raises(AlreadyRegistered):
+            issue_ticket(event, user)
+        assert counters(event)[0] == 1
+
+    def test_cancel_returns_seat(self, django_user_model):
+        event = make_event()
+        user, = factories.make_users(django_user_model, 1)
+
+        ticket = issue_ticket(event, user, 'Базовий', status='confirmed')
+        assert ticket.cancel()[0] is True
+        assert ticket.cancel()[0] is False  # повторне скасування не повертає місце двічі
+        assert counters(event) == (0, 0, {'Базовий': (0, 0), 'ПРО': (0, 0)})
+
+    def test_admin_save_keeps_counters(self, django_user_model):
+        event = make_event()
+        stale = Event.objects.get(pk=event.pk)
+        issue_ticket(event, factories.make_users(django_user_model, 1)[0])
+
+        stale.title = 'Форум 2'
+        stale.save()
+        event.refresh_from_db()
+        assert event.title == 'Форум 2'
+        assert event.tickets_sold == 1
+
+
+@pytest.mark.django_db
+class TestHolds:
+    """Time-limited cart holds"""
+
+    def test_hold_blocks_seat_until_expiry(self, django_user_model):
+        event = make_event(max_attendees=2)
+        buyer, other, late = factories.make_users(django_user_model, 3)
+
+        hold_seat(event, buyer, 'Базовий')
+        hold_seat(event, other, 'ПРО')
+        assert counters(event) == (0, 2, {'Базовий': (0, 1), 'ПРО': (0, 1)})
+        with pytest.raises(SoldOut):
+            issue_ticket(event, late)
+
+        # Резерв прострочений - місце звільняється при нестачі, без крону
+        TicketHold.objects.filter(user=other).update(expires_at=timezone.now() - timedelta(seconds=1))
+        issue_ticket(event, late)
+        assert counters(event) == (1, 1, {'Базовий': (0, 1), 'ПРО': (0, 0)})
+        assert not TicketHold.objects.filter(user=other).exists()
+
+    def test_hold_converted_on_payment(self, django_user_model):
+        event = make_event(max_attendees=1)
+        buyer, other = factories.make_users(django_user_model, 2)
+
+        hold_seat(event, buyer, 'Базовий')
+        with pytest.raises(SoldOut):
+            hold_seat(event, other, 'Базовий')
+
+        issue_ticket(event, buyer, 'Базовий', from_hold=True, status='confirmed')
+        assert counters(event) == (1, 0, {'Базовий': (1, 0), 'ПРО': (0, 0)})
+        assert not TicketHold.objects.exists()
+
+    def test_repeat_hold_extends(self, django_user_model):
+        event = make_event()
+        buyer, = factories.make_users(django_user_model, 1)
+
+        first = hold_seat(event, buyer, 'Базовий', ttl=timedelta(minutes=1))
+        second = hold_seat(event, buyer, 'Базовий', ttl=timedelta(minutes=30))
+        assert first.pk == second.pk
+        assert counters(event)[1] == 1
+
+        hold_seat(event, buyer, 'ПРО')  # інший тариф - старий резерв повертається
+        assert counters(event) == (0, 1, {'Базовий': (0, 0), 'ПРО': (0, 1)})
+
+    def test_sweep_command(self, django_user_model):
+        from django.core.management import call_command
+
+        event = make_event()
+        for user in factories.make_users(django_user_model, 3):
+            hold_seat(event, user, 'Базовий', ttl=timedelta(seconds=-1))
+        hold_seat(event, factories.make_users(django_user_model, 1, prefix='live')[0], 'ПРО')
+
+        call_command('release_ticket_holds', stdout=open('/dev/null', 'w'))
+        assert counters(event) == (0, 1, {'Базовий': (0, 0), 'ПРО': (0, 1)})
+        assert release_expired_holds() == 0
+
+    @pytest.mark.parametrize('service_path,method', [
+        ('apps.payments.services.PaymentService', 'create_event_ticket'),
+        ('apps.payments.liqpay_service.LiqPayService', '_create_event_ticket'),
+    ])
+    def test_paid_after_sold_out_flags_refund(self, django_user_model, caplog, service_path, method):
+        from django.utils.module_loading import import_string
+        from apps.payments.models import Payment
+
+        event = make_event(max_attendees=1)
+        buyer, other = factories.make_users(django_user_model, 2)
+        issue_ticket(event, other, 'Базовий')
+        payment = Payment.objects.create(user=buyer, amount=350, payment_type='event_ticket', status='succeeded')
+
+        # Резерв кошика протух до оплати, місце вже продане
+        service = import_string(service_path)()
+        getattr(service, method)(buyer, event.id, payment, 'Базовий')
+
+        payment.refresh_from_db()
+        assert payment.metadata['refund_required']['reason'] == 'event_sold_out'
+        assert payment.metadata['refund_required']['event_id'] == event.id
+        assert Payment.objects.filter(metadata__has_key='refund_required').get() == payment
+        assert any(record.levelname == 'ERROR' and 'refund required' in record.message for record in caplog.records)
+        assert not EventTicket.objects.filter(user=buyer).exists()
+
+    def test_cart_holds_and_releases(self, rf, django_user_model, settings):
+        from apps.cart.services import CartService
+
+        event = make_event(max_attendees=1)
+        buyer, other = factories.make_users(django_user_model, 2)
+
+        request = rf.get('/')
+        request.user = buyer
+        request.session = {}
+        cart = CartService(request)
+        assert cart.add_event_ticket(event, 'Базовий')[0] is True
+
+        request.user = other
+        assert CartService(request).add_event_ticket(event, 'Базовий') == (False, 'Всі квитки продані')
+
+        cart.clear()
+        assert counters(event)[1] == 0
+
+
+@pytest.mark.slow
+@pytest.mark.django_db(transaction=True)
+class TestConcurrency:
+    """No oversell under a registration spike"""
+
+    WORKERS = 500
+
+    def test_500_concurrent_registrations(self, django_user_model):
+        # Файлова SQLite з timeout (conftest.django_db_modify_db_settings) або Postgres
+        assert not (connection.vendor == 'sqlite' and connection.is_in_memory_db())
+        event = make_event(
+            max_attendees=120,
+            ticket_tiers=[{'name': 'Базовий', 'price': 0, 'capacity': 100}, {'name': 'ПРО', 'price': 0}],
+        )
+        users = factories.make_users(django_user_model, self.WORKERS)
+        start = threading.Barrier(self.WORKERS)
+
+        def register(index):
+            user = users[index]
+            tier = 'Базовий' if index % 5 else 'ПРО'
+            try:
+                start.wait()
+                if index % 7 == 0:
+                    hold_seat(event, user, tier)
+                    issue_ticket(event, user, tier, from_hold=True, status='confirmed')
+                else:
+                    issue_ticket(event, user, tier, status='confirmed')
+                return 'ok'
+            except SoldOut:
+                return 'sold_out'
+            finally:
+                connection.close()
+
+        # Один потік на реєстрацію: всі 500 стартують разом з бар'єра
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            outcomes = list(pool.map(register, range(self.WORKERS)))
+
+        sold, held, tiers = counters(event)
+        assert set(outcomes) == {'ok', 'sold_out'}
+        assert outcomes.count('ok') == sold == EventTicket.objects.filter(event=event).count() == 120
+        assert held == 0
+        assert tiers['Базовий'][0] == EventTicket.objects.filter(event=event, tier_name='Базовий').count() <= 100
+        assert tiers['ПРО'][0] == EventTicket.objects.filter(event=event, tier_name='ПРО').count()
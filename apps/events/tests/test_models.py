@@ -2,7 +2,8 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
-from .models import Event, Speaker, EventTicket
+from apps.events.models import Event, EventTicket
+from apps.events.numbering import is_valid_ticket_number
 
 User = get_user_model()
 
@@ -10,6 +11,7 @@ User = get_user_model()
 class EventModelTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
+            username='organizer',
             email='organizer@test.com',
             password='testpass123'
         )
@@ -55,11 +57,13 @@ class EventModelTest(TestCase):
 class EventTicketTest(TestCase):
     def setUp(self):
         self.organizer = User.objects.create_user(
+            username='organizer',
             email='organizer@test.com',
             password='testpass123'
         )
         
         self.user = User.objects.create_user(
+            username='user',
             email='user@test.com',
             password='testpass123'
         )
@@ -87,7 +91,8 @@ class EventTicketTest(TestCase):
         )
         
         self.assertIsNotNone(ticket.ticket_number)
-        self.assertEqual(len(ticket.ticket_number), 8)
+        self.assertEqual(len(ticket.ticket_number), 9)
+        self.assertTrue(is_valid_ticket_number(ticket.ticket_number))
     
     def test_ticket_check_in(self):
         """Test ticket check-in process"""
@@ -0,0 +1,147 @@
+"""
+Test ticket number allocator - check digit, block reservation, bulk import
+"""
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.events import numbering
+from apps.events.inventory import SoldOut, issue_ticket, issue_tickets
+from apps.events.models import EventTicket
+from apps.events.numbering import (
+    ALPHABET, allocate_ticket_numbers, encode_ticket_number, is_valid_ticket_number, next_ticket_number,
+)
+from apps.events.tests import factories
+
+
+@pytest.fixture(autouse=True)
+def fresh_block():
+    numbering._block.clear()
+    yield
+    numbering._block.clear()
+
+
+def make_event(max_attendees=100):
+    return factories.make_event(max_attendees=max_attendees, is_free=True)
+
+
+class TestEncoding:
+    """Format and check digit (no database)"""
+
+    def test_format_and_bijection(self):
+        numbers = [encode_ticket_number(value) for value in range(1, 20001)]
+        assert len(set(numbers)) == len(numbers)
+        assert all(len(number) == 9 and number[0] == 'T' for number in numbers)
+        assert all(is_valid_ticket_number(number) for number in numbers)
+        # Підряд значення лічильника - не підряд номери
+        assert numbers[0][:6] != numbers[1][:6]
+
+    def test_check_digit_catches_typos(self):
+        number = encode_ticket_number(123456)
+        body = number[1:]
+        for position in range(len(body)):
+            for char in ALPHABET:
+                if char != body[position]:
+                    typo = 'T' + body[:position] + char + body[position + 1:]
+                    assert not is_valid_ticket_number(typo)
+
+        swapped = [
+            'T' + body[:i] + body[i + 1] + body[i] + body[i + 2:]
+            for i in range(len(body) - 1) if body[i] != body[i + 1]
+        ]
+        assert sum(is_valid_ticket_number(number) for number in swapped) <= 1
+
+    def test_manual_entry_normalized(self):
+        number = encode_ticket_number(42)
+        messy = number.lower().replace('0', 'o').replace('1', 'l')
+        assert is_valid_ticket_number(f' {messy[:4]}-{messy[4:]} ')
+        assert not is_valid_ticket_number('ABCD1234')
+        assert not is_valid_ticket_number('')
+
+    def test_out_of_range(self):
+        with pytest.raises(numbering.TicketNumbersExhausted):
+            encode_ticket_number(numbering.SPACE)
+
+
+@pytest.mark.django_db
+class TestAllocation:
+    """Unique numbers without lookup queries"""
+
+    def test_ticket_save_does_no_lookup(self, django_user_model):
+        event = make_event()
+        users = factories.make_users(django_user_model, 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            tickets = [EventTicket.objects.create(event=event, user=user) for user in users]
+        lookups = [q['sql'] for q in ctx.captured_queries if 'FROM "event_tickets"' in q['sql']]
+        assert lookups == []
+        assert len({ticket.ticket_number for ticket in tickets}) == 3
+
+    def test_block_outside_transaction(self, settings, django_user_model, monkeypatch):
+        settings.TICKET_NUMBER_BLOCK_SIZE = 10
+        monkeypatch.setattr(numbering, '_block_is_durable', lambda: True)
+        allocate_ticket_numbers(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            numbers = [next_ticket_number() for _ in range(25)]
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        assert len(updates) == 3  # один блок на 10 номерів
+        assert len(set(numbers)) == 25
+
+    def test_forked_worker_drops_parent_block(self, settings, monkeypatch):
+        settings.TICKET_NUMBER_BLOCK_SIZE = 10
+        monkeypatch.setattr(numbering, '_block_is_durable', lambda: True)
+
+        parent = next_ticket_number()
+        monkeypatch.setattr(numbering.os, 'getpid', lambda: -1)
+        child = next_ticket_number()
+        # Дочірній процес бере новий блок, а не продовжує батьківський
+        assert len(numbering._block.values) == 9
+        assert child != parent
+
+    def test_bulk_allocation_single_reservation(self):
+        allocate_ticket_numbers(1)
+        with CaptureQueriesContext(connection) as ctx:
+            numbers = allocate_ticket_numbers(1000)
+        assert len([q for q in ctx.captured_queries if q['sql'].startswith(('UPDATE', 'SELECT'))]) == 2
+        assert len(set(numbers) | set(allocate_ticket_numbers(10))) == 1010
+
+
+@pytest.mark.django_db
+class TestImport:
+    """Bulk ticket issue for attendee lists"""
+
+    def test_issue_tickets(self, django_user_model):
+        event = make_event(max_attendees=300)
+        users = factories.make_users(django_user_model, 250)
+        issue_ticket(event, users[0], status='confirmed')
+
+        with CaptureQueriesContext(connection) as ctx:
+            tickets = issue_tickets(event, users + users[:5], status='confirmed')
+        assert len(ctx.captured_queries) < 15
+        assert len(tickets) == 249
+        event.refresh_from_db()
+        assert event.tickets_sold == 250
+        numbers = EventTicket.objects.filter(event=event).values_list('ticket_number', flat=True)
+        assert len(set(numbers)) == 250
+        assert all(is_valid_ticket_number(number) for number in numbers)
+
+    def test_not_enough_seats_imports_nothing(self, django_user_model):
+        event = make_event(max_attendees=5)
+        with pytest.raises(SoldOut):
+            issue_tickets(event, factories.make_users(django_user_model, 6))
+        assert not EventTicket.objects.filter(event=event).exists()
+
+    def test_command(self, django_user_model, tmp_path):
+        event = make_event(max_attendees=10)
+        factories.make_users(django_user_model, 3)
+        path = tmp_path / 'attendees.csv'
+        path.write_text('name,email\nA,fan0@test.com\nB,fan1@test.com\nC,nobody@test.com\nD,fan0@test.com\n')
+
+        out = StringIO()
+        call_command('import_event_attendees', str(path), '--event', str(event.id), stdout=out)
+        assert 'Imported 2 tickets (0 skipped, 1 unknown emails)' in out.getvalue()
+        assert EventTicket.objects.filter(event=event, status='confirmed').count() == 2
@@ -0,0 +1,129 @@
+"""
+Test deferred QR rendering - no image work on save, cached endpoint, bulk pre-render
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.events import qr
+from apps.events.models import EventTicket
+from apps.events.tests import factories
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Лічильник рендерів (рендер справжній)"""
+    calls = []
+    original = qr.render_qr
+
+    def counting(token, fmt='svg'):
+        calls.append((token, fmt))
+        return original(token, fmt)
+
+    monkeypatch.setattr(qr, 'render_qr', counting)
+    return calls
+
+
+def make_event():
+    return factories.make_event(slug='forum', is_free=True, start_datetime=timezone.now() + timedelta(days=1))
+
+
+def make_ticket(event, django_user_model, name='fan'):
+    user = django_user_model.objects.create_user(username=name, email=f'{name}@test.com', password='x')
+    return EventTicket.objects.create(event=event, user=user, status='confirmed')
+
+
+@pytest.mark.django_db
+class TestTicketSave:
+    """Creating a ticket does no image work"""
+
+    def test_no_render_no_extra_update(self, django_user_model, renders, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        event = make_event()
+        user = django_user_model.objects.create_user(username='fan', email='fan@test.com', password='x')
+
+        with CaptureQueriesContext(connection) as ctx:
+            ticket = EventTicket.objects.create(event=event, user=user, status='confirmed')
+        assert renders == []
+        assert not ticket.qr_code
+        assert not list(tmp_path.iterdir())
+        assert not [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "event_tickets"')]
+
+
+@pytest.mark.django_db
+class TestQREndpoint:
+    """Rendered on first request, then cached"""
+
+    @pytest.fixture
+    def owner(self, client, django_user_model, no_silk):
+        ticket = make_ticket(make_event(), django_user_model)
+        client.force_login(ticket.user)
+        return ticket
+
+    def test_svg_cached(self, client, owner, renders, locmem_cache):
+        url = owner.get_qr_url('svg')
+
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first['Content-Type'] == 'image/svg+xml'
+        assert b'<svg' in first.content
+        second = client.get(url)
+        assert second.content == first.content
+        assert renders == [(owner.qr_token, 'svg')]
+
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert not_modified.status_code == 304
+        assert len(renders) == 1
+
+    def test_png(self, client, owner, locmem_cache):
+        response = client.get(owner.get_qr_url('png'))
+        assert response['Content-Type'] == 'image/png'
+        assert response.content.startswith(b'\x89PNG')
+        assert client.get(f'/events/tickets/{owner.id}/qr.gif').status_code == 404
+
+    def test_access(self, client, owner, django_user_model, locmem_cache):
+        stranger = django_user_model.objects.create_user(username='x', email='x@test.com', password='x')
+        client.force_login(stranger)
+        assert client.get(owner.get_qr_url()).status_code == 404
+
+        stranger.is_staff = True
+        stranger.save()
+        assert client.get(owner.get_qr_url()).status_code == 200
+
+
+@pytest.mark.django_db
+class TestPrerender:
+    """Bulk pre-render into the cache"""
+
+    def test_in_process_and_skip_cached(self, django_user_model, locmem_cache, renders):
+        event = make_event()
+        tokens = [make_ticket(event, django_user_model, f'fan{i}').qr_token for i in range(3)]
+
+        assert qr.prerender(tokens, workers=1) == (6, 0)
+        assert qr.prerender(tokens, workers=1) == (0, 6)
+        assert len(renders) == 6
+
+        qr.get_qr_image(tokens[0], 'png')
+        assert len(renders) == 6  # з кешу
+
+    def test_process_pool(self, django_user_model, locmem_cache):
+        event = make_event()
+        tokens = [make_ticket(event, django_user_model, f'fan{i}').qr_token for i in range(4)]
+
+        assert qr.prerender(tokens, formats=('svg',), workers=2) == (4, 0)
+        for token in tokens:
+            assert locmem_cache.get(qr.qr_cache_key(token, 'svg')) == qr.render_qr(token, 'svg')
+
+    def test_command(self, django_user_model, locmem_cache):
+        event = make_event()
+        for i in range(3):
+            make_ticket(event, django_user_model, f'fan{i}')
+
+        out = StringIO()
+        call_command('prerender_ticket_qr', '--event', str(event.id), '--format', 'svg', '--workers', '1', stdout=out)
+        assert 'Rendered 3 QR images (0 already cached)' in out.getvalue()
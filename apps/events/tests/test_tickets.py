@@ -0,0 +1,306 @@
+"""
+Test signed ticket tokens - offline verification, manifest, single and batch check-in
+"""
+import base64
+import json
+import re
+import time
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.events.models import EventTicket
+from apps.events.tests import factories
+from apps.events.tickets import (
+    check_in_batch, check_in_token, event_key, resolve_qr, sign_ticket,
+    validate_scan, verify_manifest, verify_token,
+)
+
+pytestmark = pytest.mark.usefixtures('media')  # QR коди квитків
+
+
+# Алфавітний режим QR
+QR_ALPHANUMERIC = re.compile(r'^[0-9A-Z $%*+\-./:]+$')
+
+
+def make_event(slug='forum', **kwargs):
+    return factories.make_event(
+        slug=slug, max_attendees=5000, is_free=True,
+        start_datetime=timezone.now() + timedelta(hours=1),
+        end_datetime=timezone.now() + timedelta(hours=5), **kwargs,
+    )
+
+
+def make_tickets(event, django_user_model, count, status='confirmed', prefix='fan'):
+    """Квитки через bulk_create - для великих обсягів"""
+    users = factories.make_users(django_user_model, count, prefix)
+    return EventTicket.objects.bulk_create([
+        EventTicket(event=event, user=user, ticket_number=f'{prefix.upper()}{i:06d}', status=status)
+        for i, user in enumerate(users)
+    ])
+
+
+def token(ticket):
+    return sign_ticket(ticket.event_id, ticket.id, ticket.ticket_number)
+
+
+@pytest.mark.django_db
+class TestTokens:
+    """Signature checks need no database"""
+
+    def test_roundtrip_without_queries(self, django_user_model):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+        signed = token(ticket)
+
+        assert QR_ALPHANUMERIC.match(signed)
+        assert len(signed) < 40
+        with CaptureQueriesContext(connection) as ctx:
+            claim = verify_token(signed)
+        assert len(ctx.captured_queries) == 0
+        assert claim == (event.id, ticket.id, ticket.ticket_number)
+
+    def test_tampering(self, django_user_model):
+        event = make_event()
+        other = make_event(slug='other')
+        ticket, = make_tickets(event, django_user_model, 1)
+        prefix, event_id, ticket_id, number, signature = token(ticket).split(':')
+
+        assert verify_token(f'{prefix}:{event_id}:{ticket_id}:FAN999999:{signature}') is None
+        assert verify_token(f'{prefix}:{other.id}:{ticket_id}:{number}:{signature}') is None
+        assert verify_token(f'{prefix}:{event_id}:{ticket_id}:{number}:{"A" * 16}') is None
+        assert verify_token('garbage') is None
+        assert verify_token(None) is None
+
+    def test_signing_key_rotation(self, django_user_model, settings):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+        signed = token(ticket)
+
+        settings.TICKET_SIGNING_KEY = 'rotated'
+        assert verify_token(signed) is None
+        # Офлайн сканер з ключем події зі старого маніфесту
+        settings.TICKET_SIGNING_KEY = ''
+        assert verify_token(signed, key=event_key(event.id)) is not None
+
+    def test_legacy_qr_formats(self, django_user_model):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+        legacy = json.dumps({
+            'ticket_id': ticket.id, 'event_id': event.id, 'user_id': ticket.user_id,
+            'ticket_number': ticket.ticket_number, 'hash': ticket.generate_secure_hash(),
+        })
+
+        expected = (event.id, ticket.id, ticket.ticket_number)
+        assert resolve_qr(legacy) == expected
+        assert resolve_qr(base64.b64encode(legacy.encode()).decode()) == expected
+        assert resolve_qr(legacy.replace(ticket.generate_secure_hash(), '0' * 16)) is None
+
+    @pytest.mark.parametrize('qr_data', [
+        '{"ticket_id": "abc", "hash": "x"}',  # ValueError
+        '{"ticket_id": [1], "hash": "x"}',  # TypeError
+    ])
+    def test_legacy_qr_with_bad_ticket_id(self, qr_data):
+        assert resolve_qr(qr_data) is None
+        assert resolve_qr(base64.b64encode(qr_data.encode()).decode()) is None
+
+    def test_saved_ticket_has_signed_token(self, django_user_model):
+        event = make_event()
+        user = django_user_model.objects.create_user(username='buyer', email='buyer@test.com', password='x')
+        ticket = EventTicket.objects.create(event=event, user=user, status='confirmed')
+
+        assert ticket.qr_token == token(ticket)
+        assert ticket.validate_qr_data(ticket.qr_token)
+
+
+@pytest.mark.django_db
+class TestScan:
+    """Online validate and check-in"""
+
+    def test_validate_is_one_query(self, django_user_model):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            valid, error, scanned = validate_scan(token(ticket))
+        assert (valid, error) == (True, '')
+        assert scanned.user.email == 'fan0@test.com'
+        assert len(ctx.captured_queries) == 1
+
+    def test_check_in_once(self, django_user_model):
+        event = make_event()
+        pending, confirmed = make_tickets(event, django_user_model, 2)
+        EventTicket.objects.filter(pk=pending.pk).update(status='pending')
+
+        success, message, ticket = check_in_token(token(confirmed))
+        assert success is True
+        assert ticket.status == 'used'
+
+        success, message, _ = check_in_token(token(confirmed))
+        assert success is False
+        assert 'вже використаний' in message
+        assert check_in_token(token(pending))[1] == 'Квиток не підтверджений'
+
+    def test_api_endpoints(self, client, django_user_model, no_silk):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+        client.force_login(django_user_model.objects.create_user(
+            username='door', email='door@test.com', password='x', is_staff=True
+        ))
+
+        response = client.post('/api/v1/events/qr/validate/', {'qr_data': token(ticket)}, content_type='application/json')
+        assert response.json()['valid'] is True
+        response = client.post('/api/v1/events/qr/checkin/', {'qr_data': token(ticket)}, content_type='application/json')
+        assert response.json()['success'] is True
+        assert response.json()['ticket']['checked_in_at']
+
+        response = client.post('/events/qr/validate/', {'qr_data': token(ticket)}, content_type='application/json')
+        assert response.json()['valid'] is False
+        assert 'used_at' in response.json()
+
+
+def decode_bitmap(value, count):
+    bits = base64.b64decode(value)
+    return [bool(bits[i >> 3] >> (i & 7) & 1) for i in range(count)]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('no_silk')
+class TestOfflineScanning:
+    """Manifest download and bulk upload"""
+
+    def login(self, client, django_user_model, is_staff=True):
+        user = django_user_model.objects.create_user(
+            username='door', email='door@test.com', password='x', is_staff=is_staff
+        )
+        client.force_login(user)
+        return user
+
+    def test_manifest(self, client, django_user_model):
+        event = make_event()
+        tickets = make_tickets(event, django_user_model, 10)
+        EventTicket.objects.filter(pk=tickets[3].pk).update(status='used')
+        EventTicket.objects.filter(pk=tickets[5].pk).update(status='cancelled')
+        self.login(client, django_user_model)
+
+        data = client.get(f'/api/v1/events/qr/events/{event.id}/manifest/').json()
+        key = base64.b64decode(data['key'])
+        assert verify_manifest(data['payload'], data['signature'], key)
+        assert not verify_manifest(data['payload'].replace('FAN000001', 'FAN000002'), data['signature'], key)
+
+        manifest = json.loads(data['payload'])
+        assert [number for _, number in manifest['tickets']] == [t.ticket_number for t in tickets]
+        assert decode_bitmap(manifest['valid'], 10) == [i != 5 for i in range(10)]
+        assert decode_bitmap(manifest['used'], 10) == [i == 3 for i in range(10)]
+        # Ключ з маніфесту перевіряє токени події офлайн
+        assert verify_token(token(tickets[0]), key=key) is not None
+
+    def test_staff_only(self, client, django_user_model):
+        event = make_event()
+        self.login(client, django_user_model, is_staff=False)
+
+        assert client.get(f'/api/v1/events/qr/events/{event.id}/manifest/').status_code == 403
+        response = client.post(f'/api/v1/events/qr/events/{event.id}/checkins/', {'scans': [{'token': 'x'}]},
+                               content_type='application/json')
+        assert response.status_code == 403
+
+    def test_organizer_uploads_without_key(self, client, django_user_model):
+        event = make_event()
+        ticket, = make_tickets(event, django_user_model, 1)
+        event.organizer = self.login(client, django_user_model, is_staff=False)
+        event.save()
+
+        # Ключ з маніфесту підписує токени - тільки staff
+        assert client.get(f'/api/v1/events/qr/events/{event.id}/manifest/').status_code == 403
+        response = client.post(f'/api/v1/events/qr/events/{event.id}/checkins/', {'scans': [{'token': token(ticket)}]},
+                               content_type='application/json')
+        assert response.status_code == 200
+        assert response.json()['checked_in'] == 1
+
+    def test_batch_upload(self, client, django_user_model):
+        event = make_event()
+        other = make_event(slug='other')
+        tickets = make_tickets(event, django_user_model, 4)
+        foreign, = make_tickets(other, django_user_model, 1, prefix='guest')
+        EventTicket.objects.filter(pk=tickets[1].pk).update(status='used', used_at=timezone.now())
+        EventTicket.objects.filter(pk=tickets[2].pk).update(status='pending')
+        staff = self.login(client, django_user_model)
+
+        early = (timezone.now() - timedelta(minutes=30)).isoformat()
+        late = (timezone.now() - timedelta(minutes=10)).isoformat()
+        response = client.post(f'/api/v1/events/qr/events/{event.id}/checkins/', {'scans': [
+            {'token': token(tickets[0]), 'scanned_at': late},
+            {'token': token(tickets[0]), 'scanned_at': early},
+            {'token': token(tickets[1])},
+            {'token': token(tickets[2])},
+            {'token': token(foreign)},
+            {'token': token(tickets[3])[:-1] + 'A'},
+        ]}, content_type='application/json')
+
+        data = response.json()
+        assert data['checked_in'] == 1
+        assert [result['status'] for result in data['results']] == [
+            'duplicate', 'checked_in', 'already_used', 'not_confirmed', 'wrong_event', 'invalid',
+        ]
+        ticket = EventTicket.objects.get(pk=tickets[0].pk)
+        assert ticket.status == 'used'
+        assert ticket.used_at.isoformat() == early
+        assert ticket.checked_in_by == staff
+
+    def test_batch_out_of_range_scan_time(self, django_user_model):
+        event = make_event()
+        tickets = make_tickets(event, django_user_model, 2)
+
+        before = timezone.now()
+        results = check_in_batch(event, [
+            {'token': token(tickets[0]), 'scanned_at': '2024-13-45T00:00:00'},
+            {'token': token(tickets[1]), 'scanned_at': 12345},
+        ])
+        assert [result['status'] for result in results] == ['checked_in', 'checked_in']
+        # Час вивантаження замість некоректного часу пристрою
+        assert EventTicket.objects.get(pk=tickets[0].pk).used_at >= before
+
+    def test_batch_query_count_is_fixed(self, django_user_model):
+        event = make_event()
+        tickets = make_tickets(event, django_user_model, 300)
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = check_in_batch(event, [{'token': token(ticket)} for ticket in tickets])
+        assert {result['status'] for result in results} == {'checked_in'}
+        # Одна вибірка квитків + bulk_update (SQLite ділить UPDATE за лімітом параметрів), не запит на квиток
+        assert len(ctx.captured_queries) < 10
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestScanBenchmark:
+    """Scan throughput"""
+
+    def test_throughput(self, django_user_model):
+        event = make_event()
+        tickets = make_tickets(event, django_user_model, 1000)
+        tokens = [token(ticket) for ticket in tickets]
+
+        started = time.perf_counter()
+        rounds = 20
+        for _ in range(rounds):
+            for signed in tokens:
+                assert verify_token(signed) is not None
+        offline_rate = rounds * len(tokens) / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for signed in tokens[:200]:
+            assert validate_scan(signed)[0]
+        online_rate = 200 / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        results = check_in_batch(event, [{'token': signed} for signed in tokens])
+        batch_rate = len(tokens) / (time.perf_counter() - started)
+
+        print(f"\nScan throughput: offline verify {offline_rate:,.0f}/s, "
+              f"online validate {online_rate:,.0f}/s, batch check-in {batch_rate:,.0f}/s")
+        assert {result['status'] for result in results} == {'checked_in'}
+        assert offline_rate > 10000
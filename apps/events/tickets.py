@@ -0,0 +1,352 @@
+"""
+Signed ticket tokens and check-in
+Токен квитка: PV1:<event_id>:<ticket_id>:<ticket_number>:<SIG>
+SIG - перші 10 байт HMAC-SHA256 ключем події (base32, 16 символів). Усі символи з
+алфавітного режиму QR (щільніший код), підпис перевіряється без запиту до БД.
+
+Ключ події виводиться з TICKET_SIGNING_KEY (або SECRET_KEY) і віддається сканерам
+разом з маніфестом - скомпрометований сканер не дає підробити квитки інших подій.
+Маніфест (номери квитків + бітмапи valid/used) підписаний тим самим ключем,
+сканер працює офлайн і потім вивантажує відмітки пачкою (check_in_batch).
+
+Межа довіри: ключ симетричний, тож власник маніфесту (пристрій сканера) може
+випустити валідний PV1 токен для будь-якого квитка з цього маніфесту - тобто
+скопіювати вже проданий квиток, але не створити новий (check-in шукає квиток у БД
+за id і номером). Тому маніфест з ключем видається тільки staff
+(EventScanManifestAPIView) - організатор події звичайний користувач і ключа
+не отримує, лише вивантажує відмітки; повторний вхід за копією видно при
+вивантаженні (already_used/duplicate). Якщо маніфест знадобиться недовіреним
+сканерам, потрібен асиметричний підпис (Ed25519) - пристрій перевіряє, але не підписує.
+"""
+from functools import lru_cache
+from typing import NamedTuple
+import base64
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_PREFIX = 'PV1'
+SIGNATURE_BYTES = 10
+
+# Максимум відміток в одному вивантаженні сканера
+CHECKIN_BATCH_MAX = 1000
+
+MANIFEST_VERSION = 1
+
+
+class TicketClaim(NamedTuple):
+    event_id: int
+    ticket_id: int
+    ticket_number: str
+
+
+def _master_key():
+    return (getattr(settings, 'TICKET_SIGNING_KEY', '') or settings.SECRET_KEY).encode()
+
+
+@lru_cache(maxsize=1024)
+def _derive_event_key(master, event_id):
+    return hmac.new(master, f'events.ticket:{event_id}'.encode(), hashlib.sha256).digest()
+
+
+def event_key(event_id):
+    """Ключ підпису квитків і маніфесту однієї події"""
+    return _derive_event_key(_master_key(), int(event_id))
+
+
+def _signature(key, ticket_id, ticket_number):
+    digest = hmac.new(key, f'{ticket_id}:{ticket_number}'.encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest[:SIGNATURE_BYTES]).decode()
+
+
+def sign_ticket(event_id, ticket_id, ticket_number):
+    """Токен для QR коду квитка"""
+    signature = _signature(event_key(event_id), ticket_id, ticket_number)
+    return f'{TOKEN_PREFIX}:{event_id}:{ticket_id}:{ticket_number}:{signature}'
+
+
+def verify_token(token, key=None):
+    """
+    Перевірити підпис токена (без БД)
+
+    Args:
+        key: ключ події (офлайн сканер); за замовчуванням виводиться з TICKET_SIGNING_KEY
+
+    Returns:
+        TicketClaim | None
+    """
+    if not isinstance(token, str):
+        return None
+    parts = token.strip().split(':')
+    if len(parts) != 5 or parts[0] != TOKEN_PREFIX:
+        return None
+    _, event_id, ticket_id, ticket_number, signature = parts
+    if not (event_id.isdigit() and ticket_id.isdigit() and ticket_number):
+        return None
+
+    expected = _signature(key or event_key(event_id), int(ticket_id), ticket_number)
+    if not hmac.compare_digest(expected, signature.upper()):
+        return None
+    return TicketClaim(int(event_id), int(ticket_id), ticket_number)
+
+
+def _legacy_claim(qr_data):
+    """
+    Старі QR коди: base64 JSON (модель) або сирий JSON (в'юхи) з unkeyed sha256
+    Потребує запиту до БД - лише для квитків, випущених до PV1.
+    """
+    from .models import EventTicket
+
+    data = None
+    for decode in (lambda raw: raw, lambda raw: base64.b64decode(raw).decode()):
+        try:
+            data = json.loads(decode(qr_data))
+            break
+        except (ValueError, TypeError):
+            continue
+    if not isinstance(data, dict):
+        return None
+    try:
+        ticket_id = int(data.get('ticket_id'))
+    except (TypeError, ValueError):
+        return None  # "abc", [1], null - підроблений або пошкоджений QR
+    if not 0 < ticket_id < 2 ** 63:
+        return None
+
+    ticket = EventTicket.objects.filter(pk=ticket_id).only(
+        'id', 'event_id', 'user_id', 'ticket_number'
+    ).first()
+    if ticket is None or not hmac.compare_digest(str(data.get('hash', '')), ticket.generate_secure_hash()):
+        return None
+    return TicketClaim(ticket.event_id, ticket.id, ticket.ticket_number)
+
+
+def resolve_qr(qr_data):
+    """TicketClaim з QR (PV1 токен або старий формат) або None"""
+    if not qr_data:
+        return None
+    if isinstance(qr_data, str) and qr_data.startswith(TOKEN_PREFIX + ':'):
+        return verify_token(qr_data)
+    return _legacy_claim(qr_data)
+
+
+def can_manage_event(user, event):
+    """Персонал або організатор події (вивантаження відміток; маніфест - тільки staff)"""
+    return user.is_authenticated and (user.is_staff or event.organizer_id == user.id)
+
+
+def _attendee_name(ticket):
+    profile = getattr(ticket.user, 'profile', None)
+    return profile.full_name if profile else ticket.user.email
+
+
+def _scan_queryset():
+    from .models import EventTicket
+
+    return EventTicket.objects.select_related('event', 'user__profile').only(
+        'id', 'ticket_number', 'status', 'used_at', 'event_id', 'user_id',
+        'event__title', 'event__start_datetime', 'event__end_datetime', 'event__is_archived',
+        'user__email', 'user__profile__first_name', 'user__profile__last_name',
+    )
+
+
+def validate_scan(qr_data):
+    """
+    Перевірка квитка на вході (без відмітки)
+
+    Returns:
+        tuple: (valid, error, ticket|None) - ticket з подією і профілем одним запитом
+    """
+    claim = resolve_qr(qr_data)
+    if claim is None:
+        return False, 'Підроблений QR код', None
+
+    ticket = _scan_queryset().filter(pk=claim.ticket_id, event_id=claim.event_id).first()
+    if ticket is None or ticket.ticket_number != claim.ticket_number:
+        return False, 'Квиток не знайдено', None
+    if ticket.status == 'used':
+        return False, f'Квиток вже використаний {ticket.used_at.strftime("%d.%m.%Y %H:%M")}', ticket
+    if ticket.status != 'confirmed':
+        return False, 'Квиток не підтверджений', ticket
+    event = ticket.event
+    if event.end_datetime and event.end_datetime < timezone.now():
+        return False, 'Івент завершений', ticket
+    return True, '', ticket
+
+
+def check_in_token(qr_data, checked_by=None):
+    """
+    Відмітити квиток одним умовним UPDATE (два сканери одночасно - успіх лише в одного)
+
+    Returns:
+        tuple: (success, message, ticket|None)
+    """
+    from .models import EventTicket
+
+    claim = resolve_qr(qr_data)
+    if claim is None:
+        return False, 'Підроблений QR код', None
+
+    now = timezone.now()
+    updated = EventTicket.objects.filter(
+        pk=claim.ticket_id, event_id=claim.event_id, ticket_number=claim.ticket_number, status='confirmed',
+    ).update(status='used', used_at=now, checked_in_by=checked_by, updated_at=now)
+
+    ticket = _scan_queryset().filter(pk=claim.ticket_id, event_id=claim.event_id).first()
+    if updated:
+        return True, 'Квиток успішно відмічений', ticket
+    if ticket is None or ticket.ticket_number != claim.ticket_number:
+        return False, 'Квиток не знайдено', None
+    if ticket.status == 'used':
+        return False, f'Квиток вже використаний {ticket.used_at.strftime("%d.%m.%Y %H:%M")}', ticket
+    return False, 'Квиток не підтверджений', ticket
+
+
+def ticket_info(ticket):
+    """Дані квитка для відповіді сканеру"""
+    return {
+        'number': ticket.ticket_number,
+        'event': ticket.event.title,
+        'user': _attendee_name(ticket),
+        'event_start': ticket.event.start_datetime.isoformat() if ticket.event.start_datetime else None,
+        'checked_in_at': ticket.used_at.isoformat() if ticket.used_at else None,
+    }
+
+
+def _bitmap(flags):
+    bits = bytearray((len(flags) + 7) // 8)
+    for index, flag in enumerate(flags):
+        if flag:
+            bits[index >> 3] |= 1 << (index & 7)
+    return base64.b64encode(bytes(bits)).decode()
+
+
+def build_manifest(event):
+    """
+    Підписаний маніфест для офлайн сканування
+
+    payload - канонічний JSON: tickets [[ticket_id, ticket_number], ...] за id і два
+    бітмапи (біт i = tickets[i], молодший біт першим): valid (confirmed/used) і used.
+    signature - HMAC-SHA256(payload) ключем події (base64); key - цей ключ для
+    перевірки токенів і маніфесту на пристрої (і підпису токенів цієї події -
+    див. межу довіри в docstring модуля).
+    """
+    from .models import EventTicket
+
+    rows = list(EventTicket.objects.filter(event_id=event.pk).order_by('id').values_list(
+        'id', 'ticket_number', 'status'
+    ))
+    payload = json.dumps({
+        'version': MANIFEST_VERSION,
+        'event_id': event.pk,
+        'generated_at': timezone.now().isoformat(),
+        'count': len(rows),
+        'tickets': [[ticket_id, number] for ticket_id, number, _ in rows],
+        'valid': _bitmap([status in ('confirmed', 'used') for _, _, status in rows]),
+        'used': _bitmap([status == 'used' for _, _, status in rows]),
+    }, separators=(',', ':'), sort_keys=True)
+
+    key = event_key(event.pk)
+    return {
+        'payload': payload,
+        'signature': base64.b64encode(hmac.new(key, payload.encode(), hashlib.sha256).digest()).decode(),
+        'key': base64.b64encode(key).decode(),
+    }
+
+
+def verify_manifest(payload, signature, key):
+    """Перевірка маніфесту (як на пристрої); key - bytes ключ події"""
+    expected = base64.b64encode(hmac.new(key, payload.encode(), hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+
+def _scan_time(value, now):
+    """Час сканування з пристрою; без часу, некоректний або з майбутнього - час вивантаження"""
+    try:
+        scanned_at = parse_datetime(value) if isinstance(value, str) else None
+    except ValueError:
+        # Формат правильний, значення ні ('2024-13-45T00:00:00')
+        scanned_at = None
+    if scanned_at is None:
+        return now
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    return min(scanned_at, now)
+
+
+def check_in_batch(event, scans, checked_by=None):
+    """
+    Вивантаження офлайн відміток сканера
+
+    Args:
+        scans: [{'token': str, 'scanned_at': iso datetime (optional)}]
+
+    Returns:
+        list: результат для кожного скану в тому ж порядку -
+        {'token', 'status': checked_in|already_used|duplicate|invalid|wrong_event|not_found|not_confirmed,
+         'ticket_number', 'used_at'}
+    """
+    from .models import EventTicket
+
+    now = timezone.now()
+    results = []
+    first_scan = {}
+    for scan in scans:
+        token = scan.get('token') if isinstance(scan, dict) else None
+        claim = verify_token(token)
+        result = {'token': token, 'status': 'invalid', 'ticket_number': None, 'used_at': None}
+        results.append(result)
+        if claim is None:
+            continue
+        result['ticket_number'] = claim.ticket_number
+        if claim.event_id != event.pk:
+            result['status'] = 'wrong_event'
+            continue
+
+        scanned_at = _scan_time(scan.get('scanned_at'), now)
+        previous = first_scan.get(claim.ticket_id)
+        if previous is not None:
+            # Той самий квиток кілька разів у пачці - зараховується найраніший скан
+            earlier, later = sorted([previous, (scanned_at, claim, result)], key=lambda item: item[0])
+            later[2]['status'] = 'duplicate'
+            first_scan[claim.ticket_id] = earlier
+            continue
+        first_scan[claim.ticket_id] = (scanned_at, claim, result)
+
+    with transaction.atomic():
+        tickets = {
+            ticket.id: ticket for ticket in EventTicket.objects.select_for_update().filter(
+                event_id=event.pk, id__in=list(first_scan)
+            ).only('id', 'ticket_number', 'status', 'used_at')
+        }
+        to_update = []
+        for ticket_id, (scanned_at, claim, result) in first_scan.items():
+            ticket = tickets.get(ticket_id)
+            if ticket is None or ticket.ticket_number != claim.ticket_number:
+                result['status'] = 'not_found'
+            elif ticket.status == 'used':
+                result['status'] = 'already_used'
+                result['used_at'] = ticket.used_at.isoformat() if ticket.used_at else None
+            elif ticket.status != 'confirmed':
+                result['status'] = 'not_confirmed'
+            else:
+                ticket.status = 'used'
+                ticket.used_at = scanned_at
+                ticket.checked_in_by = checked_by
+                ticket.updated_at = now
+                to_update.append(ticket)
+                result['status'] = 'checked_in'
+                result['used_at'] = scanned_at.isoformat()
+        EventTicket.objects.bulk_update(to_update, ['status', 'used_at', 'checked_in_by', 'updated_at'], batch_size=500)
+
+    logger.info(f"Batch check-in for event {event.pk}: {len(to_update)} of {len(results)} scans applied")
+    return results
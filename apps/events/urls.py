@@ -7,6 +7,7 @@ urlpatterns = [
     # Event listing and details
     path('', views.EventListView.as_view(), name='event_list'),
     path('calendar/', views.event_calendar_data, name='calendar_data'),
+    path('calendar.ics', views.event_calendar_ics, name='calendar_ics'),
     path('<slug:slug>/', views.EventDetailView.as_view(), name='event_detail'),
     
     # Registration actions
@@ -19,6 +20,7 @@ urlpatterns = [
     # QR code validation (for event staff)
     path('qr/validate/', views.validate_qr_code, name='validate_qr'),
     path('qr/checkin/', views.check_in_ticket, name='checkin_ticket'),
+    path('tickets/<int:ticket_id>/qr.<str:fmt>', views.ticket_qr, name='ticket_qr'),
     
     # Speakers
     path('speakers/', views.SpeakerListView.as_view(), name='speaker_list'),
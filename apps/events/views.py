@@ -3,7 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count, Avg, Sum
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
@@ -13,8 +13,13 @@ from datetime import timedelta
 import json
 
 from django.db import models as django_models
+from django.utils.cache import get_conditional_response
 from .models import Event, EventTicket, EventWaitlist, EventFeedback, Speaker, EventRegistration
+from .calendar_feed import CALENDAR_ICS_MONTHS, CalendarRangeError, feed_for_request, set_validators
 from .forms import FreeEventRegistrationForm
+from .inventory import AlreadyRegistered, SoldOut, issue_ticket
+from .tickets import can_manage_event, check_in_token, ticket_info, validate_scan
+from apps.core.counters import view_counters
 # TODO: Видалено TicketBalance - буде нова система підписок
 # # TODO: TicketBalance видалено - нова система підписок
 # from apps.subscriptions.models import TicketBalance
@@ -189,6 +194,12 @@ class EventDetailView(DetailView):
             'speakers', 'tickets__user'
         )
     
+    def get_object(self, queryset=None):
+        obj = super().get_object(queryset)
+        # Лічильник переглядів (write-behind)
+        view_counters.incr(obj, 'view_count')
+        return obj
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         event = self.object
@@ -271,35 +282,18 @@ def register_for_event(request, slug):
     tier_name = request.POST.get('tier_name', '')
     use_balance = payment_method == 'balance'
     
-    if use_balance and event.requires_subscription:
+    if (use_balance and event.requires_subscription) or event.is_free:
         # TODO: Use new subscription system ticket balance
-        # Temporarily treat as free event until new subscription system is integrated
-        ticket = EventTicket.objects.create(
-            event=event,
-            user=user,
-            status='confirmed',
-            used_balance=True,
-            tier_name=tier_name
-        )
-        
-        # Update event stats
-        event.tickets_sold += 1
-        event.save()
-        
-        messages.success(request, f'Ви успішно зареєстровані на {event.title}!')
-        return redirect('accounts:profile')
-    
-    elif event.is_free:
-        # Free event registration
-        ticket = EventTicket.objects.create(
-            event=event,
-            user=user,
-            status='confirmed',
-            tier_name=tier_name
-        )
-        
-        event.tickets_sold += 1
-        event.save()
+        # Temporarily treat balance as free event until new subscription system is integrated
+        try:
+            issue_ticket(
+                event, user, tier_name,
+                status='confirmed',
+                used_balance=use_balance and event.requires_subscription
+            )
+        except (SoldOut, AlreadyRegistered) as e:
+            messages.error(request, e.message)
+            return redirect('events:event_detail', slug=slug)
         
         messages.success(request, f'Ви успішно зареєстровані на {event.title}!')
         return redirect('accounts:profile')
@@ -367,58 +361,24 @@ def cancel_registration(request, slug):
 @csrf_exempt
 @require_POST
 def validate_qr_code(request):
-    """Validate QR code for event check-in"""
+    """Validate QR code for event check-in (підпис без БД, стан - один запит)"""
     try:
         data = json.loads(request.body)
-        qr_data = data.get('qr_data')
-        
-        if not qr_data:
-            return JsonResponse({'valid': False, 'error': 'QR дані відсутні'})
-        
-        # Decode QR data
-        try:
-            decoded_data = json.loads(qr_data)
-            ticket_id = decoded_data.get('ticket_id')
-            
-            if not ticket_id:
-                return JsonResponse({'valid': False, 'error': 'Невірний QR код'})
-            
-            ticket = EventTicket.objects.get(id=ticket_id)
-            
-            # Validate QR data
-            if not ticket.validate_qr_data(qr_data):
-                return JsonResponse({'valid': False, 'error': 'Підроблений QR код'})
-            
-            # Check ticket status
-            if ticket.status == 'used':
-                return JsonResponse({
-                    'valid': False,
-                    'error': f'Квиток вже використаний {ticket.used_at.strftime("%d.%m.%Y %H:%M")}',
-                    'used_at': ticket.used_at.isoformat()
-                })
-            
-            if ticket.status != 'confirmed':
-                return JsonResponse({'valid': False, 'error': 'Квиток не підтверджений'})
-            
-            # Check event timing
-            if not ticket.event.is_ongoing and not ticket.event.is_upcoming:
-                return JsonResponse({'valid': False, 'error': 'Івент завершений'})
-            
-            return JsonResponse({
-                'valid': True,
-                'ticket': {
-                    'number': ticket.ticket_number,
-                    'event': ticket.event.title,
-                    'user': ticket.user.profile.full_name if hasattr(ticket.user, 'profile') else ticket.user.email,
-                    'event_start': ticket.event.start_datetime.isoformat()
-                }
-            })
-            
-        except (json.JSONDecodeError, ValueError, EventTicket.DoesNotExist):
-            return JsonResponse({'valid': False, 'error': 'Квиток не знайдено'})
-        
     except json.JSONDecodeError:
         return JsonResponse({'valid': False, 'error': 'Невірний формат даних'})
+    
+    qr_data = data.get('qr_data')
+    if not qr_data:
+        return JsonResponse({'valid': False, 'error': 'QR дані відсутні'})
+    
+    valid, error, ticket = validate_scan(qr_data)
+    if not valid:
+        response = {'valid': False, 'error': error}
+        if ticket is not None and ticket.used_at:
+            response['used_at'] = ticket.used_at.isoformat()
+        return JsonResponse(response)
+    
+    return JsonResponse({'valid': True, 'ticket': ticket_info(ticket)})
 
 
 @csrf_exempt
@@ -427,80 +387,80 @@ def check_in_ticket(request):
     """Check in ticket at event"""
     try:
         data = json.loads(request.body)
-        qr_data = data.get('qr_data')
-        
-        if not qr_data:
-            return JsonResponse({'success': False, 'error': 'QR дані відсутні'})
-        
-        # Decode and find ticket
-        try:
-            decoded_data = json.loads(qr_data)
-            ticket = EventTicket.objects.get(id=decoded_data.get('ticket_id'))
-            
-            # Validate QR
-            if not ticket.validate_qr_data(qr_data):
-                return JsonResponse({'success': False, 'error': 'Підроблений QR код'})
-            
-            # Check in
-            success, message = ticket.check_in()
-            
-            if success:
-                return JsonResponse({
-                    'success': True,
-                    'message': message,
-                    'ticket': {
-                        'number': ticket.ticket_number,
-                        'user': ticket.user.profile.full_name if hasattr(ticket.user, 'profile') else ticket.user.email,
-                        'checked_in_at': ticket.used_at.isoformat()
-                    }
-                })
-            else:
-                return JsonResponse({'success': False, 'error': message})
-                
-        except (json.JSONDecodeError, ValueError, EventTicket.DoesNotExist):
-            return JsonResponse({'success': False, 'error': 'Квиток не знайдено'})
-        
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Невірний формат даних'})
+    
+    qr_data = data.get('qr_data')
+    if not qr_data:
+        return JsonResponse({'success': False, 'error': 'QR дані відсутні'})
+    
+    checked_by = request.user if request.user.is_authenticated else None
+    success, message, ticket = check_in_token(qr_data, checked_by)
+    if not success:
+        return JsonResponse({'success': False, 'error': message})
+    
+    return JsonResponse({
+        'success': True,
+        'message': message,
+        'ticket': ticket_info(ticket)
+    })
 
 
-def event_calendar_data(request):
-    """Get events data for calendar"""
-    start_date = request.GET.get('start')
-    end_date = request.GET.get('end')
-    event_type = request.GET.get('type')
-    
-    # Base queryset
-    events = Event.objects.filter(
-        status='published',
-        start_datetime__gte=start_date,
-        start_datetime__lte=end_date
+@login_required
+def ticket_qr(request, ticket_id, fmt):
+    """QR код квитка (SVG/PNG) - рендер при першому запиті, далі з кешу"""
+    from .qr import QR_FORMATS, get_qr_image, token_digest
+    
+    if fmt not in QR_FORMATS:
+        raise Http404("Невідомий формат")
+    
+    ticket = get_object_or_404(
+        EventTicket.objects.select_related('event').only('id', 'event_id', 'user_id', 'ticket_number', 'event__organizer_id'),
+        id=ticket_id
     )
+    if ticket.user_id != request.user.id and not can_manage_event(request.user, ticket.event):
+        raise Http404("Квиток не знайдено")
     
-    if event_type and event_type != 'all':
-        events = events.filter(event_type=event_type)
-    
-    # Format for calendar
-    calendar_events = []
-    for event in events:
-        calendar_events.append({
-            'id': event.id,
-            'title': event.title,
-            'start': event.start_datetime.isoformat(),
-            'end': event.end_datetime.isoformat(),
-            'url': event.get_absolute_url(),
-            'className': f'event-{event.event_type}',
-            'extendedProps': {
-                'type': event.get_event_type_display(),
-                'location': event.location,
-                'price': float(event.price) if not event.is_free else 0,
-                'isFree': event.is_free,
-                'availableTickets': event.available_tickets,
-                'isSoldOut': event.is_sold_out
-            }
-        })
-    
-    return JsonResponse(calendar_events, safe=False)
+    token = ticket.qr_token
+    etag = f'"{token_digest(token)}-{fmt}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(get_qr_image(token, fmt), content_type=QR_FORMATS[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+def event_calendar_data(request):
+    """Get events data for calendar (кешовані місячні кошики, умовний GET)"""
+    try:
+        feed = feed_for_request(request.GET)
+    except CalendarRangeError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    not_modified = get_conditional_response(request, etag=feed.etag, last_modified=feed.last_modified)
+    if not_modified is not None:
+        return set_validators(not_modified, feed)
+    return set_validators(JsonResponse(feed.events, safe=False), feed)
+
+
+def event_calendar_ics(request):
+    """iCalendar export (підписка в Google/Apple Calendar) з тих самих кошиків"""
+    try:
+        feed = feed_for_request(request.GET, default_months=CALENDAR_ICS_MONTHS)
+    except CalendarRangeError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain; charset=utf-8')
+    
+    not_modified = get_conditional_response(request, etag=feed.etag, last_modified=feed.last_modified)
+    if not_modified is not None:
+        return set_validators(not_modified, feed)
+    response = HttpResponse(
+        feed.to_ics(f'{request.scheme}://{request.get_host()}'),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'inline; filename="playvision-events.ics"'
+    return set_validators(response, feed)
 
 
 class SpeakerListView(ListView):
@@ -601,23 +561,23 @@ def event_register(request, slug):
             messages.info(request, 'Ви вже зареєстровані на цю подію')
             return redirect('events:event_detail', slug=slug)
         
-        # Check capacity
-        if event.tickets_sold >= event.max_attendees:
-            messages.error(request, 'На жаль, всі місця зайняті')
-            return redirect('events:event_detail', slug=slug)
-        
         # Get form data
         name = request.POST.get('name', request.user.get_full_name() or request.user.username)
         email = request.POST.get('email', request.user.email)
         phone = request.POST.get('phone', '')
         
-        # Create ticket
-        ticket = EventTicket.objects.create(
-            event=event,
-            user=request.user,
-            price=event.price if not event.is_free else 0,
-            ticket_number=f"EVT{event.id:04d}{request.user.id:04d}"
-        )
+        # Reserve seat + create ticket (atomic capacity check)
+        try:
+            ticket = issue_ticket(
+                event, request.user,
+                price=event.price if not event.is_free else 0,
+            )
+        except SoldOut:
+            messages.error(request, 'На жаль, всі місця зайняті')
+            return redirect('events:event_detail', slug=slug)
+        except AlreadyRegistered:
+            messages.info(request, 'Ви вже зареєстровані на цю подію')
+            return redirect('events:event_detail', slug=slug)
         
         # Create registration
         EventRegistration.objects.create(
@@ -632,10 +592,6 @@ def event_register(request, slug):
             notes=request.POST.get('expectations', '')
         )
         
-        # Update tickets sold
-        event.tickets_sold += 1
-        event.save()
-        
         messages.success(request, 'Ви успішно зареєструвалися на подію!')
         
         # If paid event, redirect to payment
@@ -674,15 +630,17 @@ def register_free_event(request, slug):
     # Форма
     form = FreeEventRegistrationForm(request.POST)
     if form.is_valid():
-        # Створюємо квиток
-        ticket = EventTicket.objects.create(
-            event=event,
-            user=user,
-            status='confirmed',
-            price=0,
-            tier_name='Безкоштовний',
-            used_balance=False
-        )
+        # Резервуємо місце і створюємо квиток
+        try:
+            ticket = issue_ticket(
+                event, user, 'Безкоштовний',
+                status='confirmed',
+                price=0,
+                used_balance=False
+            )
+        except (SoldOut, AlreadyRegistered) as e:
+            messages.error(request, e.message)
+            return redirect('events:event_detail', slug=slug)
         
         # Створюємо реєстрацію
         EventRegistration.objects.create(
@@ -694,10 +652,6 @@ def register_free_event(request, slug):
             attendee_phone=form.cleaned_data.get('attendee_phone', '')
         )
         
-        # Оновлюємо лічильник
-        event.tickets_sold += 1
-        event.save()
-        
         messages.success(request, f'Ви успішно зареєстровані на {event.title}!')
         return redirect('accounts:profile')
     
@@ -3,6 +3,9 @@ from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+import bisect
+import threading
+import time
 
 
 class LoyaltyTier(models.Model):
@@ -289,24 +292,11 @@ class PointEarningRule(models.Model):
         ₴399-1000: none=5, c/b=8, a/pro=10
         ₴1000-3000: none=10, c/b=15, a/pro=20
         ₴3000+: none=15, c/b=23, a/pro=30
-        """
-        rules = cls.objects.filter(
-            rule_type='purchase',
-            subscription_tier=user_subscription_tier,
-            is_active=True
-        ).order_by('min_amount')
-
-        for rule in rules:
-            if rule.min_amount is None:
-                continue
-
-            if amount < rule.min_amount:
-                continue
-
-            if rule.max_amount is None or amount <= rule.max_amount:
-                return rule.points
 
-        return 0
+        Перше активне правило (за min_amount), що містить суму;
+        див. PointRuleMatrix.
+        """
+        return point_rule_matrix.purchase_points(amount, user_subscription_tier)
 
     @classmethod
     def get_points_for_subscription(cls, subscription_tier: str, duration_months: int) -> int:
@@ -315,14 +305,7 @@ class PointEarningRule(models.Model):
         C/B-Vision: 1міс=15, 3міс=50, 6міс=100, 12міс=200
         A/Pro-Vision: 3міс=80, 6міс=160, 12міс=320
         """
-        rule = cls.objects.filter(
-            rule_type='subscription',
-            subscription_tier=subscription_tier,
-            subscription_duration_months=duration_months,
-            is_active=True
-        ).first()
-
-        return rule.points if rule else 0
+        return point_rule_matrix.subscription_points(subscription_tier, duration_months)
 
 
 class RedemptionOption(models.Model):
@@ -391,3 +374,160 @@ class RedemptionOption(models.Model):
         if self.requires_subscription and not has_subscription:
             return False
         return True
+
+
+# Скомпільована матриця правил нарахування
+
+LOYALTY_RULES_VERSION_KEY = 'loyalty_point_rules_version'
+
+
+class PointRuleMatrix:
+    """
+    Активні PointEarningRule, скомпільовані для O(log n) пошуку
+
+    - Покупки: для кожного tier відсортований масив меж [(сума, 0|1)] і бали
+      на кожному сегменті: (x, 0) - рівно x, (x, 1) - одразу після x
+      (max_amount включний). Перекриття діапазонів розв'язуються при
+      компіляції (перше правило за min_amount), тож пошук - один bisect.
+    - Підписки: {(tier, місяці): бали}.
+
+    Таблиці будуються один раз на процес і перезбираються, коли змінюється
+    LOYALTY_RULES_VERSION_KEY (збереження/видалення правила). Ключ
+    перевіряється не частіше VERSION_CHECK_INTERVAL секунд; у процесі, де
+    правило змінили, матриця скидається одразу.
+
+    Usage:
+        point_rule_matrix.purchase_points(Decimal('1500'), 'c_vision')  # 15
+        point_rule_matrix.purchase_points_for_prices({course.id: course.price}, tier)
+        point_rule_matrix.subscription_points('a_vision', 12)  # 320
+    """
+
+    VERSION_CHECK_INTERVAL = 1.0
+
+    _unchecked = object()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._purchase = None
+        self._subscription = None
+        self.reset()
+
+    def reset(self):
+        """
+        Позначити таблиці застарілими (наступний виклик перечитає БД)
+
+        Таблиці не обнуляються: потоки, що саме їх читають, дочитують старі,
+        а нові підміняються під lock в _ensure_fresh().
+        """
+        with self._lock:
+            self._version = self._unchecked
+            self._next_check = 0.0
+
+    # Compiling
+
+    @staticmethod
+    def _compile_purchase_tier(rules):
+        bounds = sorted(
+            {(rule.min_amount, 0) for rule in rules}
+            | {(rule.max_amount, 1) for rule in rules if rule.max_amount is not None}
+        )
+        points = []
+        for amount, after in bounds:
+            value = 0
+            for rule in rules:
+                if rule.min_amount > amount:
+                    continue
+                if (rule.max_amount is None or amount < rule.max_amount
+                        or not after and amount == rule.max_amount):
+                    value = rule.points
+                    break
+            points.append(value)
+        return bounds, points
+
+    def _load(self):
+        purchase_rules = {}
+        subscription = {}
+        # Підписки: NULL min_amount - порядок як у Meta.ordering (order, id)
+        rules = PointEarningRule.objects.filter(is_active=True).order_by('min_amount', 'order', 'id')
+        for rule in rules:
+            if rule.rule_type == 'purchase' and rule.min_amount is not None:
+                purchase_rules.setdefault(rule.subscription_tier, []).append(rule)
+            elif rule.rule_type == 'subscription':
+                key = (rule.subscription_tier, rule.subscription_duration_months)
+                subscription.setdefault(key, rule.points)
+
+        purchase = {
+            tier: self._compile_purchase_tier(tier_rules)
+            for tier, tier_rules in purchase_rules.items()
+        }
+        return purchase, subscription
+
+    def _ensure_fresh(self):
+        """Актуальні (purchase, subscription) таблиці - одна пара на весь виклик"""
+        now = time.monotonic()
+        purchase, subscription = self._purchase, self._subscription
+        if purchase is not None and now < self._next_check:
+            return purchase, subscription
+        self._next_check = now + self.VERSION_CHECK_INTERVAL
+
+        from django.core.cache import cache
+        version = cache.get(LOYALTY_RULES_VERSION_KEY)
+        if purchase is None or version != self._version:
+            purchase, subscription = self._load()
+            with self._lock:
+                self._purchase = purchase
+                self._subscription = subscription
+                self._version = version
+        return purchase, subscription
+
+    # Lookups
+
+    @staticmethod
+    def _lookup(table, amount):
+        if table is None:
+            return 0
+        bounds, points = table
+        if not isinstance(amount, Decimal):
+            amount = Decimal(str(amount))
+        index = bisect.bisect_right(bounds, (amount, 0)) - 1
+        return points[index] if index >= 0 else 0
+
+    def purchase_points(self, amount, tier='none') -> int:
+        purchase, _ = self._ensure_fresh()
+        return self._lookup(purchase.get(tier), amount)
+
+    def purchase_points_for_prices(self, prices, tier='none'):
+        """{id: ціна} -> {id: бали} (одна перевірка версії на весь набір)"""
+        purchase, _ = self._ensure_fresh()
+        table = purchase.get(tier)
+        return {key: self._lookup(table, amount) for key, amount in prices.items()}
+
+    def subscription_points(self, tier, duration_months) -> int:
+        _, subscription = self._ensure_fresh()
+        return subscription.get((tier, duration_months), 0)
+
+
+point_rule_matrix = PointRuleMatrix()
+
+
+def invalidate_point_rules():
+    """Нова версія матриці балів (викликається при зміні PointEarningRule)"""
+    from django.core.cache import cache
+
+    try:
+        cache.incr(LOYALTY_RULES_VERSION_KEY)
+    except ValueError:
+        cache.set(LOYALTY_RULES_VERSION_KEY, 1, None)
+    point_rule_matrix.reset()
+
+
+# Signals для інвалідації скомпільованої матриці балів
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+@receiver([post_save, post_delete], sender=PointEarningRule)
+def invalidate_point_rules_matrix(sender, **kwargs):
+    """Нова версія матриці при додаванні/зміні/видаленні правила"""
+    from django.db import transaction
+    transaction.on_commit(invalidate_point_rules)
@@ -1,10 +1,13 @@
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from decimal import Decimal
+import logging
 from django.contrib.auth import get_user_model
-from .models import LoyaltyAccount, PointEarningRule, RedemptionOption
+from .models import LoyaltyAccount, PointEarningRule, RedemptionOption, point_rule_matrix
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class LoyaltyService:
     """
@@ -28,7 +31,7 @@ class LoyaltyService:
 
         # Перевірити активну підписку
         try:
-            subscription = user.subscriptions.filter(status='active').first()
+            subscription = user.subscriptions.filter(status='active').select_related('plan').first()
             if not subscription:
                 return 'none'
 
@@ -145,23 +148,41 @@ class LoyaltyService:
         return success
 
     @classmethod
-    def get_points_for_course_display(cls, course_price: Decimal, user: Optional[User] = None) -> int:
+    def get_display_tier(cls, user: Optional[User]) -> str:
+        """Рівень підписки для відображення балів (запам'ятовується на об'єкті user)"""
+        if not user or not user.is_authenticated:
+            return 'none'
+        tier = getattr(user, '_loyalty_display_tier', None)
+        if tier is None:
+            tier = cls.get_user_subscription_tier(user)
+            user._loyalty_display_tier = tier
+        return tier
+
+    @classmethod
+    def get_points_for_courses_display(cls, course_prices: Dict[int, Decimal],
+                                       user: Optional[User] = None) -> Dict[int, int]:
         """
-        Отримати кількість балів для відображення на картці курсу
+        Бали для карток курсів одним викликом: {course_id: ціна} -> {course_id: бали}
+
+        Рівень підписки визначається один раз, бали - з скомпільованої
+        матриці правил (без запитів до PointEarningRule).
         """
+        if not course_prices:
+            return {}
         try:
-            if not user or not user.is_authenticated:
-                tier = 'none'
-            else:
-                tier = cls.get_user_subscription_tier(user)
-
-            return PointEarningRule.get_points_for_purchase(course_price, tier)
+            tier = cls.get_display_tier(user)
+            return point_rule_matrix.purchase_points_for_prices(course_prices, tier)
         except Exception as e:
             # Якщо таблиці немає або є проблеми з БД, повертаємо 0
-            import logging
-            logger = logging.getLogger(__name__)
             logger.warning(f"Could not get points for course display: {e}")
-            return 0
+            return {course_id: 0 for course_id in course_prices}
+
+    @classmethod
+    def get_points_for_course_display(cls, course_price: Decimal, user: Optional[User] = None) -> int:
+        """
+        Отримати кількість балів для відображення на картці курсу
+        """
+        return cls.get_points_for_courses_display({None: course_price}, user)[None]
 
     @classmethod
     def can_redeem_subscription_month(cls, user: User, tier: str = 'c_vision') -> Tuple[bool, int]:
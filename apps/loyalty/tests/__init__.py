@@ -0,0 +1 @@
+# Loyalty tests
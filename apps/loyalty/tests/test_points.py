@@ -0,0 +1,283 @@
+"""
+Test loyalty points - compiled rule matrix, batched display API, views
+"""
+import time
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.loyalty.models import PointEarningRule, point_rule_matrix
+from apps.loyalty.services import LoyaltyService
+
+
+# Матриця з PointEarningRule.get_points_for_purchase
+PURCHASE_MATRIX = [
+    # (min, max, {tier: points})
+    ('399', '1000', {'none': 5, 'c_vision': 8, 'b_vision': 8, 'a_vision': 10, 'pro_vision': 10}),
+    ('1000', '3000', {'none': 10, 'c_vision': 15, 'b_vision': 15, 'a_vision': 20, 'pro_vision': 20}),
+    ('3000', None, {'none': 15, 'c_vision': 23, 'b_vision': 23, 'a_vision': 30, 'pro_vision': 30}),
+]
+
+SUBSCRIPTION_MATRIX = {
+    'c_vision': {1: 15, 3: 50, 6: 100, 12: 200},
+    'b_vision': {1: 15, 3: 50, 6: 100, 12: 200},
+    'a_vision': {3: 80, 6: 160, 12: 320},
+    'pro_vision': {3: 80, 6: 160, 12: 320},
+}
+
+AMOUNTS = ['0', '398.99', '399', '500', '1000', '1000.01', '2999.99', '3000', '3000.01', '100000']
+
+
+@pytest.fixture
+def matrix(locmem_cache):
+    """Compiled matrix reset for each test"""
+    point_rule_matrix.reset()
+    yield point_rule_matrix
+    point_rule_matrix.reset()
+
+
+@pytest.fixture
+def rules(db):
+    created = []
+    for order, (min_amount, max_amount, tiers) in enumerate(PURCHASE_MATRIX):
+        for tier, points in tiers.items():
+            created.append(PointEarningRule.objects.create(
+                rule_type='purchase', subscription_tier=tier, points=points, order=order,
+                min_amount=Decimal(min_amount), max_amount=Decimal(max_amount) if max_amount else None,
+            ))
+    for tier, durations in SUBSCRIPTION_MATRIX.items():
+        for months, points in durations.items():
+            created.append(PointEarningRule.objects.create(
+                rule_type='subscription', subscription_tier=tier,
+                subscription_duration_months=months, points=points,
+            ))
+    return created
+
+
+def scan_purchase_points(amount, tier):
+    """Попередня реалізація get_points_for_purchase (запит + перебір правил)"""
+    rules = PointEarningRule.objects.filter(
+        rule_type='purchase', subscription_tier=tier, is_active=True
+    ).order_by('min_amount')
+    for rule in rules:
+        if rule.min_amount is None or amount < rule.min_amount:
+            continue
+        if rule.max_amount is None or amount <= rule.max_amount:
+            return rule.points
+    return 0
+
+
+def make_course(slug, price):
+    from apps.content.models import Course
+    return Course.objects.create(
+        title=f'Курс {slug}', slug=slug, description='Опис', short_description='Коротко',
+        price=price, is_published=True,
+    )
+
+
+def rule_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries if 'point_earning_rules' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestPointRuleMatrix:
+    """Compiled matrix must match the per-call rule scan"""
+
+    def test_matches_rule_scan(self, matrix, rules):
+        for tier in ['none', 'c_vision', 'b_vision', 'a_vision', 'pro_vision', 'unknown']:
+            for amount in AMOUNTS:
+                expected = scan_purchase_points(Decimal(amount), tier)
+                assert PointEarningRule.get_points_for_purchase(Decimal(amount), tier) == expected, (tier, amount)
+
+    def test_subscription_points(self, matrix, rules):
+        for tier, durations in SUBSCRIPTION_MATRIX.items():
+            for months, points in durations.items():
+                assert PointEarningRule.get_points_for_subscription(tier, months) == points
+        assert PointEarningRule.get_points_for_subscription('a_vision', 1) == 0
+        assert PointEarningRule.get_points_for_subscription('none', 12) == 0
+
+    def test_subscription_rule_order(self, matrix):
+        PointEarningRule.objects.create(
+            rule_type='subscription', subscription_tier='c_vision', subscription_duration_months=1,
+            points=20, order=2,
+        )
+        PointEarningRule.objects.create(
+            rule_type='subscription', subscription_tier='c_vision', subscription_duration_months=1,
+            points=15, order=1,
+        )
+        assert PointEarningRule.get_points_for_subscription('c_vision', 1) == 15
+
+    def test_gaps_overlaps_and_inactive(self, matrix):
+        def rule(min_amount, max_amount, points, **kwargs):
+            PointEarningRule.objects.create(
+                rule_type='purchase', points=points, min_amount=Decimal(min_amount),
+                max_amount=Decimal(max_amount) if max_amount else None, **kwargs,
+            )
+
+        rule('100', '200', 1)
+        rule('150', '500', 2)
+        rule('300', '400', 3, order=1)
+        rule('600', None, 4)
+        rule('0', None, 99, is_active=False)
+
+        for amount in ['50', '100', '150', '200', '200.01', '300', '450', '500', '550', '600', '9999']:
+            expected = scan_purchase_points(Decimal(amount), 'none')
+            assert matrix.purchase_points(Decimal(amount)) == expected, amount
+
+    def test_batch_without_queries(self, matrix, rules):
+        matrix.purchase_points(Decimal('500'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            points = matrix.purchase_points_for_prices({1: Decimal('500'), 2: Decimal('1500'), 3: 5000, 4: 10}, 'a_vision')
+        assert points == {1: 10, 2: 20, 3: 30, 4: 0}
+        assert len(ctx.captured_queries) == 0
+
+    def test_rule_edit_invalidates(self, matrix, rules, django_capture_on_commit_callbacks):
+        assert matrix.purchase_points(Decimal('500')) == 5
+
+        rule = next(r for r in rules if r.subscription_tier == 'none' and r.min_amount == Decimal('399'))
+        with django_capture_on_commit_callbacks(execute=True):
+            rule.points = 7
+            rule.save()
+        assert matrix.purchase_points(Decimal('500')) == 7
+
+        with django_capture_on_commit_callbacks(execute=True):
+            rule.delete()
+        assert matrix.purchase_points(Decimal('500')) == 0
+
+    def test_reset_during_lookup(self, matrix, rules, monkeypatch):
+        """on_commit reset() з іншого потоку між _ensure_fresh() і читанням таблиці"""
+        ensure_fresh = matrix._ensure_fresh
+
+        def fresh_then_reset():
+            tables = ensure_fresh()
+            matrix.reset()
+            return tables
+
+        monkeypatch.setattr(matrix, '_ensure_fresh', fresh_then_reset)
+        assert matrix.purchase_points(Decimal('500')) == 5
+        assert matrix.purchase_points_for_prices({1: Decimal('1500')}, 'a_vision') == {1: 20}
+        assert matrix.subscription_points('a_vision', 12) == 320
+
+    def test_other_process_bump_is_throttled(self, matrix, rules, locmem_cache, monkeypatch):
+        from apps.loyalty import models
+
+        assert matrix.purchase_points(Decimal('500')) == 5
+        PointEarningRule.objects.filter(subscription_tier='none', min_amount=Decimal('399')).update(points=9)
+        locmem_cache.set(models.LOYALTY_RULES_VERSION_KEY, 100, None)
+
+        # В межах інтервалу - без запитів до кешу та БД
+        assert matrix.purchase_points(Decimal('500')) == 5
+
+        monkeypatch.setattr(matrix, '_next_check', 0.0)
+        assert matrix.purchase_points(Decimal('500')) == 9
+
+
+@pytest.mark.django_db
+class TestPointsDisplay:
+    """Test batched display API and the pages using it"""
+
+    def test_anonymous_and_missing_user(self, matrix, rules):
+        from django.contrib.auth.models import AnonymousUser
+
+        prices = {1: Decimal('500'), 2: Decimal('3500')}
+        assert LoyaltyService.get_points_for_courses_display(prices, AnonymousUser()) == {1: 5, 2: 15}
+        assert LoyaltyService.get_points_for_courses_display(prices) == {1: 5, 2: 15}
+        assert LoyaltyService.get_points_for_courses_display({}) == {}
+        assert LoyaltyService.get_points_for_course_display(Decimal('1500')) == 10
+
+    def test_tier_resolved_once_per_user(self, matrix, rules, django_user_model, monkeypatch):
+        user = django_user_model.objects.create_user(
+            username='loyal', email='loyal@test.com', password='test123!@#'
+        )
+        calls = []
+        monkeypatch.setattr(
+            LoyaltyService, 'get_user_subscription_tier',
+            classmethod(lambda cls, u: calls.append(u) or 'c_vision')
+        )
+
+        assert LoyaltyService.get_points_for_courses_display({1: Decimal('500')}, user) == {1: 8}
+        assert LoyaltyService.get_points_for_course_display(Decimal('1500'), user) == 15
+        assert len(calls) == 1
+
+    def test_catalog_queries_do_not_grow_with_courses(self, client, matrix, rules, django_user_model, no_silk):
+        client.force_login(django_user_model.objects.create_user(
+            username='catalog', email='catalog@test.com', password='test123!@#'
+        ))
+        for i in range(12):
+            make_course(f'course-{i}', Decimal(400 + i * 300))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get('/hub/', HTTP_HX_REQUEST='true')
+        assert response.status_code == 200
+        assert len(response.context['course_points']) == 12
+        assert set(response.context['course_points'].values()) == {5, 10, 15}
+        assert response.content.decode().count('балів за покупку') == 12
+        assert len(rule_queries(ctx)) <= 1
+        subscription_queries = [q for q in ctx.captured_queries if 'FROM "subscriptions"' in q['sql']]
+        assert len(subscription_queries) <= 1
+
+    def test_course_detail(self, client, matrix, rules, no_silk):
+        course = make_course('detail', Decimal('1500'))
+        make_course('other', Decimal('500'))
+
+        response = client.get(course.get_absolute_url())
+        assert response.status_code == 200
+        assert response.context['purchase_points'] == 10
+        assert response.context['course_points'][course.id] == 10
+        content = response.content.decode()
+        assert 'Бали за покупку:' in content and '+10' in content
+        assert '+5 балів' in content  # Картка схожого курсу
+
+    def test_cart(self, client, matrix, rules, monkeypatch, no_silk):
+        from django.urls import reverse
+        from apps.cart.models import Cart
+        from apps.cart.services import CartService, SubscriptionSuggestionService
+
+        # Підказка підписки та рекомендації не стосуються балів
+        # (і посилаються на поля, яких уже немає в моделях)
+        monkeypatch.setattr(SubscriptionSuggestionService, 'should_show_suggestion', lambda *args: False)
+        monkeypatch.setattr(CartService, 'get_recommendations', lambda self: [])
+        cart = Cart.objects.create()
+        session = client.session
+        session['cart_id'] = cart.id
+        session.save()
+        first = cart.items.create(item_type='course', item_id=1, item_name='Курс 1', price=Decimal('500'))
+        second = cart.items.create(item_type='course', item_id=2, item_name='Курс 2', price=Decimal('700'))
+        cart.items.create(item_type='subscription', item_id=1, item_name='C-Vision', price=Decimal('5000'))
+
+        response = client.get(reverse('cart:cart'))
+        assert response.status_code == 200
+        assert response.context['item_points'] == {first.id: 5, second.id: 5}
+        # Бали нараховуються за суму замовлення без підписок (₴1200)
+        assert response.context['cart_points_total'] == 10
+        content = response.content.decode()
+        assert content.count('+5 балів') == 2
+        assert 'Бали лояльності' in content
+
+
+@pytest.mark.slow
+@pytest.mark.django_db
+class TestPointRuleMatrixBenchmark:
+    """get_points_for_purchase: query + scan per call vs compiled matrix"""
+
+    CALLS = 2000
+
+    def _measure(self, func):
+        amounts = [Decimal(100 + (i * 37) % 5000) for i in range(self.CALLS)]
+        tiers = ['none', 'c_vision', 'a_vision']
+        start = time.perf_counter()
+        for i, amount in enumerate(amounts):
+            func(amount, tiers[i % len(tiers)])
+        return (time.perf_counter() - start) / self.CALLS * 1_000_000
+
+    def test_lookup_latency(self, matrix, rules):
+        scan_us = self._measure(scan_purchase_points)
+        PointEarningRule.get_points_for_purchase(Decimal('500'))
+        compiled_us = self._measure(PointEarningRule.get_points_for_purchase)
+
+        print(f"\nget_points_for_purchase: rule scan {scan_us:.1f}µs, compiled matrix {compiled_us:.1f}µs "
+              f"({scan_us / compiled_us:.0f}x)")
+        assert compiled_us < scan_us
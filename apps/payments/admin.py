@@ -5,6 +5,20 @@ from django.utils import timezone
 from .models import Payment, Order, OrderItem, Coupon, CouponUsage, WebhookEvent
 
 
+class RefundRequiredFilter(admin.SimpleListFilter):
+    """Оплачені платежі, за які нічого не видано (Payment.mark_refund_required)"""
+    title = 'Потрібне повернення'
+    parameter_name = 'refund_required'
+    
+    def lookups(self, request, model_admin):
+        return [('yes', 'Так')]
+    
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(metadata__has_key='refund_required')
+        return queryset
+
+
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = [
@@ -12,7 +26,7 @@ class PaymentAdmin(admin.ModelAdmin):
         'stripe_payment_intent_id', 'created_at'
     ]
     list_filter = [
-        'status', 'payment_type', 'currency', 'created_at'
+        'status', 'payment_type', 'currency', 'created_at', RefundRequiredFilter
     ]
     search_fields = [
         'user__email', 'stripe_payment_intent_id', 'description'
@@ -10,6 +10,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 from datetime import timedelta
+import logging
 
 try:
     from liqpay import LiqPay
@@ -19,6 +20,8 @@ except ImportError:
 from .models import Payment, Order, OrderItem
 from apps.subscriptions.models import Subscription, Plan
 
+logger = logging.getLogger(__name__)
+
 
 class LiqPayService:
     """
@@ -209,25 +212,19 @@ class LiqPayService:
         """Обробка товарів після успішної оплати"""
         for item in order.items.all():
             if item.item_type == 'course':
-                self._grant_course_access(order.user, item.item_id)
+                self._grant_course_access(order.user, item.item_id, order.payment)
             elif item.item_type == 'subscription':
                 self._create_subscription(order.user, item.item_id)
             elif item.item_type == 'event_ticket':
-                self._create_event_ticket(order.user, item.item_id, order.payment)
+                tier_name = item.item_metadata.get('tier_name', '') if item.item_metadata else ''
+                self._create_event_ticket(order.user, item.item_id, order.payment, tier_name, item.price)
     
-    def _grant_course_access(self, user, course_id):
+    def _grant_course_access(self, user, course_id, payment):
         """Надання доступу до курсу"""
-        from apps.content.models import Course, UserCourseAccess
+        from apps.content.entitlements import grant_entitlement
         
-        course = Course.objects.get(id=course_id)
-        UserCourseAccess.objects.get_or_create(
-            user=user,
-            course=course,
-            defaults={
-                'granted_at': timezone.now(),
-                'access_type': 'purchased'
-            }
-        )
+        # Сигнал платежу зробить те саме після commit; тут доступ видно вже в транзакції
+        grant_entitlement(user.id, 'course', course_id, 'payment', payment.id)
     
     def _create_subscription(self, user, plan_id):
         """Створення підписки після оплати"""
@@ -249,17 +246,25 @@ class LiqPayService:
         
         return subscription
     
-    def _create_event_ticket(self, user, event_id, payment):
-        """Створення квитка на івент"""
-        from apps.events.models import Event, EventRegistration
+    def _create_event_ticket(self, user, event_id, payment, tier_name='', price=None):
+        """Створення квитка на івент (місце з резерву кошика)"""
+        from apps.events.inventory import AlreadyRegistered, SoldOut, issue_ticket
+        from apps.events.models import Event
         
         event = Event.objects.get(id=event_id)
-        EventRegistration.objects.create(
-            user=user,
-            event=event,
-            payment=payment,
-            status='confirmed'
-        )
+        try:
+            issue_ticket(
+                event, user, tier_name,
+                from_hold=True,
+                payment=payment,
+                status='confirmed',
+                price=price if price is not None else event.price
+            )
+        except AlreadyRegistered:
+            pass
+        except SoldOut:
+            logger.error(f"Event {event_id} sold out for paid order (payment {payment.id}), refund required")
+            payment.mark_refund_required('event_sold_out', event_id=event_id, tier_name=tier_name)
     
     def _award_loyalty_points(self, order):
         """Нарахування балів лояльності"""
@@ -78,6 +78,17 @@ class Payment(models.Model):
         """Mark payment as failed"""
         self.status = 'failed'
         self.save()
+    
+    def mark_refund_required(self, reason, **details):
+        """
+        Гроші отримано, але покупку не видано - потрібне повернення
+        Запис у metadata['refund_required'] (фільтр в адмінці платежів)
+        """
+        self.metadata = {
+            **(self.metadata or {}),
+            'refund_required': {'reason': reason, 'at': timezone.now().isoformat(), **details},
+        }
+        self.save(update_fields=['metadata', 'updated_at'])
 
 
 class Order(models.Model):
@@ -6,11 +6,13 @@ from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.auth import get_user_model
+import logging
 
 from .models import Payment, Order, OrderItem, WebhookEvent, Coupon, CouponUsage
 from apps.loyalty.services import LoyaltyService
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # Optional Stripe configuration
 try:
@@ -240,8 +242,9 @@ class PaymentService:
             pass
     
     def create_event_ticket(self, user, event_id, payment, tier_name='', price=None):
-        """Create event ticket"""
-        from apps.events.models import Event, EventTicket
+        """Create event ticket (місце з резерву кошика або з вільних)"""
+        from apps.events.inventory import AlreadyRegistered, SoldOut, issue_ticket
+        from apps.events.models import Event
         
         try:
             event = Event.objects.get(id=event_id)
@@ -249,21 +252,23 @@ class PaymentService:
             # Use provided price or event's default price
             ticket_price = price if price is not None else event.price
             
-            ticket = EventTicket.objects.create(
-                event=event,
-                user=user,
+            issue_ticket(
+                event, user, tier_name,
+                from_hold=True,
                 payment=payment,
                 status='confirmed',
-                tier_name=tier_name,
                 price=ticket_price
             )
             
-            # Update event ticket count
-            event.tickets_sold += 1
-            event.save()
-            
         except Event.DoesNotExist:
             pass
+        except AlreadyRegistered:
+            pass
+        except SoldOut:
+            # Оплата пройшла після закінчення резерву, а місць вже немає - потрібне повернення коштів
+            logger.error(f"Event {event_id} sold out for paid order (payment {payment.id if payment else None}), refund required")
+            if payment:
+                payment.mark_refund_required('event_sold_out', event_id=event_id, tier_name=tier_name)
     
     def get_order_payment_type(self, order):
         """Determine payment type from order items"""
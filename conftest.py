@@ -6,12 +6,65 @@ from django.conf import settings
 
 
 @pytest.fixture(scope='session')
-def django_db_setup():
-    """Setup test database"""
-    settings.DATABASES['default'] = {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': ':memory:',
+def django_db_modify_db_settings(django_db_modify_db_settings, tmp_path_factory):
+    """
+    File SQLite test DB instead of in-memory: concurrency tests (rate limit,
+    ticket inventory) need other threads' connections to see the same DB and
+    to wait on its write lock (timeout) instead of failing at once.
+    IMMEDIATE transactions take the write lock at BEGIN, so a read-then-write
+    transaction cannot deadlock with another writer.
+    """
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.setdefault('TEST', {})['NAME'] = str(tmp_path_factory.mktemp('db') / 'test.sqlite3')
+        database.setdefault('OPTIONS', {}).update({'timeout': 30, 'transaction_mode': 'IMMEDIATE'})
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup):
+    """Setup test database (file SQLite from django_db_modify_db_settings)"""
+
+
+@pytest.fixture(autouse=True)
+def discard_view_counters():
+    """Write-behind лічильники не переживають тест (flush при виході пішов би в dev БД)"""
+    yield
+    from apps.core.counters import view_counters
+    view_counters.discard()
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    """Справжній кеш замість DummyCache з development-налаштувань"""
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'playvision-test'},
     }
+    from django.core.cache import cache
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def no_silk(settings):
+    """Silk записує кожен запит у БД - прибираємо шум з підрахунку запитів"""
+    settings.MIDDLEWARE = [m for m in settings.MIDDLEWARE if 'silk' not in m]
+    return settings
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """MEDIA_ROOT у тимчасовій теці (QR коди, файли матеріалів)"""
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def user(django_user_model):
+    """Звичайний користувач"""
+    return django_user_model.objects.create_user(
+        username='user', email='user@test.com', password='test123!@#'
+    )
 
 
 @pytest.fixture
@@ -19,6 +72,7 @@ def admin_user(db):
     """Create admin user for testing"""
     from apps.accounts.models import User
     return User.objects.create_superuser(
+        username='admin',
         email='admin@test.com',
         password='test123!@#'
     )
@@ -29,7 +83,8 @@ def regular_user(db):
     """Create regular user for testing"""
     from apps.accounts.models import User
     return User.objects.create_user(
-        email='user@test.com',
+        username='regular',
+        email='regular@test.com',
         password='test123!@#'
     )
 
@@ -4,11 +4,167 @@ Custom middleware for Play Vision project
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from django.core.cache import cache
 from django.utils.deprecation import MiddlewareMixin
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from collections import namedtuple
+import math
 import time
 
 
+# Request classification (compiled once from settings)
+
+class PrefixTable:
+    """
+    Compiled path-prefix lookup
+    
+    Prefixes are bucketed by their first path segment, so a lookup is one
+    dict access plus a scan of the (usually 1-2 item) bucket, longest
+    prefix first - instead of scanning every prefix on every request.
+    """
+    
+    def __init__(self, items):
+        self._buckets = {}
+        self._root = []  # Префікси без повного першого сегмента ('/', '/ap')
+        for prefix, value in items:
+            head, sep, _ = prefix[1:].partition('/')
+            bucket = self._buckets.setdefault(head, []) if sep else self._root
+            bucket.append((prefix, value))
+        for bucket in (*self._buckets.values(), self._root):
+            bucket.sort(key=lambda item: len(item[0]), reverse=True)
+    
+    def match_all(self, path):
+        """Values of all matching prefixes, longest first"""
+        bucket = self._buckets.get(path[1:].partition('/')[0], ())
+        matches = tuple(value for prefix, value in bucket if path.startswith(prefix))
+        if self._root:
+            matches += tuple(value for prefix, value in self._root if path.startswith(prefix))
+        return matches
+    
+    def match(self, path, default=None):
+        """Value of the longest matching prefix"""
+        matches = self.match_all(path)
+        return matches[0] if matches else default
+
+
+RequestRoute = namedtuple('RequestRoute', [
+    'domain',               # 'com_ua' | 'default'
+    'is_com_ua_domain',
+    'landing_only',         # Сторінка доступна тільки на landing домені
+    'analytics_tracked',    # AnalyticsMiddleware пише PageView
+    'rate_limit_rules',     # Правила RateLimitMiddleware, longest prefix first
+    'skip_user_checks',     # API/static/HTMX-шляхи - без перевірок користувача
+    'phone_reminder',       # PhoneRegistrationMiddleware показує нагадування
+])
+
+
+class MiddlewareRouter:
+    """
+    Classifies requests for the custom middlewares in one pass
+    
+    Built once (at first use) from settings:
+        COM_UA_DOMAINS, LANDING_ONLY_PATHS, ANALYTICS_TRACKED_PATHS,
+        RATE_LIMIT_RULES, PHONE_REGISTRATION_SKIP_PATHS (+ STATIC_URL,
+        MEDIA_URL), PHONE_REMINDER_PATHS
+    
+    Usage:
+        route = classify_request(request)  # memoized on request
+        if route.analytics_tracked:
+            ...
+    """
+    
+    SETTINGS = (
+        'COM_UA_DOMAINS', 'LANDING_ONLY_PATHS', 'ANALYTICS_TRACKED_PATHS', 'RATE_LIMIT_RULES',
+        'PHONE_REGISTRATION_SKIP_PATHS', 'PHONE_REMINDER_PATHS', 'STATIC_URL', 'MEDIA_URL',
+    )
+    
+    def __init__(self, settings):
+        self.domains = {
+            host.lower(): 'com_ua'
+            for host in getattr(settings, 'COM_UA_DOMAINS', ['playvision.com.ua', 'www.playvision.com.ua'])
+        }
+        self.landing_only = frozenset(getattr(settings, 'LANDING_ONLY_PATHS', ['/submit/']))
+        self.analytics = PrefixTable(
+            (prefix, True)
+            for prefix in getattr(settings, 'ANALYTICS_TRACKED_PATHS', ['/hub/', '/events/', '/account/', '/pricing/'])
+        )
+        self.rate_limits = PrefixTable(
+            (rule.prefix, rule) for rule in build_rate_limit_rules(getattr(settings, 'RATE_LIMIT_RULES', {}))
+        )
+        skip_paths = list(getattr(settings, 'PHONE_REGISTRATION_SKIP_PATHS', ['/api/', '/htmx/']))
+        skip_paths += [url for url in (settings.STATIC_URL, settings.MEDIA_URL) if url and url.startswith('/')]
+        self.skip_user_checks = PrefixTable((prefix, True) for prefix in skip_paths)
+        self.phone_reminder = PrefixTable(
+            (prefix, True)
+            for prefix in getattr(settings, 'PHONE_REMINDER_PATHS', ['/account/', '/cabinet/', '/hub/', '/events/'])
+        )
+        
+        # Сегменти, де класифікація залежить від решти шляху ('/admin/login/',
+        # '/submit/'); для решти маршрут однаковий для всього '/<segment>/...'
+        tables = (self.analytics, self.rate_limits, self.skip_user_checks, self.phone_reminder)
+        self._segment_routes = {}
+        self._cache_segments = not any(table._root for table in tables)
+        self._deep_segments = {path[1:].partition('/')[0] for path in self.landing_only}
+        for table in tables:
+            for head, bucket in table._buckets.items():
+                if any(prefix != f'/{head}/' for prefix, _ in bucket):
+                    self._deep_segments.add(head)
+    
+    SEGMENT_CACHE_SIZE = 1024
+    
+    def classify(self, host, path):
+        domain = self.domains.get(host, 'default')
+        head, sep, _ = path[1:].partition('/')
+        if not sep or head in self._deep_segments or not self._cache_segments:
+            return self._classify(domain, path)
+        
+        route = self._segment_routes.get((domain, head))
+        if route is None:
+            route = self._classify(domain, path)
+            if len(self._segment_routes) < self.SEGMENT_CACHE_SIZE:
+                self._segment_routes[(domain, head)] = route
+        return route
+    
+    def _classify(self, domain, path):
+        return RequestRoute(
+            domain=domain,
+            is_com_ua_domain=domain == 'com_ua',
+            landing_only=path in self.landing_only,
+            analytics_tracked=self.analytics.match(path, False),
+            rate_limit_rules=self.rate_limits.match_all(path),
+            skip_user_checks=self.skip_user_checks.match(path, False),
+            phone_reminder=self.phone_reminder.match(path, False),
+        )
+
+
+_router = None
+
+
+def get_router():
+    """Process-wide MiddlewareRouter (rebuilt when routing settings change)"""
+    global _router
+    if _router is None:
+        from django.conf import settings
+        _router = MiddlewareRouter(settings)
+    return _router
+
+
+@receiver(setting_changed)
+def reset_router(setting, **kwargs):
+    global _router
+    if setting in MiddlewareRouter.SETTINGS:
+        _router = None
+
+
+def classify_request(request):
+    """RequestRoute for this request (computed once per request)"""
+    route = getattr(request, 'route', None)
+    if route is None:
+        host = request.get_host().lower().split(':')[0]
+        route = request.route = get_router().classify(host, request.path)
+    return route
+
+
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """Add security headers to all responses"""
     
@@ -40,39 +196,187 @@ class NoCacheMiddleware(MiddlewareMixin):
         return response
 
 
-class BasicRateLimitMiddleware(MiddlewareMixin):
-    """Basic rate limiting middleware"""
+# Rate limiting
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'count', 'limit', 'retry_after'])
+
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window counter on atomic cache.incr()
     
-    def process_request(self, request):
-        # Skip rate limiting for authenticated superusers
-        if request.user.is_authenticated and request.user.is_superuser:
-            return None
+    Keeps one counter per fixed window; the current estimate is
+    previous_window * (unused share of it) + current_window, so there is no
+    burst at window edges and the TTL is never extended by new hits.
+    One check = incr + get (no get/set race between gunicorn workers).
+    
+    Usage:
+        limiter = SlidingWindowRateLimiter(limit=5, window=60, scope='auth_login')
+        result = limiter.hit(ip)
+        if not result.allowed:
+            response['Retry-After'] = result.retry_after
+    """
+    
+    def __init__(self, limit, window, scope, cache_alias=None):
+        self.limit = limit
+        self.window = window
+        self.scope = scope
+        self.cache_alias = cache_alias
+    
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        from django.conf import settings
+        return caches[self.cache_alias or getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+    
+    def _key(self, ident, window_index):
+        return f"rate_limit:{self.scope}:{ident}:{window_index}"
+    
+    def _incr(self, cache, key):
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Перший запит у вікні; add() програє гонку - значить ключ вже є
+            if cache.add(key, 1, self.window * 2):
+                return 1
+            return cache.incr(key)
+    
+    def hit(self, ident, now=None):
+        """
+        Count one request and decide if it is allowed
         
-        # Get client IP
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
+        Returns:
+            RateLimitResult: allowed, count (estimated), limit, retry_after (seconds)
+        """
+        now = time.time() if now is None else now
+        window_index, elapsed = divmod(now, self.window)
+        window_index = int(window_index)
         
-        # Rate limit sensitive endpoints
-        sensitive_paths = ['/auth/login/', '/auth/register/', '/auth/password-reset/']
+        cache = self.cache
+        current = self._incr(cache, self._key(ident, window_index))
+        previous = 0
+        if current <= self.limit:
+            previous = cache.get(self._key(ident, window_index - 1), 0)
         
-        for path in sensitive_paths:
-            if request.path.startswith(path):
-                cache_key = f"rate_limit:{ip}:{path}"
-                requests = cache.get(cache_key, 0)
-                
-                if requests >= 5:  # Max 5 requests per minute
-                    return HttpResponse(
-                        'Rate limit exceeded. Please try again later.',
-                        status=429,
-                        content_type='text/plain'
-                    )
-                
-                cache.set(cache_key, requests + 1, 60)  # 1 minute window
+        weight = 1 - elapsed / self.window
+        estimated = previous * weight + current
+        if estimated <= self.limit:
+            return RateLimitResult(True, estimated, self.limit, 0)
+        
+        return RateLimitResult(False, estimated, self.limit, self._retry_after(current, previous, elapsed))
+    
+    def _retry_after(self, current, previous, elapsed):
+        """Seconds until the estimate drops below the limit (no further hits)"""
+        if current < self.limit and previous:
+            # Ще в цьому вікні: чекаємо поки "вивітриться" попереднє
+            wait = self.window * (1 - (self.limit - current) / previous) - elapsed
+        else:
+            # Поточне вікно стане попереднім і має вивітритись до limit
+            wait = (self.window - elapsed) + self.window * (1 - self.limit / current)
+        return max(1, math.ceil(wait))
+
+
+class RateLimitRule:
+    """Rate limit for one route prefix (see settings.RATE_LIMIT_RULES)"""
+    
+    def __init__(self, prefix, limit, window, methods=None, scope=None,
+                 message='Rate limit exceeded. Please try again later.', cache_alias=None):
+        self.prefix = prefix
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.message = message
+        self.limiter = SlidingWindowRateLimiter(
+            limit, window, scope or prefix.strip('/').replace('/', '_'), cache_alias
+        )
+    
+    def matches(self, request):
+        return request.path.startswith(self.prefix) and (
+            self.methods is None or request.method in self.methods
+        )
+
+
+def build_rate_limit_rules(config):
+    """
+    Build rules from {'/prefix/': {'limit': 5, 'window': 60, ...}}
+    
+    Longest prefix wins, so '/auth/login/' can override '/auth/'.
+    """
+    rules = [RateLimitRule(prefix, **options) for prefix, options in config.items()]
+    return sorted(rules, key=lambda rule: len(rule.prefix), reverse=True)
+
+
+class RateLimitMiddleware:
+    """
+    Per-route-prefix rate limiting (sliding window, atomic counters)
+    
+    Rules come from settings.RATE_LIMIT_RULES; over-limit requests get
+    429 with a Retry-After header. Authenticated superusers are not limited.
+    """
+    
+    rules_setting = 'RATE_LIMIT_RULES'
+    default_rules = {}
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.table = None
+        if self.rules_setting != 'RATE_LIMIT_RULES':
+            # Власний набір правил (не з MiddlewareRouter)
+            from django.conf import settings
+            config = getattr(settings, self.rules_setting, self.default_rules)
+            self.table = PrefixTable((rule.prefix, rule) for rule in build_rate_limit_rules(config))
+    
+    def __call__(self, request):
+        response = self.check(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+    
+    def get_rules(self, request):
+        if self.table is not None:
+            return self.table.match_all(request.path)
+        return classify_request(request).rate_limit_rules
+    
+    def check(self, request):
+        """Return 429 response if the request is over its route limit"""
+        rules = self.get_rules(request)
+        if not rules:
+            return None
         
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_superuser:
+            return None
+        
+        for rule in rules:
+            if rule.matches(request):
+                return self.apply_rule(request, rule)
         return None
+    
+    def apply_rule(self, request, rule):
+        from apps.core.services import get_client_ip
+        
+        ip = getattr(request, 'client_ip', None) or get_client_ip(request)
+        try:
+            result = rule.limiter.hit(ip)
+        except Exception:
+            # Cache backend down - не блокуємо сайт
+            return None
+        
+        if result.allowed:
+            return None
+        
+        response = HttpResponse(rule.message, status=429, content_type='text/plain')
+        response['Retry-After'] = str(result.retry_after)
+        return response
+
+
+class BasicRateLimitMiddleware(RateLimitMiddleware):
+    """Basic rate limiting middleware (auth endpoints, 5 requests per minute)"""
+    
+    rules_setting = 'BASIC_RATE_LIMIT_RULES'
+    default_rules = {
+        '/auth/login/': {'limit': 5, 'window': 60},
+        '/auth/register/': {'limit': 5, 'window': 60},
+        '/auth/password-reset/': {'limit': 5, 'window': 60},
+    }
 
 
 class PaywallMiddleware(MiddlewareMixin):
@@ -126,34 +430,36 @@ class MaintenanceMiddleware(MiddlewareMixin):
 
 
 class AnalyticsMiddleware(MiddlewareMixin):
-    """Basic analytics middleware for internal metrics"""
+    """
+    Basic analytics middleware for internal metrics
+    
+    Only enqueues a small PageViewRecord - rows are written in batches by
+    apps.analytics.services.page_view_buffer in a background thread.
+    """
     
     def process_request(self, request):
         request._start_time = time.time()
         return None
     
     def process_response(self, request, response):
-        # Log page views for important pages
-        important_paths = ['/hub/', '/events/', '/account/', '/pricing/']
-        
-        if any(request.path.startswith(path) for path in important_paths):
-            duration = getattr(request, '_start_time', None)
-            if duration:
-                duration = time.time() - duration
-            
-            # Log to analytics (simplified - would normally use Celery task)
+        # Log page views for important pages (settings.ANALYTICS_TRACKED_PATHS)
+        if classify_request(request).analytics_tracked:
             try:
-                from apps.analytics.models import PageView
-                PageView.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
+                from apps.analytics.services import page_view_buffer, PageViewRecord
+                
+                ip = self.get_client_ip(request)
+                session = getattr(request, 'session', None)
+                session_key = (session.session_key if session is not None else None) or f"ip:{ip}"
+                user = getattr(request, 'user', None)
+                
+                page_view_buffer.enqueue(PageViewRecord(
+                    user_id=user.pk if user is not None and user.is_authenticated else None,
+                    session_key=session_key,
                     path=request.path,
-                    method=request.method,
-                    status_code=response.status_code,
-                    duration=duration,
+                    ip_address=ip,
                     user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    ip_address=self.get_client_ip(request)
-                )
-            except:
+                ))
+            except Exception:
                 # Fail silently - analytics shouldn't break the site
                 pass
         
@@ -203,42 +509,56 @@ class CountryDetectionMiddleware:
         return response
 
 
-class AdminRateLimitMiddleware:
+class AdminRateLimitMiddleware(RateLimitMiddleware):
     """
     Rate limit admin login attempts to prevent brute force
     Max 5 attempts per 15 minutes per IP
     """
     
-    def __init__(self, get_response):
-        self.get_response = get_response
-    
-    def __call__(self, request):
-        from django.http import HttpResponseForbidden
-        
-        # Only check admin login POST requests
-        if request.path.startswith('/admin/login/') and request.method == 'POST':
-            from apps.core.services import get_client_ip
-            
-            ip = get_client_ip(request)
-            cache_key = f"admin_login_attempts:{ip}"
-            
-            attempts = cache.get(cache_key, 0)
-            
-            if attempts >= 5:
-                return HttpResponseForbidden(
-                    "Too many login attempts. Please try again in 15 minutes."
-                )
-            
-            # Increment counter
-            cache.set(cache_key, attempts + 1, 900)  # 15 minutes TTL
-        
-        return self.get_response(request)
+    rules_setting = 'ADMIN_RATE_LIMIT_RULES'
+    default_rules = {
+        '/admin/login/': {
+            'limit': 5,
+            'window': 900,
+            'methods': ['POST'],
+            'scope': 'admin_login',
+            'message': 'Too many login attempts. Please try again in 15 minutes.',
+        },
+    }
 
 
 class PhoneRegistrationMiddleware(MiddlewareMixin):
-    """Middleware for handling phone-only registration limits and reminders"""
+    """
+    Middleware for handling phone-only registration limits and reminders
+    
+    Skips non-HTML requests (/api/, static, media, HTMX fragments) before
+    touching request.user. The reminder is shown on PHONE_REMINDER_PATHS at
+    most once per PHONE_REMINDER_TTL seconds - tracked by a session flag
+    instead of reading back the message storage.
+    
+    Must be placed after MessageMiddleware.
+    """
+    
+    REMINDER_SESSION_KEY = 'phone_reminder_next_at'
+    
+    def __init__(self, get_response):
+        from django.conf import settings
+        
+        super().__init__(get_response)
+        self.reminder_ttl = getattr(settings, 'PHONE_REMINDER_TTL', 3600)
+    
+    def is_html_request(self, request):
+        """Full-page request (not API, static file or HTMX fragment)"""
+        if classify_request(request).skip_user_checks:
+            return False
+        meta = request.META
+        if meta.get('HTTP_HX_REQUEST') and not meta.get('HTTP_HX_BOOSTED'):
+            return False
+        return True
     
     def process_request(self, request):
+        if not self.is_html_request(request):
+            return None
         # Check phone registration limits before processing request
         if request.user.is_authenticated:
             return self.handle_phone_registration_limits(request)
@@ -264,39 +584,32 @@ class PhoneRegistrationMiddleware(MiddlewareMixin):
             return redirect('accounts:login')
         
         # Add reminder message ONLY for phone-only registration users
-        if user.needs_email_verification:
+        # Only show on specific pages to avoid spam
+        if user.needs_email_verification and classify_request(request).phone_reminder:
+            now = time.time()
+            if request.session.get(self.REMINDER_SESSION_KEY, 0) > now:
+                return None
+            
             from django.contrib import messages
             days_left = 3 - user.days_since_phone_registration
-            
-            # Check if we haven't already added this message
-            storage = messages.get_messages(request)
-            existing_messages = [str(m) for m in storage]
-            reminder_exists = any('Додайте email' in msg for msg in existing_messages)
-            
-            # Only show on specific pages to avoid spam
-            show_on_pages = ['/account/', '/cabinet/', '/hub/', '/events/']
-            should_show = any(request.path.startswith(page) for page in show_on_pages)
-            
-            if not reminder_exists and should_show:
-                messages.warning(request, 
-                    f'⚠️ Додайте email в особистому кабінеті та підтвердіть його. '
-                    f'Залишилось днів: {days_left}')
+            messages.warning(request, 
+                f'⚠️ Додайте email в особистому кабінеті та підтвердіть його. '
+                f'Залишилось днів: {days_left}')
+            request.session[self.REMINDER_SESSION_KEY] = now + self.reminder_ttl
         
         return None
 
 
 class DomainRoutingMiddleware:
-    """Визначає тип домену та встановлює прапор"""
+    """Визначає тип домену та встановлює прапор (і request.route для інших middleware)"""
     
     def __init__(self, get_response):
         self.get_response = get_response
+        get_router()  # Компілюємо таблицю при старті, а не на першому запиті
     
     def __call__(self, request):
-        host = request.get_host().lower().split(':')[0]
-        
-        com_ua_domains = ['playvision.com.ua', 'www.playvision.com.ua']
-        is_com_ua_domain = host in com_ua_domains
-        request.is_com_ua_domain = is_com_ua_domain
+        route = classify_request(request)
+        request.is_com_ua_domain = route.is_com_ua_domain
         
         return self.get_response(request)
 
@@ -313,12 +626,10 @@ class LandingDomainRestrictionMiddleware:
     def __call__(self, request):
         from django.http import Http404
         
-        is_com_ua_domain = getattr(request, 'is_com_ua_domain', False)
-        path = request.path
+        route = classify_request(request)
         
-        # Блокуємо /submit/ тільки на НЕ landing доменах
-        if not is_com_ua_domain:
-            if path == '/submit/':
-                raise Http404("Ця сторінка недоступна на даному домені")
+        # Блокуємо /submit/ тільки на НЕ landing доменах (settings.LANDING_ONLY_PATHS)
+        if route.landing_only and not route.is_com_ua_domain:
+            raise Http404("Ця сторінка недоступна на даному домені")
         
         return self.get_response(request)
@@ -71,9 +71,9 @@ MIDDLEWARE = [
     'playvision.middleware.LandingDomainRestrictionMiddleware',  # Landing domain access control
     'apps.core.services.RequestContextMiddleware',  # Request context for signals
     'playvision.middleware.CountryDetectionMiddleware',  # GeoIP detection
-    'playvision.middleware.AdminRateLimitMiddleware',  # Admin security
-    'playvision.middleware.PhoneRegistrationMiddleware',
+    'playvision.middleware.RateLimitMiddleware',  # Admin/auth brute force protection (RATE_LIMIT_RULES)
     'django.contrib.messages.middleware.MessageMiddleware',
+    'playvision.middleware.PhoneRegistrationMiddleware',  # AFTER messages
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
 ]
@@ -93,16 +93,31 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
                 'django.template.context_processors.static',
-                'apps.events.context_processors.event_categories_menu',
-                'apps.cart.context_processors.cart_context',
-                'apps.cms.context_processors.site_content',
-                'apps.core.context_processors.external_urls',
-                'apps.landing.context_processors.analytics',  # Analytics pixels
+                'apps.core.context_processors.site_context',  # Lazy site-wide data
             ],
         },
     },
 ]
 
+# Lazy per-request site context (apps.core.context_processors.site_context)
+# provider -> ключі, які він повертає. Provider викликається тільки коли
+# template використовує один з його ключів, і не більше одного разу за запит.
+SITE_CONTEXT_PROVIDERS = {
+    'apps.events.context_processors.event_categories_menu': ['event_categories_menu'],
+    'apps.cart.context_processors.cart_context': ['cart_items_count', 'cart_total_amount'],
+    'apps.cms.context_processors.country_context': ['country_code', 'is_ukraine'],
+    'apps.cms.context_processors.theme_context': ['theme'],
+    'apps.cms.context_processors.hero_slides_context': ['cms_hero_slides'],
+    'apps.cms.context_processors.experts_home_context': ['cms_experts', 'cms_experts_home'],
+    'apps.cms.context_processors.experts_about_context': ['cms_experts_about'],
+    'apps.cms.context_processors.experts_mentoring_context': ['cms_experts_mentoring'],
+    'apps.cms.context_processors.main_courses_context': ['main_courses'],
+    'apps.core.context_processors.external_urls': [
+        'external_auth_url', 'external_join_url_default', 'BUNNY_LIBRARY_ID',
+    ],
+    'apps.landing.context_processors.analytics': ['GOOGLE_ANALYTICS_ID', 'FACEBOOK_PIXEL_ID'],  # Analytics pixels
+}
+
 WSGI_APPLICATION = 'playvision.wsgi.application'
 
 # Database
@@ -113,12 +128,34 @@ DATABASES = {
     }
 }
 
-# Cache - Simple DatabaseCache (NO REDIS!)
+# Cache - per-process LRU in front of shared DatabaseCache (NO REDIS!)
+# Локальний рівень живе LOCAL_TIMEOUT секунд; cache.delete()/incr() в одному воркері
+# прибирає лише цей ключ з локальних рівнів усіх воркерів (журнал інвалідацій у 'shared').
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'BACKEND': 'apps.core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_TIMEOUT': 10,
+            'LOCAL_MAX_ENTRIES': 2000,
+            'VERSION_CHECK_INTERVAL': 1,
+            # Лічильники та журнали, які змінюються з кожним запитом - тільки shared
+            'LOCAL_EXCLUDE_PREFIXES': [
+                'rate_limit:',
+                'admin_login_attempts:',
+                'video_access',
+                'user_ips_',
+                'security_incident_',
+                # Запит на flush лічильників (set() не розсилається воркерам)
+                'view_counters_',
+            ],
+        },
+    },
+    'shared': {
+        # DatabaseCache з атомарним incr() (лічильники rate limit)
+        'BACKEND': 'apps.core.cache.AtomicDatabaseCache',
         'LOCATION': 'django_cache_table',
-    }
+    },
 }
 
 # Password validation
@@ -326,3 +363,64 @@ SENDPULSE_ADDRESS_BOOK_SUBSCRIPTION = config('SENDPULSE_ADDRESS_BOOK_SUBSCRIPTIO
 # Analytics (Google Analytics & Facebook Pixel)
 GOOGLE_ANALYTICS_ID = config('GOOGLE_ANALYTICS_ID', default='')
 FACEBOOK_PIXEL_ID = config('FACEBOOK_PIXEL_ID', default='')
+
+# Internal page-view analytics (AnalyticsMiddleware -> batched bulk_create)
+ANALYTICS_PAGEVIEW_BATCH_SIZE = config('ANALYTICS_PAGEVIEW_BATCH_SIZE', default=200, cast=int)
+ANALYTICS_PAGEVIEW_FLUSH_MS = config('ANALYTICS_PAGEVIEW_FLUSH_MS', default=1000, cast=int)
+ANALYTICS_PAGEVIEW_MAX_QUEUE = config('ANALYTICS_PAGEVIEW_MAX_QUEUE', default=10000, cast=int)
+
+# Write-behind view counters (apps.core.counters) - F() UPDATE пачкою замість save() на перегляд
+VIEW_COUNTERS_FLUSH_INTERVAL = config('VIEW_COUNTERS_FLUSH_INTERVAL', default=30, cast=int)
+VIEW_COUNTERS_MAX_PENDING = config('VIEW_COUNTERS_MAX_PENDING', default=1000, cast=int)
+
+# Завантаження матеріалів (apps.core.downloads): '' - потік з Django з Range,
+# 'x-accel-redirect' (nginx: internal location DOWNLOAD_ACCEL_PREFIX -> MEDIA_ROOT) або 'x-sendfile'
+DOWNLOAD_OFFLOAD = config('DOWNLOAD_OFFLOAD', default='')
+DOWNLOAD_ACCEL_PREFIX = config('DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
+
+# Резерв місця на подію в кошику (apps.events.inventory), хвилин
+TICKET_HOLD_MINUTES = config('TICKET_HOLD_MINUTES', default=15, cast=int)
+
+# Ключ підпису QR квитків (apps.events.tickets); порожній - SECRET_KEY.
+# Зміна ключа робить недійсними всі видані QR коди.
+TICKET_SIGNING_KEY = config('TICKET_SIGNING_KEY', default='')
+
+# Номери квитків (apps.events.numbering): скільки значень лічильника процес резервує одним запитом
+TICKET_NUMBER_BLOCK_SIZE = config('TICKET_NUMBER_BLOCK_SIZE', default=50, cast=int)
+
+# Календар подій (apps.events.calendar_feed): скільки секунд живе місячний кошик
+# (доступність квитків у календарі оновлюється не рідше)
+CALENDAR_FEED_TTL = config('CALENDAR_FEED_TTL', default=300, cast=int)
+
+# Course catalog search (apps.content.search)
+COURSE_SEARCH_CONFIG = 'simple'  # Postgres text search config (немає вбудованої української)
+COURSE_SEARCH_MAX_RESULTS = 500  # Скільки найрелевантніших курсів повертає in-process індекс
+
+# Middleware route table (playvision.middleware.MiddlewareRouter) - compiled once at startup
+# Разом з RATE_LIMIT_RULES та PHONE_* нижче
+COM_UA_DOMAINS = ['playvision.com.ua', 'www.playvision.com.ua']
+LANDING_ONLY_PATHS = ['/submit/']  # Тільки на landing (com.ua) доменах, точний збіг
+ANALYTICS_TRACKED_PATHS = ['/hub/', '/events/', '/account/', '/pricing/']
+
+# Rate limiting (playvision.middleware.RateLimitMiddleware) - sliding window per IP
+# {'/path/prefix/': {'limit': N, 'window': seconds, 'methods': [...], 'scope': ..., 'message': ...}}
+# Перевищення ліміту - 429 з Retry-After (раніше адмін-ліміт відповідав 403).
+# Ліміти /auth/* нові: до цього BasicRateLimitMiddleware не був підключений.
+RATE_LIMIT_CACHE = 'default'
+RATE_LIMIT_RULES = {
+    '/admin/login/': {
+        'limit': 5,
+        'window': 900,
+        'methods': ['POST'],
+        'scope': 'admin_login',
+        'message': 'Too many login attempts. Please try again in 15 minutes.',
+    },
+    '/auth/login/': {'limit': 5, 'window': 60, 'methods': ['POST']},
+    '/auth/register/': {'limit': 5, 'window': 60, 'methods': ['POST']},
+    '/auth/password-reset/': {'limit': 5, 'window': 60, 'methods': ['POST']},
+}
+
+# Phone-only registration reminder (playvision.middleware.PhoneRegistrationMiddleware)
+PHONE_REMINDER_PATHS = ['/account/', '/cabinet/', '/hub/', '/events/']
+PHONE_REMINDER_TTL = 3600  # Нагадування не частіше ніж раз на годину
+PHONE_REGISTRATION_SKIP_PATHS = ['/api/', '/htmx/']